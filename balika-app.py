@@ -11,88 +11,71 @@
 # ==============================================================================
 import streamlit as st
 import sqlite3
-import pandas as pd
 from datetime import datetime, timedelta
 import hashlib
-import json
-import random
+import math
 import time
 import io
 import base64
 import os
+from contextlib import ExitStack
+from dataclasses import replace
 
-# --- PROTECTION MODULES OPTIONNELS ---
-try:
-    import plotly.express as px
-    import plotly.graph_objects as go
-    PLOTLY_AVAILABLE = True
-except ImportError:
-    PLOTLY_AVAILABLE = False
+from balika.archive import ARCHIVE_DIR, KEEP_MONTHS, ArchiveError, ArchiveStore
+from balika.audit import ACTIONS as AUDIT_ACTIONS, AuditLogger
+from balika.backup import SNAPSHOT_DIR, BackupError, create_snapshot, list_snapshots, restore_snapshot
+from balika.credit import aging_columns
+from balika.dates import day_bounds, last_days, today_bounds
+from balika.db import Database
+from balika.importer import TEMPLATE, rejected_csv
+from balika.messaging import MAX_LENGTH as MSG_MAX_LENGTH
+from balika.outbox import Outbox, SyncWorker
+from balika.paging import COUNT_CAP, build_filter, count_estimate, fetch_page, fetch_page_many
+from balika.replenish import purchase_csv
+from balika.schema import create_tables, migrate
+from balika.services import (AccountSuspended, BarcodeTaken, CartLine, DebtError, ImportFileError, InvalidCredentials,
+                             MessageError, ReturnError, Services, StockError, UserExists)
+from balika.shards import ShardRouter
+from balika.telemetry import Telemetry
+
+# --- PROTECTION MODULES OPTIONNELS (imports paresseux : seules les pages qui tracent ou tabulent les chargent) ---
+def lazy_pandas():
+    import pandas as pd
+    return pd
+
+def lazy_plotly():
+    try:
+        import plotly.express as px
+    except ImportError:
+        return None
+    return px
 
 # ------------------------------------------------------------------------------
 # 1. ARCHITECTURE DE LA BASE DE DONNÉES (v650)
 # ------------------------------------------------------------------------------
 DB_FILE = "balika_v650_master.db"
+# BALIKA_STORAGE=shards : catalogue central + un fichier par boutique (balika.shards)
+STORAGE = os.environ.get("BALIKA_STORAGE", "single")
+CATALOG_FILE = os.environ.get("BALIKA_CATALOG", "balika_catalog.db")
+SHARD_DIR = os.environ.get("BALIKA_SHARD_DIR", "balika_shards")
+# Terminal CAISSE hors ligne (BALIKA_TERMINAL) : ventes, dettes et dépenses écrites en local puis
+# poussées en tâche de fond vers l'ingestion centrale BALIKA_SYNC_URL (balika.outbox, balika.ingest)
+TERMINAL_ID = os.environ.get("BALIKA_TERMINAL", "")
+SYNC_URL = os.environ.get("BALIKA_SYNC_URL", "")
+SNAPSHOT_KEEP = int(os.environ.get("BALIKA_BACKUP_KEEP", "7"))
+# Mois clos sortis de la base vivante : un fichier compressé par boutique et par mois (balika.archive)
+ARCHIVE_ROOT = os.environ.get("BALIKA_ARCHIVE_DIR", ARCHIVE_DIR)
+# MESSAGERIE : la boîte de réception se rafraîchit seule toutes les BALIKA_MSG_POLL secondes
+MSG_POLL_S = int(os.environ.get("BALIKA_MSG_POLL", "15"))
+INBOX_KEEP = 100
 
-def init_master_db():
-    with sqlite3.connect(DB_FILE) as conn:
+def init_master_db(db):
+    with db.write() as conn:
         cursor = conn.cursor()
         
-        # Configuration Système
-        cursor.execute("""CREATE TABLE IF NOT EXISTS system_config (
-            id INTEGER PRIMARY KEY, app_name TEXT, marquee TEXT, version TEXT, 
-            theme_id TEXT DEFAULT 'Cobalt', marquee_active INTEGER DEFAULT 1,
-            broadcast_msg TEXT DEFAULT 'Bienvenue sur le réseau Balika')""")
-        
-        # Utilisateurs & Profils
-        cursor.execute("""CREATE TABLE IF NOT EXISTS users (
-            uid TEXT PRIMARY KEY, pwd TEXT, role TEXT, shop TEXT, status TEXT, 
-            name TEXT, tel TEXT, photo_url TEXT DEFAULT '', created_at TEXT,
-            last_login TEXT)""")
-        
-        # Boutiques & Paramètres
-        cursor.execute("""CREATE TABLE IF NOT EXISTS shops (
-            sid TEXT PRIMARY KEY, name TEXT, owner TEXT, rate REAL DEFAULT 2800.0, 
-            head TEXT DEFAULT 'BIENVENUE CHEZ BALIKA', addr TEXT, tel TEXT, 
-            rccm TEXT, idnat TEXT, currency_pref TEXT DEFAULT 'USD',
-            closing_balance REAL DEFAULT 0.0)""")
-        
-        # Inventaire & Catégories
-        cursor.execute("""CREATE TABLE IF NOT EXISTS inventory (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, item TEXT, qty INTEGER, 
-            buy_price REAL, sell_price REAL, sid TEXT, category TEXT DEFAULT 'GÉNÉRAL',
-            min_stock INTEGER DEFAULT 5, last_restock TEXT)""")
-        
-        # Ventes & Transactions
-        cursor.execute("""CREATE TABLE IF NOT EXISTS sales (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, ref TEXT, cli TEXT, total_usd REAL, 
-            paid_usd REAL, rest_usd REAL, date TEXT, time TEXT, seller TEXT, 
-            sid TEXT, items_json TEXT, currency TEXT, profit REAL, status TEXT DEFAULT 'VALIDÉ')""")
-        
-        # Retours Produits
-        cursor.execute("""CREATE TABLE IF NOT EXISTS returns (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, sale_ref TEXT, item TEXT, qty INTEGER, 
-            reason TEXT, date TEXT, sid TEXT, refund_amount REAL)""")
-        
-        # Dettes & Crédits
-        cursor.execute("""CREATE TABLE IF NOT EXISTS debts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, cli TEXT, balance REAL, 
-            sale_ref TEXT, sid TEXT, status TEXT DEFAULT 'OUVERT', last_update TEXT)""")
-        
-        # Dépenses Opérationnelles
-        cursor.execute("""CREATE TABLE IF NOT EXISTS expenses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, label TEXT, amount REAL, 
-            date TEXT, sid TEXT, user TEXT, category TEXT DEFAULT 'AUTRE')""")
-
-        # Journal d'Audit
-        cursor.execute("""CREATE TABLE IF NOT EXISTS audit_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT, action TEXT, 
-            details TEXT, date TEXT, time TEXT, sid TEXT)""")
-
-        # Messagerie Interne
-        cursor.execute("""CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, sender TEXT, receiver TEXT, 
-            content TEXT, date TEXT, is_read INTEGER DEFAULT 0)""")
+        # Tables v650 + migrations versionnées (index, contraintes d'unicité)
+        create_tables(cursor)
+        migrate(conn)
 
         # Initialisation Config
         cursor.execute("SELECT id FROM system_config WHERE id=1")
@@ -107,30 +90,238 @@ def init_master_db():
             cursor.execute("""INSERT INTO users (uid, pwd, role, shop, status, name, tel, created_at) 
                            VALUES (?,?,?,?,?,?,?,?)""", 
                           ('admin', admin_p, 'SUPER_ADMIN', 'SYSTEM', 'ACTIF', 'ADMINISTRATEUR', '000', datetime.now().isoformat()))
-        conn.commit()
 
-init_master_db()
+@st.cache_resource(show_spinner=False)
+def get_telemetry():
+    # Chronos pages + requêtes du processus (BALIKA_TELEMETRY=0 pour désactiver)
+    return Telemetry.from_env()
+
+TELEMETRY = get_telemetry()
+
+@st.cache_resource(show_spinner=False)
+def get_db():
+    # Pool unique partagé par toutes les sessions (un écrivain, plusieurs lecteurs) ;
+    # schéma et migrations exécutés une seule fois par processus, pas à chaque rerun.
+    # En mode partitionné, comptes et configuration vivent dans le catalogue.
+    if STORAGE == "shards":
+        db = ShardRouter(CATALOG_FILE, SHARD_DIR, telemetry=get_telemetry())
+    else:
+        db = Database(DB_FILE, telemetry=get_telemetry())
+    init_master_db(db.catalog)
+    return db
+
+DB = get_db()
 
 # ------------------------------------------------------------------------------
 # 2. FONCTIONS UTILITAIRES SÉCURISÉES
 # ------------------------------------------------------------------------------
-def get_hash(p): return hashlib.sha256(p.encode()).hexdigest()
+@st.cache_resource(show_spinner=False)
+def get_audit():
+    # Écrivain d'audit de fond partagé : file bornée, écriture par lots, vidé à l'arrêt
+    return AuditLogger(DB, batch_size=200, flush_interval=1.0, max_queue=10000, policy="block")
 
 def log_audit(u, action, details, s):
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute("""INSERT INTO audit_logs (user, action, details, date, time, sid) 
-                     VALUES (?,?,?,?,?,?)""",
-                     (u, action, details, datetime.now().strftime("%d/%m/%Y"), 
-                      datetime.now().strftime("%H:%M:%S"), s))
-        conn.commit()
+    get_audit().log(u, action, details, s)
+
+@st.cache_resource(show_spinner=False)
+def get_archive():
+    # Copies décompressées des mois archivés partagées entre sessions (cache LRU sur disque temporaire)
+    return ArchiveStore(ARCHIVE_ROOT)
+
+@st.cache_resource(show_spinner=False)
+def get_services():
+    # Couche métier importable (balika.services) : les pages ne font plus que l'affichage
+    return Services.build(DB, get_audit(), outbox=Outbox(TERMINAL_ID) if TERMINAL_ID else None, archive=get_archive())
+
+SVC = get_services()
+
+@st.cache_resource(show_spinner=False)
+def get_sync():
+    # Un seul thread d'envoi par processus, quel que soit le nombre de sessions
+    if not (TERMINAL_ID and SYNC_URL):
+        return None
+    return SyncWorker(DB, SYNC_URL, token=os.environ.get("BALIKA_SYNC_TOKEN"))
+
+SYNC = get_sync()
 
 def get_base64_bin(bin_file):
     with open(bin_file, 'rb') as f:
         data = f.read()
     return base64.b64encode(data).decode()
 
+GRID_PAGE_SIZE = 50
+
+def paged_grid(key, table, columns, where="", params=(), sorts=None, search_cols=(), row_key="id", page_size=GRID_PAGE_SIZE,
+               dbs=None):
+    # Grille paginée par clé : filtre, tri et page lus en SQL, seule la page visible est chargée.
+    # columns = [(expression SQL, libellé)] ; sorts = {libellé: expression de tri}. Retourne les lignes affichées.
+    # dbs : bases interrogées (défaut : le catalogue) ; plusieurs bases -> pages fusionnées.
+    pd = lazy_pandas()
+    sorts = sorts or {"Par défaut": row_key}
+    c_f, c_s, c_o = st.columns([3, 2, 1])
+    text = c_f.text_input("🔎 Filtrer", key=f"grid_{key}_q")
+    sort_lbl = c_s.selectbox("Trier par", list(sorts), key=f"grid_{key}_s")
+    desc = c_o.checkbox("Décroissant", value=True, key=f"grid_{key}_d")
+    w, p = build_filter(where, params, text, search_cols)
+    dbs = dbs or [DB.catalog]
+    sig = (w, tuple(p), sort_lbl, desc, len(dbs))
+    state = st.session_state.setdefault(f"grid_{key}", {'sig': sig, 'cursors': [None]})
+    if state['sig'] != sig:
+        state.update(sig=sig, cursors=[None])
+    with ExitStack() as stack:
+        conns = [stack.enter_context(db.read()) for db in dbs]
+        if len(conns) == 1:
+            rows, nxt = fetch_page(conns[0], table, [c for c, _ in columns], w, p, sorts[sort_lbl], desc,
+                                   state['cursors'][-1], page_size, key=row_key)
+        else:
+            rows, nxt = fetch_page_many(conns, table, [c for c, _ in columns], w, p, sorts[sort_lbl], desc,
+                                        state['cursors'][-1], page_size, key=row_key)
+        counts = [count_estimate(conn, table, w, p) for conn in conns]
+    total = sum(n for n, _ in counts)
+    capped = total > COUNT_CAP or any(c for _, c in counts)
+    total = min(total, COUNT_CAP)
+    st.dataframe(pd.DataFrame(rows, columns=[lbl for _, lbl in columns]), use_container_width=True, hide_index=True)
+    c_prev, c_info, c_next = st.columns([1, 2, 1])
+    c_info.caption(f"Page {len(state['cursors'])} · {total:,}{'+' if capped else ''} lignes")
+    if c_prev.button("◀ PRÉCÉDENT", key=f"grid_{key}_prev", disabled=len(state['cursors']) == 1):
+        state['cursors'].pop(); st.rerun()
+    if c_next.button("SUIVANT ▶", key=f"grid_{key}_next", disabled=nxt is None):
+        state['cursors'].append(nxt); st.rerun()
+    return rows
+
+@st.cache_data(show_spinner=False, ttl=300)
+def reorder_table(sid, n_low):
+    # Vitesses de vente sur 28 jours : recalculées au plus toutes les 5 min, ou dès qu'un article
+    # franchit le seuil (n_low, compte low_stock lu en direct, fait partie de la clé du cache)
+    return SVC.inventory.reorder_list(sid)
+
+@st.cache_data(show_spinner=False, ttl=300)
+def network_reorder_table():
+    return SVC.inventory.network_reorder()
+
+def unread_badge(uid):
+    # Compteur tenu par triggers (message_unread) : une lecture de clé primaire par rerun
+    n = SVC.messages.unread(uid)
+    st.session_state.session['msg_count'] = n
+    if n:
+        st.sidebar.caption(f"✉️ {n} message(s) non lu(s)")
+
+@st.fragment(run_every=MSG_POLL_S)
+def inbox_fragment(uid):
+    # Seul ce fragment se réexécute au rafraîchissement ; il ne lit que les messages d'id > dernier vu
+    box = st.session_state.get('inbox')
+    if box is None or box['uid'] != uid:
+        box = st.session_state['inbox'] = {'uid': uid, 'last_seen': 0, 'rows': []}
+    new = SVC.messages.since(uid, box['last_seen']) if box['last_seen'] else SVC.messages.recent(uid, INBOX_KEEP)
+    if new:
+        box['rows'] = (new[::-1] + box['rows'])[:INBOX_KEEP]
+        box['last_seen'] = new[-1].id
+    c_t, c_b = st.columns([3, 1])
+    if c_b.button("✅ TOUT MARQUER LU", key="inbox_read") and box['last_seen']:
+        SVC.messages.mark_read(uid, box['last_seen'])
+        box['rows'] = [replace(m, read=True) for m in box['rows']]
+    unread = SVC.messages.unread(uid)
+    st.session_state.session['msg_count'] = unread
+    c_t.subheader(f"📥 REÇUS · {unread} non lu(s)")
+    if not box['rows']:
+        st.info("Aucun message.")
+    for m in box['rows']:
+        with st.container(border=True):
+            st.markdown(f"{'🆕 ' if not m.read else ''}**{m.sender.upper()}** · {m.ts[:16].replace('T', ' ')}")
+            st.text(m.content)
+
+def messaging_page(uid, role, sid):
+    st.header("✉️ MESSAGERIE")
+    contacts = SVC.messages.contacts(uid, role, sid)
+    with st.form("f_msg", clear_on_submit=True):
+        to = st.selectbox("Destinataire", contacts, format_func=lambda c: f"{c[1]} ({c[0]})")
+        body = st.text_area("Message", max_chars=MSG_MAX_LENGTH)
+        if st.form_submit_button("📨 ENVOYER"):
+            try:
+                SVC.messages.send(uid, role, sid, to[0] if to else "", body)
+                st.success("Message envoyé.")
+            except MessageError as e: st.error(f"⚠️ {e}")
+    inbox_fragment(uid)
+    with st.expander("📤 ENVOYÉS"):
+        pd = lazy_pandas()
+        st.dataframe(pd.DataFrame([(m.ts[:16].replace('T', ' '), m.receiver, m.content, "✅" if m.read else "")
+                                   for m in SVC.messages.sent(uid)], columns=["Date", "À", "Message", "Lu"]),
+                     use_container_width=True, hide_index=True)
+
+def cart_add(inv_id, art):
+    # Callbacks exécutés avant le fragment : le panier affiché est déjà à jour, sans st.rerun()
+    cart = st.session_state.session['cart']
+    if inv_id in cart:
+        cart[inv_id]['q'] = min(cart[inv_id]['q'] + 1, cart[inv_id]['max'])
+    else:
+        cart[inv_id] = {'item': art.item, 'p': art.sell_price, 'q': 1, 'max': art.qty, 'buy': art.buy_price}
+    st.session_state[f"q_{inv_id}"] = cart[inv_id]['q']
+
+def cart_drop(inv_id):
+    st.session_state.session['cart'].pop(inv_id, None)
+
+@st.fragment
+def cart_fragment(sid, rate):
+    # CAISSE : recherche, panier, total et encaissement ; un ajout, une quantité ou un ❌ ne
+    # réexécutent que ce fragment. Panier = {inventory.id: {'item', 'p', 'q', 'max', 'buy'}} :
+    # prix et stock lus à l'ajout, aucune lecture de base avant la confirmation (qui revérifie le stock)
+    with TELEMETRY.page("🛒 PANIER"):
+        cart = st.session_state.session['cart']
+        devise = st.radio("MONNAIE DE PAIEMENT", ["USD", "CDF"], horizontal=True)
+        # Recherche indexée (code-barres, début de nom, plein texte), relue seulement quand le texte change
+        q_art = st.text_input("🔎 RECHERCHER / SCANNER (désignation, catégorie ou code-barres)", key="caisse_q")
+        last = st.session_state.get('caisse_found')
+        if last is None or last[0] != (sid, q_art):
+            last = st.session_state['caisse_found'] = ((sid, q_art), SVC.inventory.search(sid, q_art))
+        found = last[1]
+        sel_id = st.selectbox("RECHERCHER ARTICLE", [None] + list(found),
+                              format_func=lambda i: "---" if i is None else f"{found[i].item} [Reste: {found[i].qty}]",
+                              index=1 if q_art and found and next(iter(found.values())).barcode == q_art.strip() else 0)
+
+        if sel_id is not None:
+            st.button("➕ AJOUTER AU PANIER", on_click=cart_add, args=(sel_id, found[sel_id]))
+
+        if not cart:
+            return
+        st.markdown('<div class="cart-container">', unsafe_allow_html=True)
+        st.subheader("🛒 PANIER")
+        for inv_id, d in cart.items():
+            ca, cb, cc = st.columns([3, 2, 1])
+            ca.write(f"**{d['item']}**")
+            st.session_state.setdefault(f"q_{inv_id}", d['q'])   # quantité reprise au retour sur la page
+            d['q'] = cb.number_input("Qté", 1, d['max'], key=f"q_{inv_id}")
+            cc.button("❌", key=f"del_{inv_id}", on_click=cart_drop, args=(inv_id,))
+
+        total_usd = sum(v['p']*v['q'] for v in cart.values())
+        val_disp = total_usd if devise == "USD" else total_usd * rate
+        st.markdown(f"<div class='total-box'><span class='total-val'>{val_disp:,.0f} {devise}</span></div>", unsafe_allow_html=True)
+
+        with st.form("valid"):
+            client = st.text_input("NOM DU CLIENT", "COMPTANT").upper()
+            paye = st.number_input(f"MONTANT REÇU ({devise})", value=float(val_disp))
+            if st.form_submit_button("✅ CONFIRMER ET IMPRIMER"):
+                p_usd = paye if devise == "USD" else paye / rate
+                lines = [CartLine(inv_id, d['item'], d['q'], d['p'], d['buy']) for inv_id, d in cart.items()]
+                st.session_state.pop('caisse_found', None)   # stock relu à la prochaine recherche
+                try:
+                    # Transaction unique : contrôle + décrément du stock, référence, vente, lignes, dette
+                    sale = SVC.sales.checkout(sid, st.session_state.session['user'], lines, client, p_usd, devise)
+                except StockError as e:
+                    st.error(f"🛑 Stock insuffisant : {e}")
+                else:
+                    if SYNC is not None: SYNC.notify()
+                    st.session_state.session['viewing_invoice'] = {
+                        'ref': sale.ref, 'cli': client, 'total_val': val_disp, 'dev': devise,
+                        'items': dict(cart), 'date': datetime.now().strftime("%d/%m/%Y %H:%M")
+                    }
+                    st.session_state.session['cart'] = {}
+                    st.rerun()   # rerun complet : affichage de la facture
+        st.markdown('</div>', unsafe_allow_html=True)
+
+@st.cache_data(show_spinner=False)
 def load_sys_config():
-    with sqlite3.connect(DB_FILE) as conn:
+    # Invalidé par CONFIG SYSTÈME et BROADCAST (load_sys_config.clear())
+    with DB.catalog.read() as conn:
         return conn.execute("SELECT app_name, marquee, theme_id, marquee_active, broadcast_msg FROM system_config WHERE id=1").fetchone()
 
 # ------------------------------------------------------------------------------
@@ -150,12 +341,15 @@ SELECTED_THEME = THEMES.get(CURRENT_THEME, THEMES["Cobalt"])
 
 st.set_page_config(page_title=APP_NAME, layout="wide", initial_sidebar_state="expanded")
 
-def apply_ui():
-    st.markdown(f"""
+@st.cache_data(show_spinner=False)
+def build_css(theme_id):
+    # Feuille de style construite une fois par thème, puis servie depuis le cache
+    theme = THEMES.get(theme_id, THEMES["Cobalt"])
+    return f"""
     <style>
-        [data-testid="stAppViewContainer"] {{ background: {SELECTED_THEME['bg']}; color: white !important; }}
+        [data-testid="stAppViewContainer"] {{ background: {theme['bg']}; color: white !important; }}
         [data-testid="stHeader"] {{ background: rgba(0,0,0,0); }}
-        [data-testid="stSidebar"] {{ background-color: #000000 !important; border-right: 3px solid {SELECTED_THEME['accent']}; }}
+        [data-testid="stSidebar"] {{ background-color: #000000 !important; border-right: 3px solid {theme['accent']}; }}
         
         /* Textes & Titres */
         h1, h2, h3, h4, p, label, .stMarkdown {{ color: white !important; text-align: center; }}
@@ -166,20 +360,20 @@ def apply_ui():
         input, .stNumberInput input, .stTextInput input, .stSelectbox select {{ 
             text-align: center; border-radius: 12px !important; 
             background: #ffffff !important; color: #000000 !important; 
-            font-weight: bold; border: 2px solid {SELECTED_THEME['accent']};
+            font-weight: bold; border: 2px solid {theme['accent']};
         }}
 
         /* Marquee Professionnel */
         .marquee-container {{
             background: #000; color: #00ff00; padding: 12px; font-weight: bold;
-            border-bottom: 3px solid {SELECTED_THEME['accent']}; position: fixed; 
+            border-bottom: 3px solid {theme['accent']}; position: fixed; 
             top: 0; left: 0; width: 100%; z-index: 9999; font-family: 'Courier New', monospace;
         }}
 
         /* Panier & Facture (v192 requirement: Blanc avec texte noir) */
         .cart-container {{
             background: #ffffff !important; color: #000000 !important; padding: 25px;
-            border-radius: 20px; border: 6px solid {SELECTED_THEME['accent']}; margin: 20px 0;
+            border-radius: 20px; border: 6px solid {theme['accent']}; margin: 20px 0;
             box-shadow: 0 15px 35px rgba(0,0,0,0.6);
         }}
         .cart-container p, .cart-container h1, .cart-container h2, .cart-container h3, .cart-container span, .cart-container b, .cart-container div {{
@@ -197,7 +391,7 @@ def apply_ui():
         /* Boutons */
         .stButton > button {{
             width: 100%; height: 60px; border-radius: 15px; font-weight: bold;
-            background: linear-gradient(45deg, {SELECTED_THEME['accent']}, #004a99); 
+            background: linear-gradient(45deg, {theme['accent']}, #004a99); 
             color: white !important; border: none; transition: 0.4s;
             text-transform: uppercase; font-size: 16px;
         }}
@@ -208,11 +402,14 @@ def apply_ui():
         
         /* Stats Cards */
         .stat-card {{
-            background: rgba(255,255,255,0.1); border-left: 5px solid {SELECTED_THEME['accent']};
+            background: rgba(255,255,255,0.1); border-left: 5px solid {theme['accent']};
             padding: 20px; border-radius: 10px; margin: 10px 0;
         }}
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def apply_ui():
+    st.markdown(build_css(CURRENT_THEME), unsafe_allow_html=True)
 
 apply_ui()
 
@@ -230,48 +427,43 @@ if 'session' not in st.session_state:
 # 5. AUTHENTIFICATION (LOGIN / SIGNUP)
 # ------------------------------------------------------------------------------
 if not st.session_state.session['logged_in']:
-    if MARQUEE_ON:
-        st.markdown(f'<div class="marquee-container"><marquee>{MARQUEE_TEXT} | {B_MSG}</marquee></div><br><br><br>', unsafe_allow_html=True)
+    with TELEMETRY.page("🔑 CONNEXION"):
+        if MARQUEE_ON:
+            st.markdown(f'<div class="marquee-container"><marquee>{MARQUEE_TEXT} | {B_MSG}</marquee></div><br><br><br>', unsafe_allow_html=True)
     
-    st.markdown(f"<h1 style='font-size: 50px;'>💎 {APP_NAME}</h1>", unsafe_allow_html=True)
+        st.markdown(f"<h1 style='font-size: 50px;'>💎 {APP_NAME}</h1>", unsafe_allow_html=True)
     
-    _, col_log, _ = st.columns([0.15, 0.7, 0.15])
-    with col_log:
-        tab_log, tab_reg = st.tabs(["🔑 ACCÈS SÉCURISÉ", "📝 NOUVELLE BOUTIQUE"])
+        _, col_log, _ = st.columns([0.15, 0.7, 0.15])
+        with col_log:
+            tab_log, tab_reg = st.tabs(["🔑 ACCÈS SÉCURISÉ", "📝 NOUVELLE BOUTIQUE"])
         
-        with tab_log:
-            u_in = st.text_input("IDENTIFIANT", placeholder="ex: admin").lower().strip()
-            p_in = st.text_input("MOT DE PASSE", type="password", placeholder="••••••••")
-            if st.button("🚀 SE CONNECTER AU SYSTÈME"):
-                with sqlite3.connect(DB_FILE) as conn:
-                    res = conn.execute("SELECT pwd, role, shop, status, name FROM users WHERE uid=?", (u_in,)).fetchone()
-                    if res and get_hash(p_in) == res[0]:
-                        if res[3] == "ACTIF":
-                            st.session_state.session.update({
-                                'logged_in': True, 'user': u_in, 'role': res[1], 
-                                'shop_id': res[2], 'name': res[4]
-                            })
-                            log_audit(u_in, "CONNEXION", "Accès autorisé", res[2])
-                            st.rerun()
-                        else: st.error("🛑 Ce compte est suspendu. Contactez l'administrateur.")
-                    else: st.error("❌ Identifiants incorrects.")
+            with tab_log:
+                u_in = st.text_input("IDENTIFIANT", placeholder="ex: admin").lower().strip()
+                p_in = st.text_input("MOT DE PASSE", type="password", placeholder="••••••••")
+                if st.button("🚀 SE CONNECTER AU SYSTÈME"):
+                    try:
+                        user = SVC.auth.login(u_in, p_in)
+                    except AccountSuspended: st.error("🛑 Ce compte est suspendu. Contactez l'administrateur.")
+                    except InvalidCredentials: st.error("❌ Identifiants incorrects.")
+                    else:
+                        st.session_state.session.update({
+                            'logged_in': True, 'user': user.uid, 'role': user.role, 
+                            'shop_id': user.shop_id, 'name': user.name
+                        })
+                        st.rerun()
         
-        with tab_reg:
-            st.info("Formulaire de demande d'adhésion au réseau Balika Business.")
-            reg_uid = st.text_input("ID Utilisateur (Login)")
-            reg_shop = st.text_input("Nom de la Boutique")
-            reg_tel = st.text_input("Numéro Téléphone")
-            reg_p1 = st.text_input("Définir Mot de Passe", type="password")
-            if st.button("📩 ENVOYER MA DEMANDE"):
-                if reg_uid and reg_p1:
-                    with sqlite3.connect(DB_FILE) as conn:
+            with tab_reg:
+                st.info("Formulaire de demande d'adhésion au réseau Balika Business.")
+                reg_uid = st.text_input("ID Utilisateur (Login)")
+                reg_shop = st.text_input("Nom de la Boutique")
+                reg_tel = st.text_input("Numéro Téléphone")
+                reg_p1 = st.text_input("Définir Mot de Passe", type="password")
+                if st.button("📩 ENVOYER MA DEMANDE"):
+                    if reg_uid and reg_p1:
                         try:
-                            conn.execute("""INSERT INTO users (uid, pwd, role, shop, status, name, tel, created_at) 
-                                         VALUES (?,?,?,?,?,?,?,?)""",
-                                         (reg_uid.lower(), get_hash(reg_p1), 'GERANT', reg_uid.lower(), 'EN_ATTENTE', reg_shop, reg_tel, datetime.now().isoformat()))
-                            conn.commit()
+                            SVC.auth.register(reg_uid, reg_p1, reg_shop, reg_tel)
                             st.success("✅ Demande enregistrée ! Attendez l'activation par l'admin.")
-                        except: st.error("⚠️ Cet identifiant est déjà utilisé.")
+                        except UserExists: st.error("⚠️ Cet identifiant est déjà utilisé.")
     st.stop()
 
 # ------------------------------------------------------------------------------
@@ -280,71 +472,207 @@ if not st.session_state.session['logged_in']:
 if st.session_state.session['role'] == "SUPER_ADMIN":
     st.sidebar.title("🛡️ ADMINISTRATEUR")
     adm_nav = st.sidebar.radio("MENU GESTION", 
-        ["📊 GLOBAL DASHBOARD", "👥 ABONNÉS & BOUTIQUES", "📢 BROADCAST", "🕵️ AUDIT & SÉCURITÉ", "⚙️ CONFIG SYSTÈME", "💾 SAUVEGARDE", "🚪 QUITTER"])
+        ["📊 GLOBAL DASHBOARD", "👥 ABONNÉS & BOUTIQUES", "📢 BROADCAST", "✉️ MESSAGERIE", "🕵️ AUDIT & SÉCURITÉ", "⏱️ PERFORMANCE", "⚙️ CONFIG SYSTÈME", "💾 SAUVEGARDE", "🚪 QUITTER"])
     
-    if adm_nav == "📊 GLOBAL DASHBOARD":
-        st.header("📊 ANALYSE DU RÉSEAU")
-        with sqlite3.connect(DB_FILE) as conn:
-            total_sales = conn.execute("SELECT SUM(total_usd) FROM sales").fetchone()[0] or 0
-            total_profit = conn.execute("SELECT SUM(profit) FROM sales").fetchone()[0] or 0
-            shops_count = conn.execute("SELECT COUNT(sid) FROM shops").fetchone()[0]
-            
+    unread_badge(st.session_state.session['user'])
+
+    with TELEMETRY.page(adm_nav):
+        if adm_nav == "📊 GLOBAL DASHBOARD":
+            st.header("📊 ANALYSE DU RÉSEAU")
+            # Lecture des agrégats journaliers (daily_shop_stats) au lieu de la table sales
+            px = lazy_plotly()
+            net = SVC.reports.network_totals()
+        
             c1, c2, c3 = st.columns(3)
-            c1.metric("CHIFFRE D'AFFAIRES", f"{total_sales:,.2f} $")
-            c2.metric("PROFIT TOTAL", f"{total_profit:,.2f} $")
-            c3.metric("BOUTIQUES ACTIVES", shops_count)
-            
-            if PLOTLY_AVAILABLE:
-                df_s = pd.read_sql("SELECT sid, SUM(total_usd) as CA FROM sales GROUP BY sid", conn)
-                fig = px.pie(df_s, values='CA', names='sid', title="Répartition du Revenu par Boutique", hole=0.4)
+            c1.metric("CHIFFRE D'AFFAIRES", f"{net.revenue:,.2f} $")
+            c2.metric("PROFIT TOTAL", f"{net.profit:,.2f} $")
+            c3.metric("BOUTIQUES ACTIVES", net.shops)
+        
+            if px:
+                fig = px.pie(SVC.reports.revenue_by_shop(), values='CA', names='sid', title="Répartition du Revenu par Boutique", hole=0.4)
                 st.plotly_chart(fig, use_container_width=True)
 
-    elif adm_nav == "👥 ABONNÉS & BOUTIQUES":
-        st.header("👥 GESTION DES PARTENAIRES")
-        with sqlite3.connect(DB_FILE) as conn:
-            users = pd.read_sql("SELECT uid, name, shop, role, status, created_at FROM users WHERE uid != 'admin'", conn)
-            st.dataframe(users, use_container_width=True)
-            
-            sel_user = st.selectbox("Choisir un utilisateur", users['uid'].tolist())
+            with st.expander("📦 RÉASSORT DU RÉSEAU"):
+                net_re = network_reorder_table()
+                st.caption(f"{len(net_re):,} article(s) à commander · {net_re['Coût estimé'].sum():,.2f} $ estimés")
+                st.dataframe(net_re.drop(columns="id"), use_container_width=True, hide_index=True)
+                st.download_button("📥 BON DE COMMANDE RÉSEAU (CSV)", purchase_csv(net_re), "bon_de_commande_reseau.csv", "text/csv")
+
+        elif adm_nav == "👥 ABONNÉS & BOUTIQUES":
+            st.header("👥 GESTION DES PARTENAIRES")
+            users = paged_grid("users", "users",
+                               [("uid", "uid"), ("name", "name"), ("shop", "shop"), ("role", "role"), ("status", "status"), ("created_at", "created_at")],
+                               "uid != 'admin'", sorts={"Inscription": "COALESCE(created_at, '')", "Identifiant": "uid", "Statut": "COALESCE(status, '')"},
+                               search_cols=("uid", "name", "shop"), row_key="rowid")
+        
+            sel_user = st.selectbox("Choisir un utilisateur (page affichée)", [u[0] for u in users])
             col_a, col_b, col_c = st.columns(3)
-            if col_a.button("✅ ACTIVER COMPTE"):
-                conn.execute("UPDATE users SET status='ACTIF' WHERE uid=?", (sel_user,))
-                conn.execute("INSERT OR IGNORE INTO shops (sid, name) VALUES (?,?)", (sel_user, sel_user))
-                conn.commit(); st.rerun()
-            if col_b.button("🚫 BLOQUER COMPTE"):
-                conn.execute("UPDATE users SET status='BLOQUE' WHERE uid=?", (sel_user,))
-                conn.commit(); st.rerun()
-            if col_c.button("🗑️ SUPPRIMER TOUT"):
-                conn.execute("DELETE FROM users WHERE uid=?", (sel_user,))
-                conn.commit(); st.rerun()
-
-    elif adm_nav == "📢 BROADCAST":
-        st.header("📢 MESSAGE À TOUTES LES BOUTIQUES")
-        msg = st.text_area("Texte du message flash", B_MSG)
-        if st.button("DIFFUSER LE MESSAGE"):
-            with sqlite3.connect(DB_FILE) as conn:
-                conn.execute("UPDATE system_config SET broadcast_msg=? WHERE id=1", (msg,))
-                conn.commit(); st.success("Diffusé !")
-
-    elif adm_nav == "⚙️ CONFIG SYSTÈME":
-        st.header("⚙️ PARAMÈTRES ET APPARENCE")
-        with st.form("sys_form"):
-            new_app = st.text_input("Nom de l'ERP", APP_NAME)
-            new_marq = st.text_area("Texte Marquee", MARQUEE_TEXT)
-            new_th = st.selectbox("Thème Visuel", list(THEMES.keys()), index=list(THEMES.keys()).index(CURRENT_THEME))
-            if st.form_submit_button("SAUVEGARDER CONFIGURATION"):
-                with sqlite3.connect(DB_FILE) as conn:
-                    conn.execute("UPDATE system_config SET app_name=?, marquee=?, theme_id=? WHERE id=1", (new_app, new_marq, new_th))
-                    conn.commit(); st.rerun()
-
-    elif adm_nav == "💾 SAUVEGARDE":
-        st.header("💾 BACKUP INTÉGRAL")
-        with open(DB_FILE, "rb") as f:
-            st.download_button("📥 TÉLÉCHARGER LA BASE DE DONNÉES (.DB)", f, file_name=f"backup_balika_{datetime.now().strftime('%d_%m_%H%M')}.db")
-        st.warning("⚠️ Téléchargez régulièrement une copie pour éviter toute perte de données.")
-
-    elif adm_nav == "🚪 QUITTER":
-        st.session_state.session['logged_in'] = False; st.rerun()
+            if sel_user and col_a.button("✅ ACTIVER COMPTE"):
+                SVC.auth.activate(st.session_state.session['user'], sel_user)
+                st.rerun()
+            if sel_user and col_b.button("🚫 BLOQUER COMPTE"):
+                SVC.auth.block(st.session_state.session['user'], sel_user)
+                st.rerun()
+            if sel_user and col_c.button("🗑️ SUPPRIMER TOUT"):
+                SVC.auth.delete(st.session_state.session['user'], sel_user)
+                st.rerun()
+
+        elif adm_nav == "📢 BROADCAST":
+            st.header("📢 MESSAGE À TOUTES LES BOUTIQUES")
+            msg = st.text_area("Texte du message flash", B_MSG)
+            to_inbox = st.checkbox("✉️ Envoyer aussi dans la messagerie de chaque gérant", value=True)
+            if st.button("DIFFUSER LE MESSAGE"):
+                with DB.catalog.write() as conn:
+                    conn.execute("UPDATE system_config SET broadcast_msg=? WHERE id=1", (msg,))
+                load_sys_config.clear()
+                log_audit(st.session_state.session['user'], "BROADCAST", msg[:200], "SYSTEM")
+                try:
+                    n = SVC.messages.broadcast(st.session_state.session['user'], msg) if to_inbox else 0
+                    st.success(f"Diffusé !{f' ({n} boîte(s) de réception)' if to_inbox else ''}")
+                except MessageError as e: st.error(f"⚠️ {e}")
+
+        elif adm_nav == "✉️ MESSAGERIE":
+            messaging_page(st.session_state.session['user'], "SUPER_ADMIN", None)
+
+        elif adm_nav == "🕵️ AUDIT & SÉCURITÉ":
+            st.header("🕵️ JOURNAL D'AUDIT")
+            f1, f2, f3, f4 = st.columns(4)
+            a_period = f1.date_input("PÉRIODE", value=last_days(7), key="aud_period")
+            a_user = f2.text_input("Utilisateur", key="aud_user").lower().strip()
+            a_action = f3.selectbox("Action", ["TOUTES"] + list(AUDIT_ACTIONS), key="aud_action")
+            a_shop = f4.text_input("Boutique", key="aud_shop").lower().strip()
+            lo, hi = day_bounds(*a_period) if a_period else day_bounds(*last_days(7))
+            # Filtres d'égalité + intervalle sur ts : servis par les index (user|action|sid, ts)
+            a_where, a_params = ["ts >= ?", "ts < ?"], [lo, hi]
+            for col, val in (("user", a_user), ("action", "" if a_action == "TOUTES" else a_action), ("sid", a_shop)):
+                if val:
+                    a_where.append(f"{col} = ?"); a_params.append(val)
+            paged_grid("audit", "audit_logs",
+                       [("date", "Date"), ("time", "Heure"), ("user", "Utilisateur"), ("action", "Action"), ("details", "Détails"), ("sid", "Boutique")],
+                       " AND ".join(a_where), a_params, sorts={"Date": "ts"}, search_cols=("details",),
+                       dbs=SVC.reports.audit_bases(lo, hi, a_shop or None))
+            st.caption(f"File d'audit : {get_audit().pending()} en attente · {get_audit().dropped} perdues")
+
+        elif adm_nav == "⏱️ PERFORMANCE":
+            st.header("⏱️ PERFORMANCE DU SERVEUR")
+            if not TELEMETRY.enabled:
+                st.info("Télémétrie désactivée (BALIKA_TELEMETRY=0).")
+            else:
+                pd = lazy_pandas()
+                st.caption(f"Mesures depuis le {datetime.fromtimestamp(TELEMETRY.started).strftime('%d/%m/%Y %H:%M')} · "
+                           f"seuil requête lente {TELEMETRY.slow_ms:.0f} ms · processus {os.getpid()}")
+                st.subheader("📄 PAGES (exécution complète du script)")
+                pages = sorted(TELEMETRY.page_stats().items(), key=lambda kv: kv[1]['p95_ms'], reverse=True)
+                st.dataframe(pd.DataFrame([{"Page": n, "Reruns": s['count'], "p50 ms": round(s['p50_ms'], 1), "p95 ms": round(s['p95_ms'], 1),
+                                            "p99 ms": round(s['p99_ms'], 1), "max ms": round(s['max_ms'], 1),
+                                            "Issues": " · ".join(f"{k} {v}" for k, v in s['outcomes'].items())} for n, s in pages]),
+                             use_container_width=True, hide_index=True)
+                st.subheader("🗄️ REQUÊTES SQL")
+                crit = st.radio("Classer par", ["Temps total", "p95", "Instructions VM"], horizontal=True, key="perf_sort")
+                queries = TELEMETRY.query_stats(top=25, by={"Temps total": "total_ms", "p95": "p95_ms", "Instructions VM": "vm_steps"}[crit])
+                st.dataframe(pd.DataFrame([{"Page": q['page'], "Requête": q['sql'], "Appels": q['count'], "Total ms": round(q['total_ms'], 1),
+                                            "p50 ms": round(q['p50_ms'], 2), "p95 ms": round(q['p95_ms'], 2), "max ms": round(q['max_ms'], 1),
+                                            "VM/appel": int(q['vm_steps'])} for q in queries]),
+                             use_container_width=True, hide_index=True)
+                st.subheader(f"🐢 REQUÊTES LENTES (≥ {TELEMETRY.slow_ms:.0f} ms)")
+                slow = TELEMETRY.slow_queries()
+                if slow:
+                    st.dataframe(pd.DataFrame([{"Heure": datetime.fromtimestamp(t).strftime('%H:%M:%S'), "Page": pg, "Requête": sql,
+                                                "ms": round(ms, 1), "VM": steps} for t, pg, sql, ms, steps in slow]),
+                                 use_container_width=True, hide_index=True)
+                else: st.success("Aucune requête lente.")
+                if st.button("🔄 RÉINITIALISER LES MESURES"):
+                    TELEMETRY.reset(); st.rerun()
+
+        elif adm_nav == "⚙️ CONFIG SYSTÈME":
+            st.header("⚙️ PARAMÈTRES ET APPARENCE")
+            with st.form("sys_form"):
+                new_app = st.text_input("Nom de l'ERP", APP_NAME)
+                new_marq = st.text_area("Texte Marquee", MARQUEE_TEXT)
+                new_th = st.selectbox("Thème Visuel", list(THEMES.keys()), index=list(THEMES.keys()).index(CURRENT_THEME))
+                if st.form_submit_button("SAUVEGARDER CONFIGURATION"):
+                    with DB.catalog.write() as conn:
+                        conn.execute("UPDATE system_config SET app_name=?, marquee=?, theme_id=? WHERE id=1", (new_app, new_marq, new_th))
+                    load_sys_config.clear()
+                    log_audit(st.session_state.session['user'], "CONFIG", f"{new_app} / thème {new_th}", "SYSTEM")
+                    st.rerun()
+
+        elif adm_nav == "💾 SAUVEGARDE":
+            st.header("💾 BACKUP INTÉGRAL")
+            # Stockage partitionné : un instantané par fichier (catalogue ou boutique), rangé dans son propre dossier
+            bases = {os.path.splitext(os.path.basename(db.path))[0]: db for db in DB.databases()}
+            b_name = st.selectbox("Base", list(bases)) if len(bases) > 1 else next(iter(bases))
+            b_db = bases[b_name]
+            b_path, b_dir = b_db.path, (os.path.join(SNAPSHOT_DIR, b_name) if DB.sharded else SNAPSHOT_DIR)
+            # Instantané en ligne (API backup SQLite) : les boutiques continuent de vendre pendant la copie
+            if st.button("📸 CRÉER UN INSTANTANÉ MAINTENANT"):
+                bar = st.progress(0.0, text="Copie en cours...")
+                try:
+                    res = create_snapshot(b_path, b_dir, keep=SNAPSHOT_KEEP, progress=lambda done, total: bar.progress(done / max(total, 1), text=f"Compression {done}/{total} pages"))
+                except (BackupError, sqlite3.Error) as e:
+                    st.error(f"Échec de la sauvegarde : {e}")
+                else:
+                    bar.progress(1.0, text="Terminé")
+                    log_audit(st.session_state.session['user'], "CONFIG", f"Instantané {os.path.basename(res['path'])}", "SYSTEM")
+                    st.success(f"✅ {os.path.basename(res['path'])} : {res['bytes_raw'] / 1e6:,.1f} Mo → {res['bytes_gz'] / 1e6:,.1f} Mo en {res['seconds']:.1f} s")
+
+            snaps = list_snapshots(b_dir)
+            if snaps:
+                st.subheader(f"INSTANTANÉS CONSERVÉS ({len(snaps)}/{SNAPSHOT_KEEP})")
+                labels = {p: f"{w.strftime('%d/%m/%Y %H:%M:%S')} — {n / 1e6:,.1f} Mo" for p, n, w in snaps}
+                snap = st.selectbox("Instantané", list(labels), format_func=labels.get)
+                # Fichier ouvert passé tel quel : on ne relit pas la base, seul le .gz compressé est servi
+                with open(snap, "rb") as f:
+                    st.download_button("📥 TÉLÉCHARGER L'INSTANTANÉ (.DB.GZ)", f, file_name=os.path.basename(snap), mime="application/gzip")
+                with st.expander("♻️ RESTAURER CET INSTANTANÉ"):
+                    st.warning("⚠️ Toutes les données saisies depuis cet instantané seront perdues.")
+                    sure = st.checkbox("Je confirme la restauration", key="restore_ok")
+                    if st.button("RESTAURER", disabled=not sure):
+                        try:
+                            restore_snapshot(snap, b_path, b_db)
+                        except (BackupError, sqlite3.Error, OSError) as e:
+                            st.error(f"Échec de la restauration : {e}")
+                        else:
+                            st.cache_data.clear()
+                            log_audit(st.session_state.session['user'], "CONFIG", f"Restauration {os.path.basename(snap)}", "SYSTEM")
+                            st.success("✅ Base restaurée.")
+            else:
+                st.info("Aucun instantané pour le moment.")
+            st.warning("⚠️ Téléchargez régulièrement une copie pour éviter toute perte de données.")
+
+            # Mois clos -> un fichier compressé par boutique et par mois ; rapports et retours les relisent au besoin
+            with st.expander("🧊 ARCHIVAGE DES MOIS CLOS"):
+                pd = lazy_pandas()
+                keep = st.number_input("Mois gardés en ligne (en plus du mois en cours)", 1, 60, KEEP_MONTHS, key="arch_keep")
+                compact = st.checkbox("Compacter les bases ensuite (VACUUM)", value=True, key="arch_vacuum")
+                if st.button("🧊 ARCHIVER MAINTENANT"):
+                    done = []
+                    try:
+                        with st.spinner("Archivage en cours..."):
+                            for db in DB.databases():
+                                done += get_archive().archive_closed(db, keep)
+                                if compact:
+                                    db.vacuum()
+                    except (ArchiveError, sqlite3.Error, OSError) as e:
+                        st.error(f"Échec de l'archivage : {e}")
+                    else:
+                        log_audit(st.session_state.session['user'], "CONFIG", f"Archivage : {len(done)} mois (garder {keep})", "SYSTEM")
+                        st.success(f"✅ {len(done)} mois archivé(s), {sum(r['sales'] for r in done):,} ventes sorties de la base vivante.")
+                manifest = []
+                for db in DB.databases():
+                    with db.read() as conn:
+                        manifest += conn.execute("SELECT sid, month, sales, sale_items, returns, audit_logs, bytes FROM archive_manifest "
+                                                 "ORDER BY sid, month DESC").fetchall()
+                if manifest:
+                    st.dataframe(pd.DataFrame(manifest, columns=["Boutique", "Mois", "Ventes", "Lignes", "Retours", "Audits", "Octets"]),
+                                 use_container_width=True, hide_index=True)
+                else:
+                    st.info("Aucun mois archivé.")
+                st.caption(f"Dossier : {ARCHIVE_ROOT} · base vivante : "
+                           f"{sum(os.path.getsize(db.path) for db in DB.databases()) / 1e6:,.1f} Mo")
+
+        elif adm_nav == "🚪 QUITTER":
+            st.session_state.session['logged_in'] = False; st.rerun()
     st.stop()
 
 # ------------------------------------------------------------------------------
@@ -353,255 +681,342 @@ if st.session_state.session['role'] == "SUPER_ADMIN":
 sid = st.session_state.session['shop_id']
 role = st.session_state.session['role']
 
-with sqlite3.connect(DB_FILE) as conn:
+with DB.catalog.read() as conn:
     shop_data = conn.execute("SELECT name, rate, head, addr, tel, currency_pref, closing_balance FROM shops WHERE sid=?", (sid,)).fetchone()
-    if not shop_data:
-        conn.execute("INSERT INTO shops (sid, name) VALUES (?,?)", (sid, sid))
-        conn.commit()
-        sh_inf = (sid, 2800.0, "BIENVENUE", "", "", "USD", 0.0)
-    else: sh_inf = shop_data
+if not shop_data:
+    with DB.catalog.write() as conn:
+        conn.execute("INSERT OR IGNORE INTO shops (sid, name) VALUES (?,?)", (sid, sid))
+    sh_inf = (sid, 2800.0, "BIENVENUE", "", "", "USD", 0.0)
+else: sh_inf = shop_data
+SHOP_DB = DB.shop(sid)   # base des données de la boutique (la même que DB hors partitionnement)
 
 # Menu Boutique
 if role == "GERANT":
-    nav = ["🏠 ACCUEIL", "🛒 CAISSE", "📦 STOCK & INVENTAIRE", "📉 DETTES & CRÉDITS", "💸 DÉPENSES", "🔄 RETOURS", "📊 RAPPORTS & ANALYTICS", "👥 ÉQUIPE", "⚙️ RÉGLAGES", "🚪 DÉCONNEXION"]
+    nav = ["🏠 ACCUEIL", "🛒 CAISSE", "📦 STOCK & INVENTAIRE", "📉 DETTES & CRÉDITS", "💸 DÉPENSES", "🔄 RETOURS", "🧾 CLÔTURE DE CAISSE", "📊 RAPPORTS & ANALYTICS", "👥 ÉQUIPE", "✉️ MESSAGERIE", "⚙️ RÉGLAGES", "🚪 DÉCONNEXION"]
 else:
-    nav = ["🏠 ACCUEIL", "🛒 CAISSE", "📉 DETTES & CRÉDITS", "💸 DÉPENSES", "🔄 RETOURS", "🚪 DÉCONNEXION"]
+    nav = ["🏠 ACCUEIL", "🛒 CAISSE", "📉 DETTES & CRÉDITS", "💸 DÉPENSES", "🔄 RETOURS", "✉️ MESSAGERIE", "🚪 DÉCONNEXION"]
 
 choice = st.sidebar.radio(f"🏪 {sh_inf[0]}", nav)
+unread_badge(st.session_state.session['user'])
+if SYNC is not None:
+    sync_st = SYNC.status()
+    st.sidebar.caption(f"📡 {TERMINAL_ID} · {sync_st['depth']} en attente · retard {sync_st['lag_s']:.0f} s"
+                       + (f" · ⚠️ {sync_st['last_error']}" if sync_st['depth'] and sync_st['last_error'] else ""))
 
 # --- 7.1 ACCUEIL BOUTIQUE ---
-if choice == "🏠 ACCUEIL":
-    if MARQUEE_ON:
-        st.markdown(f'<div class="marquee-container"><marquee>{MARQUEE_TEXT} | 📢 {B_MSG}</marquee></div><br>', unsafe_allow_html=True)
+with TELEMETRY.page(choice):
+    if choice == "🏠 ACCUEIL":
+        if MARQUEE_ON:
+            st.markdown(f'<div class="marquee-container"><marquee>{MARQUEE_TEXT} | 📢 {B_MSG}</marquee></div><br>', unsafe_allow_html=True)
     
-    st.markdown(f"<h1 style='font-size:70px; margin-bottom:0;'>{datetime.now().strftime('%H:%M')}</h1>", unsafe_allow_html=True)
-    st.markdown(f"<h3>{datetime.now().strftime('%A, %d %B %Y')}</h3>", unsafe_allow_html=True)
+        st.markdown(f"<h1 style='font-size:70px; margin-bottom:0;'>{datetime.now().strftime('%H:%M')}</h1>", unsafe_allow_html=True)
+        st.markdown(f"<h3>{datetime.now().strftime('%A, %d %B %Y')}</h3>", unsafe_allow_html=True)
+    
+        # Période des tuiles (par défaut : aujourd'hui) -> intervalle sur l'index (sid, ts)
+        periode = st.date_input("PÉRIODE", value=(datetime.now().date(), datetime.now().date()), key="acc_period")
+        lo, hi = day_bounds(*periode) if periode else today_bounds()
+        lbl = "JOUR" if len(periode) != 2 or periode[0] == periode[1] else "PÉRIODE"
+        tot = SVC.reports.shop_totals(sid, lo, hi)
+    
+        v_val = tot.revenue
+        p_val = tot.profit
+        d_val = tot.expenses
     
-    with sqlite3.connect(DB_FILE) as conn:
-        today = datetime.now().strftime("%d/%m/%Y")
-        sales_j = conn.execute("SELECT SUM(total_usd), SUM(profit) FROM sales WHERE sid=? AND date=?", (sid, today)).fetchone()
-        exp_j = conn.execute("SELECT SUM(amount) FROM expenses WHERE sid=? AND date=?", (sid, today)).fetchone()
-        
-        v_val = sales_j[0] or 0
-        p_val = sales_j[1] or 0
-        d_val = exp_j[0] or 0
-        
         c1, c2 = st.columns(2)
         with c1:
-            st.markdown(f"<div class='total-box'><h3>VENTES JOUR</h3><span class='total-val'>{v_val:,.2f} $</span></div>", unsafe_allow_html=True)
+            st.markdown(f"<div class='total-box'><h3>VENTES {lbl}</h3><span class='total-val'>{v_val:,.2f} $</span></div>", unsafe_allow_html=True)
         with c2:
-            st.markdown(f"<div class='total-box' style='border-color: #ff4b4b;'><h3>DÉPENSES JOUR</h3><span class='total-val' style='color:#ff4b4b;'>{d_val:,.2f} $</span></div>", unsafe_allow_html=True)
-        
+            st.markdown(f"<div class='total-box' style='border-color: #ff4b4b;'><h3>DÉPENSES {lbl}</h3><span class='total-val' style='color:#ff4b4b;'>{d_val:,.2f} $</span></div>", unsafe_allow_html=True)
+    
         if role == "GERANT":
             st.markdown(f"<div class='total-box' style='border-color: {SELECTED_THEME['accent']};'><h3>BÉNÉFICE NET ESTIMÉ</h3><span class='total-val' style='color:{SELECTED_THEME['accent']};'>{(p_val - d_val):,.2f} $</span></div>", unsafe_allow_html=True)
 
-# --- 7.2 CAISSE (MODULE VENTE & DOUBLE FACTURE) ---
-elif choice == "🛒 CAISSE":
-    if st.session_state.session['viewing_invoice']:
-        inv = st.session_state.session['viewing_invoice']
-        st.markdown('<div class="cart-container">', unsafe_allow_html=True)
-        st.markdown(f"<h1>{sh_inf[0]}</h1><p>{sh_inf[2]}</p>", unsafe_allow_html=True)
-        st.write(f"**FACT-ID:** {inv['ref']} | **CLIENT:** {inv['cli']}")
-        st.write(f"**DATE:** {inv['date']} | **VENDEUR:** {st.session_state.session['user']}")
-        st.markdown("---")
-        for item, d in inv['items'].items():
-            st.write(f"• {item} (x{d['q']}) : **{(d['q']*d['p']):,.2f} $**")
-        st.markdown("---")
-        st.markdown(f"<div class='total-box'><span class='total-val'>{inv['total_val']:,.0f} {inv['dev']}</span></div>", unsafe_allow_html=True)
+            # Alerte stock bas : ensemble low_stock (triggers), suggestions selon la vitesse de vente
+            n_low = SVC.inventory.low_stock_count(sid)
+            reorder = reorder_table(sid, n_low)
+            st.metric("📦 À RÉAPPROVISIONNER", f"{len(reorder)} article(s)", f"{n_low} sous le seuil", delta_color="inverse")
+            if not reorder.empty:
+                with st.expander(f"BON DE COMMANDE SUGGÉRÉ ({reorder['Coût estimé'].sum():,.2f} $)"):
+                    st.dataframe(reorder.drop(columns="id"), use_container_width=True, hide_index=True)
+                    st.download_button("📥 BON DE COMMANDE (CSV)", purchase_csv(reorder), f"bon_de_commande_{sid}.csv", "text/csv")
+
+    # --- 7.2 CAISSE (MODULE VENTE & DOUBLE FACTURE) ---
+    elif choice == "🛒 CAISSE":
+        if st.session_state.session['viewing_invoice']:
+            inv = st.session_state.session['viewing_invoice']
+            st.markdown('<div class="cart-container">', unsafe_allow_html=True)
+            st.markdown(f"<h1>{sh_inf[0]}</h1><p>{sh_inf[2]}</p>", unsafe_allow_html=True)
+            st.write(f"**FACT-ID:** {inv['ref']} | **CLIENT:** {inv['cli']}")
+            st.write(f"**DATE:** {inv['date']} | **VENDEUR:** {st.session_state.session['user']}")
+            st.markdown("---")
+            for d in inv['items'].values():
+                st.write(f"• {d['item']} (x{d['q']}) : **{(d['q']*d['p']):,.2f} $**")
+            st.markdown("---")
+            st.markdown(f"<div class='total-box'><span class='total-val'>{inv['total_val']:,.0f} {inv['dev']}</span></div>", unsafe_allow_html=True)
         
-        # Souche Administrative (v192 requirement)
-        st.markdown("<div style='border-top: 2px dashed #000; margin-top:20px; padding-top:10px;'><b>--- SOUCHE ADMINISTRATIVE ---</b><br>Usage interne seulement.</div>", unsafe_allow_html=True)
+            # Souche Administrative (v192 requirement)
+            st.markdown("<div style='border-top: 2px dashed #000; margin-top:20px; padding-top:10px;'><b>--- SOUCHE ADMINISTRATIVE ---</b><br>Usage interne seulement.</div>", unsafe_allow_html=True)
         
-        c_back, c_share = st.columns(2)
-        if c_back.button("⬅️ NOUVELLE VENTE"):
-            st.session_state.session['viewing_invoice'] = None; st.rerun()
+            c_back, c_share = st.columns(2)
+            if c_back.button("⬅️ NOUVELLE VENTE"):
+                st.session_state.session['viewing_invoice'] = None; st.rerun()
         
-        msg_share = f"RECU {sh_inf[0]}\nRef: {inv['ref']}\nTotal: {inv['total_val']} {inv['dev']}\nMerci !"
-        c_share.download_button("📤 PARTAGER FACTURE", msg_share, file_name=f"recu_{inv['ref']}.txt")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    else:
-        devise = st.radio("MONNAIE DE PAIEMENT", ["USD", "CDF"], horizontal=True)
-        with sqlite3.connect(DB_FILE) as conn:
-            stock = conn.execute("SELECT item, sell_price, qty, buy_price FROM inventory WHERE sid=? AND qty > 0", (sid,)).fetchall()
-            options = ["---"] + [f"{p[0]} [Reste: {p[2]}]" for p in stock]
-            sel_item = st.selectbox("RECHERCHER ARTICLE", options)
-            
-            if sel_item != "---" and st.button("➕ AJOUTER AU PANIER"):
-                name = sel_item.split(" [")[0]
-                it_data = next(x for x in stock if x[0] == name)
-                if name in st.session_state.session['cart']:
-                    if st.session_state.session['cart'][name]['q'] < it_data[2]:
-                        st.session_state.session['cart'][name]['q'] += 1
-                else:
-                    st.session_state.session['cart'][name] = {'p': it_data[1], 'q': 1, 'max': it_data[2], 'buy': it_data[3]}
-                st.rerun()
-
-        if st.session_state.session['cart']:
-            st.markdown('<div class="cart-container">', unsafe_allow_html=True)
-            st.subheader("🛒 PANIER")
-            for it, d in list(st.session_state.session['cart'].items()):
-                ca, cb, cc = st.columns([3, 2, 1])
-                ca.write(f"**{it}**")
-                d['q'] = cb.number_input("Qté", 1, d['max'], d['q'], key=f"q_{it}")
-                if cc.button("❌", key=f"del_{it}"): del st.session_state.session['cart'][it]; st.rerun()
-            
-            total_usd = sum(v['p']*v['q'] for v in st.session_state.session['cart'].values())
-            profit_t = sum((v['p']-v['buy'])*v['q'] for v in st.session_state.session['cart'].values())
-            val_disp = total_usd if devise == "USD" else total_usd * sh_inf[1]
-            
-            st.markdown(f"<div class='total-box'><span class='total-val'>{val_disp:,.0f} {devise}</span></div>", unsafe_allow_html=True)
-            
-            with st.form("valid"):
-                client = st.text_input("NOM DU CLIENT", "COMPTANT").upper()
-                paye = st.number_input(f"MONTANT REÇU ({devise})", value=float(val_disp))
-                if st.form_submit_button("✅ CONFIRMER ET IMPRIMER"):
-                    ref_v = f"B-{random.randint(1000, 9999)}"
-                    p_usd = paye if devise == "USD" else paye / sh_inf[1]
-                    reste = total_usd - p_usd
-                    
-                    with sqlite3.connect(DB_FILE) as conn:
-                        conn.execute("""INSERT INTO sales (ref, cli, total_usd, paid_usd, rest_usd, date, time, seller, sid, items_json, currency, profit) 
-                                     VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""",
-                                     (ref_v, client, total_usd, p_usd, reste, datetime.now().strftime("%d/%m/%Y"), 
-                                      datetime.now().strftime("%H:%M"), st.session_state.session['user'], sid, 
-                                      json.dumps(st.session_state.session['cart']), devise, profit_t))
-                        
-                        for it, d in st.session_state.session['cart'].items():
-                            conn.execute("UPDATE inventory SET qty = qty - ? WHERE item=? AND sid=?", (d['q'], it, sid))
-                        
-                        if reste > 0.01:
-                            conn.execute("INSERT INTO debts (cli, balance, sale_ref, sid, last_update) VALUES (?,?,?,?,?)",
-                                         (client, reste, ref_v, sid, datetime.now().strftime("%d/%m/%Y")))
-                        conn.commit()
-                    
-                    st.session_state.session['viewing_invoice'] = {
-                        'ref': ref_v, 'cli': client, 'total_val': val_disp, 'dev': devise,
-                        'items': st.session_state.session['cart'].copy(), 'date': datetime.now().strftime("%d/%m/%Y %H:%M")
-                    }
-                    st.session_state.session['cart'] = {}
-                    st.rerun()
+            msg_share = f"RECU {sh_inf[0]}\nRef: {inv['ref']}\nTotal: {inv['total_val']} {inv['dev']}\nMerci !"
+            c_share.download_button("📤 PARTAGER FACTURE", msg_share, file_name=f"recu_{inv['ref']}.txt")
             st.markdown('</div>', unsafe_allow_html=True)
+    
+        else:
+            cart_fragment(sid, sh_inf[1])
 
-# --- 7.3 INVENTAIRE ---
-elif choice == "📦 STOCK & INVENTAIRE":
-    st.header("📦 GESTION DU STOCK")
-    with sqlite3.connect(DB_FILE) as conn:
-        df_inv = pd.read_sql(f"SELECT item as Article, category as Catégorie, qty as Stock, buy_price as Achat, sell_price as Vente FROM inventory WHERE sid='{sid}'", conn)
-        st.dataframe(df_inv, use_container_width=True)
-        
+    # --- 7.3 INVENTAIRE ---
+    elif choice == "📦 STOCK & INVENTAIRE":
+        st.header("📦 GESTION DU STOCK")
+        paged_grid("stock", "inventory",
+                   [("item", "Article"), ("category", "Catégorie"), ("qty", "Stock"), ("buy_price", "Achat"), ("sell_price", "Vente"), ("barcode", "Code-barres")],
+                   "sid=?", (sid,), sorts={"Désignation": "item", "Stock": "COALESCE(qty, 0)", "Catégorie": "COALESCE(category, '')"},
+                   search_cols=("item", "category", "barcode"), dbs=[SHOP_DB])
+    
         with st.expander("➕ ENTRÉE DE NOUVEAUX PRODUITS"):
             with st.form("f_inv"):
                 n_art = st.text_input("Désignation").upper()
+                n_bar = st.text_input("Code-barres / SKU (optionnel)").strip() or None
                 n_cat = st.selectbox("Catégorie", ["GÉNÉRAL", "ALIMENTAIRE", "COSMETIQUE", "HABILLEMENT", "ÉLECTRONIQUE"])
                 n_pa = st.number_input("Prix d'Achat USD", 0.0)
                 n_pv = st.number_input("Prix de Vente USD", 0.0)
                 n_q = st.number_input("Quantité", 1)
                 if st.form_submit_button("VALIDER L'ENTRÉE"):
-                    conn.execute("INSERT INTO inventory (item, category, qty, buy_price, sell_price, sid) VALUES (?,?,?,?,?,?)",
-                                 (n_art, n_cat, n_q, n_pa, n_pv, sid))
-                    conn.commit(); st.success("Stock ajouté !"); st.rerun()
-
-# --- 7.4 DETTES ---
-elif choice == "📉 DETTES & CRÉDITS":
-    st.header("📉 SUIVI DES CRÉANCES")
-    with sqlite3.connect(DB_FILE) as conn:
-        dettes = conn.execute("SELECT id, cli, balance, sale_ref FROM debts WHERE sid=? AND status='OUVERT'", (sid,)).fetchall()
-        if not dettes: st.info("Aucune dette en attente.")
-        for id_d, cli, bal, ref in dettes:
-            with st.expander(f"👤 {cli} | Dette : {bal:,.2f} $ (Ref: {ref})"):
-                pay = st.number_input("Montant à payer", 0.0, float(bal), key=f"p_{id_d}")
-                if st.button("ENCAISSER", key=f"b_{id_d}"):
-                    new_b = bal - pay
-                    conn.execute("UPDATE debts SET balance=?, last_update=? WHERE id=?", (new_b, datetime.now().strftime("%d/%m/%Y"), id_d))
-                    if new_b <= 0: conn.execute("UPDATE debts SET status='SOLDE' WHERE id=?", (id_d,))
-                    conn.commit(); st.success("Paiement validé !"); st.rerun()
-
-# --- 7.5 DÉPENSES ---
-elif choice == "💸 DÉPENSES":
-    st.header("💸 SORTIES DE CAISSE")
-    with st.form("f_exp"):
-        motif = st.text_input("Motif de la dépense")
-        montant = st.number_input("Montant USD", 0.1)
-        if st.form_submit_button("ENREGISTRER LA DÉPENSE"):
-            with sqlite3.connect(DB_FILE) as conn:
-                conn.execute("INSERT INTO expenses (label, amount, date, sid, user) VALUES (?,?,?,?,?)",
-                             (motif, montant, datetime.now().strftime("%d/%m/%Y"), sid, st.session_state.session['user']))
-                conn.commit(); st.success("Dépense enregistrée."); st.rerun()
-
-# --- 7.6 RETOURS PRODUITS ---
-elif choice == "🔄 RETOURS":
-    st.header("🔄 GESTION DES RETOURS")
-    sale_ref = st.text_input("Référence Facture")
-    if sale_ref:
-        with sqlite3.connect(DB_FILE) as conn:
-            sale = conn.execute("SELECT items_json FROM sales WHERE ref=? AND sid=?", (sale_ref, sid)).fetchone()
-            if sale:
-                items = json.loads(sale[0])
-                it_name = st.selectbox("Article à retourner", list(items.keys()))
-                qty_ret = st.number_input("Quantité retournée", 1, items[it_name]['q'])
-                if st.button("VALIDER LE RETOUR"):
-                    conn.execute("INSERT INTO returns (sale_ref, item, qty, date, sid) VALUES (?,?,?,?,?)",
-                                 (sale_ref, it_name, qty_ret, datetime.now().strftime("%d/%m/%Y"), sid))
-                    conn.execute("UPDATE inventory SET qty = qty + ? WHERE item=? AND sid=?", (qty_ret, it_name, sid))
-                    conn.commit(); st.success("Retour effectué, stock réajusté."); st.rerun()
+                    # Réassort d'un article existant : cumul du stock au lieu d'un doublon
+                    try:
+                        SVC.inventory.restock(sid, st.session_state.session['user'], n_art, n_cat, n_q, n_pa, n_pv, n_bar)
+                    except BarcodeTaken: st.error("⚠️ Ce code-barres est déjà attribué à un autre article.")
+                    else:
+                        st.success("Stock ajouté !"); st.rerun()
+
+        with st.expander("📥 IMPORT EN MASSE (CSV / EXCEL)"):
+            st.caption("Une ligne par article : désignation, quantité et prix de vente obligatoires ; catégorie, prix d'achat, "
+                       "stock minimum et code-barres facultatifs. Séparateur ; ou , détecté automatiquement.")
+            st.download_button("📄 MODÈLE CSV", TEMPLATE, "modele_stock.csv", "text/csv")
+            up = st.file_uploader("Fichier de stock", type=["csv", "xlsx"], key="imp_file")
+            imp_mode = st.radio("Quantités du fichier", ["add", "set"], horizontal=True,
+                                format_func={"add": "➕ Réassort (ajoutées au stock)", "set": "📋 Inventaire (remplacent le stock)"}.get)
+            if up and st.button("🚀 LANCER L'IMPORT"):
+                bar = st.progress(0.0, "Import en cours…")
+                total = max(1, up.size); up.seek(0)
+                try:
+                    rep = SVC.inventory.bulk_import(sid, st.session_state.session['user'], up, up.name, imp_mode,
+                                                    progress=lambda n, r: bar.progress(min(1.0, up.tell() / total), f"{n:,} lignes lues…"))
+                except ImportFileError as e: st.error(f"⚠️ {e}")
+                else:
+                    bar.progress(1.0, f"Terminé en {rep.seconds:.1f} s")
+                    c1, c2, c3 = st.columns(3)
+                    c1.metric("Créés", rep.created); c2.metric("Mis à jour", rep.updated); c3.metric("Rejetés", len(rep.rejected))
+                    if rep.rejected:
+                        pd = lazy_pandas()
+                        st.dataframe(pd.DataFrame([(n, why) for n, why, _ in rep.rejected[:500]], columns=["Ligne", "Motif"]),
+                                     use_container_width=True, hide_index=True)
+                        st.download_button("⬇️ LIGNES REJETÉES (CSV)", rejected_csv(rep), "rejets_import.csv", "text/csv")
+
+    # --- 7.4 DETTES ---
+    elif choice == "📉 DETTES & CRÉDITS":
+        st.header("📉 SUIVI DES CRÉANCES")
+        if done := st.session_state.pop('last_payment', None): st.success(done)
+        # Encours par ancienneté (SQL sur les dettes ouvertes) + une ligne par client débiteur (table clients)
+        aging = SVC.debts.aging(sid)
+        cols = st.columns(len(aging) + 1)
+        cols[0].metric("Encours total", f"{sum(aging.values()):,.2f} $")
+        for col, (bucket, amount) in zip(cols[1:], aging.items()):
+            col.metric(bucket, f"{amount:,.2f} $")
+        a30, a60, a60p = aging_columns()
+        clients = paged_grid("clients", "clients",
+                             [("name", "Client"), ("balance", "Solde $"), ("open_debts", "Factures"), (a30, "0-30 j"),
+                              (a60, "31-60 j"), (a60p, "60+ j"), ("last_ts", "Dernière opération")],
+                             "sid=? AND open_debts > 0", (sid,),
+                             sorts={"Solde": "balance", "Client": "name", "Dernière opération": "COALESCE(last_ts, '')"},
+                             search_cols=("name",), dbs=[SHOP_DB])
+        if not clients: st.info("Aucune dette en attente.")
+        else:
+            # Un seul formulaire de règlement pour le client choisi dans la page affichée
+            by_cli = {c[0]: c for c in clients}
+            cli = st.selectbox("Client", list(by_cli), format_func=lambda c: f"👤 {c} | {by_cli[c][1]:,.2f} $ ({by_cli[c][2]} facture(s))")
+            c_open, c_hist = st.columns(2)
+            c_open.caption("Factures ouvertes (imputées de la plus ancienne à la plus récente)")
+            c_open.table([{"Facture": d.sale_ref, "Date": (d.ts or "")[:10], "Reste $": f"{d.balance:,.2f}"}
+                          for d in SVC.debts.open_debts(sid, cli)])
+            c_hist.caption("Derniers règlements")
+            hist = SVC.debts.payments(sid, cli)
+            if hist:
+                c_hist.table([{"Date": ts[:16].replace("T", " "), "Montant $": f"{amt:,.2f}", "Par": u, "Factures": n}
+                              for _, amt, ts, u, n in hist])
+            else: c_hist.info("Aucun règlement enregistré.")
+            pay = st.number_input("Montant réglé", 0.0, float(by_cli[cli][1]), key=f"p_{cli}")
+            if st.button("ENCAISSER", key=f"b_{cli}"):
+                try:
+                    res = SVC.debts.pay_client(sid, st.session_state.session['user'], cli, pay)
+                except DebtError as e: st.error(f"⚠️ {e}")
+                else:
+                    soldees = sum(l.settled for l in res.lines)
+                    st.session_state['last_payment'] = (f"Paiement validé : {res.paid:,.2f} $ imputés sur {len(res.lines)} facture(s)"
+                                                        f" dont {soldees} soldée(s), reste dû {res.balance:,.2f} $")
+                    st.rerun()
+
+    # --- 7.5 DÉPENSES ---
+    elif choice == "💸 DÉPENSES":
+        st.header("💸 SORTIES DE CAISSE")
+        with st.form("f_exp"):
+            motif = st.text_input("Motif de la dépense")
+            montant = st.number_input("Montant USD", 0.1)
+            if st.form_submit_button("ENREGISTRER LA DÉPENSE"):
+                SVC.sales.record_expense(sid, st.session_state.session['user'], motif, montant)
+                st.success("Dépense enregistrée."); st.rerun()
+
+    # --- 7.6 RETOURS PRODUITS ---
+    elif choice == "🔄 RETOURS":
+        st.header("🔄 GESTION DES RETOURS")
+        sale_ref = st.text_input("Référence Facture")
+        if sale_ref:
+            items = SVC.sales.returnable(sid, sale_ref)
+            if items is not None:
+                if not items: st.info("Tous les articles de cette facture ont déjà été retournés.")
+                else:
+                    it_name = st.selectbox("Article à retourner", list(items.keys()))
+                    qty_ret = st.number_input("Quantité retournée", 1, items[it_name].qty)
+                    if st.button("VALIDER LE RETOUR"):
+                        try:
+                            SVC.sales.record_return(sid, st.session_state.session['user'], sale_ref, it_name, qty_ret)
+                        except ReturnError as e: st.error(f"⚠️ {e}")
+                        else:
+                            st.success("Retour effectué, stock réajusté."); st.rerun()
             else: st.error("Facture introuvable.")
 
-# --- 7.7 RAPPORTS ---
-elif choice == "📊 RAPPORTS & ANALYTICS":
-    st.header("📊 ANALYSE BOUTIQUE")
-    with sqlite3.connect(DB_FILE) as conn:
-        df_sales = pd.read_sql(f"SELECT date, ref, cli, total_usd as Total, seller FROM sales WHERE sid='{sid}'", conn)
-        st.dataframe(df_sales, use_container_width=True)
-        
-        if PLOTLY_AVAILABLE:
-            fig_l = px.line(df_sales.groupby('date').sum().reset_index(), x='date', y='Total', title="Évolution du CA Journalier")
-            st.plotly_chart(fig_l, use_container_width=True)
-
-# --- 7.8 ÉQUIPE ---
-elif choice == "👥 ÉQUIPE":
-    st.header("👥 ÉQUIPE & SÉCURITÉ")
-    with sqlite3.connect(DB_FILE) as conn:
-        vendeurs = pd.read_sql(f"SELECT uid as Login, name as Nom, status FROM users WHERE shop='{sid}' AND role='VENDEUR'", conn)
+    # --- 7.6 bis CLÔTURE DE CAISSE (journal cash_movements depuis le dernier point) ---
+    elif choice == "🧾 CLÔTURE DE CAISSE":
+        st.header("🧾 CLÔTURE DE CAISSE")
+        if done := st.session_state.pop('last_closing', None): st.success(done)
+        pos = SVC.cash.position(sid)
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Fond d'ouverture", f"{pos.opening['USD']:,.2f} $", f"{pos.opening['CDF']:,.0f} CDF", delta_color="off")
+        c2.metric("Mouvements nets", f"{pos.net['USD']:+,.2f} $", f"{pos.net['CDF']:+,.0f} CDF", delta_color="off")
+        c3.metric("Attendu en caisse", f"{pos.expected['USD']:,.2f} $", f"{pos.expected['CDF']:,.0f} CDF", delta_color="off")
+        if pos.by_kind:
+            pd = lazy_pandas()
+            st.dataframe(pd.DataFrame([(k, v['n'], v['USD'], v['CDF']) for k, v in sorted(pos.by_kind.items())],
+                                      columns=["Type", "Opérations", "USD", "CDF"]), use_container_width=True, hide_index=True)
+        else: st.info("Aucun mouvement depuis la dernière clôture.")
+
+        with st.form("f_close"):
+            st.caption(f"{pos.movements} mouvement(s) depuis la dernière clôture. Le fond conservé devient le fond d'ouverture suivant.")
+            k1, k2 = st.columns(2)
+            cnt_usd = k1.number_input("Compté USD", 0.0, value=max(0.0, float(pos.expected['USD'])))
+            cnt_cdf = k2.number_input("Compté CDF", 0.0, value=max(0.0, float(pos.expected['CDF'])), step=500.0)
+            kep_usd = k1.number_input("Fond conservé USD", 0.0, value=max(0.0, float(pos.opening['USD'])))
+            kep_cdf = k2.number_input("Fond conservé CDF", 0.0, value=max(0.0, float(pos.opening['CDF'])), step=500.0)
+            note = st.text_input("Observation")
+            if st.form_submit_button("🔒 CLÔTURER LA CAISSE"):
+                try:
+                    clo = SVC.cash.close(sid, st.session_state.session['user'], cnt_usd, cnt_cdf, kep_usd, kep_cdf, note)
+                except ValueError as e: st.error(f"⚠️ {e}")
+                else:
+                    st.session_state['last_closing'] = (
+                        f"Caisse clôturée : écart {clo.gap['USD']:+,.2f} $ / {clo.gap['CDF']:+,.0f} CDF, "
+                        f"versement {clo.counted['USD'] - clo.kept['USD']:,.2f} $ / {clo.counted['CDF'] - clo.kept['CDF']:,.0f} CDF")
+                    st.rerun()
+
+        st.subheader("📚 HISTORIQUE DES CLÔTURES")
+        paged_grid("closings", "cash_closings",
+                   [("ts", "Date"), ("user", "Par"), ("movements", "Mvts"), ("expected_usd", "Attendu $"), ("counted_usd", "Compté $"),
+                    ("counted_usd - expected_usd", "Écart $"), ("expected_cdf", "Attendu CDF"), ("counted_cdf", "Compté CDF"),
+                    ("counted_cdf - expected_cdf", "Écart CDF"), ("kept_usd", "Fond $"), ("note", "Note")],
+                   "sid=?", (sid,), sorts={"Date": "id"}, search_cols=("user", "note"), dbs=[SHOP_DB])
+
+    # --- 7.7 RAPPORTS ---
+    elif choice == "📊 RAPPORTS & ANALYTICS":
+        st.header("📊 ANALYSE BOUTIQUE")
+        px = lazy_plotly()
+        # Fenêtre glissante par défaut (30 jours) : seul l'intervalle demandé est lu
+        periode = st.date_input("PÉRIODE", value=last_days(30), key="rap_period")
+        lo, hi = day_bounds(*periode) if periode else day_bounds(*last_days(30))
+        paged_grid("sales", "sales",
+                   [("date", "date"), ("time", "heure"), ("ref", "ref"), ("cli", "cli"), ("total_usd", "Total"), ("seller", "seller")],
+                   "sid=? AND ts >= ? AND ts < ?", (sid, lo, hi),
+                   sorts={"Date": "ts", "Montant": "COALESCE(total_usd, 0)", "Client": "COALESCE(cli, '')"},
+                   search_cols=("ref", "cli", "seller"), dbs=SVC.reports.sales_bases(sid, lo, hi))
+        # Cubes (jour, heure, vendeur, catégorie, article) lus une fois par période puis servis
+        # depuis le cache du service tant qu'aucune vente ne change la période : changer de vue ne relit rien
+        cubes = SVC.reports.analytics(sid, lo, hi)
+        summ = cubes.summary.set_index("Indicateur")
+        k = st.columns(4)
+        for col, lbl in zip(k, ["CA ($)", "Marge ($)", "Ventes", "Panier moyen ($)"]):
+            ecart = summ.loc[lbl, "Écart (%)"]
+            col.metric(lbl, f"{summ.loc[lbl, 'Période']:,.2f}", None if math.isnan(ecart) else f"{ecart:+.1f} % vs période préc.")
+        with st.expander(f"⚖️ COMPARAISON AVEC LA PÉRIODE PRÉCÉDENTE ({cubes.prev_lo} → {cubes.lo})"):
+            st.dataframe(cubes.summary, use_container_width=True, hide_index=True)
+
+        vue = st.radio("VUE", ["📈 JOUR", "🕐 HEURE", "📅 JOUR DE SEMAINE", "👤 VENDEUR", "🗂️ CATÉGORIE", "🏆 TOP / FLOP ARTICLES"],
+                       horizontal=True, key="rap_vue")
+        if vue == "🏆 TOP / FLOP ARTICLES":
+            c_top, c_flop = st.columns(2)
+            c_top.subheader("🏆 TOP MARGE"); c_top.dataframe(cubes.top(10), use_container_width=True, hide_index=True)
+            c_flop.subheader("🔻 FLOP MARGE"); c_flop.dataframe(cubes.bottom(10), use_container_width=True, hide_index=True)
+        else:
+            df_vue, axe = {"📈 JOUR": (cubes.by_day, "date"), "🕐 HEURE": (cubes.by_hour, "Heure"),
+                           "📅 JOUR DE SEMAINE": (cubes.by_weekday, "Jour"), "👤 VENDEUR": (cubes.by_seller, "Vendeur"),
+                           "🗂️ CATÉGORIE": (cubes.by_category, "Catégorie")}[vue]
+            if px:
+                fig = (px.line if axe == "date" else px.bar)(df_vue, x=axe, y=["CA", "Marge"], title=f"CA et marge par {axe.lower()}",
+                                                             **({} if axe == "date" else {'barmode': "group"}))
+                st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(df_vue, use_container_width=True, hide_index=True)
+
+    # --- 7.8 ÉQUIPE ---
+    elif choice == "👥 ÉQUIPE":
+        st.header("👥 ÉQUIPE & SÉCURITÉ")
+        pd = lazy_pandas()
+        vendeurs = pd.DataFrame(SVC.auth.sellers(sid), columns=["Login", "Nom", "status"])
         st.table(vendeurs)
-        
+    
         with st.expander("➕ CRÉER UN COMPTE VENDEUR"):
             v_id = st.text_input("Identifiant Vendeur").lower()
             v_n = st.text_input("Nom Complet")
             v_p = st.text_input("Pass", type="password")
             if st.button("CRÉER COMPTE"):
                 try:
-                    conn.execute("INSERT INTO users (uid, pwd, role, shop, status, name) VALUES (?,?,?,?,?,?)",
-                                 (v_id, get_hash(v_p), 'VENDEUR', sid, 'ACTIF', v_n))
-                    conn.commit(); st.success("Vendeur ajouté."); st.rerun()
-                except: st.error("Identifiant déjà pris.")
-        
+                    SVC.auth.create_seller(st.session_state.session['user'], sid, v_id, v_p, v_n)
+                except UserExists: st.error("Identifiant déjà pris.")
+                else:
+                    st.success("Vendeur ajouté."); st.rerun()
+    
         with st.expander("🗑️ SUPPRIMER UN VENDEUR"):
             to_del = st.selectbox("Vendeur à supprimer", ["---"] + vendeurs['Login'].tolist())
             if st.button("SUPPRIMER DÉFINITIVEMENT") and to_del != "---":
-                conn.execute("DELETE FROM users WHERE uid=?", (to_del,))
-                conn.commit(); st.rerun()
-        
+                SVC.auth.delete_seller(st.session_state.session['user'], sid, to_del)
+                st.rerun()
+    
         with st.expander("🔑 CHANGER MON MOT DE PASSE"):
             m_p1 = st.text_input("Nouveau Pass", type="password")
             if st.button("MODIFIER MON PASSE"):
-                conn.execute("UPDATE users SET pwd=? WHERE uid=?", (get_hash(m_p1), st.session_state.session['user']))
-                conn.commit(); st.success("Modifié !")
-
-# --- 7.9 RÉGLAGES ---
-elif choice == "⚙️ RÉGLAGES":
-    st.header("⚙️ CONFIGURATION BOUTIQUE")
-    with st.form("f_sh"):
-        n_sh = st.text_input("Nom de l'Etablissement", sh_inf[0])
-        n_ra = st.number_input("Taux de Change (1$ = ? CDF)", value=sh_inf[1])
-        n_he = st.text_area("En-tête Facture", sh_inf[2])
-        if st.form_submit_button("METTRE À JOUR"):
-            with sqlite3.connect(DB_FILE) as conn:
-                conn.execute("UPDATE shops SET name=?, rate=?, head=? WHERE sid=?", (n_sh, n_ra, n_he, sid))
-                conn.commit(); st.success("Réglages sauvés !"); st.rerun()
-
-elif choice == "🚪 DÉCONNEXION":
-    st.session_state.session['logged_in'] = False; st.rerun()
+                SVC.auth.change_password(st.session_state.session['user'], m_p1, sid)
+                st.success("Modifié !")
+
+    # --- 7.9 RÉGLAGES ---
+    elif choice == "⚙️ RÉGLAGES":
+        st.header("⚙️ CONFIGURATION BOUTIQUE")
+        with st.form("f_sh"):
+            n_sh = st.text_input("Nom de l'Etablissement", sh_inf[0])
+            n_ra = st.number_input("Taux de Change (1$ = ? CDF)", value=sh_inf[1])
+            n_he = st.text_area("En-tête Facture", sh_inf[2])
+            if st.form_submit_button("METTRE À JOUR"):
+                with DB.catalog.write() as conn:
+                    conn.execute("UPDATE shops SET name=?, rate=?, head=? WHERE sid=?", (n_sh, n_ra, n_he, sid))
+                DB.sync_shop(sid)   # taux recopié dans le fichier boutique (triggers de caisse)
+                log_audit(st.session_state.session['user'], "RÉGLAGES", f"{n_sh} taux {n_ra}", sid)
+                st.success("Réglages sauvés !"); st.rerun()
+
+    # --- 7.10 MESSAGERIE ---
+    elif choice == "✉️ MESSAGERIE":
+        messaging_page(st.session_state.session['user'], role, sid)
+
+    elif choice == "🚪 DÉCONNEXION":
+        st.session_state.session['logged_in'] = False; st.rerun()
 
 # ------------------------------------------------------------------------------
 # 8. PIED DE PAGE & VERSIONING (v650)
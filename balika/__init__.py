@@ -0,0 +1,6 @@
+# ==============================================================================
+# 💎 BALIKA BUSINESS ERP - NOYAU MÉTIER (PACKAGE IMPORTABLE)
+# ------------------------------------------------------------------------------
+# Modules partagés par le script Streamlit (balika-app.py) et les outils en
+# ligne de commande (bench/). Aucun import Streamlit ici.
+# ==============================================================================
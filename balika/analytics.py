@@ -0,0 +1,303 @@
+# ==============================================================================
+# 💎 BALIKA ERP - MOTEUR D'ANALYSE DES VENTES (RAPPORTS & ANALYTICS)
+# ------------------------------------------------------------------------------
+# Deux tables de faits au grain du jour, tenues par triggers dans la
+# transaction de la vente :
+# - hourly_sales : ventes, CA et marge par (boutique, jour, heure, vendeur) ;
+# - daily_item_sales (balika.replenish) : unités, CA et coût par article.
+# Une fenêtre [lo, hi) et la fenêtre précédente de même durée sont lues une
+# seule fois en colonnes étroites typées (entiers, flottants, catégories) ;
+# tous les cubes (jour, heure, jour de semaine, vendeur, catégorie, article,
+# comparaison de périodes) en sont tirés par group-by pandas/NumPy. Le volume
+# lu dépend des jours x heures x vendeurs et des articles vendus, pas du
+# nombre de lignes de vente.
+#
+# CubeCache garde les cubes par (sid, fenêtre) avec leur version de données
+# (ventes, CA et retours des deux fenêtres dans daily_shop_stats) : changer
+# de graphique ne relit rien, une vente ou un retour dans la période, si.
+#
+#   python -m balika.analytics rebuild balika_v650_master.db
+# ==============================================================================
+import json
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from functools import cached_property
+
+from balika.archive import live_days
+
+CREATE_TABLE = """CREATE TABLE IF NOT EXISTS hourly_sales (
+    sid TEXT NOT NULL, day TEXT NOT NULL, hour INTEGER NOT NULL, seller TEXT NOT NULL,
+    sale_count INTEGER NOT NULL DEFAULT 0, revenue REAL NOT NULL DEFAULT 0, profit REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (sid, day, hour, seller)) WITHOUT ROWID"""
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+_TS = f"COALESCE(NEW.ts, {_NOW})"
+
+TRIGGERS = {
+    "trg_hourly_sales": f"""CREATE TRIGGER IF NOT EXISTS trg_hourly_sales AFTER INSERT ON sales
+        BEGIN INSERT INTO hourly_sales (sid, day, hour, seller, sale_count, revenue, profit)
+              VALUES (NEW.sid, substr({_TS}, 1, 10), CAST(substr({_TS}, 12, 2) AS INTEGER), COALESCE(NEW.seller, ''),
+                      1, COALESCE(NEW.total_usd, 0), COALESCE(NEW.profit, 0))
+              ON CONFLICT(sid, day, hour, seller) DO UPDATE SET sale_count = sale_count + 1,
+                  revenue = revenue + excluded.revenue, profit = profit + excluded.profit; END""",
+}
+
+WEEKDAYS = ("Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche")
+UNKNOWN_CATEGORY = "(article supprimé)"
+CACHE_SIZE = 32
+
+
+def _pd():
+    import pandas as pd
+    return pd
+
+
+def _np():
+    import numpy as np
+    return np
+
+
+def install(conn):
+    conn.execute(CREATE_TABLE)
+    for ddl in TRIGGERS.values():
+        conn.execute(ddl)
+
+
+def rebuild_hourly_sales(conn):
+    """Recalcule hourly_sales depuis sales (mois archivés gardés) ; retourne le nombre de lignes."""
+    conn.execute(f"DELETE FROM hourly_sales WHERE {live_days(conn, 'hourly_sales.sid', 'hourly_sales.day')}")
+    return conn.execute(f"""INSERT INTO hourly_sales (sid, day, hour, seller, sale_count, revenue, profit)
+                            SELECT sid, substr(COALESCE(ts, {_NOW}), 1, 10), CAST(substr(COALESCE(ts, {_NOW}), 12, 2) AS INTEGER),
+                                   COALESCE(seller, ''), COUNT(*), SUM(COALESCE(total_usd, 0)), SUM(COALESCE(profit, 0))
+                            FROM sales WHERE sid IS NOT NULL AND {live_days(conn, "sales.sid", "sales.ts")}
+                            GROUP BY 1, 2, 3, 4""").rowcount
+
+
+def previous_window(lo, hi):
+    """Fenêtre précédente de même durée, qui se termine à `lo` (jours ISO)."""
+    start, end = date.fromisoformat(lo[:10]), date.fromisoformat(hi[:10])
+    return (start - (end - start)).isoformat(), start.isoformat()
+
+
+def data_version(conn, sid, lo, hi):
+    """Empreinte des deux fenêtres (ventes, CA, retours) : change à chaque vente ou retour daté dedans."""
+    prev_lo, _ = previous_window(lo, hi)
+    return conn.execute("""SELECT COALESCE(SUM(sale_count), 0), ROUND(COALESCE(SUM(revenue), 0), 4),
+                                  ROUND(COALESCE(SUM(returns), 0), 4)
+                           FROM daily_shop_stats WHERE sid=? AND day >= ? AND day < ?""",
+                        (sid, prev_lo, hi[:10])).fetchone()
+
+
+# ------------------------------------------------------------------------------
+# LECTURE : COLONNES ÉTROITES TYPÉES
+# ------------------------------------------------------------------------------
+def _frame(rows, dtypes):
+    pd = _pd()
+    cols = list(zip(*rows)) if rows else [()] * len(dtypes)
+    return pd.DataFrame({name: pd.Series(col, dtype=dtype) for (name, dtype), col in zip(dtypes.items(), cols)})
+
+
+def load_window(conn, sid, lo, hi):
+    """(heures, articles, noms) pour [fenêtre précédente, hi) ; colonne `cur` = période demandée."""
+    prev_lo, _ = previous_window(lo, hi)
+    lo, hi = lo[:10], hi[:10]
+    hours = _frame(conn.execute("""SELECT day, day >= ?, hour, seller, sale_count, revenue, profit FROM hourly_sales
+                                   WHERE sid=? AND day >= ? AND day < ?""", (lo, sid, prev_lo, hi)).fetchall(),
+                   {"day": "category", "cur": "bool", "hour": "int8", "seller": "category",
+                    "sale_count": "int64", "revenue": "float64", "profit": "float64"})
+    # Articles : sommes par (article, période) faites par SQLite sur l'intervalle de clé primaire
+    items = _frame(conn.execute("""SELECT inv_id, day >= ?, SUM(qty), SUM(revenue), SUM(cost) FROM daily_item_sales
+                                   WHERE sid=? AND day >= ? AND day < ? GROUP BY inv_id, day >= ?""",
+                                (lo, sid, prev_lo, hi, lo)).fetchall(),
+                   {"inv_id": "int64", "cur": "bool", "qty": "int64", "revenue": "float64", "cost": "float64"})
+    names = _frame(conn.execute("""SELECT id, item, COALESCE(category, 'GÉNÉRAL') FROM inventory
+                                   WHERE id IN (SELECT value FROM json_each(?))""",
+                                (json.dumps(items["inv_id"].unique().tolist()),)).fetchall(),
+                   {"inv_id": "int64", "Article": "object", "Catégorie": "object"})
+    return hours, items, names
+
+
+# ------------------------------------------------------------------------------
+# CUBES
+# ------------------------------------------------------------------------------
+def _ratio(num, den, scale=1.0):
+    # Division vectorisée : NaN là où le dénominateur est nul
+    np = _np()
+    num, den = np.asarray(num, dtype="float64") * scale, np.asarray(den, dtype="float64")
+    out = np.full(den.shape, np.nan)
+    np.divide(num, den, out=out, where=den != 0)
+    return out.round(2)
+
+
+def _sums(frame, key, cols=("sale_count", "revenue", "profit")):
+    return frame.groupby(key, observed=True, sort=True)[list(cols)].sum()
+
+
+class Cubes:
+    """Cubes d'une fenêtre, tirés des colonnes lues une fois ; chacun est
+    calculé au premier affichage puis gardé avec l'objet (dans CubeCache)."""
+
+    def __init__(self, hours, items, names, lo, hi):
+        self.prev_lo, _ = previous_window(lo, hi)
+        self.lo, self.hi = lo[:10], hi[:10]
+        self._hours, self._items, self._names = hours, items, names
+
+    @cached_property
+    def _cur_hours(self):
+        return self._hours[self._hours["cur"]]
+
+    @cached_property
+    def summary(self):
+        """Indicateur, Période, Précédente, Écart (%)."""
+        pd, np, hours, items = _pd(), _np(), self._hours, self._items
+
+        def kpis(h, units):
+            ca, marge, n = float(h["revenue"].sum()), float(h["profit"].sum()), int(h["sale_count"].sum())
+            return [ca, marge, n, ca / n if n else 0.0, units / n if n else 0.0, 100 * marge / ca if ca else 0.0]
+        now_k = kpis(self._cur_hours, int(items.loc[items["cur"], "qty"].sum()))
+        prev_k = kpis(hours[~hours["cur"]], int(items.loc[~items["cur"], "qty"].sum()))
+        return pd.DataFrame({"Indicateur": ["CA ($)", "Marge ($)", "Ventes", "Panier moyen ($)", "Articles / vente",
+                                            "Taux de marge (%)"],
+                             "Période": np.round(now_k, 2), "Précédente": np.round(prev_k, 2),
+                             "Écart (%)": _ratio(np.subtract(now_k, prev_k), prev_k, 100)})
+
+    @cached_property
+    def _days(self):
+        # Sommes par jour de la période, jours sans vente à 0
+        pd = _pd()
+        days = pd.date_range(self.lo, date.fromisoformat(self.hi) - timedelta(days=1), freq="D")
+        d = _sums(self._cur_hours, "day")
+        d.index = pd.to_datetime(d.index.astype(str))
+        return d.reindex(days, fill_value=0)
+
+    @cached_property
+    def by_day(self):
+        """date, CA, Marge, Ventes."""
+        d = self._days
+        return _pd().DataFrame({"date": d.index, "CA": d["revenue"].round(2).to_numpy(),
+                                "Marge": d["profit"].round(2).to_numpy(), "Ventes": d["sale_count"].to_numpy()})
+
+    @cached_property
+    def by_weekday(self):
+        """Jour, CA, Marge, Ventes, CA moyen / jour."""
+        d = self._days
+        wd = d.groupby(d.index.dayofweek).sum().reindex(range(7), fill_value=0)
+        n_days = _np().bincount(d.index.dayofweek, minlength=7)
+        return _pd().DataFrame({"Jour": WEEKDAYS, "CA": wd["revenue"].round(2).to_numpy(),
+                                "Marge": wd["profit"].round(2).to_numpy(), "Ventes": wd["sale_count"].to_numpy(),
+                                "CA moyen / jour": _ratio(wd["revenue"], n_days)})
+
+    @cached_property
+    def by_hour(self):
+        """Heure, CA, Marge, Ventes, Panier moyen."""
+        h = _sums(self._cur_hours, "hour").reindex(range(24), fill_value=0)
+        return _pd().DataFrame({"Heure": [f"{x:02d}h" for x in range(24)], "CA": h["revenue"].round(2).to_numpy(),
+                                "Marge": h["profit"].round(2).to_numpy(), "Ventes": h["sale_count"].to_numpy(),
+                                "Panier moyen": _ratio(h["revenue"], h["sale_count"])})
+
+    @cached_property
+    def by_seller(self):
+        """Vendeur, CA, Marge, Ventes, Panier moyen, Part CA (%)."""
+        s = _sums(self._cur_hours, "seller").sort_values("revenue", ascending=False)
+        return _pd().DataFrame({"Vendeur": s.index.astype(str), "CA": s["revenue"].round(2).to_numpy(),
+                                "Marge": s["profit"].round(2).to_numpy(), "Ventes": s["sale_count"].to_numpy(),
+                                "Panier moyen": _ratio(s["revenue"], s["sale_count"]),
+                                "Part CA (%)": _ratio(s["revenue"], [s["revenue"].sum()] * len(s), 100)})
+
+    @cached_property
+    def _articles(self):
+        # Articles de la période, CA de la précédente à côté, noms et catégories joints
+        pd, items = _pd(), self._items
+        cur_i, prev_i = items[items["cur"]].set_index("inv_id"), items[~items["cur"]].set_index("inv_id")
+        p = cur_i[["qty", "revenue", "cost"]].join(prev_i[["revenue"]].rename(columns={"revenue": "prev"}), how="left")
+        p = p.join(self._names.set_index("inv_id"), how="left")
+        p["Article"] = p["Article"].fillna(pd.Series(p.index.map(lambda i: f"#{i}"), index=p.index))
+        p["Catégorie"] = p["Catégorie"].fillna(UNKNOWN_CATEGORY).astype("category")
+        p["prev"] = p["prev"].fillna(0.0)
+        p["margin"] = p["revenue"] - p["cost"]
+        return p
+
+    @cached_property
+    def products(self):
+        """Article, Catégorie, Unités, CA, Marge, Taux de marge (%), CA préc., Évol. CA (%)."""
+        p = self._articles
+        products = _pd().DataFrame({"Article": p["Article"].to_numpy(), "Catégorie": p["Catégorie"].astype(str).to_numpy(),
+                                    "Unités": p["qty"].to_numpy(), "CA": p["revenue"].round(2).to_numpy(),
+                                    "Marge": p["margin"].round(2).to_numpy(),
+                                    "Taux de marge (%)": _ratio(p["margin"], p["revenue"], 100),
+                                    "CA préc.": p["prev"].round(2).to_numpy(),
+                                    "Évol. CA (%)": _ratio(p["revenue"] - p["prev"], p["prev"], 100)})
+        return products.sort_values("Marge", ascending=False, ignore_index=True)
+
+    @cached_property
+    def by_category(self):
+        """Catégorie, Unités, CA, Marge, Taux de marge (%), CA préc., Évol. CA (%)."""
+        c = self._articles.groupby("Catégorie", observed=True)[["qty", "revenue", "margin", "prev"]].sum()
+        c = c.sort_values("margin", ascending=False)
+        return _pd().DataFrame({"Catégorie": c.index.astype(str), "Unités": c["qty"].to_numpy(),
+                                "CA": c["revenue"].round(2).to_numpy(), "Marge": c["margin"].round(2).to_numpy(),
+                                "Taux de marge (%)": _ratio(c["margin"], c["revenue"], 100),
+                                "CA préc.": c["prev"].round(2).to_numpy(),
+                                "Évol. CA (%)": _ratio(c["revenue"] - c["prev"], c["prev"], 100)})
+
+    def top(self, n=10, by="Marge"):
+        return self.products.nlargest(n, by)
+
+    def bottom(self, n=10, by="Marge"):
+        return self.products.nsmallest(n, by)
+
+
+def analyze(conn, sid, lo, hi):
+    """Cubes de la boutique sur [lo, hi) (jours ISO), comparés à la fenêtre précédente."""
+    return Cubes(*load_window(conn, sid, lo, hi), lo, hi)
+
+
+class CubeCache:
+    """LRU (sid, lo, hi) -> (version, Cubes) ; une version différente reconstruit l'entrée."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, build):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == version:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        cubes = build()
+        with self._lock:
+            self.misses += 1
+            self._data[key] = (version, cubes)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return cubes
+
+
+def main(argv=None):
+    import sqlite3
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] != "rebuild":
+        print("usage: python -m balika.analytics rebuild <fichier.db>")
+        return 2
+    conn = sqlite3.connect(argv[1], isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        install(conn)
+        n = rebuild_hourly_sales(conn)
+        conn.execute("COMMIT")
+        print(f"hourly_sales reconstruite : {n} lignes (boutique, jour, heure, vendeur).")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
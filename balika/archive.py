@@ -0,0 +1,360 @@
+# ==============================================================================
+# 💎 BALIKA ERP - ARCHIVAGE DES MOIS CLOS (PARTITIONS MENSUELLES COMPRESSÉES)
+# ------------------------------------------------------------------------------
+# sales, sale_items, returns et audit_logs ne font que grossir. archive_closed()
+# sort de la base vivante les mois clos (plus anciens que les `keep_months`
+# derniers) vers un fichier SQLite par (boutique, mois), compressé en gzip :
+#     <dossier>/<boutique>/<AAAA-MM>.db.gz
+# Mêmes tables et index que la base vivante, sans triggers. Les lignes sont
+# copiées, vérifiées puis supprimées ; la suppression et le manifeste
+# (archive_manifest) sont écrits dans la même transaction.
+#
+# Restent en ligne :
+# - les tables dérivées (daily_shop_stats, hourly_sales, daily_item_sales) :
+#   ACCUEIL et RAPPORTS restent exacts sans rouvrir les archives, et leurs
+#   reconstructions (rebuild_*) ne touchent plus aux mois archivés (live_days) ;
+# - archived_refs (facture -> mois) et archived_returns (quantités déjà
+#   retournées par facture) : RETOURS trouve une vieille facture sans ouvrir
+#   d'autre fichier que le sien.
+#
+# Lecture : ArchiveStore.months() / locate() renvoient des bases en lecture
+# seule (read(), comme Database), ouvertes sur une copie décompressée gardée en
+# cache ; la grille des ventes, le journal d'audit et RETOURS les interrogent
+# en plus de la base vivante.
+#
+#   python -m balika.archive run  balika_v650_master.db [dossier] [mois_gardés]
+#   python -m balika.archive list balika_v650_master.db
+# ==============================================================================
+import atexit
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+
+ARCHIVE_DIR = "archives"
+KEEP_MONTHS = 6
+CACHE_SIZE = 8
+CHUNK = 1024 * 1024
+SUFFIX = ".db.gz"
+# Tables archivées, datées par ts ; sale_items suit ses ventes
+DATED_TABLES = ("sales", "returns", "audit_logs")
+TABLES = ("sales", "sale_items", "returns", "audit_logs")
+
+DDL = (
+    """CREATE TABLE IF NOT EXISTS archive_manifest (
+    sid TEXT NOT NULL, month TEXT NOT NULL, path TEXT NOT NULL,
+    sales INTEGER NOT NULL DEFAULT 0, sale_items INTEGER NOT NULL DEFAULT 0,
+    returns INTEGER NOT NULL DEFAULT 0, audit_logs INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0, archived_ts TEXT,
+    PRIMARY KEY (sid, month)) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS archived_refs (
+    sid TEXT NOT NULL, ref TEXT NOT NULL, month TEXT NOT NULL,
+    PRIMARY KEY (sid, ref)) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS archived_returns (
+    sid TEXT NOT NULL, sale_ref TEXT NOT NULL, item TEXT NOT NULL, qty INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sid, sale_ref, item)) WITHOUT ROWID""",
+)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def install(conn):
+    for ddl in DDL:
+        conn.execute(ddl)
+
+
+def live_days(conn, sid, day):
+    """Condition SQL « (sid, jour) hors d'un mois archivé » pour les reconstructions de
+    tables dérivées. `sid` et `day` : expressions qualifiées (table.colonne)."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='archive_manifest'").fetchone() is None:
+        return "1"
+    return f"NOT EXISTS (SELECT 1 FROM archive_manifest m WHERE m.sid = {sid} AND m.month = substr({day}, 1, 7))"
+
+
+# ------------------------------------------------------------------------------
+# MOIS
+# ------------------------------------------------------------------------------
+def month_bounds(month):
+    """[premier jour, premier jour du mois suivant) d'un mois AAAA-MM."""
+    y, m = int(month[:4]), int(month[5:7])
+    return f"{month}-01", f"{y + m // 12:04d}-{m % 12 + 1:02d}-01"
+
+
+def first_live_month(today, keep_months=KEEP_MONTHS):
+    """Plus ancien mois gardé en ligne : le mois en cours et les `keep_months` précédents."""
+    n = today.year * 12 + today.month - 1 - keep_months
+    return f"{n // 12:04d}-{n % 12 + 1:02d}"
+
+
+def closed_months(conn, sid, before):
+    """Mois de la boutique antérieurs à `before` qui ont encore des lignes en ligne."""
+    firsts = [conn.execute(f"SELECT MIN(ts) FROM {t} WHERE sid=?", (sid,)).fetchone()[0] for t in DATED_TABLES]
+    month, out = min((f[:7] for f in firsts if f), default=before), []
+    while month < before:
+        out.append(month)
+        month = month_bounds(month)[1][:7]
+    return out
+
+
+def shop_dir(sid):
+    from balika.shards import shard_filename   # import local : balika.shards importe le schéma
+    return shard_filename(sid)[:-len(".db")]
+
+
+# ------------------------------------------------------------------------------
+# ÉCRITURE D'UN MOIS
+# ------------------------------------------------------------------------------
+def _gzip_file(src, dst):
+    with open(src, "rb") as fin, gzip.open(dst, "wb", compresslevel=6) as fout:
+        shutil.copyfileobj(fin, fout, CHUNK)
+
+
+def _gunzip_file(src, dst):
+    with gzip.open(src, "rb") as fin, open(dst, "wb") as fout:
+        shutil.copyfileobj(fin, fout, CHUNK)
+
+
+def _range(table):
+    # Lignes du mois encore en ligne, bornées par le plus grand id vu à la copie
+    if table == "sale_items":
+        return "sale_id IN (SELECT id FROM {db}sales WHERE sid=? AND ts >= ? AND ts < ? AND id <= ?)"
+    return "sid=? AND ts >= ? AND ts < ? AND id <= ?"
+
+
+def _fill(live_path, path, sid, lo, hi):
+    """Copie le mois de la base vivante (attachée) dans `path` ; retourne
+    {table: (lignes en ligne, plus grand id)} et les totaux du fichier."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS live", (live_path,))
+        conn.execute("BEGIN")          # un seul instantané de lecture de la base vivante
+        have = {r[0] for r in conn.execute("SELECT name FROM main.sqlite_master")}
+        ddl = conn.execute(f"""SELECT name, sql FROM live.sqlite_master WHERE type IN ('table', 'index') AND sql IS NOT NULL
+                               AND tbl_name IN ({','.join('?' * len(TABLES))}) ORDER BY type DESC""", TABLES).fetchall()
+        for name, sql in ddl:
+            if name not in have:
+                conn.execute(sql)
+        max_sale = conn.execute("SELECT MAX(id) FROM live.sales WHERE sid=? AND ts >= ? AND ts < ?", (sid, lo, hi)).fetchone()[0]
+        live = {}
+        for t in TABLES:
+            top = max_sale if t == "sale_items" else \
+                conn.execute(f"SELECT MAX(id) FROM live.{t} WHERE sid=? AND ts >= ? AND ts < ?", (sid, lo, hi)).fetchone()[0]
+            where, params = _range(t).format(db="live."), (sid, lo, hi, top or 0)
+            src = {r[1] for r in conn.execute(f"PRAGMA live.table_info({t})")}
+            cols = ", ".join(r[1] for r in conn.execute(f"PRAGMA main.table_info({t})") if r[1] in src)
+            conn.execute(f"INSERT OR IGNORE INTO main.{t} ({cols}) SELECT {cols} FROM live.{t} WHERE {where}", params)
+            n = conn.execute(f"SELECT COUNT(*) FROM live.{t} WHERE {where}", params).fetchone()[0]
+            missing = conn.execute(f"SELECT COUNT(*) FROM live.{t} l WHERE {where} "
+                                   f"AND NOT EXISTS (SELECT 1 FROM main.{t} a WHERE a.id = l.id)", params).fetchone()[0]
+            if missing:
+                raise ArchiveError(f"{t} : {missing} ligne(s) absentes de l'archive {os.path.basename(path)}")
+            live[t] = (n, top or 0)
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE live")
+        check = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if check != "ok":
+            raise ArchiveError(f"integrity_check : {check}")
+        totals = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in TABLES}
+        return live, totals
+    finally:
+        conn.close()
+
+
+def _purge(conn, sid, month, lo, hi, live):
+    """Dans la transaction de l'écrivain : index d'archive, suppression vérifiée, manifeste."""
+    sales = (sid, lo, hi, live["sales"][1])
+    conn.execute(f"""INSERT OR IGNORE INTO archived_refs (sid, ref, month)
+                     SELECT sid, ref, ? FROM sales WHERE {_range('sales')} AND ref IS NOT NULL""", (month, *sales))
+    conn.execute(f"""INSERT INTO archived_returns (sid, sale_ref, item, qty)
+                     SELECT sid, sale_ref, COALESCE(item, ''), SUM(COALESCE(qty, 0)) FROM returns
+                     WHERE {_range('returns')} AND sale_ref IS NOT NULL GROUP BY 1, 2, 3
+                     ON CONFLICT(sid, sale_ref, item) DO UPDATE SET qty = qty + excluded.qty""",
+                 (sid, lo, hi, live["returns"][1]))
+    for t in ("sale_items", "sales", "returns", "audit_logs"):      # sale_items d'abord : sa borne passe par les ventes
+        params = sales if t == "sale_items" else (sid, lo, hi, live[t][1])
+        n = conn.execute(f"DELETE FROM {t} WHERE {_range(t).format(db='')}", params).rowcount
+        if n != live[t][0]:
+            raise ArchiveError(f"{t} {sid} {month} : {n} ligne(s) à supprimer, {live[t][0]} archivée(s)")
+
+
+def archive_month(db, sid, month, root=ARCHIVE_DIR):
+    """Archive un mois d'une boutique (fusionné dans le fichier s'il existe déjà) ;
+    None si le mois n'a plus rien en ligne."""
+    lo, hi = month_bounds(month)
+    rel = f"{shop_dir(sid)}/{month}{SUFFIX}"
+    final = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(final), exist_ok=True)
+    tmp_db, tmp_gz = final + ".tmp.db", final + ".tmp"
+    try:
+        if os.path.exists(final):
+            _gunzip_file(final, tmp_db)
+        live, totals = _fill(db.path, tmp_db, sid, lo, hi)
+        if not any(n for n, _ in live.values()):
+            return None
+        _gzip_file(tmp_db, tmp_gz)
+        os.replace(tmp_gz, final)
+    finally:
+        for path in (tmp_db, tmp_gz):
+            if os.path.exists(path):
+                os.remove(path)
+    size = os.path.getsize(final)
+    with db.write() as conn:
+        _purge(conn, sid, month, lo, hi, live)
+        conn.execute("""INSERT INTO archive_manifest (sid, month, path, sales, sale_items, returns, audit_logs, bytes, archived_ts)
+                        VALUES (?,?,?,?,?,?,?,?,?)
+                        ON CONFLICT(sid, month) DO UPDATE SET path=excluded.path, sales=excluded.sales,
+                            sale_items=excluded.sale_items, returns=excluded.returns, audit_logs=excluded.audit_logs,
+                            bytes=excluded.bytes, archived_ts=excluded.archived_ts""",
+                     (sid, month, rel, *(totals[t] for t in TABLES), size, datetime.now().isoformat(timespec="seconds")))
+    return {'sid': sid, 'month': month, 'path': final, 'bytes': size, **{t: n for t, (n, _) in live.items()}}
+
+
+def archive_closed(db, root=ARCHIVE_DIR, keep_months=KEEP_MONTHS, today=None, progress=None):
+    """Archive les mois clos de chaque boutique de la base (et l'audit SYSTEM) ;
+    retourne la liste des mois archivés (voir archive_month)."""
+    from balika.shards import SYSTEM_SID   # import local : balika.shards importe le schéma
+
+    before = first_live_month(today or date.today(), keep_months)
+    with db.read() as conn:
+        sids = [r[0] for r in conn.execute("SELECT sid FROM shops ORDER BY sid")] + [SYSTEM_SID]
+        todo = [(sid, m) for sid in sids for m in closed_months(conn, sid, before)]
+    done = []
+    for sid, month in todo:
+        res = archive_month(db, sid, month, root)
+        if res is not None:
+            done.append(res)
+            if progress:
+                progress(res)
+    return done
+
+
+# ------------------------------------------------------------------------------
+# LECTURE TRANSPARENTE
+# ------------------------------------------------------------------------------
+class MonthArchive:
+    """Un mois archivé d'une boutique, interrogé comme une base (lecture seule)."""
+
+    def __init__(self, store, sid, month, path):
+        self.store = store
+        self.sid = sid
+        self.month = month
+        self.path = path
+
+    @contextmanager
+    def read(self):
+        conn = sqlite3.connect(f"file:{self.store.local_copy(self.path)}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+class ArchiveStore:
+    """Dossier d'archives + cache LRU de copies décompressées (fichiers temporaires)."""
+
+    def __init__(self, root=ARCHIVE_DIR, cache_size=CACHE_SIZE):
+        self.root = root
+        self.cache_size = cache_size
+        self.opened = 0
+        self._cache = OrderedDict()    # chemin relatif -> (mtime, copie décompressée)
+        self._lock = threading.Lock()
+        self._tmp = None
+        atexit.register(self.close)
+
+    def archive_closed(self, db, keep_months=KEEP_MONTHS, today=None, progress=None):
+        return archive_closed(db, self.root, keep_months, today, progress)
+
+    def months(self, conn, lo, hi, sid=None):
+        """Mois archivés (de la boutique `sid`, ou de toutes) qui recoupent [lo, hi)."""
+        sql = "SELECT sid, month, path FROM archive_manifest WHERE month >= ? AND month <= ? AND month || '-01' < ?"
+        params = [lo[:7], hi[:7], hi]
+        if sid is not None:
+            sql, params = sql.replace("WHERE", "WHERE sid=? AND"), [sid, *params]
+        return [MonthArchive(self, *r) for r in conn.execute(sql + " ORDER BY sid, month", params)]
+
+    def locate(self, conn, sid, ref):
+        """Mois archivé qui contient la facture `ref`, ou None."""
+        row = conn.execute("""SELECT m.sid, m.month, m.path FROM archived_refs r
+                              JOIN archive_manifest m ON m.sid = r.sid AND m.month = r.month
+                              WHERE r.sid=? AND r.ref=?""", (sid, ref)).fetchone()
+        return MonthArchive(self, *row) if row else None
+
+    def local_copy(self, rel):
+        path = os.path.join(self.root, rel)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            hit = self._cache.get(rel)
+            if hit is not None and hit[0] == mtime:
+                self._cache.move_to_end(rel)
+                return hit[1]
+            if self._tmp is None:
+                self._tmp = tempfile.mkdtemp(prefix="balika-archive-")
+            local = os.path.join(self._tmp, f"{self.opened}.db")
+            _gunzip_file(path, local)
+            self.opened += 1
+            self._cache[rel] = (mtime, local)
+            while len(self._cache) > self.cache_size:
+                _, (_, old) = self._cache.popitem(last=False)
+                self._remove(old)
+            return local
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def close(self):
+        with self._lock:
+            self._cache.clear()
+            if self._tmp is not None:
+                shutil.rmtree(self._tmp, ignore_errors=True)
+                self._tmp = None
+
+
+def main(argv=None):
+    from balika.db import Database
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["run"] and len(argv) in (2, 3, 4):
+        path, root = argv[1], argv[2] if len(argv) > 2 else ARCHIVE_DIR
+        keep = int(argv[3]) if len(argv) > 3 else KEEP_MONTHS
+        db = Database(path)
+        try:
+            with db.write() as conn:
+                install(conn)
+            before = os.path.getsize(path)
+            done = archive_closed(db, root, keep, progress=lambda r: print(
+                f"  {r['sid']} {r['month']} : {r['sales']:,} ventes, {r['sale_items']:,} lignes, {r['returns']:,} retours, "
+                f"{r['audit_logs']:,} audits -> {r['bytes'] / 1e6:,.2f} Mo"))
+            db.vacuum()
+            print(f"✅ {len(done)} mois archivé(s) dans {root} ; base {before / 1e6:,.1f} Mo -> {os.path.getsize(path) / 1e6:,.1f} Mo")
+            return 0
+        finally:
+            db.close()
+    if argv[:1] == ["list"] and len(argv) == 2:
+        conn = sqlite3.connect(argv[1])
+        try:
+            install(conn)
+            for row in conn.execute("SELECT sid, month, sales, sale_items, returns, audit_logs, bytes, path "
+                                    "FROM archive_manifest ORDER BY sid, month"):
+                print(f"{row[0]:<16} {row[1]}  {row[2]:>8,} ventes {row[3]:>9,} lignes {row[4]:>6,} retours "
+                      f"{row[5]:>8,} audits {row[6] / 1e6:>8,.2f} Mo  {row[7]}")
+        finally:
+            conn.close()
+        return 0
+    print("usage: python -m balika.archive {run <db> [dossier] [mois_gardés] | list <db>}")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# ==============================================================================
+# 💎 BALIKA ERP - JOURNAL D'AUDIT ASYNCHRONE (FILE BORNÉE + ÉCRIVAIN DE FOND)
+# ------------------------------------------------------------------------------
+# log() ne fait qu'empiler une ligne : aucune écriture disque sur le chemin de
+# la requête. Un thread écrivain vide la file par lots (executemany, une seule
+# transaction) dès que `batch_size` lignes attendent ou que `flush_interval`
+# secondes se sont écoulées. La file est vidée à l'arrêt du processus (atexit).
+#
+# File pleine : policy="block" attend jusqu'à `block_timeout` s (contre-pression)
+# puis abandonne la ligne ; policy="drop" l'abandonne tout de suite. Les lignes
+# abandonnées sont comptées dans `dropped`.
+#
+# Stockage partitionné (balika.shards) : chaque lot est réparti par sid, une
+# transaction par base (audit SYSTEM dans le catalogue).
+# ==============================================================================
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from balika.dates import now_ts
+
+ACTIONS = ("CONNEXION", "VENTE", "STOCK", "DETTE", "DÉPENSE", "RETOUR", "COMPTE", "ÉQUIPE",
+           "CONFIG", "BROADCAST", "RÉGLAGES", "CLÔTURE")
+
+_INSERT = """INSERT INTO audit_logs (user, action, details, date, time, sid, ts)
+             VALUES (?,?,?,?,?,?,?)"""
+_STOP = object()
+
+
+class AuditLogger:
+    def __init__(self, db, batch_size=200, flush_interval=1.0, max_queue=10000,
+                 policy="block", block_timeout=0.5):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"policy inconnue : {policy}")
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.written = 0
+        self._q = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="balika-audit", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- CÔTÉ REQUÊTE ----------------------------------------------------------
+    def log(self, user, action, details, sid, now=None):
+        now = now or datetime.now()
+        row = (user, action, details, now.strftime("%d/%m/%Y"), now.strftime("%H:%M:%S"), sid, now_ts(now))
+        try:
+            if self.policy == "drop" or self._closed:
+                self._q.put_nowait(row)
+            else:
+                self._q.put(row, timeout=self.block_timeout)
+        except queue.Full:
+            self.dropped += 1
+
+    def pending(self):
+        return self._q.qsize()
+
+    def flush(self, timeout=5.0):
+        """Attend que toutes les lignes déjà empilées soient écrites."""
+        deadline = time.monotonic() + timeout
+        while self._q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return self._q.unfinished_tasks == 0
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._q.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    # --- THREAD ÉCRIVAIN -------------------------------------------------------
+    def _run(self):
+        batch, stop = [], False
+        while not stop:
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._q.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write(batch)
+                batch = []
+
+    def _write(self, batch, attempts=5):
+        try:
+            groups = {}
+            for row in batch:
+                groups.setdefault(self.db.shop(row[5]), []).append(row)
+            for db, rows in groups.items():
+                self._write_rows(db, rows, attempts)
+        finally:
+            for _ in batch:
+                self._q.task_done()
+
+    def _write_rows(self, db, rows, attempts):
+        # Base momentanément verrouillée par un autre processus : quelques essais
+        # espacés, puis le lot est compté comme perdu plutôt que de bloquer la file.
+        for attempt in range(attempts):
+            try:
+                with db.write() as conn:
+                    conn.executemany(_INSERT, rows)
+                self.written += len(rows)
+                return
+            except sqlite3.OperationalError:
+                time.sleep(0.1 * (attempt + 1))
+        self.dropped += len(rows)
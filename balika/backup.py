@@ -0,0 +1,188 @@
+# ==============================================================================
+# 💎 BALIKA ERP - SAUVEGARDES EN LIGNE, COMPRESSÉES ET ROTATIVES
+# ------------------------------------------------------------------------------
+# - Instantané figé sans copie intermédiaire : le WAL est vidé dans le fichier
+#   (checkpoint TRUNCATE), son vide est vérifié sous le verrou d'écriture (tenu
+#   quelques microsecondes), puis une transaction de lecture est ouverte. Tant
+#   qu'elle dure, aucun checkpoint ne peut réécrire le fichier : les caisses
+#   continuent d'écrire dans le WAL et le fichier reste l'instantané.
+# - Le fichier est vérifié (PRAGMA integrity_check dans ce même instantané) puis
+#   lu par blocs et compressé à la volée vers backups/balika_AAAAMMJJ_HHMMSS.db.gz :
+#   seul le .gz grandit sur le disque, jamais une copie brute de la base.
+#   Seules les `keep` dernières sont conservées.
+# - restore_snapshot() réinjecte un instantané dans la base vivante via l'API de
+#   sauvegarde SQLite, sous le verrou de l'écrivain de l'application (db=...).
+#   En ligne de commande, aucun verrou de l'application n'est disponible :
+#   arrêter l'application avant `restore`.
+#
+#   python -m balika.backup snapshot balika_v650_master.db [dossier]
+#   python -m balika.backup list     [dossier]
+#   python -m balika.backup restore  backups/balika_....db.gz balika_v650_master.db   (application arrêtée)
+# ==============================================================================
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+SNAPSHOT_DIR = "backups"
+KEEP = 7
+MAX_RESTARTS = 5
+CHUNK = 1024 * 1024
+PREFIX = "balika_"
+SUFFIX = ".db.gz"
+
+
+class BackupError(Exception):
+    pass
+
+
+def _freeze(src_path):
+    """Connexion dans une transaction de lecture dont l'instantané est exactement le fichier
+    (WAL vide) ; le fichier ne change plus tant qu'elle reste ouverte."""
+    reader = sqlite3.connect(src_path, timeout=30, isolation_level=None)
+    lock = sqlite3.connect(src_path, timeout=30, isolation_level=None)
+    try:
+        if reader.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+            # Journal classique : le verrou SHARED de la lecture suffit à figer le fichier
+            reader.execute("BEGIN")
+            reader.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            return reader
+        for _ in range(MAX_RESTARTS):
+            reader.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            lock.execute("BEGIN IMMEDIATE")           # aucune écriture entre la vérification et la lecture
+            try:
+                busy, frames, _ = reader.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+                if busy == 0 and frames == 0:
+                    reader.execute("BEGIN")
+                    reader.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                    return reader
+            finally:
+                lock.execute("ROLLBACK")
+            time.sleep(0.05)
+        raise BackupError("WAL impossible à vider (lectures longues en cours) : réessayez")
+    except BaseException:
+        reader.close()
+        raise
+    finally:
+        lock.close()
+
+
+def _stream(src_path, dst_gz, progress):
+    """Compresse l'instantané figé de src_path vers dst_gz ; retourne la taille brute en octets."""
+    reader = _freeze(src_path)
+    try:
+        check = reader.execute("PRAGMA integrity_check").fetchone()[0]
+        if check != "ok":
+            raise BackupError(f"integrity_check : {check}")
+        page_size = reader.execute("PRAGMA page_size").fetchone()[0]
+        total = reader.execute("PRAGMA page_count").fetchone()[0]
+        raw, done = total * page_size, 0
+        with open(src_path, "rb") as fin, gzip.open(dst_gz, "wb", compresslevel=6) as fout:
+            while done < raw:
+                block = fin.read(min(CHUNK, raw - done))
+                if not block:
+                    raise BackupError("fichier plus court que l'instantané")
+                if done == 0:
+                    # En-tête : journal classique (octets 18-19), l'instantané s'ouvre seul, sans -wal
+                    block = block[:18] + b"\x01\x01" + block[20:]
+                fout.write(block)
+                done += len(block)
+                if progress:
+                    progress(done // page_size, total)
+        return raw
+    finally:
+        reader.close()
+
+
+def list_snapshots(dest_dir=SNAPSHOT_DIR):
+    """Instantanés du plus récent au plus ancien : [(chemin, octets, date)]."""
+    if not os.path.isdir(dest_dir):
+        return []
+    out = []
+    for name in os.listdir(dest_dir):
+        if name.startswith(PREFIX) and name.endswith(SUFFIX):
+            path = os.path.join(dest_dir, name)
+            out.append((path, os.path.getsize(path), datetime.strptime(name[len(PREFIX):-len(SUFFIX)], "%Y%m%d_%H%M%S")))
+    return sorted(out, key=lambda s: s[2], reverse=True)
+
+
+def rotate(dest_dir=SNAPSHOT_DIR, keep=KEEP):
+    removed = []
+    for path, _, _ in list_snapshots(dest_dir)[keep:]:
+        os.remove(path)
+        removed.append(path)
+    return removed
+
+
+def create_snapshot(db_path, dest_dir=SNAPSHOT_DIR, keep=KEEP, progress=None, now=None):
+    """Crée, vérifie et compresse un instantané ; retourne un dict de statistiques."""
+    os.makedirs(dest_dir, exist_ok=True)
+    now = now or datetime.now()
+    final = os.path.join(dest_dir, f"{PREFIX}{now.strftime('%Y%m%d_%H%M%S')}{SUFFIX}")
+    tmp_gz = final + ".tmp"
+    t0 = time.perf_counter()
+    try:
+        raw = _stream(db_path, tmp_gz, progress)
+        os.replace(tmp_gz, final)
+    finally:
+        if os.path.exists(tmp_gz):
+            os.remove(tmp_gz)
+    seconds = time.perf_counter() - t0
+    rotate(dest_dir, keep)
+    return {'path': final, 'bytes_raw': raw, 'bytes_gz': os.path.getsize(final), 'seconds': seconds}
+
+
+def restore_snapshot(snapshot_path, db_path, db=None):
+    """Remplace le contenu de db_path par celui de l'instantané (vérifié avant).
+
+    db : pool Database de l'application ouvert sur db_path ; son écrivain est suspendu
+    pendant la réinjection. Sans db, l'application doit être arrêtée.
+    """
+    tmp_db = db_path + ".restore.tmp"
+    try:
+        with gzip.open(snapshot_path, "rb") as fin, open(tmp_db, "wb") as fout:
+            shutil.copyfileobj(fin, fout, CHUNK)
+        src = sqlite3.connect(tmp_db)
+        try:
+            check = src.execute("PRAGMA integrity_check").fetchone()[0]
+            if check != "ok":
+                raise BackupError(f"Instantané corrompu : {check}")
+            with db.paused() if db is not None else nullcontext():
+                dst = sqlite3.connect(db_path, timeout=30)
+                try:
+                    src.backup(dst)
+                finally:
+                    dst.close()
+        finally:
+            src.close()
+    finally:
+        if os.path.exists(tmp_db):
+            os.remove(tmp_db)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["snapshot"] and len(argv) in (2, 3):
+        res = create_snapshot(argv[1], *argv[2:])
+        mb = res['bytes_raw'] / 1e6
+        print(f"✅ {res['path']} : {mb:,.1f} Mo -> {res['bytes_gz'] / 1e6:,.1f} Mo en {res['seconds']:.1f} s "
+              f"({mb / max(res['seconds'], 1e-9):,.1f} Mo/s)")
+        return 0
+    if argv[:1] == ["list"] and len(argv) in (1, 2):
+        for path, size, when in list_snapshots(*argv[1:]):
+            print(f"{when:%d/%m/%Y %H:%M:%S}  {size / 1e6:10,.1f} Mo  {path}")
+        return 0
+    if argv[:1] == ["restore"] and len(argv) == 3:
+        restore_snapshot(argv[1], argv[2])
+        print(f"✅ {argv[2]} restaurée depuis {argv[1]}")
+        return 0
+    print("usage: python -m balika.backup {snapshot <db> [dossier] | list [dossier] | restore <snapshot> <db>}")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
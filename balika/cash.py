@@ -0,0 +1,140 @@
+# ==============================================================================
+# 💎 BALIKA ERP - JOURNAL DE CAISSE ET CLÔTURE (cash_movements / cash_closings)
+# ------------------------------------------------------------------------------
+# Chaque entrée ou sortie d'espèces est ajoutée à cash_movements par des
+# triggers, dans la même transaction que l'opération d'origine :
+#   VENTE   : part encaissée de la vente (MIN(payé, total)), dans la devise payée
+#   DETTE   : paiement d'une dette (baisse du solde)
+#   DÉPENSE : sortie de caisse
+#   RETOUR  : remboursement client
+# Le journal est en ajout seul (UPDATE/DELETE refusés). Une clôture agrège
+# uniquement les mouvements postérieurs au dernier point de clôture
+# (id > last_movement_id, intervalle sur l'index (sid, id)) : son coût dépend
+# de la journée, pas de l'historique. Le fond conservé devient le fond
+# d'ouverture suivant (shops.closing_balance / closing_balance_cdf).
+# ==============================================================================
+import json
+
+from balika.dates import now_ts
+
+KINDS = ("VENTE", "DETTE", "DÉPENSE", "RETOUR")
+CURRENCIES = ("USD", "CDF")
+DEFAULT_RATE = 2800.0
+
+CREATE_TABLES = (
+    """CREATE TABLE IF NOT EXISTS cash_movements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, sid TEXT NOT NULL, ts TEXT NOT NULL,
+        kind TEXT NOT NULL, ref TEXT, user TEXT,
+        currency TEXT NOT NULL DEFAULT 'USD', amount REAL NOT NULL, amount_usd REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS idx_cash_movements_sid_id ON cash_movements(sid, id)",
+    """CREATE TABLE IF NOT EXISTS cash_closings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, sid TEXT NOT NULL, ts TEXT NOT NULL, user TEXT,
+        last_movement_id INTEGER NOT NULL, movements INTEGER NOT NULL,
+        opening_usd REAL NOT NULL, opening_cdf REAL NOT NULL,
+        net_usd REAL NOT NULL, net_cdf REAL NOT NULL,
+        expected_usd REAL NOT NULL, expected_cdf REAL NOT NULL,
+        counted_usd REAL NOT NULL, counted_cdf REAL NOT NULL,
+        kept_usd REAL NOT NULL, kept_cdf REAL NOT NULL,
+        breakdown TEXT, note TEXT)""",
+    "CREATE INDEX IF NOT EXISTS idx_cash_closings_sid_id ON cash_closings(sid, id)",
+)
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+
+
+def _move(sid, ts, kind, ref, user, currency, amount_usd):
+    # Montant natif : converti au taux de la boutique au moment de l'opération
+    native = (f"CASE WHEN {currency} = 'CDF' THEN ({amount_usd}) * COALESCE("
+              f"(SELECT rate FROM shops WHERE sid = {sid}), {DEFAULT_RATE}) ELSE ({amount_usd}) END")
+    return (f"INSERT INTO cash_movements (sid, ts, kind, ref, user, currency, amount, amount_usd) "
+            f"VALUES ({sid}, COALESCE({ts}, {_NOW}), '{kind}', {ref}, {user}, {currency}, {native}, {amount_usd});")
+
+
+_SALE_CASH = "MIN(COALESCE(NEW.paid_usd, 0), COALESCE(NEW.total_usd, 0))"
+_SALE_CUR = "CASE WHEN NEW.currency = 'CDF' THEN 'CDF' ELSE 'USD' END"
+
+TRIGGERS = {
+    "trg_cash_sales": f"""CREATE TRIGGER IF NOT EXISTS trg_cash_sales AFTER INSERT ON sales
+        WHEN {_SALE_CASH} > 0
+        BEGIN {_move("NEW.sid", "NEW.ts", "VENTE", "NEW.ref", "NEW.seller", _SALE_CUR, _SALE_CASH)} END""",
+    "trg_cash_debts_paid": f"""CREATE TRIGGER IF NOT EXISTS trg_cash_debts_paid AFTER UPDATE OF balance ON debts
+        WHEN NEW.balance < OLD.balance
+        BEGIN {_move("NEW.sid", "NEW.updated_ts", "DETTE", "NEW.sale_ref", "NULL", "'USD'",
+                     "OLD.balance - NEW.balance")} END""",
+    "trg_cash_expenses": f"""CREATE TRIGGER IF NOT EXISTS trg_cash_expenses AFTER INSERT ON expenses
+        WHEN COALESCE(NEW.amount, 0) <> 0
+        BEGIN {_move("NEW.sid", "NEW.ts", "DÉPENSE", "NEW.label", "NEW.user", "'USD'", "-NEW.amount")} END""",
+    "trg_cash_returns": f"""CREATE TRIGGER IF NOT EXISTS trg_cash_returns AFTER INSERT ON returns
+        WHEN COALESCE(NEW.refund_amount, 0) <> 0
+        BEGIN {_move("NEW.sid", "NEW.ts", "RETOUR", "NEW.sale_ref", "NULL", "'USD'", "-NEW.refund_amount")} END""",
+    # Journal en ajout seul : une erreur se corrige par un mouvement inverse, jamais par réécriture
+    "trg_cash_movements_no_update": """CREATE TRIGGER IF NOT EXISTS trg_cash_movements_no_update
+        BEFORE UPDATE ON cash_movements BEGIN SELECT RAISE(ABORT, 'journal de caisse en ajout seul'); END""",
+    "trg_cash_movements_no_delete": """CREATE TRIGGER IF NOT EXISTS trg_cash_movements_no_delete
+        BEFORE DELETE ON cash_movements BEGIN SELECT RAISE(ABORT, 'journal de caisse en ajout seul'); END""",
+}
+
+
+def install(conn):
+    for ddl in CREATE_TABLES:
+        conn.execute(ddl)
+    for ddl in TRIGGERS.values():
+        conn.execute(ddl)
+
+
+# ------------------------------------------------------------------------------
+# CLÔTURE
+# ------------------------------------------------------------------------------
+def pending(conn, sid):
+    """Mouvements depuis le dernier point de clôture, agrégés par (type, devise).
+
+    Retourne {'since_id', 'last_id', 'movements', 'opening': {devise: fond},
+    'by_kind': {type: {devise: montant, 'n': nombre}}, 'net': {devise: montant},
+    'expected': {devise: fond + net}}.
+    """
+    row = conn.execute("SELECT last_movement_id FROM cash_closings WHERE sid=? ORDER BY id DESC LIMIT 1",
+                       (sid,)).fetchone()
+    since = row[0] if row else 0
+    shop = conn.execute("SELECT closing_balance, closing_balance_cdf FROM shops WHERE sid=?", (sid,)).fetchone()
+    opening = {"USD": (shop and shop[0]) or 0.0, "CDF": (shop and shop[1]) or 0.0}
+    by_kind, net = {}, dict.fromkeys(CURRENCIES, 0.0)
+    count, last_id = 0, since
+    for kind, currency, n, total, top in conn.execute(
+            """SELECT kind, currency, COUNT(*), SUM(amount), MAX(id) FROM cash_movements
+               WHERE sid=? AND id > ? GROUP BY kind, currency""", (sid, since)):
+        slot = by_kind.setdefault(kind, {**dict.fromkeys(CURRENCIES, 0.0), 'n': 0})
+        slot[currency] = slot.get(currency, 0.0) + total
+        slot['n'] += n
+        net[currency] = net.get(currency, 0.0) + total
+        count += n
+        last_id = max(last_id, top)
+    return {'since_id': since, 'last_id': last_id, 'movements': count, 'opening': opening,
+            'by_kind': by_kind, 'net': net, 'expected': {c: opening.get(c, 0.0) + net[c] for c in net}}
+
+
+def close_register(db, sid, user, counted_usd, counted_cdf, kept_usd=None, kept_cdf=None, note="", now=None):
+    """Clôture la caisse : fige les mouvements en attente, enregistre le comptage
+    et reporte le fond conservé (par défaut tout le compté) comme fond d'ouverture."""
+    kept_usd = counted_usd if kept_usd is None else kept_usd
+    kept_cdf = counted_cdf if kept_cdf is None else kept_cdf
+    if min(counted_usd, counted_cdf, kept_usd, kept_cdf) < 0:
+        raise ValueError("montant négatif")
+    if kept_usd > counted_usd or kept_cdf > counted_cdf:
+        raise ValueError("le fond conservé dépasse le montant compté")
+    ts = now_ts(now)
+    with db.write() as conn:
+        # Relu sous le verrou d'écriture : un mouvement arrivé après appartient à la clôture suivante
+        p = pending(conn, sid)
+        cur = conn.execute(
+            """INSERT INTO cash_closings (sid, ts, user, last_movement_id, movements, opening_usd, opening_cdf,
+                   net_usd, net_cdf, expected_usd, expected_cdf, counted_usd, counted_cdf, kept_usd, kept_cdf,
+                   breakdown, note)
+               VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+            (sid, ts, user, p['last_id'], p['movements'], p['opening']['USD'], p['opening']['CDF'],
+             p['net']['USD'], p['net']['CDF'], p['expected']['USD'], p['expected']['CDF'],
+             counted_usd, counted_cdf, kept_usd, kept_cdf, json.dumps(p['by_kind'], ensure_ascii=False), note))
+        conn.execute("INSERT OR IGNORE INTO shops (sid, name) VALUES (?,?)", (sid, sid))
+        conn.execute("UPDATE shops SET closing_balance=?, closing_balance_cdf=? WHERE sid=?", (kept_usd, kept_cdf, sid))
+    return {**p, 'closing_id': cur.lastrowid, 'ts': ts, 'counted': {"USD": counted_usd, "CDF": counted_cdf},
+            'kept': {"USD": kept_usd, "CDF": kept_cdf},
+            'gap': {"USD": counted_usd - p['expected']['USD'], "CDF": counted_cdf - p['expected']['CDF']}}
@@ -0,0 +1,134 @@
+# ==============================================================================
+# 💎 BALIKA ERP - MOTEUR D'ENCAISSEMENT (CAISSE)
+# ------------------------------------------------------------------------------
+# Une vente = une transaction IMMEDIATE :
+#   1. contrôle du stock disponible pour toutes les lignes du panier ;
+#   2. décrément groupé (executemany) avec garde `qty >= ?` ;
+#   3. référence séquentielle par boutique (shop_counters), jamais réutilisée ;
+#   4. vente, lignes sale_items et dette éventuelle.
+# Si une ligne manque de stock, rien n'est écrit (rollback) et StockError est levée.
+# Un retour (record_return) est borné par la quantité vendue moins les retours
+# déjà faits, en ligne ou archivés ; au-delà, ReturnError.
+# ==============================================================================
+from datetime import datetime
+
+from balika.dates import now_ts
+
+DEBT_THRESHOLD = 0.01
+
+
+class StockError(Exception):
+    """Stock insuffisant ; `shortages` = [(article, demandé, disponible)]."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(", ".join(f"{it} ({want} > {have})" for it, want, have in shortages))
+
+
+class ReturnError(Exception):
+    pass
+
+
+INVOICE_LINES = """SELECT si.item, si.qty, si.unit_price, si.inv_id FROM sales s
+                   JOIN sale_items si ON si.sale_id = s.id WHERE s.sid=? AND s.ref=?"""
+
+
+def returned(conn, sid, sale_ref):
+    """{article: quantité déjà retournée} sur la facture (retours en ligne et archivés)."""
+    deja = {}
+    for it, q in conn.execute("""SELECT item, SUM(qty) FROM returns WHERE sid=? AND sale_ref=? GROUP BY item
+                                 UNION ALL SELECT item, qty FROM archived_returns WHERE sid=? AND sale_ref=?""",
+                              (sid, sale_ref, sid, sale_ref)):
+        deja[it] = deja.get(it, 0) + (q or 0)
+    return deja
+
+
+def next_ref(conn, sid, prefix="B-"):
+    """Alloue la prochaine référence de la boutique (à appeler dans une transaction)."""
+    conn.execute("""INSERT INTO shop_counters (sid, last_ref) VALUES (?, 1)
+                    ON CONFLICT(sid) DO UPDATE SET last_ref = last_ref + 1""", (sid,))
+    n = conn.execute("SELECT last_ref FROM shop_counters WHERE sid=?", (sid,)).fetchone()[0]
+    return f"{prefix}{n:06d}"
+
+
+def checkout(db, sid, seller, lines, client, paid_usd, currency, now=None, ref_prefix="B-"):
+    """Enregistre une vente de façon atomique et retourne son résumé.
+
+    `lines` : itérable de dicts {'id', 'item', 'q', 'p', 'buy'} (id = inventory.id).
+    """
+    with db.write() as conn:
+        return record_sale(conn, sid, seller, lines, client, paid_usd, currency, now, ref_prefix=ref_prefix)
+
+
+def record_sale(conn, sid, seller, lines, client, paid_usd, currency, now=None, ref=None, ref_prefix="B-", strict=True):
+    """Corps de checkout(), dans la transaction d'écriture de l'appelant.
+
+    `ref` : référence imposée (vente d'un terminal, voir balika.ingest). `strict=False` :
+    la vente a déjà eu lieu, elle est enregistrée même si le stock manque ; le stock
+    des articles en rupture est ramené à 0 au lieu de lever StockError.
+    """
+    lines = [l for l in lines if l['q'] > 0]
+    if not lines:
+        raise ValueError("Panier vide")
+    now = now or datetime.now()
+    ts = now_ts(now)
+    total_usd = sum(l['p'] * l['q'] for l in lines)
+    profit = sum((l['p'] - l['buy']) * l['q'] for l in lines)
+    rest_usd = total_usd - paid_usd
+
+    ids = [l['id'] for l in lines]
+    dispo = dict(conn.execute(f"SELECT id, qty FROM inventory WHERE sid=? AND id IN ({','.join('?' * len(ids))})",
+                              (sid, *ids)).fetchall())
+    short = [(l['item'], l['q'], dispo.get(l['id'], 0)) for l in lines if dispo.get(l['id'], 0) < l['q']]
+    if strict:
+        if short:
+            raise StockError(short)
+        cur = conn.executemany("UPDATE inventory SET qty = qty - ? WHERE id=? AND sid=? AND qty >= ?",
+                               [(l['q'], l['id'], sid, l['q']) for l in lines])
+        if cur.rowcount != len(lines):
+            # Garde-fou : ne devrait pas arriver sous le verrou d'écriture
+            raise StockError([(l['item'], l['q'], dispo.get(l['id'], 0)) for l in lines])
+    else:
+        conn.executemany("UPDATE inventory SET qty = MAX(qty - ?, 0) WHERE id=? AND sid=?",
+                         [(l['q'], l['id'], sid) for l in lines])
+
+    ref = ref or next_ref(conn, sid, ref_prefix)
+    cur = conn.execute("""INSERT INTO sales (ref, cli, total_usd, paid_usd, rest_usd, date, time, seller, sid,
+                                             currency, profit, ts)
+                          VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""",
+                       (ref, client, total_usd, paid_usd, rest_usd, now.strftime("%d/%m/%Y"),
+                        now.strftime("%H:%M"), seller, sid, currency, profit, ts))
+    sale_id = cur.lastrowid
+    conn.executemany("""INSERT INTO sale_items (sale_id, inv_id, item, qty, unit_price, buy_price, sid)
+                        VALUES (?,?,?,?,?,?,?)""",
+                     [(sale_id, l['id'], l['item'], l['q'], l['p'], l['buy'], sid) for l in lines])
+    if rest_usd > DEBT_THRESHOLD:
+        conn.execute("""INSERT INTO debts (cli, balance, sale_ref, sid, last_update, ts, updated_ts)
+                        VALUES (?,?,?,?,?,?,?)""",
+                     (client, rest_usd, ref, sid, now.strftime("%d/%m/%Y"), ts, ts))
+
+    return {'ref': ref, 'sale_id': sale_id, 'total_usd': total_usd, 'profit': profit,
+            'paid_usd': paid_usd, 'rest_usd': rest_usd, 'ts': ts}
+
+
+def record_return(conn, sid, sale_ref, item, qty, lines, now=None):
+    """Retour de `qty` x `item`, dans la transaction d'écriture de l'appelant : ligne returns
+    et stock réintégré ; retourne le montant remboursé.
+
+    `lines` : lignes de la facture [(item, qty, unit_price, inv_id)] (INVOICE_LINES, ou la
+    partition d'un mois archivé). À appeler sous le verrou d'écriture : deux retours
+    simultanés ne dépassent pas la quantité vendue.
+    """
+    sold = {it: (q, p, inv_id) for it, q, p, inv_id in lines}
+    left = sold[item][0] - returned(conn, sid, sale_ref).get(item, 0) if item in sold else 0
+    if qty <= 0 or qty > left:
+        raise ReturnError(f"{item} : {qty} > {left} retournable(s)")
+    _, unit_price, inv_id = sold[item]
+    refund = qty * unit_price
+    conn.execute("INSERT INTO returns (sale_ref, item, qty, date, sid, ts, refund_amount) VALUES (?,?,?,?,?,?,?)",
+                 (sale_ref, item, qty, (now or datetime.now()).strftime("%d/%m/%Y"), sid, now_ts(now), refund))
+    if inv_id:
+        conn.execute("UPDATE inventory SET qty = qty + ? WHERE id=?", (qty, inv_id))
+    else:
+        conn.execute("UPDATE inventory SET qty = qty + ? WHERE item=? AND sid=?", (qty, item, sid))
+    return refund
@@ -0,0 +1,162 @@
+# ==============================================================================
+# 💎 BALIKA ERP - COMPTES CLIENTS À CRÉDIT ET RÈGLEMENTS (clients / debt_payments)
+# ------------------------------------------------------------------------------
+# - clients : une ligne par (boutique, client) avec le solde dû et le nombre de
+#   factures ouvertes, tenue à jour par des triggers sur debts (création à la
+#   vente, baisse au paiement) ; la page DETTES pagine cette table au lieu de
+#   charger toutes les dettes de la boutique.
+# - debt_payments / debt_payment_lines : historique des règlements ; un
+#   règlement est réparti FIFO (factures les plus anciennes d'abord) sur les
+#   dettes ouvertes du client, dans une seule transaction.
+# - ancienneté (0–30 / 31–60 / 60+ jours) calculée en SQL : par client sur
+#   l'index partiel des dettes ouvertes (sid, cli, ts), pour les seuls clients
+#   affichés ; pour la boutique sur debt_aging (encours par jour d'origine,
+#   tenu par les mêmes triggers), quelques centaines de lignes au plus.
+# ==============================================================================
+from datetime import date, timedelta
+
+from balika.dates import FR_DATE, now_ts
+
+AGING_BUCKETS = ("0-30 j", "31-60 j", "60+ j")
+
+CREATE_TABLES = (
+    """CREATE TABLE IF NOT EXISTS clients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, sid TEXT NOT NULL, name TEXT NOT NULL,
+        balance REAL NOT NULL DEFAULT 0, open_debts INTEGER NOT NULL DEFAULT 0,
+        first_ts TEXT, last_ts TEXT, UNIQUE (sid, name))""",
+    "CREATE INDEX IF NOT EXISTS idx_clients_open ON clients(sid, balance) WHERE open_debts > 0",
+    """CREATE TABLE IF NOT EXISTS debt_payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, sid TEXT NOT NULL, cli TEXT NOT NULL,
+        amount REAL NOT NULL, ts TEXT NOT NULL, user TEXT, debts INTEGER NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS idx_debt_payments_cli ON debt_payments(sid, cli, id)",
+    """CREATE TABLE IF NOT EXISTS debt_payment_lines (
+        payment_id INTEGER NOT NULL, debt_id INTEGER NOT NULL, sale_ref TEXT,
+        amount REAL NOT NULL, balance_after REAL NOT NULL, PRIMARY KEY (payment_id, debt_id)) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_debt_payment_lines_debt ON debt_payment_lines(debt_id)",
+    """CREATE TABLE IF NOT EXISTS debt_aging (
+        sid TEXT NOT NULL, day TEXT NOT NULL, balance REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (sid, day)) WITHOUT ROWID""",
+    # FIFO et ancienneté : dettes ouvertes d'un client dans l'ordre chronologique (balance : index couvrant)
+    "CREATE INDEX IF NOT EXISTS idx_debts_open_fifo ON debts(sid, cli, ts, id, balance) WHERE status = 'OUVERT'",
+)
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+_OPEN = "(CASE WHEN {0}.status = 'OUVERT' THEN COALESCE({0}.balance, 0) ELSE 0 END)"
+
+
+def _bump_aging(delta):
+    return (f"INSERT INTO debt_aging (sid, day, balance) VALUES (NEW.sid, substr(COALESCE(NEW.ts, {_NOW}), 1, 10), {delta}) "
+            f"ON CONFLICT(sid, day) DO UPDATE SET balance = balance + excluded.balance;")
+
+
+TRIGGERS = {
+    "trg_clients_debt_insert": f"""CREATE TRIGGER IF NOT EXISTS trg_clients_debt_insert AFTER INSERT ON debts
+        BEGIN
+        INSERT INTO clients (sid, name, balance, open_debts, first_ts, last_ts)
+        VALUES (NEW.sid, COALESCE(NEW.cli, ''), {_OPEN.format('NEW')}, NEW.status = 'OUVERT',
+                COALESCE(NEW.ts, {_NOW}), COALESCE(NEW.ts, {_NOW}))
+        ON CONFLICT(sid, name) DO UPDATE SET balance = balance + excluded.balance,
+            open_debts = open_debts + excluded.open_debts, last_ts = excluded.last_ts;
+        {_bump_aging(_OPEN.format('NEW'))}
+        END""",
+    "trg_clients_debt_update": f"""CREATE TRIGGER IF NOT EXISTS trg_clients_debt_update AFTER UPDATE OF balance, status ON debts
+        BEGIN
+        UPDATE clients SET balance = balance + {_OPEN.format('NEW')} - {_OPEN.format('OLD')},
+            open_debts = open_debts + (NEW.status = 'OUVERT') - (OLD.status = 'OUVERT'),
+            last_ts = COALESCE(NEW.updated_ts, {_NOW})
+        WHERE sid = NEW.sid AND name = COALESCE(NEW.cli, '');
+        {_bump_aging(f"{_OPEN.format('NEW')} - {_OPEN.format('OLD')}")}
+        END""",
+}
+
+
+def install(conn):
+    conn.execute("DROP INDEX IF EXISTS idx_debts_open")   # préfixe de idx_debts_open_fifo
+    for ddl in CREATE_TABLES:
+        conn.execute(ddl)
+    for ddl in TRIGGERS.values():
+        conn.execute(ddl)
+
+
+def rebuild_clients(conn):
+    """Recalcule soldes clients et encours par jour depuis debts ; retourne le nombre de comptes."""
+    conn.execute("DELETE FROM debt_aging")
+    conn.execute(f"""INSERT INTO debt_aging (sid, day, balance)
+                     SELECT sid, substr(COALESCE(ts, {_NOW}), 1, 10), SUM(COALESCE(balance, 0)) FROM debts
+                     WHERE sid IS NOT NULL AND status = 'OUVERT' GROUP BY 1, 2""")
+    conn.execute("DELETE FROM clients")
+    conn.execute("""INSERT INTO clients (sid, name, balance, open_debts, first_ts, last_ts)
+                    SELECT sid, COALESCE(cli, ''),
+                           SUM(CASE WHEN status = 'OUVERT' THEN COALESCE(balance, 0) ELSE 0 END),
+                           SUM(status = 'OUVERT'), MIN(ts), MAX(COALESCE(updated_ts, ts))
+                    FROM debts WHERE sid IS NOT NULL GROUP BY sid, COALESCE(cli, '')""")
+    return conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+
+
+# ------------------------------------------------------------------------------
+# RÈGLEMENT FIFO
+# ------------------------------------------------------------------------------
+def allocate_payment(conn, sid, cli, amount, user, now=None, debt_id=None):
+    """Répartit `amount` sur les dettes ouvertes du client (la plus ancienne d'abord,
+    ou la seule `debt_id`), à appeler dans la transaction d'écriture de l'appelant.
+
+    Le montant est plafonné au solde dû. Retourne (payment_id, montant imputé,
+    [(debt_id, sale_ref, imputé, solde restant)]) ; payment_id vaut None si
+    rien n'était dû.
+    """
+    if debt_id is None:
+        rows = conn.execute("""SELECT id, balance, sale_ref FROM debts
+                               WHERE sid=? AND cli=? AND status='OUVERT' ORDER BY ts, id""", (sid, cli)).fetchall()
+    else:
+        rows = conn.execute("SELECT id, balance, sale_ref FROM debts WHERE id=? AND sid=? AND status='OUVERT'",
+                            (debt_id, sid)).fetchall()
+    now_iso = now_ts(now)
+    day = (now.date() if now else date.today()).strftime(FR_DATE)
+    left, lines = amount, []
+    for d_id, bal, ref in rows:
+        if left <= 0:
+            break
+        paid = min(left, bal or 0)
+        lines.append((d_id, ref, paid, (bal or 0) - paid))
+        left -= paid
+    if not lines:
+        return None, 0.0, []
+    conn.executemany("UPDATE debts SET balance=?, last_update=?, updated_ts=?, status=? WHERE id=?",
+                     [(rest, day, now_iso, 'SOLDE' if rest <= 0 else 'OUVERT', d_id) for d_id, _, _, rest in lines])
+    applied = amount - left
+    cur = conn.execute("INSERT INTO debt_payments (sid, cli, amount, ts, user, debts) VALUES (?,?,?,?,?,?)",
+                       (sid, cli, applied, now_iso, user, len(lines)))
+    conn.executemany("""INSERT INTO debt_payment_lines (payment_id, debt_id, sale_ref, amount, balance_after)
+                        VALUES (?,?,?,?,?)""", [(cur.lastrowid, d_id, ref, paid, rest) for d_id, ref, paid, rest in lines])
+    return cur.lastrowid, applied, lines
+
+
+# ------------------------------------------------------------------------------
+# ANCIENNETÉ
+# ------------------------------------------------------------------------------
+def aging_limits(today=None):
+    """Bornes ISO des tranches : dette de moins de 30 jours si ts >= d30, etc."""
+    today = today or date.today()
+    return (today - timedelta(days=30)).isoformat(), (today - timedelta(days=60)).isoformat()
+
+
+def aging_columns(table="clients", today=None):
+    """Trois expressions SQL (une par tranche) évaluées pour chaque ligne de `table`
+    via l'index (sid, cli, ts) : seules les lignes de la page affichée les calculent.
+    Les bornes sont des dates générées par le code, jamais une saisie."""
+    d30, d60 = aging_limits(today)
+    base = (f"SELECT COALESCE(SUM(d.balance), 0) FROM debts d WHERE d.sid = {table}.sid "
+            f"AND d.cli = {table}.name AND d.status = 'OUVERT'")
+    return (f"({base} AND d.ts >= '{d30}')",
+            f"({base} AND d.ts >= '{d60}' AND d.ts < '{d30}')",
+            f"({base} AND COALESCE(d.ts, '') < '{d60}')")
+
+
+def shop_aging(conn, sid, today=None):
+    """Totaux de la boutique par tranche : {tranche: montant} (table debt_aging)."""
+    d30, d60 = aging_limits(today)
+    row = conn.execute("""SELECT COALESCE(SUM(CASE WHEN day >= ? THEN balance END), 0),
+                                 COALESCE(SUM(CASE WHEN day >= ? AND day < ? THEN balance END), 0),
+                                 COALESCE(SUM(CASE WHEN day < ? THEN balance END), 0)
+                          FROM debt_aging WHERE sid=?""", (d30, d60, d30, d60, sid)).fetchone()
+    return dict(zip(AGING_BUCKETS, row))
@@ -0,0 +1,40 @@
+# ==============================================================================
+# 💎 BALIKA ERP - HORODATAGE ISO-8601 TRIABLE
+# ------------------------------------------------------------------------------
+# Les colonnes historiques `date` ("%d/%m/%Y") et `time` restent écrites pour
+# l'affichage ; la colonne `ts` ("YYYY-MM-DDTHH:MM:SS") sert aux filtres par
+# période, qui deviennent des parcours d'intervalle d'index (ts >= ? AND ts < ?).
+# ==============================================================================
+from datetime import date, datetime, timedelta
+
+ISO_FMT = "%Y-%m-%dT%H:%M:%S"
+FR_DATE = "%d/%m/%Y"
+
+
+def now_ts(now=None):
+    return (now or datetime.now()).strftime(ISO_FMT)
+
+
+def day_bounds(start, end=None):
+    """Bornes semi-ouvertes [début, fin+1 jour) pour `ts >= ? AND ts < ?`."""
+    end = end or start
+    return start.isoformat(), (end + timedelta(days=1)).isoformat()
+
+
+def today_bounds():
+    return day_bounds(date.today())
+
+
+def last_days(n):
+    """(début, fin) couvrant les n derniers jours, aujourd'hui inclus."""
+    end = date.today()
+    return end - timedelta(days=n - 1), end
+
+
+def fr_to_iso_sql(date_col, time_col=None):
+    """Expression SQL qui convertit une date "%d/%m/%Y" (+ heure) en ts ISO."""
+    day = f"substr({date_col},7,4) || '-' || substr({date_col},4,2) || '-' || substr({date_col},1,2)"
+    if time_col is None:
+        return f"{day} || 'T00:00:00'"
+    return (f"{day} || 'T' || CASE WHEN length({time_col}) = 5 THEN {time_col} || ':00' "
+            f"ELSE COALESCE({time_col}, '00:00:00') END")
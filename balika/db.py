@@ -0,0 +1,149 @@
+# ==============================================================================
+# 💎 BALIKA ERP - COUCHE D'ACCÈS AUX DONNÉES (POOL SQLITE EN MODE WAL)
+# ------------------------------------------------------------------------------
+# - Un seul écrivain (verrou) : les transactions sont sérialisées dans le
+#   processus au lieu de se battre pour le verrou fichier ("database is locked").
+# - Plusieurs lecteurs réutilisés entre les sessions : plus de connect() par rerun.
+# - Pragmas réglés une fois par connexion (WAL, synchronous, cache, mmap, busy).
+# - Même interface de routage que balika.shards.ShardRouter (catalog, shop(sid),
+#   databases(), fan_out) : en fichier unique, tout pointe vers cette base.
+# ==============================================================================
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from balika.telemetry import TimedConnection
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", "-16000"),       # ~16 Mo de cache de pages par connexion
+    ("mmap_size", "268435456"),     # 256 Mo mappés en mémoire
+    ("busy_timeout", "5000"),       # attente max (ms) si un autre processus écrit
+    ("temp_store", "MEMORY"),
+)
+
+DEFAULT_READERS = 4
+
+
+def connect(path, readonly=False, telemetry=None):
+    """Ouvre une connexion réglée (autocommit, partageable entre threads).
+
+    Avec une télémétrie active, chaque requête est chronométrée (balika.telemetry).
+    """
+    if telemetry is not None and telemetry.enabled:
+        conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False,
+                               factory=TimedConnection).attach(telemetry)
+    else:
+        conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    if readonly:
+        conn.execute("PRAGMA query_only=1")
+    return conn
+
+
+class Database:
+    """Pool partagé : un écrivain unique et `readers` connexions de lecture."""
+
+    def __init__(self, path, readers=DEFAULT_READERS, telemetry=None):
+        self.path = path
+        self.telemetry = telemetry
+        self.max_readers = max(1, readers)
+        self._readers = queue.LifoQueue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._writer = connect(path, telemetry=telemetry)
+
+    # --- LECTURE -------------------------------------------------------------
+    def _acquire_reader(self):
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._created < self.max_readers:
+                self._created += 1
+                return connect(self.path, readonly=True, telemetry=self.telemetry)
+        return self._readers.get()
+
+    @contextmanager
+    def read(self):
+        """Prête une connexion de lecture (lecture seule, autocommit)."""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    # --- ÉCRITURE ------------------------------------------------------------
+    @contextmanager
+    def write(self):
+        """Transaction IMMEDIATE sur l'écrivain unique (commit ou rollback).
+
+        Les appels imbriqués dans le même thread rejoignent la transaction
+        en cours au lieu d'en ouvrir une nouvelle.
+        """
+        with self._write_lock:
+            if self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield self._writer
+                finally:
+                    self._write_depth -= 1
+                return
+            self._writer.execute("BEGIN IMMEDIATE")
+            self._write_depth = 1
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            else:
+                self._writer.execute("COMMIT")
+            finally:
+                self._write_depth = 0
+
+    def vacuum(self):
+        """VACUUM puis checkpoint, hors transaction : rend au disque les pages libérées (après archivage)."""
+        with self._write_lock:
+            self._writer.execute("VACUUM")
+            self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    @contextmanager
+    def paused(self):
+        """Écrivain suspendu (verrou tenu, hors transaction) : le fichier peut être remplacé (restauration)."""
+        with self._write_lock:
+            yield
+
+    # --- ROUTAGE (fichier unique : catalogue et boutiques dans la même base) ----
+    sharded = False
+
+    @property
+    def catalog(self):
+        return self
+
+    def shop(self, sid):
+        return self
+
+    def sync_shop(self, sid):
+        """Rien à recopier : la fiche boutique n'existe qu'ici."""
+
+    def databases(self):
+        return [self]
+
+    def fan_out(self, fn):
+        """fn(base) sur chaque base de boutiques ; liste des résultats."""
+        return [fn(self)]
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,259 @@
+# ==============================================================================
+# 💎 BALIKA ERP - IMPORT EN MASSE DU STOCK (CSV / EXCEL)
+# ------------------------------------------------------------------------------
+# Le fichier est lu ligne à ligne (jamais chargé en entier dans un DataFrame),
+# validé par paquets de `chunk` lignes, puis chaque paquet valide est écrit par
+# un seul executemany dans une transaction :
+#   INSERT ... ON CONFLICT(sid, item) DO UPDATE  (clé unique de la migration 1)
+# Un article existant est réassorti (mode "add") ou recompté ("set") ; prix,
+# seuil min_stock et last_restock sont mis à jour. Les lignes invalides ou dont
+# le code-barres appartient déjà à un autre article sont rejetées avec leur
+# numéro de ligne et le motif, sans bloquer le reste du fichier.
+# Paquets riches en créations : index FTS alimenté en bloc (fts_bulk_insert).
+# ==============================================================================
+import csv
+import io
+import time
+import unicodedata
+from dataclasses import dataclass, field
+
+from balika.dates import now_ts
+from balika.search import fts_bulk_insert
+
+CHUNK = 2000
+FTS_BULK_MIN = 200      # créations par paquet au-delà desquelles l'index FTS est alimenté en bloc
+MODES = ("add", "set")
+
+# En-têtes acceptés (minuscules, sans accents ni ponctuation) -> colonne inventory
+ALIASES = {
+    "item": ("item", "article", "designation", "produit", "nom", "libelle"),
+    "category": ("category", "categorie", "famille", "rayon"),
+    "qty": ("qty", "quantite", "qte", "stock", "quantity"),
+    "buy_price": ("buy_price", "prix_achat", "pa", "achat", "cout", "prix_d_achat"),
+    "sell_price": ("sell_price", "prix_vente", "pv", "vente", "prix", "prix_de_vente"),
+    "min_stock": ("min_stock", "stock_min", "seuil", "stock_minimum", "alerte"),
+    "barcode": ("barcode", "code_barres", "code_barre", "ean", "sku", "code"),
+}
+REQUIRED = ("item", "qty", "sell_price")
+TEMPLATE = "designation;categorie;quantite;prix_achat;prix_vente;stock_min;code_barres\nRIZ 25KG;ALIMENTAIRE;40;18.5;22;5;6001234567890\n"
+
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    created: int = 0
+    updated: int = 0
+    rejected: list = field(default_factory=list)   # [(n° de ligne, motif, ligne brute)]
+    seconds: float = 0.0
+
+    @property
+    def accepted(self):
+        return self.created + self.updated
+
+
+class ImportFileError(ValueError):
+    """Fichier illisible ou colonnes obligatoires absentes."""
+
+
+# ------------------------------------------------------------------------------
+# LECTURE EN FLUX
+# ------------------------------------------------------------------------------
+def _key(header):
+    text = unicodedata.normalize("NFKD", str(header or "")).encode("ascii", "ignore").decode().lower().strip()
+    return "".join(c if c.isalnum() else "_" for c in text).strip("_")
+
+
+def map_columns(headers):
+    """{colonne inventory: index dans le fichier} ; ImportFileError si une colonne obligatoire manque."""
+    keys = [_key(h) for h in headers]
+    mapping = {}
+    for col, names in ALIASES.items():
+        for i, k in enumerate(keys):
+            if k in names:
+                mapping[col] = i
+                break
+    missing = [c for c in REQUIRED if c not in mapping]
+    if missing:
+        raise ImportFileError(f"Colonnes manquantes : {', '.join(missing)} (en-têtes lus : {', '.join(map(str, headers))})")
+    return mapping
+
+
+def _csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    sample = text.read(8192)
+    text.seek(0)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=";,\t|").delimiter
+    except csv.Error:
+        delimiter = ";" if sample.count(";") > sample.count(",") else ","
+    try:
+        yield from csv.reader(text, delimiter=delimiter)
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError("Lecture Excel indisponible : installer openpyxl (ou exporter le fichier en CSV).") from None
+    wb = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for row in wb.active.iter_rows(values_only=True):
+            yield ["" if v is None else v for v in row]
+    finally:
+        wb.close()
+
+
+def read_rows(fileobj, filename):
+    """Itère les lignes brutes (liste de cellules) d'un CSV ou d'un classeur Excel."""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        return _xlsx_rows(fileobj)
+    return _csv_rows(fileobj)
+
+
+# ------------------------------------------------------------------------------
+# VALIDATION
+# ------------------------------------------------------------------------------
+def _num(value, cast):
+    if isinstance(value, (int, float)):
+        return cast(value)
+    text = str(value).strip().replace(" ", "").replace(" ", "").replace(",", ".")
+    return cast(float(text)) if cast is int else cast(text)
+
+
+def validate(cells, mapping):
+    """Ligne brute -> (item, category, qty, buy, sell, min_stock, barcode) ; ValueError(motif) sinon."""
+    def get(col):
+        i = mapping.get(col)
+        if i is None or i >= len(cells):
+            return ""
+        return cells[i]
+
+    item = str(get("item")).strip().upper()
+    if not item:
+        raise ValueError("désignation vide")
+    try:
+        qty = _num(get("qty"), int)
+    except ValueError:
+        raise ValueError(f"quantité invalide ({get('qty')!r})") from None
+    try:
+        sell = _num(get("sell_price"), float)
+        buy = _num(get("buy_price"), float) if str(get("buy_price")).strip() else 0.0
+    except ValueError:
+        raise ValueError("prix invalide") from None
+    if qty < 0 or sell < 0 or buy < 0:
+        raise ValueError("valeur négative")
+    raw_min = str(get("min_stock")).strip()
+    try:
+        min_stock = _num(raw_min, int) if raw_min else None
+    except ValueError:
+        raise ValueError(f"stock minimum invalide ({raw_min!r})") from None
+    category = str(get("category")).strip().upper() or None
+    barcode = get("barcode")
+    if isinstance(barcode, float) and barcode.is_integer():
+        barcode = int(barcode)   # EAN lus comme nombres par Excel
+    barcode = str(barcode).strip() or None
+    return item, category, qty, buy, sell, min_stock, barcode
+
+
+# ------------------------------------------------------------------------------
+# ÉCRITURE PAR PAQUETS
+# ------------------------------------------------------------------------------
+_UPSERT = {
+    "add": "qty = qty + excluded.qty",
+    "set": "qty = excluded.qty",
+}
+
+
+def _upsert_sql(mode):
+    # ?2 (catégorie) et ?6 (seuil) vides : valeur par défaut à la création, inchangée au réassort
+    return f"""INSERT INTO inventory (item, category, qty, buy_price, sell_price, min_stock, barcode, last_restock, sid)
+               VALUES (?1, COALESCE(?2, 'GÉNÉRAL'), ?3, ?4, ?5, COALESCE(?6, 5), ?7, ?8, ?9)
+               ON CONFLICT(sid, item) DO UPDATE SET {_UPSERT[mode]},
+                   category = COALESCE(?2, category),
+                   buy_price = excluded.buy_price, sell_price = excluded.sell_price,
+                   min_stock = COALESCE(?6, min_stock),
+                   barcode = COALESCE(excluded.barcode, barcode),
+                   last_restock = excluded.last_restock"""
+
+
+def _write_chunk(db, sid, chunk, mode, stamp, report):
+    """chunk = [(n° ligne, valeurs, brut)] ; une transaction, un executemany."""
+    with db.write() as conn:
+        items = list({v[0] for _, v, _ in chunk})
+        barcodes = list({v[6] for _, v, _ in chunk if v[6]})
+        existing = set()
+        for i in range(0, len(items), 500):
+            part = items[i:i + 500]
+            existing.update(r[0] for r in conn.execute(
+                f"SELECT item FROM inventory WHERE sid=? AND item IN ({','.join('?' * len(part))})", (sid, *part)))
+        owner = {}
+        for i in range(0, len(barcodes), 500):
+            part = barcodes[i:i + 500]
+            owner.update(conn.execute(
+                f"SELECT barcode, item FROM inventory WHERE sid=? AND barcode IN ({','.join('?' * len(part))})", (sid, *part)))
+        rows, seen, created = [], set(), 0
+        for line_no, (item, cat, qty, buy, sell, min_stock, barcode), raw in chunk:
+            if barcode and owner.setdefault(barcode, item) != item:
+                report.rejected.append((line_no, f"code-barres {barcode} déjà attribué à {owner[barcode]}", raw))
+                continue
+            rows.append((item, cat, qty, buy, sell, min_stock, barcode, stamp, sid))
+            if item in existing or item in seen:
+                report.updated += 1
+            else:
+                created += 1
+                seen.add(item)
+        if created >= FTS_BULK_MIN:
+            with fts_bulk_insert(conn):
+                conn.executemany(_upsert_sql(mode), rows)
+        else:
+            conn.executemany(_upsert_sql(mode), rows)
+        report.created += created
+
+
+def import_inventory(db, sid, rows, mode="add", chunk=CHUNK, progress=None, now=None):
+    """Importe des lignes brutes (en-tête en premier) dans le stock de `sid`.
+
+    `progress(lignes_lues, rapport)` est appelé après chaque paquet écrit.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode inconnu : {mode}")
+    report = ImportReport()
+    t0 = time.perf_counter()
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError("Fichier vide")
+    mapping = map_columns(header)
+    stamp = now_ts(now)
+    batch = []
+    for line_no, cells in enumerate(rows, start=2):
+        if not any(str(c).strip() for c in cells):
+            continue
+        report.read += 1
+        try:
+            batch.append((line_no, validate(cells, mapping), cells))
+        except ValueError as e:
+            report.rejected.append((line_no, str(e), cells))
+        if len(batch) >= chunk:
+            _write_chunk(db, sid, batch, mode, stamp, report)
+            batch = []
+            if progress:
+                progress(report.read, report)
+    if batch:
+        _write_chunk(db, sid, batch, mode, stamp, report)
+    if progress:
+        progress(report.read, report)
+    report.seconds = time.perf_counter() - t0
+    return report
+
+
+def rejected_csv(report):
+    """Rapport des rejets au format CSV (;) : ligne, motif, puis les cellules d'origine."""
+    out = io.StringIO()
+    w = csv.writer(out, delimiter=";")
+    w.writerow(["ligne", "motif", "contenu"])
+    for line_no, reason, raw in report.rejected:
+        w.writerow([line_no, reason, *raw])
+    return out.getvalue()
@@ -0,0 +1,243 @@
+# ==============================================================================
+# 💎 BALIKA ERP - INGESTION CENTRALE DES TERMINAUX HORS LIGNE
+# ------------------------------------------------------------------------------
+# Reçoit les lots poussés par balika.outbox.SyncWorker :
+#   POST /ingest  {"records": [{"uid", "kind", "sid", "ts", "payload"}]}
+#   -> {"results": [{"uid", "sid", "status", ...}]}  (un résultat par enregistrement)
+#
+# - Déduplication par uid (table ingested) : un lot renvoyé après une coupure
+#   ne crée rien de plus, le résultat d'origine est renvoyé (status "duplicate").
+# - Un lot = une transaction par boutique, un SAVEPOINT par enregistrement :
+#   un enregistrement invalide est "rejected" sans annuler les autres.
+# - Conflit de stock : la vente a déjà eu lieu au comptoir, elle est gardée ;
+#   le stock central est ramené à 0, l'écart est noté dans sync_conflicts et
+#   le stock central des articles concernés est renvoyé au terminal.
+# - Retour : même plafond qu'au comptoir (quantité vendue moins retours déjà
+#   faits) ; au-delà, l'enregistrement est "rejected".
+#
+#   python -m balika.ingest serve balika_v650_master.db --port 8765 [--shard-dir balika_shards]
+# ==============================================================================
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from balika.checkout import INVOICE_LINES, ReturnError, record_return, record_sale
+from balika.credit import allocate_payment
+from balika.dates import FR_DATE, ISO_FMT, now_ts
+
+MAX_BODY = 8 * 1024 * 1024
+UNAPPLIED_TOLERANCE = 0.005
+
+CREATE_TABLES = (
+    """CREATE TABLE IF NOT EXISTS ingested (
+        uid TEXT PRIMARY KEY, sid TEXT NOT NULL, terminal TEXT, kind TEXT NOT NULL, ts TEXT,
+        received_ts TEXT NOT NULL, status TEXT NOT NULL, result TEXT) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS sync_conflicts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, sid TEXT NOT NULL, uid TEXT NOT NULL, kind TEXT NOT NULL,
+        ref TEXT, detail TEXT NOT NULL, ts TEXT NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS idx_sync_conflicts_sid ON sync_conflicts(sid, id)",
+)
+
+
+class RecordError(Exception):
+    pass
+
+
+def install(conn):
+    for ddl in CREATE_TABLES:
+        conn.execute(ddl)
+
+
+# ------------------------------------------------------------------------------
+# APPLICATION D'UN ENREGISTREMENT : (résultat, [écarts])
+# ------------------------------------------------------------------------------
+def _apply_sale(conn, sid, p, now):
+    names = [l['item'] for l in p['lines']]
+    found = {it: (i, q or 0) for i, it, q in conn.execute(
+        f"SELECT id, item, qty FROM inventory WHERE sid=? AND item IN ({','.join('?' * len(names))})", (sid, *names))}
+    lines = [{'id': found.get(l['item'], (None, 0))[0], 'item': l['item'], 'q': int(l['q']),
+              'p': float(l['p']), 'buy': float(l['buy'])} for l in p['lines']]
+    sale = record_sale(conn, sid, p['seller'], lines, p['client'], float(p['paid_usd']), p['currency'], now,
+                       ref=p['ref'], strict=False)
+    short = [l for l in lines if found.get(l['item'], (None, 0))[1] < l['q']]
+    result = {'ref': sale['ref']}
+    if short:
+        result['stock'] = {l['item']: 0 for l in short}
+    return result, [f"{l['item']} : {l['q']} vendu(s), {found.get(l['item'], (None, 0))[1]} en stock central"
+                    for l in short]
+
+
+def _apply_debt_payment(conn, sid, p, now):
+    amount, debt_id = float(p['amount']), None
+    if p.get('sale_ref'):
+        row = conn.execute("SELECT id FROM debts WHERE sid=? AND sale_ref=? AND status='OUVERT'",
+                           (sid, p['sale_ref'])).fetchone()
+        debt_id = row[0] if row else None
+    _, applied, _ = allocate_payment(conn, sid, p['client'], amount, p['user'], now=now, debt_id=debt_id)
+    result = {'applied': applied}
+    if amount - applied > UNAPPLIED_TOLERANCE:
+        result['unapplied'] = amount - applied
+        return result, [f"Règlement {p['client']} : {amount - applied:.2f} $ non imputés (solde central insuffisant)"]
+    return result, []
+
+
+def _apply_expense(conn, sid, p, now):
+    conn.execute("INSERT INTO expenses (label, amount, date, sid, user, ts) VALUES (?,?,?,?,?,?)",
+                 (p['label'], float(p['amount']), now.strftime(FR_DATE), sid, p['user'], now_ts(now)))
+    return {}, []
+
+
+def _apply_return(conn, sid, p, now):
+    lines = conn.execute(INVOICE_LINES, (sid, p['sale_ref'])).fetchall()
+    if not lines:
+        raise RecordError(f"facture inconnue : {p['sale_ref']}")
+    refund = record_return(conn, sid, p['sale_ref'], p['item'], int(p['qty']), lines, now)
+    return {'ref': p['sale_ref'], 'refund': refund}, []
+
+
+APPLY = {"sale": _apply_sale, "debt_payment": _apply_debt_payment, "expense": _apply_expense, "return": _apply_return}
+_AUDIT = {"sale": ("VENTE", lambda p, r: f"{r['ref']} {p['client']} [hors ligne]", "seller"),
+          "debt_payment": ("DETTE", lambda p, r: f"Règlement {r['applied']:.2f}$ {p['client']} [hors ligne]", "user"),
+          "expense": ("DÉPENSE", lambda p, r: f"{p['label']} {float(p['amount']):.2f}$ [hors ligne]", "user"),
+          "return": ("RETOUR", lambda p, r: f"{p['sale_ref']} {p['item']} x{p['qty']} [hors ligne]", "user")}
+
+
+def _ingest_one(conn, rec, received, audit):
+    uid, sid, kind = rec['uid'], rec['sid'], rec['kind']
+    prior = conn.execute("SELECT status, result FROM ingested WHERE uid=?", (uid,)).fetchone()
+    if prior is not None:
+        return {'uid': uid, 'sid': sid, 'status': "duplicate", 'first_status': prior[0], **json.loads(prior[1])}
+    conn.execute("SAVEPOINT ingest_record")
+    try:
+        if kind not in APPLY:
+            raise RecordError(f"type inconnu : {kind}")
+        now = datetime.strptime(rec['ts'], ISO_FMT)
+        result, conflicts = APPLY[kind](conn, sid, rec['payload'], now)
+    except (RecordError, ReturnError, KeyError, TypeError, ValueError, sqlite3.IntegrityError) as e:
+        conn.execute("ROLLBACK TO ingest_record")
+        conn.execute("RELEASE ingest_record")
+        status, result = "rejected", {'error': f"{type(e).__name__}: {e}"}
+    else:
+        conn.execute("RELEASE ingest_record")
+        conn.executemany("INSERT INTO sync_conflicts (sid, uid, kind, ref, detail, ts) VALUES (?,?,?,?,?,?)",
+                         [(sid, uid, kind, result.get('ref'), c, received) for c in conflicts])
+        status = "conflict" if conflicts else "ok"
+        if audit is not None:
+            action, details, user = _AUDIT[kind]
+            audit.log(rec['payload'].get(user, "terminal"), action, details(rec['payload'], result), sid)
+    conn.execute("""INSERT INTO ingested (uid, sid, terminal, kind, ts, received_ts, status, result)
+                    VALUES (?,?,?,?,?,?,?,?)""",
+                 (uid, sid, uid.rsplit("-", 1)[0], kind, rec.get('ts'), received, status, json.dumps(result)))
+    return {'uid': uid, 'sid': sid, 'status': status, **result}
+
+
+def ingest(db, records, audit=None, now=None):
+    """Applique un lot d'enregistrements de terminaux ; un résultat par enregistrement, dans l'ordre.
+
+    `db` : Database ou ShardRouter (chaque boutique est écrite dans sa base).
+    """
+    received = now_ts(now)
+    with db.catalog.read() as conn:
+        known = {r[0] for r in conn.execute("SELECT sid FROM shops")}
+    results, by_sid = {}, {}
+    for rec in records:
+        if rec['sid'] in known:
+            by_sid.setdefault(rec['sid'], []).append(rec)
+        else:
+            results[rec['uid']] = {'uid': rec['uid'], 'sid': rec['sid'], 'status': "rejected",
+                                   'error': f"boutique inconnue : {rec['sid']}"}
+    for sid, recs in by_sid.items():
+        with db.shop(sid).write() as conn:
+            for rec in recs:
+                results[rec['uid']] = _ingest_one(conn, rec, received, audit)
+    return [results[rec['uid']] for rec in records]
+
+
+# ------------------------------------------------------------------------------
+# ENDPOINT HTTP (serveur central ou remplaçant local pour les essais)
+# ------------------------------------------------------------------------------
+class IngestHandler(BaseHTTPRequestHandler):
+    server_version = "BalikaIngest/1"
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {'ok': True})
+        else:
+            self._send(404, {'error': "introuvable"})
+
+    def do_POST(self):
+        if self.path != "/ingest":
+            return self._send(404, {'error': "introuvable"})
+        if self.server.token and self.headers.get("Authorization") != f"Bearer {self.server.token}":
+            return self._send(401, {'error': "jeton invalide"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            return self._send(413, {'error': "lot trop volumineux"})
+        try:
+            records = json.loads(self.rfile.read(length))['records']
+            if not all(isinstance(r, dict) and isinstance(r.get('uid'), str) and isinstance(r.get('sid'), str)
+                       for r in records):
+                raise ValueError("uid et sid requis")
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, {'error': str(e)})
+        self._send(200, {'results': ingest(self.server.db, records, self.server.audit)})
+
+    def _send(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+
+def make_server(db, host="127.0.0.1", port=8765, token=None, audit=None, handler=IngestHandler, verbose=False):
+    """Serveur HTTP multi-thread prêt à servir (serve_forever) ; port 0 = port libre."""
+    server = ThreadingHTTPServer((host, port), handler)
+    server.db, server.token, server.audit, server.verbose = db, token, audit, verbose
+    return server
+
+
+def main(argv=None):
+    import argparse
+
+    from balika.audit import AuditLogger
+    from balika.db import Database
+    from balika.shards import ShardRouter, init_database
+
+    ap = argparse.ArgumentParser(description="Endpoint d'ingestion des terminaux hors ligne")
+    ap.add_argument("command", choices=("serve",))
+    ap.add_argument("db", help="base centrale (catalogue avec --shard-dir)")
+    ap.add_argument("--shard-dir", help="stockage partitionné : dossier des bases boutique")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args(argv)
+    if args.shard_dir:
+        db = ShardRouter(args.db, args.shard_dir)
+    else:
+        db = Database(args.db)
+        init_database(db)
+    audit = AuditLogger(db)
+    server = make_server(db, args.host, args.port, os.environ.get("BALIKA_SYNC_TOKEN"), audit, verbose=args.verbose)
+    print(f"Ingestion sur http://{args.host}:{server.server_port}/ingest")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        audit.close()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# ==============================================================================
+# 💎 BALIKA ERP - MESSAGERIE INTERNE (admin ↔ boutiques, gérant ↔ vendeurs)
+# ------------------------------------------------------------------------------
+# La table `messages` (catalogue) reçoit enfin des lignes :
+# - message_unread : nombre de messages non lus par destinataire, tenu par des
+#   triggers sur messages ; le badge de la barre latérale est une lecture de
+#   clé primaire au lieu d'un COUNT(*) sur la boîte de réception ;
+# - idx_messages_inbox (receiver, id) : la page MESSAGERIE ne relit pas la
+#   boîte à chaque rerun, elle demande les messages `id > dernier vu` (intervalle
+#   d'index) depuis un fragment rafraîchi périodiquement ;
+# - idx_messages_unread : index partiel des non lus (marquer comme lu) ;
+# - diffusion : un seul executemany pour toutes les boutiques, dans une seule
+#   transaction de l'écrivain.
+#
+#   python -m balika.messaging rebuild balika_v650_master.db
+# ==============================================================================
+import sys
+
+from balika.dates import now_ts
+
+MAX_LENGTH = 2000
+PAGE = 50
+
+CREATE_TABLES = (
+    "CREATE INDEX IF NOT EXISTS idx_messages_inbox ON messages(receiver, id)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_sent ON messages(sender, id)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_unread ON messages(receiver, id) WHERE is_read = 0",
+    """CREATE TABLE IF NOT EXISTS message_unread (
+        receiver TEXT PRIMARY KEY, n INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID""",
+)
+
+_UNREAD = "COALESCE({0}.is_read, 0) = 0"
+
+
+def _add(row, delta):
+    return f"""INSERT INTO message_unread (receiver, n) SELECT {row}.receiver, {delta}
+               WHERE {row}.receiver IS NOT NULL AND {_UNREAD.format(row)}
+               ON CONFLICT(receiver) DO UPDATE SET n = n + excluded.n;"""
+
+
+TRIGGERS = {
+    "trg_msg_unread_ai": f"""CREATE TRIGGER IF NOT EXISTS trg_msg_unread_ai AFTER INSERT ON messages
+        BEGIN {_add("NEW", 1)} END""",
+    # Seuls les vrais changements (lu/non lu, destinataire) touchent le compteur
+    "trg_msg_unread_au": f"""CREATE TRIGGER IF NOT EXISTS trg_msg_unread_au AFTER UPDATE OF is_read, receiver ON messages
+        WHEN {_UNREAD.format("OLD")} IS NOT {_UNREAD.format("NEW")} OR OLD.receiver IS NOT NEW.receiver
+        BEGIN {_add("OLD", -1)} {_add("NEW", 1)} END""",
+    "trg_msg_unread_ad": f"""CREATE TRIGGER IF NOT EXISTS trg_msg_unread_ad AFTER DELETE ON messages
+        BEGIN {_add("OLD", -1)} END""",
+}
+
+_COLUMNS = "id, sender, receiver, content, date, is_read"
+
+
+def install(conn):
+    for ddl in CREATE_TABLES:
+        conn.execute(ddl)
+    for ddl in TRIGGERS.values():
+        conn.execute(ddl)
+
+
+def rebuild_unread(conn):
+    """Recalcule message_unread depuis messages (migration, contrôle) ; retourne le nombre de destinataires."""
+    conn.execute("DELETE FROM message_unread")
+    return conn.execute("""INSERT INTO message_unread (receiver, n)
+                           SELECT receiver, COUNT(*) FROM messages
+                           WHERE receiver IS NOT NULL AND COALESCE(is_read, 0) = 0 GROUP BY receiver""").rowcount
+
+
+# ------------------------------------------------------------------------------
+# ÉCRITURE ET LECTURE (dans la transaction de l'appelant)
+# ------------------------------------------------------------------------------
+def send(conn, sender, receivers, content, now=None):
+    """Un message par destinataire, en un seul executemany ; retourne le nombre de lignes."""
+    ts = now_ts(now)
+    rows = [(sender, r, content, ts) for r in dict.fromkeys(receivers)]
+    conn.executemany("INSERT INTO messages (sender, receiver, content, date, is_read) VALUES (?,?,?,?,0)", rows)
+    return len(rows)
+
+
+def unread(conn, receiver):
+    row = conn.execute("SELECT n FROM message_unread WHERE receiver=?", (receiver,)).fetchone()
+    return row[0] if row else 0
+
+
+def since(conn, receiver, after, limit=PAGE):
+    """Messages reçus d'id > `after`, du plus ancien au plus récent (intervalle de idx_messages_inbox)."""
+    return conn.execute(f"SELECT {_COLUMNS} FROM messages WHERE receiver=? AND id > ? ORDER BY id LIMIT ?",
+                        (receiver, after, limit)).fetchall()
+
+
+def recent(conn, receiver, limit=PAGE):
+    """Les `limit` derniers messages reçus, du plus ancien au plus récent."""
+    rows = conn.execute(f"SELECT {_COLUMNS} FROM messages WHERE receiver=? ORDER BY id DESC LIMIT ?",
+                        (receiver, limit)).fetchall()
+    return rows[::-1]
+
+
+def sent(conn, sender, limit=PAGE):
+    return conn.execute(f"SELECT {_COLUMNS} FROM messages WHERE sender=? ORDER BY id DESC LIMIT ?",
+                        (sender, limit)).fetchall()
+
+
+def mark_read(conn, receiver, upto):
+    """Marque lus les messages reçus d'id <= `upto` ; retourne le nombre de messages changés."""
+    return conn.execute("UPDATE messages SET is_read = 1 WHERE receiver=? AND is_read = 0 AND id <= ?",
+                        (receiver, upto)).rowcount
+
+
+def main(argv=None):
+    import sqlite3
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] != "rebuild":
+        print("usage: python -m balika.messaging rebuild <fichier.db>")
+        return 2
+    conn = sqlite3.connect(argv[1], isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        install(conn)
+        n = rebuild_unread(conn)
+        conn.execute("COMMIT")
+        print(f"message_unread : {n} destinataire(s)")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# ==============================================================================
+# 💎 BALIKA ERP - TERMINAL HORS LIGNE : FILE D'ENVOI (outbox) ET SYNCHRONISATION
+# ------------------------------------------------------------------------------
+# Sur un terminal CAISSE (BALIKA_TERMINAL), les services écrivent dans la base
+# locale et ajoutent, dans la même transaction, un enregistrement à `outbox`
+# (vente, règlement de dette, dépense, retour) identifié par un uid généré sur
+# place : le ticket sort sans attendre le réseau.
+#
+# SyncWorker, thread de fond, pousse les enregistrements en attente par lots
+# (ordre d'ajout) vers l'endpoint d'ingestion central (balika.ingest) :
+# - le central déduplique par uid : renvoyer un lot déjà reçu est sans effet ;
+# - échec réseau ou HTTP : nouvel essai avec attente exponentielle + aléa ;
+# - conflit de stock (le central a vendu les mêmes articles entre-temps) : la
+#   vente est gardée et le stock local des articles concernés est aligné sur
+#   celui renvoyé par le central.
+# Le stock ne descend que dans ce sens : un réassort ou un ajustement fait au
+# central n'atteint le terminal que par la réponse à un conflit de stock.
+# status() : profondeur de file, retard de synchro, dernière erreur.
+# Base partitionnée (balika.shards) : une file par fichier boutique, lues et
+# acquittées base par base (db.databases()).
+# ==============================================================================
+import atexit
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from balika.dates import now_ts
+
+CREATE_TABLES = (
+    """CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, uid TEXT NOT NULL UNIQUE, kind TEXT NOT NULL,
+        sid TEXT NOT NULL, ts TEXT NOT NULL, payload TEXT NOT NULL,
+        sent_ts TEXT, status TEXT, attempts INTEGER NOT NULL DEFAULT 0, error TEXT)""",
+    "CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(id) WHERE sent_ts IS NULL",
+)
+
+TRIGGERS = {
+    # Seul l'état d'envoi évolue ; le contenu d'un enregistrement ne change jamais
+    "trg_outbox_no_update": """CREATE TRIGGER IF NOT EXISTS trg_outbox_no_update
+        BEFORE UPDATE OF uid, kind, sid, ts, payload ON outbox BEGIN SELECT RAISE(ABORT, 'outbox en ajout seul'); END""",
+    "trg_outbox_no_delete": """CREATE TRIGGER IF NOT EXISTS trg_outbox_no_delete
+        BEFORE DELETE ON outbox BEGIN SELECT RAISE(ABORT, 'outbox en ajout seul'); END""",
+}
+
+KINDS = ("sale", "debt_payment", "expense", "return")
+
+sync_log = logging.getLogger("balika.sync")
+
+
+def install(conn):
+    for ddl in CREATE_TABLES:
+        conn.execute(ddl)
+    for ddl in TRIGGERS.values():
+        conn.execute(ddl)
+
+
+class Outbox:
+    """Identité du terminal ; append() ajoute un enregistrement dans la transaction de l'appelant."""
+
+    def __init__(self, terminal):
+        self.terminal = terminal
+
+    @property
+    def ref_prefix(self):
+        # Références de vente propres au terminal : jamais en collision au central
+        return f"{self.terminal}-"
+
+    def append(self, conn, kind, sid, payload, now=None):
+        if kind not in KINDS:
+            raise ValueError(f"type d'enregistrement inconnu : {kind}")
+        uid = f"{self.terminal}-{uuid.uuid4().hex}"
+        conn.execute("INSERT INTO outbox (uid, kind, sid, ts, payload) VALUES (?,?,?,?,?)",
+                     (uid, kind, sid, now_ts(now), json.dumps(payload, ensure_ascii=False)))
+        return uid
+
+
+def pending(conn, limit, after=0):
+    """Enregistrements non acquittés, dans l'ordre d'ajout : [(uid, kind, sid, ts, payload)]
+    (intervalle sur l'index partiel des lignes en attente)."""
+    return conn.execute("""SELECT uid, kind, sid, ts, payload FROM outbox
+                           WHERE sent_ts IS NULL AND id > ? ORDER BY id LIMIT ?""", (after, limit)).fetchall()
+
+
+def queue_state(conn, now=None):
+    """(profondeur, retard en s) : nombre en attente et âge du plus ancien."""
+    depth, oldest = conn.execute("""SELECT COUNT(*), MIN(ts) FROM outbox WHERE sent_ts IS NULL""").fetchone()
+    if not oldest:
+        return 0, 0.0
+    return depth, max(0.0, ((now or datetime.now()) - datetime.fromisoformat(oldest)).total_seconds())
+
+
+# ------------------------------------------------------------------------------
+# THREAD DE SYNCHRONISATION
+# ------------------------------------------------------------------------------
+def _by_base(origin, uids):
+    """[(base, [uid])] : regroupe les uid par base d'origine, dans l'ordre d'apparition."""
+    groups = {}
+    for uid in uids:
+        groups.setdefault(id(origin[uid]), (origin[uid], []))[1].append(uid)
+    return list(groups.values())
+
+
+class SyncWorker:
+    def __init__(self, db, url, token=None, batch_size=100, interval=2.0, base_delay=1.0, max_delay=60.0,
+                 timeout=10.0, client=None):
+        import httpx
+
+        self._httpx = httpx
+        self.db = db
+        self.url = url
+        self.batch_size = batch_size
+        self.interval = interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._client = client or httpx.Client(timeout=timeout, headers=headers)
+        self.sent = self.duplicates = self.conflicts = self.rejected = self.retries = 0
+        self.last_ok = None
+        self.last_error = None
+        self._failures = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="balika-sync", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def notify(self):
+        """Réveille le thread (nouvel enregistrement) sans attendre l'intervalle."""
+        self._wake.set()
+
+    def status(self):
+        depth, lag = 0, 0.0
+        for db in self.db.databases():
+            with db.read() as conn:
+                d, l = queue_state(conn)
+            depth, lag = depth + d, max(lag, l)
+        return {'depth': depth, 'lag_s': lag, 'sent': self.sent, 'duplicates': self.duplicates,
+                'conflicts': self.conflicts, 'rejected': self.rejected, 'retries': self.retries,
+                'last_ok': self.last_ok, 'last_error': self.last_error}
+
+    def push_once(self):
+        """Envoie un lot ; retourne le nombre d'enregistrements acquittés (lève en cas d'échec).
+
+        Partitionnement (balika.shards) : chaque fichier boutique a sa propre file ; le lot est
+        complété base après base et chaque acquittement retourne dans la base d'origine.
+        """
+        rows, origin = [], {}
+        for db in self.db.databases():
+            with db.read() as conn:
+                part = pending(conn, self.batch_size - len(rows))
+            rows += part
+            origin.update((r[0], db) for r in part)
+            if len(rows) >= self.batch_size:
+                break
+        if not rows:
+            return 0
+        body = {'records': [{'uid': uid, 'kind': kind, 'sid': sid, 'ts': ts, 'payload': json.loads(payload)}
+                            for uid, kind, sid, ts, payload in rows]}
+        try:
+            resp = self._client.post(self.url, json=body)
+            resp.raise_for_status()
+            results = resp.json()['results']
+        except Exception:
+            for db, uids in _by_base(origin, [r[0] for r in rows]):
+                with db.write() as conn:
+                    conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE uid=?", [(u,) for u in uids])
+            raise
+        self._apply(results, origin)
+        return len(results)
+
+    def _apply(self, results, origin):
+        now = now_ts()
+        by_uid = {r['uid']: r for r in results}
+        for db, uids in _by_base(origin, [u for u in by_uid if u in origin]):
+            with db.write() as conn:
+                for uid in uids:
+                    r = by_uid[uid]
+                    conn.execute("UPDATE outbox SET sent_ts=?, status=?, attempts = attempts + 1, error=? WHERE uid=?",
+                                 (now, r['status'], r.get('error'), uid))
+                    # Conflit de stock : le central fait foi pour les articles concernés (base de la boutique)
+                    for item, qty in (r.get('stock') or {}).items():
+                        conn.execute("UPDATE inventory SET qty=? WHERE sid=? AND item=?", (qty, r['sid'], item))
+        for r in results:
+            if r['status'] == "duplicate":
+                self.duplicates += 1
+            elif r['status'] == "conflict":
+                self.conflicts += 1
+            elif r['status'] == "rejected":
+                self.rejected += 1
+        self.sent += len(results)
+        self.last_ok = time.time()
+
+    def _delay(self):
+        # Attente exponentielle plafonnée, réduite au hasard (jusqu'à -50 %) pour désynchroniser les terminaux
+        return min(self.max_delay, self.base_delay * 2 ** min(self._failures - 1, 16)) * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                n = self.push_once()
+            except (self._httpx.HTTPError, ValueError, KeyError) as e:
+                self._failures += 1
+                self.retries += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                wait = self._delay()
+            except Exception as e:
+                # Erreur inattendue (base, programmation) : journalisée et réessayée, le thread ne meurt pas
+                sync_log.exception("échec de synchronisation")
+                self._failures += 1
+                self.retries += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                wait = self._delay()
+            else:
+                self._failures = 0
+                if n >= self.batch_size:
+                    continue            # file encore pleine : lot suivant tout de suite
+                wait = self.interval
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def drain(self, timeout=30.0):
+        """Attend que la file soit vide ; True si c'est le cas avant `timeout`."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.status()['depth'] == 0:
+                return True
+            self.notify()
+            time.sleep(0.05)
+        return False
+
+    def close(self, timeout=5.0):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._client.close()
@@ -0,0 +1,76 @@
+# ==============================================================================
+# 💎 BALIKA ERP - PAGINATION PAR CLÉ (KEYSET / SEEK)
+# ------------------------------------------------------------------------------
+# Une page = une requête `WHERE (tri, id) > (?, ?) ORDER BY tri, id LIMIT n+1` :
+# le coût ne dépend pas du numéro de page (pas d'OFFSET) et seule la page
+# visible est lue. Le comptage est plafonné pour rester bon marché.
+#
+# Les noms de tables / colonnes / expressions viennent toujours du code de
+# l'application ; seules les valeurs saisies passent en paramètres liés.
+#
+# Plusieurs bases (catalogue + fichiers boutique, balika.shards) : une page est
+# lue dans chaque base puis fusionnée sur (tri, clé, n° de base) ; le n° de
+# base départage les clés identiques d'une base à l'autre.
+# ==============================================================================
+COUNT_CAP = 10000
+
+
+def build_filter(where, params, text, search_cols):
+    """Ajoute un filtre `LIKE %texte%` (OU sur search_cols) à une clause WHERE."""
+    clauses, params = ([where] if where else []), list(params)
+    text = (text or "").strip()
+    if text and search_cols:
+        clauses.append("(" + " OR ".join(f"{c} LIKE ?" for c in search_cols) + ")")
+        params += [f"%{text}%"] * len(search_cols)
+    return " AND ".join(clauses), params
+
+
+def fetch_page(conn, table, columns, where="", params=(), sort="id", desc=False, after=None, limit=50, key="id",
+               inclusive=False):
+    """Retourne (lignes, curseur_suivant) ; curseur_suivant vaut None en fin de table.
+
+    `columns` : liste d'expressions SQL ; `sort` : expression de tri (de préférence
+    indexée et non NULL), départagée par `key` (id ou rowid). `after` : curseur de la page précédente
+    (`inclusive` : la ligne du curseur elle-même est reprise).
+    """
+    clauses, params = ([where] if where else []), list(params)
+    if after is not None:
+        clauses.append(f"({sort}, {key}) {'<' if desc else '>'}{'=' if inclusive else ''} (?, ?)")
+        params += list(after)
+    order = "DESC" if desc else "ASC"
+    sql = (f"SELECT {', '.join(columns)}, {sort}, {key} FROM {table}"
+           + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+           + f" ORDER BY {sort} {order}, {key} {order} LIMIT ?")
+    rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    cursor = tuple(rows[-1][-2:]) if more and rows else None
+    return [r[:-2] for r in rows], cursor
+
+
+def fetch_page_many(conns, table, columns, where="", params=(), sort="id", desc=False, after=None, limit=50, key="id"):
+    """fetch_page sur plusieurs bases, fusionné dans un seul ordre de tri.
+
+    Le curseur porte en plus le n° de la base de la dernière ligne : (tri, clé, base).
+    """
+    merged, more = [], False
+    for n, conn in enumerate(conns):
+        # Égalité (tri, clé) avec le curseur : seules les bases suivantes dans l'ordre de fusion la reprennent
+        inclusive = after is not None and (n < after[2] if desc else n > after[2])
+        rows, sub = fetch_page(conn, table, [*columns, sort, key], where, params, sort, desc,
+                               after and after[:2], limit, key, inclusive)
+        merged += [(r[-2], r[-1], n, r[:-2]) for r in rows]
+        # Une base pleine a encore des lignes, même si la fusion tient tout juste dans la page
+        more |= sub is not None
+    merged.sort(key=lambda m: m[:3], reverse=desc)
+    more |= len(merged) > limit
+    merged = merged[:limit]
+    cursor = merged[-1][:3] if more else None
+    return [m[3] for m in merged], cursor
+
+
+def count_estimate(conn, table, where="", params=(), cap=COUNT_CAP):
+    """Compte plafonné : (n, True) si le total dépasse `cap`."""
+    sql = f"SELECT COUNT(*) FROM (SELECT 1 FROM {table}" + (f" WHERE {where}" if where else "") + " LIMIT ?)"
+    n = conn.execute(sql, (*params, cap + 1)).fetchone()[0]
+    return min(n, cap), n > cap
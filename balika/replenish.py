@@ -0,0 +1,211 @@
+# ==============================================================================
+# 💎 BALIKA ERP - ALERTES DE STOCK BAS ET SUGGESTIONS DE RÉASSORT
+# ------------------------------------------------------------------------------
+# - low_stock : ensemble des articles au seuil (qty <= min_stock), tenu par des
+#   triggers sur inventory qui ne se déclenchent qu'au franchissement du seuil ;
+#   l'ACCUEIL lit cet ensemble (quelques lignes) au lieu de parcourir le stock.
+# - daily_item_sales : unités, CA et coût d'achat par (boutique, jour, article),
+#   tenue par un trigger sur sale_items ; la fenêtre récente est un intervalle
+#   contigu de la clé primaire au lieu d'une jointure sales x sale_items (lue
+#   aussi par balika.analytics).
+# - vitesse de vente : unités/jour par article sur les `window` derniers jours,
+#   pondérées par une décroissance exponentielle (demi-vie `half_life` jours),
+#   calculées d'un bloc en NumPy (bincount) ; couverture = stock / vitesse.
+# - liste de réassort : articles au seuil ou couvrant moins de `cover_days`
+#   jours ; quantité à commander = niveau cible - stock, avec
+#   niveau cible = max(2 x seuil, vitesse x cover_days).
+#
+#   python -m balika.replenish rebuild balika_v650_master.db
+# ==============================================================================
+import csv
+import io
+import json
+import sys
+from datetime import date, timedelta
+
+from balika.archive import live_days
+
+DEFAULT_MIN_STOCK = 5
+WINDOW_DAYS = 28
+HALF_LIFE_DAYS = 7
+COVER_DAYS = 14
+
+CREATE_TABLES = (
+    """CREATE TABLE IF NOT EXISTS low_stock (
+        inv_id INTEGER PRIMARY KEY, sid TEXT NOT NULL, since TEXT NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS idx_low_stock_sid ON low_stock(sid, since)",
+    """CREATE TABLE IF NOT EXISTS daily_item_sales (
+        sid TEXT NOT NULL, day TEXT NOT NULL, inv_id INTEGER NOT NULL, qty INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0, cost REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (sid, day, inv_id)) WITHOUT ROWID""",
+)
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+_BELOW = "COALESCE({0}.qty, 0) <= COALESCE({0}.min_stock, %d)" % DEFAULT_MIN_STOCK
+_ENTER = f"INSERT OR REPLACE INTO low_stock (inv_id, sid, since) VALUES (NEW.id, NEW.sid, {_NOW});"
+
+TRIGGERS = {
+    "trg_low_stock_ai": f"""CREATE TRIGGER IF NOT EXISTS trg_low_stock_ai AFTER INSERT ON inventory
+        WHEN {_BELOW.format("NEW")} BEGIN {_ENTER} END""",
+    # Une vente ou un réassort qui reste du même côté du seuil ne touche pas low_stock
+    "trg_low_stock_down": f"""CREATE TRIGGER IF NOT EXISTS trg_low_stock_down AFTER UPDATE OF qty, min_stock ON inventory
+        WHEN {_BELOW.format("NEW")} AND NOT {_BELOW.format("OLD")} BEGIN {_ENTER} END""",
+    "trg_low_stock_up": f"""CREATE TRIGGER IF NOT EXISTS trg_low_stock_up AFTER UPDATE OF qty, min_stock ON inventory
+        WHEN NOT {_BELOW.format("NEW")} AND {_BELOW.format("OLD")}
+        BEGIN DELETE FROM low_stock WHERE inv_id = OLD.id; END""",
+    "trg_low_stock_ad": """CREATE TRIGGER IF NOT EXISTS trg_low_stock_ad AFTER DELETE ON inventory
+        BEGIN DELETE FROM low_stock WHERE inv_id = OLD.id; END""",
+    "trg_item_sales": f"""CREATE TRIGGER IF NOT EXISTS trg_item_sales AFTER INSERT ON sale_items
+        WHEN NEW.inv_id IS NOT NULL
+        BEGIN INSERT INTO daily_item_sales (sid, day, inv_id, qty, revenue, cost)
+              VALUES (NEW.sid, (SELECT substr(COALESCE(ts, {_NOW}), 1, 10) FROM sales WHERE id = NEW.sale_id),
+                      NEW.inv_id, COALESCE(NEW.qty, 0), COALESCE(NEW.qty * NEW.unit_price, 0),
+                      COALESCE(NEW.qty * NEW.buy_price, 0))
+              ON CONFLICT(sid, day, inv_id) DO UPDATE SET qty = qty + excluded.qty,
+                  revenue = revenue + excluded.revenue, cost = cost + excluded.cost; END""",
+}
+
+REORDER_COLUMNS = ("id", "Article", "Catégorie", "Stock", "Seuil", "Ventes/j", "Couverture (j)",
+                   "À commander", "Prix achat", "Coût estimé", "Dernier réassort")
+
+
+def _np():
+    import numpy as np
+    return np
+
+
+def _pd():
+    import pandas as pd
+    return pd
+
+
+def install(conn):
+    for ddl in CREATE_TABLES:
+        conn.execute(ddl)
+    for ddl in TRIGGERS.values():
+        conn.execute(ddl)
+
+
+def rebuild_low_stock(conn):
+    """Recalcule l'ensemble depuis inventory (migration, contrôle) ; retourne sa taille."""
+    conn.execute("DELETE FROM low_stock")
+    return conn.execute(f"""INSERT INTO low_stock (inv_id, sid, since)
+                            SELECT id, sid, COALESCE(last_restock, {_NOW}) FROM inventory
+                            WHERE sid IS NOT NULL AND {_BELOW.format("inventory")}""").rowcount
+
+
+def rebuild_item_sales(conn):
+    """Recalcule daily_item_sales depuis sales + sale_items (mois archivés gardés) ; retourne le nombre de lignes."""
+    conn.execute(f"DELETE FROM daily_item_sales WHERE {live_days(conn, 'daily_item_sales.sid', 'daily_item_sales.day')}")
+    return conn.execute(f"""INSERT INTO daily_item_sales (sid, day, inv_id, qty, revenue, cost)
+                            SELECT si.sid, substr(COALESCE(s.ts, {_NOW}), 1, 10), si.inv_id, SUM(COALESCE(si.qty, 0)),
+                                   SUM(COALESCE(si.qty * si.unit_price, 0)), SUM(COALESCE(si.qty * si.buy_price, 0))
+                            FROM sale_items si JOIN sales s ON s.id = si.sale_id
+                            WHERE si.inv_id IS NOT NULL AND si.sid IS NOT NULL AND {live_days(conn, "si.sid", "s.ts")}
+                            GROUP BY 1, 2, 3""").rowcount
+
+
+def low_stock_count(conn, sid):
+    return conn.execute("SELECT COUNT(*) FROM low_stock WHERE sid=?", (sid,)).fetchone()[0]
+
+
+# ------------------------------------------------------------------------------
+# VITESSE DE VENTE ET LISTE DE RÉASSORT
+# ------------------------------------------------------------------------------
+def recent_sales(conn, sid, since):
+    """[(inventory.id, jour ISO, unités)] depuis le jour `since` (intervalle de daily_item_sales)."""
+    return conn.execute("SELECT inv_id, day, qty FROM daily_item_sales WHERE sid=? AND day >= ?",
+                        (sid, since[:10])).fetchall()
+
+
+def velocity(rows, today, window=WINDOW_DAYS, half_life=HALF_LIFE_DAYS):
+    """(ids, unités/jour) pour les lignes de recent_sales : moyenne journalière
+    pondérée, un jour sans vente comptant pour 0 ; tableaux NumPy."""
+    np = _np()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    inv, days, qty = zip(*rows)
+    # Quelques dizaines de jours distincts : l'âge est calculé une fois par jour, pas par ligne
+    age_of = {d: min(max((today - date.fromisoformat(d)).days, 0), window - 1) for d in set(days)}
+    age = np.fromiter(map(age_of.__getitem__, days), dtype=np.int64, count=len(days))
+    weights = 0.5 ** (np.arange(window) / half_life)
+    ids, pos = np.unique(np.array(inv, dtype=np.int64), return_inverse=True)
+    units = np.bincount(pos, weights=np.array(qty, dtype=float) * weights[age], minlength=len(ids))
+    return ids, units / weights.sum()
+
+
+def reorder_list(conn, sid, today=None, window=WINDOW_DAYS, cover_days=COVER_DAYS, half_life=HALF_LIFE_DAYS):
+    """DataFrame (REORDER_COLUMNS) des articles à commander, les plus urgents d'abord.
+
+    Seuls les articles au seuil (low_stock) et ceux vendus sur la fenêtre sont
+    lus dans inventory (par clé primaire), d'abord leurs seules colonnes
+    numériques ; désignations et prix ne sont lus que pour les lignes retenues.
+    (`+sid` : le filtre boutique ne doit pas détourner le plan vers l'index (sid, item).)
+    """
+    np, pd = _np(), _pd()
+    today = today or date.today()
+    ids, vel = velocity(recent_sales(conn, sid, (today - timedelta(days=window - 1)).isoformat()),
+                        today, window, half_life)
+    rows = conn.execute(f"""SELECT id, COALESCE(qty, 0), COALESCE(min_stock, {DEFAULT_MIN_STOCK}) FROM inventory
+                            WHERE +sid=? AND id IN (SELECT inv_id FROM low_stock WHERE sid=?
+                                                    UNION SELECT value FROM json_each(?))""",
+                        (sid, sid, json.dumps(ids.tolist()))).fetchall()
+    if not rows:
+        return pd.DataFrame(columns=REORDER_COLUMNS)
+    cand = np.array(rows, dtype=np.int64)
+    inv_id, stock, floor = cand[:, 0], cand[:, 1].astype(float), cand[:, 2].astype(float)
+    v = np.zeros(len(inv_id))
+    if len(ids):
+        at = np.searchsorted(ids, inv_id).clip(0, len(ids) - 1)    # ids triés (np.unique)
+        v = np.where(ids[at] == inv_id, vel[at], 0.0)
+    cover = np.divide(np.maximum(stock, 0), v, out=np.full(len(v), np.inf), where=v > 0)
+    order = np.clip(np.maximum(2 * floor, np.ceil(v * cover_days)) - stock, 0, None)
+    keep = ((stock <= floor) | (cover < cover_days)) & (order > 0)
+    df = pd.DataFrame({"id": inv_id[keep], "Stock": cand[keep, 1], "Seuil": cand[keep, 2],
+                       "Ventes/j": v[keep].round(2), "Couverture (j)": np.where(np.isinf(cover), np.nan, cover)[keep].round(1),
+                       "À commander": order[keep].astype(np.int64)})
+    info = pd.DataFrame(conn.execute("""SELECT id, item, COALESCE(category, 'GÉNÉRAL'), COALESCE(buy_price, 0), last_restock
+                                        FROM inventory WHERE id IN (SELECT value FROM json_each(?))""",
+                                     (json.dumps(df["id"].tolist()),)).fetchall(),
+                        columns=["id", "Article", "Catégorie", "Prix achat", "Dernier réassort"])
+    df = df.merge(info, on="id")
+    df["Coût estimé"] = (df["À commander"] * df["Prix achat"]).round(2)
+    df = df.sort_values(["Couverture (j)", "À commander"], ascending=[True, False], na_position="last")
+    return df.loc[:, list(REORDER_COLUMNS)].reset_index(drop=True)
+
+
+def purchase_csv(df):
+    """Bon de commande CSV (;) : une ligne par article + total ; colonne Boutique si présente."""
+    out = io.StringIO()
+    w = csv.writer(out, delimiter=";")
+    lead = ["Boutique"] if "Boutique" in df.columns else []
+    w.writerow([c.lower() for c in lead] + ["article", "catégorie", "quantité", "prix achat", "montant"])
+    for *head, item, cat, qty, price, cost in df[lead + ["Article", "Catégorie", "À commander", "Prix achat",
+                                                        "Coût estimé"]].itertuples(index=False, name=None):
+        w.writerow([*head, item, cat, qty, f"{price:.2f}", f"{cost:.2f}"])
+    w.writerow([""] * len(lead) + ["TOTAL", "", int(df["À commander"].sum()), "", f"{df['Coût estimé'].sum():.2f}"])
+    return out.getvalue()
+
+
+def main(argv=None):
+    import sqlite3
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] != "rebuild":
+        print("usage: python -m balika.replenish rebuild <fichier.db>")
+        return 2
+    conn = sqlite3.connect(argv[1], isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        install(conn)
+        n = rebuild_low_stock(conn)
+        days = rebuild_item_sales(conn)
+        conn.execute("COMMIT")
+        print(f"low_stock reconstruite : {n} article(s) sous le seuil ; daily_item_sales : {days} lignes.")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+# ==============================================================================
+# 💎 BALIKA ERP - SCHÉMA ET MIGRATIONS VERSIONNÉES
+# ------------------------------------------------------------------------------
+# - create_tables() : les tables historiques v650 (CREATE TABLE IF NOT EXISTS).
+# - migrate()       : applique, dans l'ordre, les étapes numérotées absentes de
+#                     schema_version. Chaque étape est idempotente.
+# - check_query_plans() : EXPLAIN QUERY PLAN des requêtes chaudes ; toute
+#                     requête qui retombe sur un SCAN complet est signalée.
+#
+#   python -m balika.schema migrate balika_v650_master.db
+#   python -m balika.schema check   balika_v650_master.db   (code retour 1 si SCAN)
+# ==============================================================================
+import json
+import sys
+from datetime import datetime
+
+from balika import analytics, archive, cash, credit, ingest, messaging, outbox, replenish, search, stats
+from balika.dates import fr_to_iso_sql
+
+
+def create_tables(cursor):
+    # Configuration Système
+    cursor.execute("""CREATE TABLE IF NOT EXISTS system_config (
+        id INTEGER PRIMARY KEY, app_name TEXT, marquee TEXT, version TEXT, 
+        theme_id TEXT DEFAULT 'Cobalt', marquee_active INTEGER DEFAULT 1,
+        broadcast_msg TEXT DEFAULT 'Bienvenue sur le réseau Balika')""")
+    
+    # Utilisateurs & Profils
+    cursor.execute("""CREATE TABLE IF NOT EXISTS users (
+        uid TEXT PRIMARY KEY, pwd TEXT, role TEXT, shop TEXT, status TEXT, 
+        name TEXT, tel TEXT, photo_url TEXT DEFAULT '', created_at TEXT,
+        last_login TEXT)""")
+    
+    # Boutiques & Paramètres
+    cursor.execute("""CREATE TABLE IF NOT EXISTS shops (
+        sid TEXT PRIMARY KEY, name TEXT, owner TEXT, rate REAL DEFAULT 2800.0, 
+        head TEXT DEFAULT 'BIENVENUE CHEZ BALIKA', addr TEXT, tel TEXT, 
+        rccm TEXT, idnat TEXT, currency_pref TEXT DEFAULT 'USD',
+        closing_balance REAL DEFAULT 0.0)""")
+    
+    # Inventaire & Catégories
+    cursor.execute("""CREATE TABLE IF NOT EXISTS inventory (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, item TEXT, qty INTEGER, 
+        buy_price REAL, sell_price REAL, sid TEXT, category TEXT DEFAULT 'GÉNÉRAL',
+        min_stock INTEGER DEFAULT 5, last_restock TEXT)""")
+    
+    # Ventes & Transactions
+    cursor.execute("""CREATE TABLE IF NOT EXISTS sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, ref TEXT, cli TEXT, total_usd REAL, 
+        paid_usd REAL, rest_usd REAL, date TEXT, time TEXT, seller TEXT, 
+        sid TEXT, items_json TEXT, currency TEXT, profit REAL, status TEXT DEFAULT 'VALIDÉ')""")
+    
+    # Retours Produits
+    cursor.execute("""CREATE TABLE IF NOT EXISTS returns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, sale_ref TEXT, item TEXT, qty INTEGER, 
+        reason TEXT, date TEXT, sid TEXT, refund_amount REAL)""")
+    
+    # Dettes & Crédits
+    cursor.execute("""CREATE TABLE IF NOT EXISTS debts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, cli TEXT, balance REAL, 
+        sale_ref TEXT, sid TEXT, status TEXT DEFAULT 'OUVERT', last_update TEXT)""")
+    
+    # Dépenses Opérationnelles
+    cursor.execute("""CREATE TABLE IF NOT EXISTS expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, label TEXT, amount REAL, 
+        date TEXT, sid TEXT, user TEXT, category TEXT DEFAULT 'AUTRE')""")
+
+    # Journal d'Audit
+    cursor.execute("""CREATE TABLE IF NOT EXISTS audit_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT, action TEXT, 
+        details TEXT, date TEXT, time TEXT, sid TEXT)""")
+
+    # Messagerie Interne
+    cursor.execute("""CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, sender TEXT, receiver TEXT, 
+        content TEXT, date TEXT, is_read INTEGER DEFAULT 0)""")
+
+
+# ------------------------------------------------------------------------------
+# ÉTAPES DE MIGRATION (numérotées, jamais renumérotées ni modifiées une fois livrées)
+# ------------------------------------------------------------------------------
+MIGRATIONS = []
+
+
+def migration(version, label):
+    def register(fn):
+        MIGRATIONS.append((version, label, fn))
+        return fn
+    return register
+
+
+@migration(1, "inventaire : fusion des doublons + UNIQUE(sid, item)")
+def _m001_inventory_unique(conn):
+    # Le formulaire STOCK créait un doublon à chaque réassort : on cumule les
+    # quantités sur la fiche la plus ancienne avant de poser la contrainte.
+    conn.execute("""UPDATE inventory SET qty = (
+                        SELECT SUM(d.qty) FROM inventory d WHERE d.sid = inventory.sid AND d.item = inventory.item)
+                    WHERE id IN (SELECT MIN(id) FROM inventory GROUP BY sid, item HAVING COUNT(*) > 1)""")
+    conn.execute("DELETE FROM inventory WHERE id NOT IN (SELECT MIN(id) FROM inventory GROUP BY sid, item)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_inventory_sid_item ON inventory(sid, item)")
+
+
+@migration(2, "ventes : références uniques par boutique")
+def _m002_sales_unique_ref(conn):
+    # Les anciennes références aléatoires (B-1000..B-9999) se répétaient : les
+    # doublons reçoivent le suffixe -<id> pour rester retrouvables dans RETOURS.
+    conn.execute("""UPDATE sales SET ref = ref || '-' || id
+                    WHERE ref IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM sales GROUP BY sid, ref)""")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_sales_sid_ref ON sales(sid, ref)")
+
+
+@migration(3, "index des chemins d'accès chauds")
+def _m003_hot_indexes(conn):
+    for ddl in (
+        "CREATE INDEX IF NOT EXISTS idx_sales_sid_date ON sales(sid, date)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_sid_date ON expenses(sid, date)",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_instock ON inventory(sid, item) WHERE qty > 0",
+        "CREATE INDEX IF NOT EXISTS idx_debts_open ON debts(sid, cli) WHERE status = 'OUVERT'",
+        "CREATE INDEX IF NOT EXISTS idx_users_shop_role ON users(shop, role)",
+        "CREATE INDEX IF NOT EXISTS idx_returns_sid_ref ON returns(sid, sale_ref)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_sid_date ON audit_logs(sid, date)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_user ON audit_logs(user)",
+    ):
+        conn.execute(ddl)
+
+
+@migration(4, "horodatage ISO-8601 (ts) + index d'intervalle")
+def _m004_iso_timestamps(conn):
+    # Réécrit les dates "%d/%m/%Y" existantes en ts triable ; les écritures
+    # renseignent ensuite ts directement.
+    for table, time_col in (("sales", "time"), ("audit_logs", "time"), ("expenses", None),
+                            ("returns", None), ("debts", None)):
+        add_column(conn, table, "ts", "TEXT")
+        date_col = "last_update" if table == "debts" else "date"
+        conn.execute(f"UPDATE {table} SET ts = {fr_to_iso_sql(date_col, time_col)} "
+                     f"WHERE ts IS NULL AND {date_col} LIKE '__/__/____'")
+    add_column(conn, "debts", "updated_ts", "TEXT")
+    conn.execute("UPDATE debts SET updated_ts = ts WHERE updated_ts IS NULL")
+    for ddl in (
+        "CREATE INDEX IF NOT EXISTS idx_sales_sid_ts ON sales(sid, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_sid_ts ON expenses(sid, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_returns_sid_ts ON returns(sid, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_debts_sid_ts ON debts(sid, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_logs(ts)",
+    ):
+        conn.execute(ddl)
+
+
+@migration(5, "lignes de vente normalisées (sale_items) + reprise de items_json")
+def _m005_sale_items(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS sale_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, sale_id INTEGER NOT NULL, inv_id INTEGER,
+        item TEXT, qty INTEGER, unit_price REAL, buy_price REAL, sid TEXT)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items(sale_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sid_inv ON sale_items(sid, inv_id)")
+    backfill_sale_items(conn)
+
+
+def backfill_sale_items(conn, batch=1000):
+    """Éclate items_json en lignes sale_items, par lots (parcours par id croissant).
+
+    Les ventes qui ont déjà des lignes sont ignorées : la reprise peut être
+    relancée sans doublon. Retourne le nombre de lignes créées.
+    """
+    last_id, created = 0, 0
+    inv_ids = {}
+    while True:
+        rows = conn.execute("""SELECT id, sid, items_json FROM sales
+                               WHERE id > ? AND items_json IS NOT NULL
+                               AND NOT EXISTS (SELECT 1 FROM sale_items si WHERE si.sale_id = sales.id)
+                               ORDER BY id LIMIT ?""", (last_id, batch)).fetchall()
+        if not rows:
+            return created
+        lines = []
+        for sale_id, sid, items_json in rows:
+            try:
+                items = json.loads(items_json)
+            except ValueError:
+                continue
+            for name, d in items.items():
+                if (sid, name) not in inv_ids:
+                    r = conn.execute("SELECT id FROM inventory WHERE sid=? AND item=?", (sid, name)).fetchone()
+                    inv_ids[(sid, name)] = r[0] if r else None
+                lines.append((sale_id, d.get('id') or inv_ids[(sid, name)], name, d.get('q', 0),
+                              d.get('p', 0.0), d.get('buy', 0.0), sid))
+        conn.executemany("""INSERT INTO sale_items (sale_id, inv_id, item, qty, unit_price, buy_price, sid)
+                            VALUES (?,?,?,?,?,?,?)""", lines)
+        created += len(lines)
+        last_id = rows[-1][0]
+
+
+@migration(6, "agrégats journaliers daily_shop_stats (triggers + reprise)")
+def _m006_daily_shop_stats(conn):
+    stats.install(conn)
+    stats.rebuild_daily_stats(conn)
+
+
+@migration(7, "compteurs de références de facture par boutique")
+def _m007_shop_counters(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS shop_counters (
+        sid TEXT PRIMARY KEY, last_ref INTEGER NOT NULL DEFAULT 0)""")
+
+
+@migration(8, "recherche articles : code-barres unique + index plein texte FTS5")
+def _m008_inventory_search(conn):
+    add_column(conn, "inventory", "barcode", "TEXT")
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS ux_inventory_barcode
+                    ON inventory(sid, barcode) WHERE barcode IS NOT NULL""")
+    search.install_fts(conn)
+
+
+@migration(9, "journal d'audit : index des filtres (utilisateur, action, boutique) x période")
+def _m009_audit_indexes(conn):
+    for ddl in (
+        "CREATE INDEX IF NOT EXISTS idx_audit_user_ts ON audit_logs(user, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_action_ts ON audit_logs(action, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_sid_ts ON audit_logs(sid, ts)",
+    ):
+        conn.execute(ddl)
+
+
+@migration(10, "recherche articles : trigger FTS de mise à jour limité aux vrais changements")
+def _m010_fts_update_trigger(conn):
+    if search.has_fts(conn):
+        conn.execute("DROP TRIGGER IF EXISTS trg_inventory_fts_au")
+        conn.execute(search.FTS_DDL[3])
+
+
+@migration(11, "journal de caisse cash_movements (triggers) + clôtures cash_closings")
+def _m011_cash_ledger(conn):
+    add_column(conn, "shops", "closing_balance_cdf", "REAL DEFAULT 0.0")
+    cash.install(conn)
+
+
+@migration(12, "comptes clients à crédit (soldes par triggers) + historique des règlements FIFO")
+def _m012_client_accounts(conn):
+    credit.install(conn)
+    credit.rebuild_clients(conn)
+
+
+@migration(13, "terminaux hors ligne : file d'envoi outbox + ingestion centrale dédupliquée (ingested, sync_conflicts)")
+def _m013_offline_sync(conn):
+    outbox.install(conn)
+    ingest.install(conn)
+
+
+@migration(14, "réassort : articles sous le seuil (low_stock) + ventes par article et par jour (daily_item_sales)")
+def _m014_replenishment(conn):
+    replenish.install(conn)
+    replenish.rebuild_low_stock(conn)
+    replenish.rebuild_item_sales(conn)
+
+
+@migration(15, "moteur d'analyse : hourly_sales (jour, heure, vendeur) + CA et coût dans daily_item_sales")
+def _m015_analytics(conn):
+    add_column(conn, "daily_item_sales", "revenue", "REAL NOT NULL DEFAULT 0")
+    add_column(conn, "daily_item_sales", "cost", "REAL NOT NULL DEFAULT 0")
+    conn.execute("DROP TRIGGER IF EXISTS trg_item_sales")
+    conn.execute(replenish.TRIGGERS["trg_item_sales"])
+    replenish.rebuild_item_sales(conn)
+    analytics.install(conn)
+    analytics.rebuild_hourly_sales(conn)
+
+
+@migration(16, "archivage des mois clos : manifeste + index des factures et retours archivés")
+def _m016_archive(conn):
+    archive.install(conn)
+
+
+@migration(17, "messagerie : index boîte de réception / envoyés / non lus + compteurs message_unread (triggers)")
+def _m017_messaging(conn):
+    messaging.install(conn)
+    messaging.rebuild_unread(conn)
+
+
+def add_column(conn, table, column, decl):
+    """ALTER TABLE ADD COLUMN idempotent."""
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def migrate(conn):
+    """Applique les migrations manquantes ; retourne les versions appliquées."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY, label TEXT, applied_at TEXT)""")
+    done = {r[0] for r in conn.execute("SELECT version FROM schema_version")}
+    applied = []
+    for version, label, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        fn(conn)
+        conn.execute("INSERT INTO schema_version (version, label, applied_at) VALUES (?,?,?)",
+                     (version, label, datetime.now().isoformat()))
+        applied.append(version)
+    return applied
+
+
+# ------------------------------------------------------------------------------
+# CONTRÔLE DES PLANS D'EXÉCUTION
+# ------------------------------------------------------------------------------
+HOT_QUERIES = (
+    ("ACCUEIL tuiles période", "SELECT SUM(revenue), SUM(profit), SUM(expenses) FROM daily_shop_stats "
+     "WHERE sid=? AND day >= ? AND day < ?", ("s", "2025-01-01", "2025-01-02")),
+    ("RAPPORTS ventes période", "SELECT date, ref, cli, total_usd, seller FROM sales WHERE sid=? AND ts >= ? AND ts < ? ORDER BY ts",
+     ("s", "2025-01-01", "2025-02-01")),
+    ("RETOURS lignes facture", "SELECT si.id, si.item, si.qty, si.unit_price, si.inv_id FROM sales s "
+     "JOIN sale_items si ON si.sale_id = s.id WHERE s.sid=? AND s.ref=?", ("s", "B-1")),
+    ("RETOURS déjà retourné", "SELECT item, SUM(qty) FROM returns WHERE sid=? AND sale_ref=? GROUP BY item "
+     "UNION ALL SELECT item, qty FROM archived_returns WHERE sid=? AND sale_ref=?", ("s", "B-1", "s", "B-1")),
+    ("RETOURS facture archivée", "SELECT m.sid, m.month, m.path FROM archived_refs r JOIN archive_manifest m "
+     "ON m.sid = r.sid AND m.month = r.month WHERE r.sid=? AND r.ref=?", ("s", "B-1")),
+    ("RAPPORTS mois archivés", "SELECT sid, month, path FROM archive_manifest WHERE sid=? AND month >= ? AND month <= ? "
+     "AND month || '-01' < ?", ("s", "2025-01", "2025-02", "2025-02-01")),
+    ("ARCHIVAGE plus ancienne vente", "SELECT MIN(ts) FROM sales WHERE sid=?", ("s",)),
+    ("RAPPORTS cubes horaires", "SELECT day, day >= ?, hour, seller, sale_count, revenue, profit FROM hourly_sales "
+     "WHERE sid=? AND day >= ? AND day < ?", ("2025-01-15", "s", "2025-01-01", "2025-02-01")),
+    ("RAPPORTS cubes articles", "SELECT inv_id, day >= ?, SUM(qty), SUM(revenue), SUM(cost) FROM daily_item_sales "
+     "WHERE sid=? AND day >= ? AND day < ? GROUP BY inv_id, day >= ?", ("2025-01-15", "s", "2025-01-01", "2025-02-01", "2025-01-15")),
+    ("RAPPORTS version des cubes", "SELECT SUM(sale_count), SUM(revenue), SUM(returns) FROM daily_shop_stats "
+     "WHERE sid=? AND day >= ? AND day < ?", ("s", "2025-01-01", "2025-02-01")),
+    ("CAISSE code-barres", "SELECT id, item, sell_price, qty FROM inventory WHERE sid=? AND barcode=?", ("s", "123")),
+    ("CAISSE début de désignation", "SELECT id, item, sell_price, qty FROM inventory WHERE sid=? AND item >= ? AND item < ? "
+     "AND qty > 0 ORDER BY item LIMIT 25", ("s", "RI", "RI\U0010ffff")),
+    ("CAISSE décrément stock", "UPDATE inventory SET qty = qty - ? WHERE id=? AND sid=? AND qty >= ?", (1, 1, "s", 1)),
+    ("CAISSE contrôle stock", "SELECT id, qty FROM inventory WHERE sid=? AND id IN (?,?)", ("s", 1, 2)),
+    ("DETTES ouvertes", "SELECT id, cli, balance, sale_ref FROM debts WHERE sid=? AND status='OUVERT'", ("s",)),
+    ("ÉQUIPE vendeurs", "SELECT uid, name, status FROM users WHERE shop=? AND role='VENDEUR'", ("s",)),
+    ("AUDIT par utilisateur", "SELECT user, action, details, date, time, sid FROM audit_logs "
+     "WHERE ts >= ? AND ts < ? AND user=? ORDER BY ts DESC LIMIT 50", ("2025-01-01", "2025-02-01", "u")),
+    ("AUDIT par action", "SELECT user, action, details, date, time, sid FROM audit_logs "
+     "WHERE ts >= ? AND ts < ? AND action=? ORDER BY ts DESC LIMIT 50", ("2025-01-01", "2025-02-01", "VENTE")),
+    ("LOGIN", "SELECT pwd, role, shop, status, name FROM users WHERE uid=?", ("admin",)),
+    ("DETTES clients débiteurs", "SELECT name, balance, open_debts FROM clients WHERE sid=? AND open_debts > 0 "
+     "ORDER BY balance DESC, id DESC LIMIT 50", ("s",)),
+    ("DETTES FIFO client", "SELECT id, balance, sale_ref FROM debts WHERE sid=? AND cli=? AND status='OUVERT' "
+     "ORDER BY ts, id", ("s", "JEAN")),
+    ("DETTES ancienneté client", "SELECT COALESCE(SUM(balance), 0) FROM debts WHERE sid=? AND cli=? AND status='OUVERT' "
+     "AND ts >= ?", ("s", "JEAN", "2025-01-01")),
+    ("DETTES ancienneté boutique", "SELECT SUM(balance) FROM debt_aging WHERE sid=? AND day >= ?", ("s", "2025-01-01")),
+    ("DETTES historique client", "SELECT id, amount, ts, user FROM debt_payments WHERE sid=? AND cli=? "
+     "ORDER BY id DESC LIMIT 20", ("s", "JEAN")),
+    ("CLÔTURE dernier point", "SELECT last_movement_id FROM cash_closings WHERE sid=? ORDER BY id DESC LIMIT 1", ("s",)),
+    ("CLÔTURE mouvements en attente", "SELECT kind, currency, COUNT(*), SUM(amount), MAX(id) FROM cash_movements "
+     "WHERE sid=? AND id > ? GROUP BY kind, currency", ("s", 0)),
+    ("SYNC file d'attente terminal", "SELECT uid, kind, sid, ts, payload FROM outbox WHERE sent_ts IS NULL "
+     "AND id > ? ORDER BY id LIMIT 100", (0,)),
+    ("SYNC déduplication centrale", "SELECT status, result FROM ingested WHERE uid=?", ("T1-0",)),
+    ("ACCUEIL articles sous le seuil", "SELECT i.id, i.item, i.qty, i.min_stock FROM low_stock l "
+     "JOIN inventory i ON i.id = l.inv_id WHERE l.sid=?", ("s",)),
+    ("RÉASSORT ventes récentes", "SELECT inv_id, day, qty FROM daily_item_sales WHERE sid=? AND day >= ?",
+     ("s", "2025-01-01")),
+    ("MESSAGERIE non lus", "SELECT n FROM message_unread WHERE receiver=?", ("u",)),
+    ("MESSAGERIE nouveaux messages", "SELECT id, sender, receiver, content, date, is_read FROM messages "
+     "WHERE receiver=? AND id > ? ORDER BY id LIMIT 50", ("u", 0)),
+    ("MESSAGERIE derniers messages", "SELECT id, sender, receiver, content, date, is_read FROM messages "
+     "WHERE receiver=? ORDER BY id DESC LIMIT 50", ("u",)),
+    ("MESSAGERIE envoyés", "SELECT id, sender, receiver, content, date, is_read FROM messages "
+     "WHERE sender=? ORDER BY id DESC LIMIT 50", ("u",)),
+    ("MESSAGERIE marquer lus", "UPDATE messages SET is_read = 1 WHERE receiver=? AND is_read = 0 AND id <= ?", ("u", 9)),
+)
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Retourne [(libellé, détail)] pour chaque requête chaude qui fait un SCAN."""
+    offenders = []
+    for label, sql, params in queries:
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+            detail = row[-1]
+            if detail.startswith("SCAN"):
+                offenders.append((label, detail))
+    return offenders
+
+
+def main(argv=None):
+    import sqlite3
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] not in ("migrate", "check"):
+        print("usage: python -m balika.schema {migrate|check} <fichier.db>")
+        return 2
+    cmd, path = argv
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        create_tables(conn.cursor())
+        applied = migrate(conn)
+        conn.execute("COMMIT")
+        if cmd == "migrate":
+            print(f"Migrations appliquées : {applied or 'aucune (à jour)'}")
+            return 0
+        offenders = check_query_plans(conn)
+        for label, detail in offenders:
+            print(f"❌ {label} : {detail}")
+        if not offenders:
+            print(f"✅ {len(HOT_QUERIES)} requêtes chaudes indexées (aucun SCAN).")
+        return 1 if offenders else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
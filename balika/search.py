@@ -0,0 +1,101 @@
+# ==============================================================================
+# 💎 BALIKA ERP - RECHERCHE D'ARTICLES (CAISSE)
+# ------------------------------------------------------------------------------
+# Ordre de résolution d'une saisie :
+#   1. code-barres / SKU exact      -> index unique (sid, barcode) ;
+#   2. début de désignation          -> intervalle sur l'index (sid, item) ;
+#   3. mots de désignation/catégorie -> FTS5 (inventory_fts), préfixes acceptés.
+# L'index FTS est maintenu ligne par ligne par des triggers sur inventory
+# (sauf pendant un import en masse : voir fts_bulk_insert).
+# Seuls les `limit` premiers résultats sont renvoyés au navigateur.
+# ==============================================================================
+import sqlite3
+from contextlib import contextmanager
+
+SEARCH_LIMIT = 25
+
+# Colonnes renvoyées pour chaque article : (id, item, sell_price, qty, buy_price, category, barcode)
+_COLS = "id, item, sell_price, qty, buy_price, category, barcode"
+
+FTS_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS inventory_fts USING fts5(
+        item, category, content='inventory', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS trg_inventory_fts_ai AFTER INSERT ON inventory BEGIN
+        INSERT INTO inventory_fts (rowid, item, category) VALUES (NEW.id, NEW.item, NEW.category); END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_inventory_fts_ad AFTER DELETE ON inventory BEGIN
+        INSERT INTO inventory_fts (inventory_fts, rowid, item, category) VALUES ('delete', OLD.id, OLD.item, OLD.category); END""",
+    # Réassort / upsert : category réécrite à l'identique -> pas de travail FTS
+    """CREATE TRIGGER IF NOT EXISTS trg_inventory_fts_au AFTER UPDATE OF item, category ON inventory
+        WHEN OLD.item IS NOT NEW.item OR OLD.category IS NOT NEW.category BEGIN
+        INSERT INTO inventory_fts (inventory_fts, rowid, item, category) VALUES ('delete', OLD.id, OLD.item, OLD.category);
+        INSERT INTO inventory_fts (rowid, item, category) VALUES (NEW.id, NEW.item, NEW.category); END""",
+)
+
+
+def install_fts(conn):
+    """Crée l'index plein texte et ses triggers ; False si FTS5 est absent de SQLite."""
+    try:
+        for ddl in FTS_DDL:
+            conn.execute(ddl)
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("INSERT INTO inventory_fts (inventory_fts) VALUES ('rebuild')")
+    return True
+
+
+def has_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name='inventory_fts'").fetchone() is not None
+
+
+@contextmanager
+def fts_bulk_insert(conn):
+    """Insertions en masse dans inventory : le trigger d'insertion FTS est suspendu
+    et les nouvelles lignes sont indexées en un seul INSERT ... SELECT à la sortie.
+
+    À utiliser dans la transaction d'écriture de l'appelant (DB.write()) : en cas
+    d'erreur, le ROLLBACK restaure aussi le trigger.
+    """
+    if not has_fts(conn):
+        yield
+        return
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM inventory").fetchone()[0]
+    conn.execute("DROP TRIGGER IF EXISTS trg_inventory_fts_ai")
+    yield
+    # AUTOINCREMENT : les lignes créées ont toutes un id > last_id
+    conn.execute("""INSERT INTO inventory_fts (rowid, item, category)
+                    SELECT id, item, category FROM inventory WHERE id > ?""", (last_id,))
+    conn.execute(FTS_DDL[1])
+
+
+def _fts_query(text):
+    tokens = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def search_inventory(conn, sid, text, limit=SEARCH_LIMIT, in_stock=True):
+    """Retourne {inventory.id: ligne} (ordre de pertinence), au plus `limit` articles."""
+    stock = " AND qty > 0" if in_stock else ""
+    text = (text or "").strip()
+    if not text:
+        rows = conn.execute(f"SELECT {_COLS} FROM inventory WHERE sid=?{stock} ORDER BY item LIMIT ?",
+                            (sid, limit)).fetchall()
+        return {r[0]: r for r in rows}
+
+    found = {}
+    r = conn.execute(f"SELECT {_COLS} FROM inventory WHERE sid=? AND barcode=?", (sid, text)).fetchone()
+    if r and ((r[3] or 0) > 0 or not in_stock):  # qty peut être NULL
+        found[r[0]] = r
+
+    key = text.upper()
+    for r in conn.execute(f"SELECT {_COLS} FROM inventory WHERE sid=? AND item >= ? AND item < ?{stock} "
+                          "ORDER BY item LIMIT ?", (sid, key, key + "\U0010ffff", limit)):
+        found.setdefault(r[0], r)
+
+    if len(found) < limit and has_fts(conn):
+        cols = ", ".join(f"i.{c.strip()}" for c in _COLS.split(","))
+        for r in conn.execute(f"""SELECT {cols} FROM inventory_fts f JOIN inventory i ON i.id = f.rowid
+                                  WHERE inventory_fts MATCH ? AND i.sid=?{stock.replace('qty', 'i.qty')}
+                                  ORDER BY f.rank LIMIT ?""", (_fts_query(text), sid, limit)):
+            found.setdefault(r[0], r)
+    return dict(list(found.items())[:limit])
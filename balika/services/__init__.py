@@ -0,0 +1,50 @@
+# ==============================================================================
+# 💎 BALIKA ERP - COUCHE SERVICES (LOGIQUE MÉTIER SANS STREAMLIT)
+# ------------------------------------------------------------------------------
+# Les pages de balika-app.py appellent ces services au lieu d'écrire leur SQL en
+# ligne ; les outils (bench/, tâches par lots) réutilisent les mêmes chemins.
+# Import léger : ni Streamlit, ni accès disque ; pandas n'est chargé que par les
+# méthodes de ReportService qui renvoient des DataFrame.
+#
+#   svc = Services.build(Database("balika_v650_master.db"), audit=AuditLogger(db))
+#   user = svc.auth.login("caisse1", "secret")
+#   Services.build(db, audit, outbox=Outbox("T1"))   (terminal hors ligne : voir balika.outbox)
+#   Services.build(db, audit, archive=ArchiveStore("archives"))   (mois clos : voir balika.archive)
+# ==============================================================================
+from dataclasses import dataclass
+
+from balika.services.auth import AccountSuspended, AuthError, AuthService, InvalidCredentials, User, UserExists
+from balika.services.cash import CashPosition, CashService, Closing
+from balika.services.debts import ClientPayment, DebtError, DebtPayment, DebtService, OpenDebt
+from balika.services.inventory import Article, BarcodeTaken, ImportFileError, ImportReport, InventoryService
+from balika.services.messages import Message, MessageError, MessageService
+from balika.services.reports import Cubes, NetworkTotals, ReportService, ShopTotals
+from balika.services.sales import CartLine, ReturnError, ReturnLine, SaleReceipt, SalesService, StockError
+
+
+@dataclass(frozen=True)
+class Services:
+    auth: AuthService
+    sales: SalesService
+    inventory: InventoryService
+    debts: DebtService
+    reports: ReportService
+    cash: CashService
+    messages: MessageService
+
+    @classmethod
+    def build(cls, db, audit=None, outbox=None, archive=None):
+        return cls(AuthService(db, audit), SalesService(db, audit, outbox, archive), InventoryService(db, audit),
+                   DebtService(db, audit, outbox), ReportService(db, audit, archive=archive), CashService(db, audit),
+                   MessageService(db, audit))
+
+
+__all__ = [
+    "Services", "AuthService", "SalesService", "InventoryService", "DebtService", "ReportService", "CashService",
+    "MessageService",
+    "User", "AuthError", "InvalidCredentials", "AccountSuspended", "UserExists",
+    "CartLine", "SaleReceipt", "StockError", "ReturnLine", "ReturnError",
+    "Article", "BarcodeTaken", "ImportReport", "ImportFileError",
+    "DebtPayment", "ClientPayment", "OpenDebt", "DebtError", "ShopTotals", "NetworkTotals", "CashPosition", "Closing",
+    "Cubes", "Message", "MessageError",
+]
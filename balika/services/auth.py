@@ -0,0 +1,106 @@
+# ==============================================================================
+# 💎 BALIKA ERP - COMPTES ET CONNEXION (AuthService)
+# ==============================================================================
+import hashlib
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+
+from balika.services.base import Service
+
+
+def hash_password(pwd: str) -> str:
+    return hashlib.sha256(pwd.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class User:
+    uid: str
+    role: str
+    shop_id: str
+    status: str
+    name: str
+
+
+class AuthError(Exception):
+    pass
+
+
+class InvalidCredentials(AuthError):
+    pass
+
+
+class AccountSuspended(AuthError):
+    pass
+
+
+class UserExists(AuthError):
+    pass
+
+
+class AuthService(Service):
+    def login(self, uid: str, pwd: str) -> User:
+        """Vérifie identifiant + mot de passe ; journalise la connexion réussie."""
+        with self.db.catalog.read() as conn:
+            res = conn.execute("SELECT pwd, role, shop, status, name FROM users WHERE uid=?", (uid,)).fetchone()
+        if not res or hash_password(pwd) != res[0]:
+            raise InvalidCredentials(uid)
+        user = User(uid, res[1], res[2], res[3], res[4])
+        if user.status != "ACTIF":
+            raise AccountSuspended(uid)
+        self._log(uid, "CONNEXION", "Accès autorisé", user.shop_id)
+        return user
+
+    def register(self, uid: str, pwd: str, shop_name: str, tel: str) -> None:
+        """Demande d'adhésion d'une boutique (compte GERANT en attente d'activation)."""
+        uid = uid.lower()
+        try:
+            with self.db.catalog.write() as conn:
+                conn.execute("""INSERT INTO users (uid, pwd, role, shop, status, name, tel, created_at)
+                                VALUES (?,?,?,?,?,?,?,?)""",
+                             (uid, hash_password(pwd), 'GERANT', uid, 'EN_ATTENTE', shop_name, tel, datetime.now().isoformat()))
+        except sqlite3.IntegrityError:
+            raise UserExists(uid) from None
+
+    # --- ADMINISTRATION DES COMPTES ---------------------------------------------
+    def activate(self, actor: str, uid: str) -> None:
+        with self.db.catalog.write() as conn:
+            conn.execute("UPDATE users SET status='ACTIF' WHERE uid=?", (uid,))
+            conn.execute("INSERT OR IGNORE INTO shops (sid, name) VALUES (?,?)", (uid, uid))
+        self._log(actor, "COMPTE", f"Activation {uid}", "SYSTEM")
+
+    def block(self, actor: str, uid: str) -> None:
+        with self.db.catalog.write() as conn:
+            conn.execute("UPDATE users SET status='BLOQUE' WHERE uid=?", (uid,))
+        self._log(actor, "COMPTE", f"Blocage {uid}", "SYSTEM")
+
+    def delete(self, actor: str, uid: str) -> None:
+        with self.db.catalog.write() as conn:
+            conn.execute("DELETE FROM users WHERE uid=?", (uid,))
+        self._log(actor, "COMPTE", f"Suppression {uid}", "SYSTEM")
+
+    # --- ÉQUIPE D'UNE BOUTIQUE -----------------------------------------------------
+    def sellers(self, sid: str) -> list[tuple[str, str, str]]:
+        """[(login, nom, statut)] des vendeurs de la boutique."""
+        with self.db.catalog.read() as conn:
+            return conn.execute("SELECT uid, name, status FROM users WHERE shop=? AND role='VENDEUR'", (sid,)).fetchall()
+
+    def create_seller(self, actor: str, sid: str, uid: str, pwd: str, name: str) -> None:
+        try:
+            with self.db.catalog.write() as conn:
+                conn.execute("INSERT INTO users (uid, pwd, role, shop, status, name) VALUES (?,?,?,?,?,?)",
+                             (uid, hash_password(pwd), 'VENDEUR', sid, 'ACTIF', name))
+        except sqlite3.IntegrityError:
+            raise UserExists(uid) from None
+        self._log(actor, "ÉQUIPE", f"Création vendeur {uid}", sid)
+
+    def delete_seller(self, actor: str, sid: str, uid: str) -> None:
+        # Limité aux vendeurs de la boutique : un gérant ne peut pas supprimer un autre compte
+        with self.db.catalog.write() as conn:
+            conn.execute("DELETE FROM users WHERE uid=? AND shop=? AND role='VENDEUR'", (uid, sid))
+        self._log(actor, "ÉQUIPE", f"Suppression vendeur {uid}", sid)
+
+    def change_password(self, uid: str, pwd: str, sid: str) -> None:
+        with self.db.catalog.write() as conn:
+            conn.execute("UPDATE users SET pwd=? WHERE uid=?", (hash_password(pwd), uid))
+        self._log(uid, "ÉQUIPE", "Changement de mot de passe", sid)
@@ -0,0 +1,30 @@
+# ==============================================================================
+# 💎 BALIKA ERP - SOCLE COMMUN DES SERVICES
+# ==============================================================================
+from datetime import datetime
+
+
+class Service:
+    """Un service = le pool Database (ou ShardRouter) partagé + le journal d'audit optionnel.
+
+    Données d'une boutique : self.db.shop(sid) ; comptes et fiches : self.db.catalog.
+    """
+
+    def __init__(self, db, audit=None, outbox=None, archive=None):
+        self.db = db
+        self.audit = audit
+        self.outbox = outbox     # terminal hors ligne (balika.outbox) : opérations à pousser au central
+        self.archive = archive   # mois clos sortis de la base vivante (balika.archive.ArchiveStore)
+
+    def _enqueue(self, conn, kind, sid, payload):
+        # Dans la transaction de l'opération : l'enregistrement existe si et seulement si l'opération existe
+        if self.outbox is not None:
+            self.outbox.append(conn, kind, sid, payload)
+
+    def _log(self, user, action, details, sid):
+        if self.audit is not None:
+            self.audit.log(user, action, details, sid)
+
+
+def fr_today(now=None):
+    return (now or datetime.now()).strftime("%d/%m/%Y")
@@ -0,0 +1,56 @@
+# ==============================================================================
+# 💎 BALIKA ERP - CLÔTURE DE CAISSE (CashService)
+# ==============================================================================
+import json
+from dataclasses import dataclass
+
+from balika.cash import close_register, pending
+from balika.services.base import Service
+
+
+@dataclass(frozen=True)
+class CashPosition:
+    since_id: int            # dernier mouvement de la clôture précédente
+    movements: int
+    opening: dict            # {devise: fond d'ouverture}
+    by_kind: dict            # {type: {devise: montant, 'n': nombre}}
+    net: dict                # {devise: entrées - sorties}
+    expected: dict           # {devise: fond + net}
+
+
+@dataclass(frozen=True)
+class Closing:
+    closing_id: int
+    ts: str
+    position: CashPosition
+    counted: dict
+    kept: dict               # fond reporté à l'ouverture suivante
+    gap: dict                # {devise: compté - attendu}
+
+
+def _position(p):
+    return CashPosition(p['since_id'], p['movements'], p['opening'], p['by_kind'], p['net'], p['expected'])
+
+
+class CashService(Service):
+    def position(self, sid: str) -> CashPosition:
+        """État de la caisse depuis la dernière clôture (mouvements du jour seulement)."""
+        with self.db.shop(sid).read() as conn:
+            return _position(pending(conn, sid))
+
+    def close(self, sid: str, user: str, counted_usd: float, counted_cdf: float,
+              kept_usd: float | None = None, kept_cdf: float | None = None, note: str = "") -> Closing:
+        """Clôture (voir balika.cash) ; ValueError si un montant est incohérent."""
+        c = close_register(self.db.shop(sid), sid, user, counted_usd, counted_cdf, kept_usd, kept_cdf, note)
+        self._log(user, "CLÔTURE", f"{c['movements']} mouvements, écart {c['gap']['USD']:+.2f}$ / "
+                                   f"{c['gap']['CDF']:+,.0f} CDF, fond {c['kept']['USD']:.2f}$", sid)
+        return Closing(c['closing_id'], c['ts'], _position(c), c['counted'], c['kept'], c['gap'])
+
+    def breakdown(self, sid: str, closing_id: int) -> dict:
+        """Détail par type de mouvement d'une clôture passée."""
+        with self.db.shop(sid).read() as conn:
+            row = conn.execute("SELECT breakdown FROM cash_closings WHERE id=? AND sid=?", (closing_id, sid)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+
+__all__ = ["CashService", "CashPosition", "Closing"]
@@ -0,0 +1,94 @@
+# ==============================================================================
+# 💎 BALIKA ERP - ENCAISSEMENT DES DETTES (DebtService)
+# ------------------------------------------------------------------------------
+# Les règlements passent par balika.credit : imputation FIFO sur les dettes
+# ouvertes du client, historique debt_payments, soldes clients par triggers.
+# ==============================================================================
+from dataclasses import dataclass
+
+from balika.credit import AGING_BUCKETS, allocate_payment, shop_aging
+from balika.services.base import Service
+
+
+@dataclass(frozen=True)
+class DebtPayment:
+    debt_id: int
+    client: str
+    sale_ref: str
+    paid: float
+    balance: float   # solde restant après paiement
+    settled: bool
+
+
+@dataclass(frozen=True)
+class ClientPayment:
+    payment_id: int
+    client: str
+    paid: float                     # montant imputé (plafonné au solde dû)
+    balance: float                  # solde client restant
+    lines: tuple[DebtPayment, ...]  # factures touchées, plus ancienne d'abord
+
+
+@dataclass(frozen=True)
+class OpenDebt:
+    debt_id: int
+    sale_ref: str
+    balance: float
+    ts: str
+
+
+class DebtError(Exception):
+    pass
+
+
+class DebtService(Service):
+    def pay(self, sid: str, user: str, debt_id: int, amount: float) -> DebtPayment:
+        """Encaisse `amount` sur une dette ouverte de la boutique (plafonné au solde)."""
+        if amount <= 0:
+            raise DebtError("Montant nul")
+        with self.db.shop(sid).write() as conn:
+            # Solde relu sous le verrou d'écriture, pas celui affiché dans la page
+            row = conn.execute("SELECT cli FROM debts WHERE id=? AND sid=? AND status='OUVERT'", (debt_id, sid)).fetchone()
+            if row is None:
+                raise DebtError(f"Dette {debt_id} introuvable ou déjà soldée")
+            cli = row[0] or ""
+            _, paid, lines = allocate_payment(conn, sid, cli, amount, user, debt_id=debt_id)
+            self._enqueue(conn, "debt_payment", sid, {'client': cli, 'amount': paid, 'user': user, 'sale_ref': lines[0][1]})
+        d_id, ref, paid, rest = lines[0]
+        self._log(user, "DETTE", f"Paiement {paid:.2f}$ {cli} ({ref})", sid)
+        return DebtPayment(d_id, cli, ref, paid, rest, rest <= 0)
+
+    def pay_client(self, sid: str, user: str, client: str, amount: float) -> ClientPayment:
+        """Règlement d'un client réparti FIFO sur ses factures ouvertes, en une transaction."""
+        if amount <= 0:
+            raise DebtError("Montant nul")
+        with self.db.shop(sid).write() as conn:
+            payment_id, paid, lines = allocate_payment(conn, sid, client, amount, user)
+            if payment_id is None:
+                raise DebtError(f"Aucune dette ouverte pour {client}")
+            balance = conn.execute("SELECT balance FROM clients WHERE sid=? AND name=?", (sid, client)).fetchone()[0]
+            self._enqueue(conn, "debt_payment", sid, {'client': client, 'amount': paid, 'user': user})
+        self._log(user, "DETTE", f"Règlement {paid:.2f}$ {client} ({len(lines)} facture(s)) reste {balance:.2f}$", sid)
+        return ClientPayment(payment_id, client, paid, balance,
+                             tuple(DebtPayment(d, client, ref, p, rest, rest <= 0) for d, ref, p, rest in lines))
+
+    def open_debts(self, sid: str, client: str) -> list[OpenDebt]:
+        """Factures ouvertes du client, dans l'ordre d'imputation (plus ancienne d'abord)."""
+        with self.db.shop(sid).read() as conn:
+            rows = conn.execute("""SELECT id, sale_ref, balance, ts FROM debts
+                                   WHERE sid=? AND cli=? AND status='OUVERT' ORDER BY ts, id""", (sid, client)).fetchall()
+        return [OpenDebt(*r) for r in rows]
+
+    def payments(self, sid: str, client: str, limit: int = 20) -> list[tuple]:
+        """Derniers règlements du client : (id, montant, ts, utilisateur, factures touchées)."""
+        with self.db.shop(sid).read() as conn:
+            return conn.execute("""SELECT id, amount, ts, user, debts FROM debt_payments
+                                   WHERE sid=? AND cli=? ORDER BY id DESC LIMIT ?""", (sid, client, limit)).fetchall()
+
+    def aging(self, sid: str) -> dict[str, float]:
+        """Encours de la boutique par ancienneté (tranches AGING_BUCKETS)."""
+        with self.db.shop(sid).read() as conn:
+            return shop_aging(conn, sid)
+
+
+__all__ = ["DebtService", "DebtPayment", "ClientPayment", "OpenDebt", "DebtError", "AGING_BUCKETS"]
@@ -0,0 +1,87 @@
+# ==============================================================================
+# 💎 BALIKA ERP - ARTICLES ET RÉASSORTS (InventoryService)
+# ==============================================================================
+import sqlite3
+from dataclasses import dataclass
+
+from balika.dates import now_ts
+from balika.importer import ImportFileError, ImportReport, import_inventory, read_rows
+from balika.replenish import COVER_DAYS, REORDER_COLUMNS, WINDOW_DAYS, low_stock_count, reorder_list
+from balika.search import SEARCH_LIMIT, search_inventory
+from balika.services.base import Service
+
+
+@dataclass(frozen=True)
+class Article:
+    id: int
+    item: str
+    sell_price: float
+    qty: int
+    buy_price: float
+    category: str | None
+    barcode: str | None
+
+
+class BarcodeTaken(Exception):
+    pass
+
+
+class InventoryService(Service):
+    def search(self, sid: str, text: str, limit: int = SEARCH_LIMIT, in_stock: bool = True) -> dict[int, Article]:
+        """{inventory.id: Article} par pertinence (code-barres, début de nom, plein texte)."""
+        with self.db.shop(sid).read() as conn:
+            found = search_inventory(conn, sid, text, limit, in_stock)
+        return {i: Article(*row) for i, row in found.items()}
+
+    def restock(self, sid: str, user: str, item: str, category: str, qty: int,
+                buy_price: float, sell_price: float, barcode: str | None = None) -> None:
+        """Entrée en stock : crée l'article ou cumule la quantité d'une fiche existante."""
+        try:
+            with self.db.shop(sid).write() as conn:
+                conn.execute("""INSERT INTO inventory (item, category, qty, buy_price, sell_price, sid, barcode, last_restock)
+                                VALUES (?,?,?,?,?,?,?,?)
+                                ON CONFLICT(sid, item) DO UPDATE SET qty = qty + excluded.qty, category = excluded.category,
+                                buy_price = excluded.buy_price, sell_price = excluded.sell_price,
+                                barcode = COALESCE(excluded.barcode, barcode), last_restock = excluded.last_restock""",
+                             (item, category, qty, buy_price, sell_price, sid, barcode, now_ts()))
+        except sqlite3.IntegrityError:
+            # Seule contrainte restante après l'upsert : l'index unique (sid, barcode)
+            raise BarcodeTaken(barcode) from None
+        self._log(user, "STOCK", f"Entrée {item} x{qty}", sid)
+
+    def bulk_import(self, sid: str, user: str, fileobj, filename: str, mode: str = "add",
+                    progress=None) -> ImportReport:
+        """Import CSV/Excel en flux, par paquets (voir balika.importer) ; ImportFileError si illisible."""
+        report = import_inventory(self.db.shop(sid), sid, read_rows(fileobj, filename), mode, progress=progress)
+        self._log(user, "STOCK", f"Import {filename} ({mode}) : {report.created} créés, {report.updated} mis à jour, "
+                                 f"{len(report.rejected)} rejetés", sid)
+        return report
+
+    # --- RÉASSORT ----------------------------------------------------------------
+    def low_stock_count(self, sid: str) -> int:
+        """Articles au seuil (ensemble low_stock tenu par triggers)."""
+        with self.db.shop(sid).read() as conn:
+            return low_stock_count(conn, sid)
+
+    def reorder_list(self, sid: str, window: int = WINDOW_DAYS, cover_days: int = COVER_DAYS):
+        """DataFrame des articles à commander (voir balika.replenish.reorder_list)."""
+        with self.db.shop(sid).read() as conn:
+            return reorder_list(conn, sid, window=window, cover_days=cover_days)
+
+    def network_reorder(self, window: int = WINDOW_DAYS, cover_days: int = COVER_DAYS):
+        """Liste de réassort de tout le réseau : DataFrame (Boutique, ...) via db.fan_out."""
+        import pandas as pd
+
+        def per_base(db):
+            with db.read() as conn:
+                sids = [r[0] for r in conn.execute("SELECT sid FROM shops ORDER BY sid")]
+                return [reorder_list(conn, s, window=window, cover_days=cover_days).assign(Boutique=s) for s in sids]
+        parts = [df for part in self.db.fan_out(per_base) for df in part if not df.empty]
+        if not parts:
+            return pd.DataFrame(columns=["Boutique", *REORDER_COLUMNS])
+        df = pd.concat(parts, ignore_index=True)
+        return df[["Boutique", *REORDER_COLUMNS]].sort_values(["Couverture (j)", "À commander"], ascending=[True, False],
+                                                               na_position="last", ignore_index=True)
+
+
+__all__ = ["InventoryService", "Article", "BarcodeTaken", "ImportFileError", "ImportReport"]
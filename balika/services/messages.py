@@ -0,0 +1,95 @@
+# ==============================================================================
+# 💎 BALIKA ERP - MESSAGERIE INTERNE (MessageService)
+# ==============================================================================
+from dataclasses import dataclass
+
+from balika import messaging
+from balika.services.base import Service
+
+
+@dataclass(frozen=True)
+class Message:
+    id: int
+    sender: str
+    receiver: str
+    content: str
+    ts: str
+    read: bool
+
+
+class MessageError(Exception):
+    pass
+
+
+def _messages(rows):
+    return [Message(r[0], r[1], r[2], r[3], r[4], bool(r[5])) for r in rows]
+
+
+class MessageService(Service):
+    # --- DESTINATAIRES AUTORISÉS ------------------------------------------------------
+    def contacts(self, uid: str, role: str, sid: str) -> list[tuple[str, str]]:
+        """[(login, libellé)] : admin -> gérants actifs ; gérant -> admin + ses vendeurs ; vendeur -> son gérant."""
+        with self.db.catalog.read() as conn:
+            if role == "SUPER_ADMIN":
+                rows = conn.execute("""SELECT uid, COALESCE(name, uid) FROM users
+                                       WHERE role='GERANT' AND status='ACTIF' ORDER BY uid""").fetchall()
+            elif role == "GERANT":
+                rows = conn.execute("""SELECT uid, COALESCE(name, uid) FROM users
+                                       WHERE role='SUPER_ADMIN' OR (shop=? AND role='VENDEUR' AND status='ACTIF')
+                                       ORDER BY role != 'SUPER_ADMIN', uid""", (sid,)).fetchall()
+            else:
+                rows = conn.execute("""SELECT uid, COALESCE(name, uid) FROM users
+                                       WHERE shop=? AND role='GERANT' AND status='ACTIF' ORDER BY uid""", (sid,)).fetchall()
+        return [(u, n) for u, n in rows if u != uid]
+
+    # --- ENVOI --------------------------------------------------------------------------
+    def send(self, uid: str, role: str, sid: str, to: str, content: str) -> None:
+        """Message à un contact autorisé ; MessageError si destinataire interdit ou texte vide / trop long."""
+        content = _check(content)
+        if to not in {u for u, _ in self.contacts(uid, role, sid)}:
+            raise MessageError(f"destinataire non autorisé : {to}")
+        with self.db.catalog.write() as conn:
+            messaging.send(conn, uid, [to], content)
+
+    def broadcast(self, actor: str, content: str) -> int:
+        """Même message dans la boîte de chaque gérant actif : une seule transaction, un seul executemany."""
+        content = _check(content)
+        with self.db.catalog.write() as conn:
+            receivers = [r[0] for r in conn.execute("SELECT uid FROM users WHERE role='GERANT' AND status='ACTIF'")]
+            n = messaging.send(conn, actor, receivers, content)
+        self._log(actor, "BROADCAST", f"Messagerie : {n} gérant(s)", "SYSTEM")
+        return n
+
+    # --- BOÎTE DE RÉCEPTION ----------------------------------------------------------
+    def unread(self, uid: str) -> int:
+        with self.db.catalog.read() as conn:
+            return messaging.unread(conn, uid)
+
+    def recent(self, uid: str, limit: int = messaging.PAGE) -> list[Message]:
+        with self.db.catalog.read() as conn:
+            return _messages(messaging.recent(conn, uid, limit))
+
+    def since(self, uid: str, after: int, limit: int = messaging.PAGE) -> list[Message]:
+        """Nouveaux messages (id > after) : ce que le client n'a pas encore vu."""
+        with self.db.catalog.read() as conn:
+            return _messages(messaging.since(conn, uid, after, limit))
+
+    def sent(self, uid: str, limit: int = messaging.PAGE) -> list[Message]:
+        with self.db.catalog.read() as conn:
+            return _messages(messaging.sent(conn, uid, limit))
+
+    def mark_read(self, uid: str, upto: int) -> int:
+        with self.db.catalog.write() as conn:
+            return messaging.mark_read(conn, uid, upto)
+
+
+def _check(content):
+    content = (content or "").strip()
+    if not content:
+        raise MessageError("message vide")
+    if len(content) > messaging.MAX_LENGTH:
+        raise MessageError(f"message trop long (max {messaging.MAX_LENGTH} caractères)")
+    return content
+
+
+__all__ = ["MessageService", "Message", "MessageError"]
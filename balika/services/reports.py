@@ -0,0 +1,92 @@
+# ==============================================================================
+# 💎 BALIKA ERP - TABLEAUX DE BORD ET RAPPORTS (ReportService)
+# ------------------------------------------------------------------------------
+# Les tuiles lisent daily_shop_stats ; RAPPORTS lit les cubes de
+# balika.analytics (tables de faits hourly_sales / daily_item_sales), gardés
+# en cache par (boutique, période) et version des données. Les méthodes qui
+# renvoient un DataFrame importent pandas à l'appel, pas à l'import du module.
+# Les vues réseau (admin) interrogent chaque base boutique via db.fan_out.
+# Les grilles de ventes et d'audit lisent aussi les mois archivés de la période
+# (balika.archive) : *_bases() renvoie la base vivante suivie de ces mois.
+# ==============================================================================
+from dataclasses import dataclass
+
+from balika.analytics import Cubes, CubeCache, analyze, data_version
+from balika.services.base import Service
+from balika.stats import shop_totals
+
+
+def _pd():
+    import pandas as pd
+    return pd
+
+
+@dataclass(frozen=True)
+class ShopTotals:
+    revenue: float
+    profit: float
+    expenses: float
+    returns: float
+    sale_count: int
+    debt_opened: float
+    debt_settled: float
+
+
+@dataclass(frozen=True)
+class NetworkTotals:
+    revenue: float
+    profit: float
+    shops: int
+
+
+class ReportService(Service):
+    def __init__(self, db, audit=None, outbox=None, archive=None):
+        super().__init__(db, audit, outbox, archive)
+        self.cubes = CubeCache()
+
+    def shop_totals(self, sid: str, lo: str, hi: str) -> ShopTotals:
+        with self.db.shop(sid).read() as conn:
+            return ShopTotals(**shop_totals(conn, sid, lo, hi))
+
+    def network_totals(self) -> NetworkTotals:
+        def totals(db):
+            with db.read() as conn:
+                return conn.execute("SELECT SUM(revenue), SUM(profit) FROM daily_shop_stats").fetchone()
+        parts = self.db.fan_out(totals)
+        with self.db.catalog.read() as conn:
+            shops = conn.execute("SELECT COUNT(sid) FROM shops").fetchone()[0]
+        return NetworkTotals(sum(r or 0 for r, _ in parts), sum(p or 0 for _, p in parts), shops)
+
+    def revenue_by_shop(self):
+        """DataFrame (sid, CA)."""
+        def by_shop(db):
+            with db.read() as conn:
+                return conn.execute("SELECT sid, SUM(revenue) FROM daily_shop_stats GROUP BY sid").fetchall()
+        rows = [r for part in self.db.fan_out(by_shop) for r in part]
+        return _pd().DataFrame(rows, columns=["sid", "CA"])
+
+    def analytics(self, sid: str, lo: str, hi: str) -> Cubes:
+        """Cubes de la période [lo, hi) contre la précédente (balika.analytics), servis depuis le
+        cache tant que la version des données des deux fenêtres n'a pas changé."""
+        with self.db.shop(sid).read() as conn:
+            version = data_version(conn, sid, lo, hi)
+            return self.cubes.get((sid, lo[:10], hi[:10]), version, lambda: analyze(conn, sid, lo, hi))
+
+    def sales_bases(self, sid: str, lo: str, hi: str) -> list:
+        """Base de la boutique puis ses mois archivés qui recoupent [lo, hi) (grille des ventes)."""
+        db = self.db.shop(sid)
+        if self.archive is None:
+            return [db]
+        with db.read() as conn:
+            return [db, *self.archive.months(conn, lo, hi, sid)]
+
+    def audit_bases(self, lo: str, hi: str, sid: str | None = None) -> list:
+        """Toutes les bases puis les mois archivés (de `sid`, ou de toutes les boutiques) qui recoupent [lo, hi)."""
+        dbs = self.db.databases()
+        if self.archive is None:
+            return dbs
+        months = []
+        for db in dbs:
+            with db.read() as conn:
+                months += self.archive.months(conn, lo, hi, sid)
+        return [*dbs, *months]
@@ -0,0 +1,91 @@
+# ==============================================================================
+# 💎 BALIKA ERP - CAISSE, RETOURS ET SORTIES DE CAISSE (SalesService)
+# ==============================================================================
+from dataclasses import asdict, dataclass
+
+from balika.checkout import INVOICE_LINES, ReturnError, StockError, record_return, record_sale, returned
+from balika.dates import now_ts
+from balika.services.base import Service, fr_today
+
+
+@dataclass(frozen=True)
+class CartLine:
+    id: int | None   # inventory.id
+    item: str
+    q: int
+    p: float         # prix de vente unitaire USD
+    buy: float       # prix d'achat unitaire USD
+
+
+@dataclass(frozen=True)
+class SaleReceipt:
+    ref: str
+    sale_id: int
+    total_usd: float
+    profit: float
+    paid_usd: float
+    rest_usd: float
+    ts: str
+
+
+@dataclass(frozen=True)
+class ReturnLine:
+    item: str
+    qty: int           # quantité encore retournable
+    unit_price: float
+    inv_id: int | None
+
+
+class SalesService(Service):
+    def checkout(self, sid: str, seller: str, lines: list[CartLine], client: str,
+                 paid_usd: float, currency: str) -> SaleReceipt:
+        """Vente atomique (voir balika.checkout) ; StockError si le stock a bougé entre-temps."""
+        prefix = self.outbox.ref_prefix if self.outbox is not None else "B-"
+        with self.db.shop(sid).write() as conn:
+            sale = SaleReceipt(**record_sale(conn, sid, seller, [asdict(l) for l in lines], client, paid_usd, currency,
+                                             ref_prefix=prefix))
+            self._enqueue(conn, "sale", sid, {
+                'ref': sale.ref, 'seller': seller, 'client': client, 'paid_usd': paid_usd, 'currency': currency,
+                'lines': [{'item': l.item, 'q': l.q, 'p': l.p, 'buy': l.buy} for l in lines if l.q > 0]})
+        self._log(seller, "VENTE", f"{sale.ref} {client} {sale.total_usd:.2f}$ reste {sale.rest_usd:.2f}$", sid)
+        return sale
+
+    # --- RETOURS ---------------------------------------------------------------------
+    def _returnable(self, conn, sid, sale_ref):
+        lines = conn.execute(INVOICE_LINES, (sid, sale_ref)).fetchall()
+        if not lines and self.archive is not None:
+            # Facture d'un mois archivé : lignes lues dans la partition de ce mois
+            month = self.archive.locate(conn, sid, sale_ref)
+            if month is not None:
+                with month.read() as old:
+                    lines = old.execute(INVOICE_LINES, (sid, sale_ref)).fetchall()
+        deja = returned(conn, sid, sale_ref)
+        return lines, {it: ReturnLine(it, q - deja.get(it, 0), p, inv_id) for it, q, p, inv_id in lines}
+
+    def returnable(self, sid: str, sale_ref: str) -> dict[str, ReturnLine] | None:
+        """Articles encore retournables d'une facture ; None si la facture est introuvable."""
+        with self.db.shop(sid).read() as conn:
+            lines, items = self._returnable(conn, sid, sale_ref)
+        if not lines:
+            return None
+        return {it: l for it, l in items.items() if l.qty > 0}
+
+    def record_return(self, sid: str, user: str, sale_ref: str, item: str, qty: int) -> float:
+        """Enregistre le retour et réintègre le stock ; retourne le montant remboursé."""
+        with self.db.shop(sid).write() as conn:
+            # Revérifié sous le verrou d'écriture (voir balika.checkout.record_return)
+            refund = record_return(conn, sid, sale_ref, item, qty, self._returnable(conn, sid, sale_ref)[0])
+            self._enqueue(conn, "return", sid, {'sale_ref': sale_ref, 'item': item, 'qty': qty, 'user': user})
+        self._log(user, "RETOUR", f"{sale_ref} {item} x{qty}", sid)
+        return refund
+
+    # --- SORTIES DE CAISSE ----------------------------------------------------------
+    def record_expense(self, sid: str, user: str, label: str, amount: float) -> None:
+        with self.db.shop(sid).write() as conn:
+            conn.execute("INSERT INTO expenses (label, amount, date, sid, user, ts) VALUES (?,?,?,?,?,?)",
+                         (label, amount, fr_today(), sid, user, now_ts()))
+            self._enqueue(conn, "expense", sid, {'label': label, 'amount': amount, 'user': user})
+        self._log(user, "DÉPENSE", f"{label} {amount:.2f}$", sid)
+
+
+__all__ = ["SalesService", "CartLine", "SaleReceipt", "ReturnLine", "ReturnError", "StockError"]
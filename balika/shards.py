@@ -0,0 +1,251 @@
+# ==============================================================================
+# 💎 BALIKA ERP - PARTITIONNEMENT PAR BOUTIQUE (CATALOGUE + UN FICHIER PAR SID)
+# ------------------------------------------------------------------------------
+# SQLite n'a qu'un écrivain par fichier : avec une base unique, les caisses de
+# toutes les boutiques font la queue derrière le même verrou. Ici :
+# - le catalogue (users, shops, system_config, messagerie + audit SYSTEM) reste
+#   dans un fichier central ;
+# - les données d'une boutique (ventes, stock, dettes, dépenses, retours,
+#   audit, tables dérivées) vivent dans `<dossier>/<sid>.db`, chacun avec son
+#   propre écrivain ; deux boutiques n'attendent plus l'une l'autre.
+#
+# ShardRouter expose la même interface que Database (catalog, shop(sid),
+# databases(), fan_out) : les services routent par sid sans savoir quel mode
+# de stockage est actif. Chaque fichier boutique porte le schéma complet et
+# une copie de sa fiche shops (taux, en-tête...) lue par les triggers de caisse ;
+# la fiche de référence reste celle du catalogue (sync_shop après modification).
+#
+#   python -m balika.shards split balika_v650_master.db balika_catalog.db shards/
+# ==============================================================================
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from balika.db import Database
+from balika.schema import create_tables, migrate
+from balika.search import has_fts
+
+SYSTEM_SID = "SYSTEM"
+
+CATALOG_TABLES = ("users", "shops", "system_config", "messages", "message_unread")
+# Tables filtrées par sid, copiées dans le fichier de la boutique
+SHARD_TABLES = ("inventory", "sales", "sale_items", "returns", "debts", "expenses", "audit_logs",
+                "shop_counters", "daily_shop_stats", "cash_movements", "cash_closings",
+                "clients", "debt_payments", "debt_aging", "ingested", "sync_conflicts", "outbox", "low_stock",
+                "daily_item_sales", "hourly_sales", "archive_manifest", "archived_refs", "archived_returns")
+# Tables sans sid : suivent leur table parente (colonne, table parente)
+CHILD_TABLES = {"debt_payment_lines": ("payment_id", "debt_payments")}
+# Fiche boutique recopiée dans le fichier boutique (les soldes de clôture y sont tenus)
+SHOP_SETTINGS = ("name", "owner", "rate", "head", "addr", "tel", "rccm", "idnat", "currency_pref")
+
+DEFAULT_WORKERS = 8
+
+
+def shard_filename(sid):
+    """Nom de fichier sûr pour un sid ; suffixe haché si le sid a dû être nettoyé."""
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", sid)[:60].lstrip(".") or "_"
+    if safe == sid:
+        return f"{safe}.db"
+    return f"{safe}-{hashlib.sha1(sid.encode()).hexdigest()[:8]}.db"
+
+
+def init_database(db):
+    """Schéma complet + migrations, dans une transaction de l'écrivain."""
+    with db.write() as conn:
+        create_tables(conn.cursor())
+        migrate(conn)
+
+
+class ShardRouter:
+    """Catalogue central + un pool Database par boutique, ouvert à la demande."""
+
+    sharded = True
+
+    def __init__(self, catalog_path, shard_dir, readers=2, telemetry=None, workers=DEFAULT_WORKERS):
+        self.shard_dir = shard_dir
+        self.readers = readers
+        self.telemetry = telemetry
+        self.workers = workers
+        os.makedirs(shard_dir, exist_ok=True)
+        self.catalog = Database(catalog_path, telemetry=telemetry)
+        init_database(self.catalog)
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    # --- ROUTAGE ---------------------------------------------------------------
+    def shop(self, sid):
+        """Base de la boutique `sid` (créée et migrée à la première ouverture) ;
+        SYSTEM ou sid vide -> catalogue."""
+        if not sid or sid == SYSTEM_SID:
+            return self.catalog
+        db = self._shards.get(sid)
+        if db is None:
+            with self._lock:
+                db = self._shards.get(sid)
+                if db is None:
+                    db = Database(os.path.join(self.shard_dir, shard_filename(sid)), self.readers, self.telemetry)
+                    init_database(db)
+                    self._sync(sid, db)
+                    self._shards[sid] = db
+        return db
+
+    def shop_ids(self):
+        with self.catalog.read() as conn:
+            return [r[0] for r in conn.execute("SELECT sid FROM shops ORDER BY sid")]
+
+    def databases(self):
+        """Catalogue puis une base par boutique du catalogue."""
+        return [self.catalog, *(self.shop(s) for s in self.shop_ids())]
+
+    def fan_out(self, fn):
+        """fn(base) sur chaque base boutique, en parallèle (threads) ; résultats dans l'ordre des sid."""
+        shards = [self.shop(s) for s in self.shop_ids()]
+        if len(shards) <= 1:
+            return [fn(db) for db in shards]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="balika-shard")
+        return list(self._pool.map(fn, shards))
+
+    # --- FICHE BOUTIQUE ----------------------------------------------------------
+    def sync_shop(self, sid):
+        """Recopie la fiche du catalogue dans le fichier boutique (après RÉGLAGES)."""
+        db = self._shards.get(sid)
+        if db is not None:
+            self._sync(sid, db)
+
+    def _sync(self, sid, db):
+        cols = ", ".join(SHOP_SETTINGS)
+        with self.catalog.read() as conn:
+            row = conn.execute(f"SELECT {cols} FROM shops WHERE sid=?", (sid,)).fetchone()
+        with db.write() as conn:
+            if row is None:
+                conn.execute("INSERT OR IGNORE INTO shops (sid, name) VALUES (?,?)", (sid, sid))
+            else:
+                conn.execute(f"""INSERT INTO shops (sid, {cols}) VALUES (?{', ?' * len(SHOP_SETTINGS)})
+                                 ON CONFLICT(sid) DO UPDATE SET {', '.join(f'{c}=excluded.{c}' for c in SHOP_SETTINGS)}""",
+                             (sid, *row))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+        for db in self._shards.values():
+            db.close()
+        self.catalog.close()
+
+
+# ------------------------------------------------------------------------------
+# DÉCOUPAGE D'UNE BASE UNIQUE EXISTANTE
+# ------------------------------------------------------------------------------
+def _copy(conn, table, where="", params=()):
+    """INSERT ... SELECT de src.table vers main.table sur les colonnes communes."""
+    src = {r[1] for r in conn.execute(f"PRAGMA src.table_info({table})")}
+    cols = [r[1] for r in conn.execute(f"PRAGMA main.table_info({table})") if r[1] in src]
+    if not cols:
+        return 0
+    col_list = ", ".join(cols)
+    return conn.execute(f"INSERT INTO main.{table} ({col_list}) SELECT {col_list} FROM src.{table}"
+                        + (f" WHERE {where}" if where else ""), params).rowcount
+
+
+def _fill(path, master, copy_rows):
+    """Crée `path` (schéma complet), y attache le master et copie les lignes
+    triggers suspendus : les tables dérivées sont copiées telles quelles."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        create_tables(conn.cursor())
+        migrate(conn)
+        conn.execute("COMMIT")
+        conn.execute("ATTACH DATABASE ? AS src", (master,))
+        conn.execute("BEGIN IMMEDIATE")
+        triggers = conn.execute("SELECT name, sql FROM main.sqlite_master WHERE type='trigger'").fetchall()
+        for name, _ in triggers:
+            conn.execute(f"DROP TRIGGER main.{name}")
+        counts = copy_rows(conn)
+        for _, sql in triggers:
+            conn.execute(sql)
+        if has_fts(conn):
+            conn.execute("INSERT INTO inventory_fts (inventory_fts) VALUES ('rebuild')")
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE src")
+        return counts
+    finally:
+        conn.close()
+
+
+def split(master, catalog_path, shard_dir, progress=print):
+    """Répartit une base unique en catalogue + un fichier par boutique.
+
+    Le master est d'abord mis à niveau (migrations) puis seulement lu. Retourne
+    {table: (lignes master, lignes copiées)} ; les deux doivent être égaux.
+    """
+    if os.path.exists(catalog_path):
+        raise FileExistsError(catalog_path)
+    os.makedirs(shard_dir, exist_ok=True)
+    conn = sqlite3.connect(master, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        create_tables(conn.cursor())
+        migrate(conn)
+        conn.execute("COMMIT")
+        sids = sorted({r[0] for t in SHARD_TABLES if t != "audit_logs"
+                       for r in conn.execute(f"SELECT DISTINCT sid FROM {t} WHERE sid IS NOT NULL AND sid != ?", (SYSTEM_SID,))}
+                      | {r[0] for r in conn.execute("SELECT sid FROM shops")})
+        expected = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                    for t in (*CATALOG_TABLES, *SHARD_TABLES, *CHILD_TABLES)}
+        with_sid = {r[0] for r in conn.execute("SELECT m.name FROM sqlite_master m, pragma_table_info(m.name) p "
+                                               "WHERE m.type='table' AND p.name='sid'")}
+    finally:
+        conn.close()
+    for table in sorted(with_sid - set(SHARD_TABLES) - set(CATALOG_TABLES)):
+        progress(f"⚠️ table {table} (colonne sid) non répartie : ajoutez-la à SHARD_TABLES")
+
+    copied = dict.fromkeys(expected, 0)
+
+    def catalog_rows(c):
+        for t in CATALOG_TABLES:
+            copied[t] += _copy(c, t)
+        # Audit hors boutique (SYSTEM, sid vide ou inconnu) : reste central
+        c.execute("CREATE TEMP TABLE shard_sids (sid TEXT PRIMARY KEY)")
+        c.executemany("INSERT INTO shard_sids VALUES (?)", [(s,) for s in sids])
+        copied["audit_logs"] += _copy(c, "audit_logs", "sid IS NULL OR sid NOT IN (SELECT sid FROM temp.shard_sids)")
+
+    _fill(catalog_path, master, catalog_rows)
+    progress(f"Catalogue : {catalog_path}")
+
+    for n, sid in enumerate(sids, 1):
+        def shard_rows(c, sid=sid):
+            _copy(c, "shops", "sid=?", (sid,))
+            for t in SHARD_TABLES:
+                copied[t] += _copy(c, t, "sid=?", (sid,))
+            for t, (col, parent) in CHILD_TABLES.items():
+                copied[t] += _copy(c, t, f"{col} IN (SELECT id FROM main.{parent})")
+
+        _fill(os.path.join(shard_dir, shard_filename(sid)), master, shard_rows)
+        progress(f"[{n}/{len(sids)}] {sid}")
+    return {t: (expected[t], copied[t]) for t in expected}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 4 or argv[0] != "split":
+        print("usage: python -m balika.shards split <master.db> <catalogue.db> <dossier_boutiques>")
+        return 2
+    _, master, catalog_path, shard_dir = argv
+    report = split(master, catalog_path, shard_dir)
+    bad = {t: v for t, v in report.items() if v[0] != v[1]}
+    for t, (want, got) in sorted(bad.items()):
+        print(f"❌ {t} : {want} lignes dans le master, {got} copiées")
+    if not bad:
+        print(f"✅ {sum(v[1] for v in report.values()):,} lignes réparties, comptes identiques au master.")
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
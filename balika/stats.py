@@ -0,0 +1,121 @@
+# ==============================================================================
+# 💎 BALIKA ERP - AGRÉGATS JOURNALIERS PAR BOUTIQUE (daily_shop_stats)
+# ------------------------------------------------------------------------------
+# Une ligne par (boutique, jour), tenue à jour par des triggers dans la même
+# transaction que la vente, la dépense, le retour ou le paiement de dette.
+# Les tableaux de bord lisent quelques centaines de lignes au lieu de `sales`.
+#
+#   python -m balika.stats rebuild balika_v650_master.db
+# ==============================================================================
+import sys
+
+from balika.archive import live_days
+
+STATS_COLUMNS = ("revenue", "profit", "expenses", "returns", "sale_count", "debt_opened", "debt_settled")
+
+CREATE_TABLE = """CREATE TABLE IF NOT EXISTS daily_shop_stats (
+    sid TEXT NOT NULL, day TEXT NOT NULL,
+    revenue REAL NOT NULL DEFAULT 0, profit REAL NOT NULL DEFAULT 0,
+    expenses REAL NOT NULL DEFAULT 0, returns REAL NOT NULL DEFAULT 0,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    debt_opened REAL NOT NULL DEFAULT 0, debt_settled REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (sid, day)) WITHOUT ROWID"""
+
+
+def _bump(sid, day, **deltas):
+    cols = ", ".join(deltas)
+    vals = ", ".join(deltas.values())
+    sets = ", ".join(f"{c} = {c} + excluded.{c}" for c in deltas)
+    return (f"INSERT INTO daily_shop_stats (sid, day, {cols}) VALUES ({sid}, {day}, {vals}) "
+            f"ON CONFLICT(sid, day) DO UPDATE SET {sets};")
+
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+
+TRIGGERS = {
+    "trg_stats_sales": f"""CREATE TRIGGER IF NOT EXISTS trg_stats_sales AFTER INSERT ON sales
+        BEGIN {_bump("NEW.sid", f"substr(COALESCE(NEW.ts, {_NOW}), 1, 10)",
+                     revenue="COALESCE(NEW.total_usd, 0)", profit="COALESCE(NEW.profit, 0)", sale_count="1")} END""",
+    "trg_stats_expenses": f"""CREATE TRIGGER IF NOT EXISTS trg_stats_expenses AFTER INSERT ON expenses
+        BEGIN {_bump("NEW.sid", f"substr(COALESCE(NEW.ts, {_NOW}), 1, 10)",
+                     expenses="COALESCE(NEW.amount, 0)")} END""",
+    "trg_stats_returns": f"""CREATE TRIGGER IF NOT EXISTS trg_stats_returns AFTER INSERT ON returns
+        BEGIN {_bump("NEW.sid", f"substr(COALESCE(NEW.ts, {_NOW}), 1, 10)",
+                     returns="COALESCE(NEW.refund_amount, 0)")} END""",
+    "trg_stats_debts_open": f"""CREATE TRIGGER IF NOT EXISTS trg_stats_debts_open AFTER INSERT ON debts
+        BEGIN {_bump("NEW.sid", f"substr(COALESCE(NEW.ts, {_NOW}), 1, 10)",
+                     debt_opened="COALESCE(NEW.balance, 0)")} END""",
+    "trg_stats_debts_paid": f"""CREATE TRIGGER IF NOT EXISTS trg_stats_debts_paid AFTER UPDATE OF balance ON debts
+        WHEN NEW.balance < OLD.balance
+        BEGIN {_bump("NEW.sid", f"substr(COALESCE(NEW.updated_ts, {_NOW}), 1, 10)",
+                     debt_settled="OLD.balance - NEW.balance")} END""",
+}
+
+
+def install(conn):
+    conn.execute(CREATE_TABLE)
+    for ddl in TRIGGERS.values():
+        conn.execute(ddl)
+
+
+def rebuild_daily_stats(conn):
+    """Recalcule toute la table depuis l'historique ; retourne le nombre de lignes.
+
+    Le solde initial d'une dette est repris de sales.rest_usd (la colonne
+    debts.balance est écrasée à chaque paiement) ; le montant déjà réglé est
+    daté du dernier paiement connu (updated_ts). Les jours des mois archivés
+    (balika.archive) sont gardés tels quels : leurs ventes ne sont plus en ligne.
+    """
+    conn.execute(f"DELETE FROM daily_shop_stats WHERE {live_days(conn, 'daily_shop_stats.sid', 'daily_shop_stats.day')}")
+    conn.execute(f"""INSERT INTO daily_shop_stats (sid, day, revenue, profit, expenses, returns,
+                                                  sale_count, debt_opened, debt_settled)
+        SELECT sid, day, SUM(rev), SUM(pro), SUM(exp), SUM(ret), SUM(cnt), SUM(dop), SUM(dset) FROM (
+            SELECT sid, substr(ts, 1, 10) AS day, COALESCE(total_usd, 0) AS rev, COALESCE(profit, 0) AS pro,
+                   0 AS exp, 0 AS ret, 1 AS cnt, 0 AS dop, 0 AS dset
+              FROM sales WHERE ts IS NOT NULL
+            UNION ALL
+            SELECT sid, substr(ts, 1, 10), 0, 0, COALESCE(amount, 0), 0, 0, 0, 0
+              FROM expenses WHERE ts IS NOT NULL
+            UNION ALL
+            SELECT sid, substr(ts, 1, 10), 0, 0, 0, COALESCE(refund_amount, 0), 0, 0, 0
+              FROM returns WHERE ts IS NOT NULL
+            UNION ALL
+            SELECT d.sid, substr(d.ts, 1, 10), 0, 0, 0, 0, 0,
+                   COALESCE((SELECT s.rest_usd FROM sales s WHERE s.sid = d.sid AND s.ref = d.sale_ref), d.balance), 0
+              FROM debts d WHERE d.ts IS NOT NULL
+            UNION ALL
+            SELECT d.sid, substr(COALESCE(d.updated_ts, d.ts), 1, 10), 0, 0, 0, 0, 0, 0,
+                   COALESCE((SELECT s.rest_usd FROM sales s WHERE s.sid = d.sid AND s.ref = d.sale_ref), d.balance) - d.balance
+              FROM debts d WHERE d.ts IS NOT NULL
+        ) AS u WHERE {live_days(conn, "u.sid", "u.day")} GROUP BY sid, day""")
+    return conn.execute("SELECT COUNT(*) FROM daily_shop_stats").fetchone()[0]
+
+
+def shop_totals(conn, sid, lo, hi):
+    """Totaux d'une boutique sur [lo, hi) (jours ISO) ; dict colonne -> valeur."""
+    row = conn.execute(f"SELECT {', '.join(f'SUM({c})' for c in STATS_COLUMNS)} FROM daily_shop_stats "
+                       "WHERE sid=? AND day >= ? AND day < ?", (sid, lo[:10], hi[:10])).fetchone()
+    return {c: (v or 0) for c, v in zip(STATS_COLUMNS, row)}
+
+
+def main(argv=None):
+    import sqlite3
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] != "rebuild":
+        print("usage: python -m balika.stats rebuild <fichier.db>")
+        return 2
+    conn = sqlite3.connect(argv[1], isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        install(conn)
+        n = rebuild_daily_stats(conn)
+        conn.execute("COMMIT")
+        print(f"daily_shop_stats reconstruite : {n} lignes (boutique, jour).")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+# ==============================================================================
+# 💎 BALIKA ERP - TÉLÉMÉTRIE DE PERFORMANCE (PAGES, REQUÊTES SQL, LENTEURS)
+# ------------------------------------------------------------------------------
+# - page(nom) : chronomètre une branche de navigation (issue : ok, rerun, stop,
+#   erreur) ; chaque exécution du script = un rerun compté pour la page. Une
+#   page imbriquée (fragment) est comptée à part et rend la main à l'englobante.
+# - TimedConnection / TimedCursor : durée de chaque requête (execute + fetch)
+#   et travail SQLite mesuré en instructions VM via le progress handler
+#   (≈ lignes parcourues : un SCAN en consomme des milliers, un index quelques
+#   dizaines). Le trace callback de sqlite3 ne donne que le texte SQL, pas la
+#   durée : la mesure se fait donc autour des appels du curseur.
+# - journal des requêtes lentes (logger "balika.slow") au-delà de slow_ms.
+# - tout est en mémoire (fenêtres glissantes bornées), par processus.
+#
+# BALIKA_TELEMETRY=0 : connexions sqlite3 ordinaires, page() ne fait rien.
+# BALIKA_SLOW_MS=200 : seuil du journal des requêtes lentes.
+# ==============================================================================
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from time import perf_counter
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+VM_TICK = 1000          # le progress handler est appelé toutes les VM_TICK instructions
+WINDOW = 1000           # échantillons conservés par page / par requête
+SLOW_KEEP = 200         # dernières requêtes lentes gardées pour la page admin
+DRAIN_EVERY = 512       # mesures brutes accumulées avant agrégation
+NO_PAGE = "—"           # requêtes hors page (démarrage, écrivain d'audit, outils)
+
+slow_log = logging.getLogger("balika.slow")
+
+_SPACES = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+@lru_cache(maxsize=4096)
+def normalize(sql):
+    """Forme canonique d'une requête : espaces réduits, listes IN (?,?,…) fusionnées."""
+    return _IN_LIST.sub("(?,…)", _SPACES.sub(" ", sql).strip())
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+class _Stat:
+    __slots__ = ("count", "total_ms", "max_ms", "steps", "recent", "outcomes")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.steps = 0
+        self.recent = deque(maxlen=WINDOW)
+        self.outcomes = {}
+
+    def add(self, ms, steps=0):
+        self.count += 1
+        self.total_ms += ms
+        self.steps += steps
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.recent.append(ms)
+
+    def summary(self):
+        ms = sorted(self.recent)
+        return {'count': self.count, 'total_ms': self.total_ms, 'mean_ms': self.total_ms / self.count if self.count else 0.0,
+                'p50_ms': percentile(ms, 50), 'p95_ms': percentile(ms, 95), 'p99_ms': percentile(ms, 99),
+                'max_ms': self.max_ms, 'vm_steps': self.steps / self.count if self.count else 0.0}
+
+
+class _Local(threading.local):
+    page = NO_PAGE
+
+
+class Telemetry:
+    def __init__(self, enabled=True, slow_ms=200.0):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._local = _Local()
+        self._raw = deque()
+        self._pages = {}
+        self._queries = {}
+        self.slow = deque(maxlen=SLOW_KEEP)
+
+    @classmethod
+    def from_env(cls):
+        return cls(enabled=os.environ.get("BALIKA_TELEMETRY", "1") != "0",
+                   slow_ms=float(os.environ.get("BALIKA_SLOW_MS", "200")))
+
+    # --- PAGES -------------------------------------------------------------------
+    @contextmanager
+    def page(self, name):
+        if not self.enabled:
+            yield
+            return
+        outer, self._local.page = self._local.page, name
+        outcome = "ok"
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            # st.rerun() / st.stop() passent par des exceptions de contrôle
+            kind = type(e).__name__
+            outcome = "rerun" if "Rerun" in kind else "stop" if "Stop" in kind else "erreur"
+            raise
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self._local.page = outer
+            with self._lock:
+                stat = self._pages.get(name) or self._pages.setdefault(name, _Stat())
+                stat.add(ms)
+                stat.outcomes[outcome] = stat.outcomes.get(outcome, 0) + 1
+
+    # --- REQUÊTES ------------------------------------------------------------------
+    def record_query(self, sql, ms, steps):
+        # Chemin chaud : un simple append (atomique sous le GIL), agrégation différée par lots
+        self._raw.append((self._local.page, sql, ms, steps))
+        if ms >= self.slow_ms:
+            self.slow.append((time.time(), self._local.page, normalize(sql), ms, steps))
+            slow_log.warning("%.1f ms, ~%d instructions VM [%s] %s", ms, steps, self._local.page, normalize(sql))
+        if len(self._raw) >= DRAIN_EVERY:
+            self._drain()
+
+    def _drain(self):
+        with self._lock:
+            raw, queries = self._raw, self._queries
+            while raw:
+                try:
+                    page, sql, ms, steps = raw.popleft()
+                except IndexError:
+                    break
+                key = (page, normalize(sql))
+                stat = queries.get(key) or queries.setdefault(key, _Stat())
+                stat.add(ms, steps)
+
+    # --- LECTURE DES MESURES ----------------------------------------------------------
+    def page_stats(self):
+        with self._lock:
+            return {name: {**s.summary(), 'outcomes': dict(s.outcomes)} for name, s in self._pages.items()}
+
+    def query_stats(self, top=20, by="total_ms"):
+        self._drain()
+        with self._lock:
+            rows = [{'page': page, 'sql': sql, **s.summary()} for (page, sql), s in self._queries.items()]
+        return sorted(rows, key=lambda r: r[by], reverse=True)[:top]
+
+    def slow_queries(self):
+        return list(self.slow)[::-1]
+
+    def reset(self):
+        with self._lock:
+            self._raw.clear()
+            self._pages.clear()
+            self._queries.clear()
+            self.slow.clear()
+            self.started = time.time()
+
+
+# ------------------------------------------------------------------------------
+# CONNEXION INSTRUMENTÉE (sqlite3.connect(..., factory=TimedConnection))
+# ------------------------------------------------------------------------------
+class TimedCursor(sqlite3.Cursor):
+    """Cumule la durée execute + fetch d'une requête ; publiée à la fin du curseur."""
+
+    _sql = None
+
+    def _finish(self):
+        if self._sql is not None:
+            conn = self.connection
+            conn.telemetry.record_query(self._sql, self._ms, (conn.ticks - self._tick0) * VM_TICK)
+            self._sql = None
+
+    def execute(self, sql, parameters=()):
+        if self._sql is not None:
+            self._finish()
+        self._sql, self._tick0 = sql, self.connection.ticks
+        t0 = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._ms = (perf_counter() - t0) * 1000
+
+    def executemany(self, sql, seq_of_parameters):
+        if self._sql is not None:
+            self._finish()
+        self._sql, self._tick0 = sql, self.connection.ticks
+        t0 = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._ms = (perf_counter() - t0) * 1000
+
+    def fetchone(self):
+        t0 = perf_counter()
+        row = super().fetchone()
+        if self._sql is not None:
+            self._ms += (perf_counter() - t0) * 1000
+            if row is None:
+                self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = perf_counter()
+        rows = super().fetchmany(size if size is not None else self.arraysize)
+        if self._sql is not None:
+            self._ms += (perf_counter() - t0) * 1000
+        return rows
+
+    def fetchall(self):
+        t0 = perf_counter()
+        rows = super().fetchall()
+        if self._sql is not None:
+            self._ms += (perf_counter() - t0) * 1000
+            self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connexion dont tous les curseurs (y compris conn.execute) sont chronométrés."""
+
+    telemetry = None
+    ticks = 0
+
+    def _tick(self):
+        self.ticks += 1
+        return 0
+
+    def attach(self, telemetry):
+        self.telemetry = telemetry
+        self.set_progress_handler(self._tick, VM_TICK)
+        return self
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute() n'appelle pas self.cursor() : raccourcis redéfinis
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,173 @@
+# ==============================================================================
+# 💎 BALIKA ERP - RAPPORTS : CUBES D'ANALYSE SUR DES MILLIONS DE LIGNES
+# ------------------------------------------------------------------------------
+# Une boutique avec --lines lignes de vente sur --days jours (chargées triggers
+# suspendus, comme une base existante, puis tables de faits reconstruites comme
+# par la migration 15). Pour des fenêtres de 30 jours et --days jours :
+#   - calcul naïf : lignes sales x sale_items x inventory chargées en pandas
+#     puis group-by (catégorie, vendeur, heure, totaux) ;
+#   - moteur (ReportService.analytics) : premier appel (lecture des faits et
+#     calcul de tous les cubes) puis appel suivant servi par le cache ;
+# contrôle : mêmes CA et marges par catégorie, vendeur et heure que le calcul
+# naïf ; une vente enregistrée ensuite change la version et reconstruit.
+#
+#   python bench/bench_analytics.py --lines 2000000 --days 365
+# ==============================================================================
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.analytics import rebuild_hourly_sales  # noqa: E402
+from balika.checkout import record_sale  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.dates import day_bounds  # noqa: E402
+from balika.replenish import rebuild_item_sales  # noqa: E402
+from balika.services import Services  # noqa: E402
+from balika.shards import init_database  # noqa: E402
+from balika.stats import rebuild_daily_stats  # noqa: E402
+
+SID = "shop0"
+CHUNK = 50_000
+VIEWS = ("summary", "by_day", "by_weekday", "by_hour", "by_seller", "by_category", "products")
+
+
+def seed(db, lines, days, skus, sellers, rnd):
+    with db.write() as conn:
+        conn.execute("INSERT INTO shops (sid, name) VALUES (?,?)", (SID, "BOUTIQUE"))
+        conn.executemany("INSERT INTO inventory (id, item, category, qty, buy_price, sell_price, sid) VALUES (?,?,?,?,?,?,?)",
+                         [(i, f"ARTICLE {i:05d}", f"CAT {i % 25:02d}", 10 ** 6, round(1 + (i % 17) * 0.5, 2),
+                           round(1.5 + (i % 17) * 0.8, 2), SID) for i in range(1, skus + 1)])
+        prices = {i: (f"ARTICLE {i:05d}", round(1.5 + (i % 17) * 0.8, 2), round(1 + (i % 17) * 0.5, 2))
+                  for i in range(1, skus + 1)}
+        triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger'").fetchall()
+        for name, _ in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+    start = date.today() - timedelta(days=days - 1)
+    cum, acc = [], 0.0
+    for k in range(1, skus + 1):
+        acc += 1.0 / k ** 0.8
+        cum.append(acc)
+    sale_id, done = 0, 0
+    while done < lines:
+        sales, items = [], []
+        while len(items) < CHUNK and done + len(items) < lines:
+            sale_id += 1
+            ts = datetime.combine(start + timedelta(days=rnd.randrange(days)), datetime.min.time()) \
+                + timedelta(seconds=rnd.randint(7 * 3600, 21 * 3600))
+            picked = set(rnd.choices(range(1, skus + 1), cum_weights=cum, k=rnd.randint(1, 4)))
+            total = cost = 0.0
+            for i in picked:
+                q = rnd.randint(1, 3)
+                item, p, b = prices[i]
+                items.append((sale_id, i, item, q, p, b, SID))
+                total += q * p
+                cost += q * b
+            sales.append((sale_id, f"B-{sale_id:07d}", "COMPTANT", total, total, 0.0, ts.strftime("%d/%m/%Y"),
+                          ts.strftime("%H:%M"), f"vendeur{rnd.randrange(sellers)}", SID, "USD", total - cost,
+                          ts.strftime("%Y-%m-%dT%H:%M:%S")))
+        with db.write() as conn:
+            conn.executemany("""INSERT INTO sales (id, ref, cli, total_usd, paid_usd, rest_usd, date, time, seller, sid,
+                                                   currency, profit, ts) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""", sales)
+            conn.executemany("""INSERT INTO sale_items (sale_id, inv_id, item, qty, unit_price, buy_price, sid)
+                                VALUES (?,?,?,?,?,?,?)""", items)
+        done += len(items)
+    t = time.perf_counter()
+    with db.write() as conn:
+        for _, sql in triggers:
+            conn.execute(sql)
+        rebuild_daily_stats(conn)
+        rebuild_item_sales(conn)
+        rebuild_hourly_sales(conn)
+    return sale_id, time.perf_counter() - t
+
+
+def naive(conn, lo, hi):
+    import pandas as pd
+    df = pd.read_sql("""SELECT s.ts, s.seller, si.qty, si.unit_price, si.buy_price, COALESCE(i.category, 'GÉNÉRAL') AS category
+                        FROM sales s JOIN sale_items si ON si.sale_id = s.id LEFT JOIN inventory i ON i.id = si.inv_id
+                        WHERE s.sid=? AND s.ts >= ? AND s.ts < ?""", conn, params=(SID, lo, hi))
+    df["ca"] = df["qty"] * df["unit_price"]
+    df["marge"] = df["ca"] - df["qty"] * df["buy_price"]
+    df["hour"] = df["ts"].str[11:13].astype(int)
+    return {"catégorie": df.groupby("category")[["ca", "marge"]].sum(),
+            "vendeur": df.groupby("seller")[["ca", "marge"]].sum(),
+            "heure": df.groupby("hour")[["ca", "marge"]].sum(),
+            "total": (df["ca"].sum(), df["marge"].sum())}
+
+
+def same(engine, ref):
+    def close(a, b):
+        return abs(a - b) <= 0.01 + 1e-9 * abs(b)
+    cat = engine.by_category.set_index("Catégorie")
+    sel = engine.by_seller.set_index("Vendeur")
+    hour = engine.by_hour.assign(h=engine.by_hour["Heure"].str[:2].astype(int)).set_index("h")
+    return (all(close(cat.loc[k, "CA"], r.ca) and close(cat.loc[k, "Marge"], r.marge) for k, r in ref["catégorie"].iterrows())
+            and all(close(sel.loc[k, "CA"], r.ca) and close(sel.loc[k, "Marge"], r.marge) for k, r in ref["vendeur"].iterrows())
+            and all(close(hour.loc[k, "CA"], r.ca) for k, r in ref["heure"].iterrows())
+            and close(engine.summary.iloc[0]["Période"], ref["total"][0]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="RAPPORTS : cubes d'analyse sur des millions de lignes")
+    ap.add_argument("--lines", type=int, default=2_000_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--skus", type=int, default=5000)
+    ap.add_argument("--sellers", type=int, default=8)
+    args = ap.parse_args()
+    rnd = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        init_database(db)
+        t = time.perf_counter()
+        n_sales, t_rebuild = seed(db, args.lines, args.days, args.skus, args.sellers, rnd)
+        print(f"Base : {args.lines:,} lignes, {n_sales:,} ventes sur {args.days} jours en {time.perf_counter() - t:.0f} s "
+              f"(dont tables de faits reconstruites en {t_rebuild:.1f} s)")
+        svc = Services.build(db)
+        ok = True
+        print(f"{'fenêtre':>8} {'naïf':>9} {'moteur':>9} {'cache':>9} {'lignes':>10}")
+        for window in (30, args.days):
+            lo, hi = day_bounds(date.today() - timedelta(days=window - 1), date.today())
+            with db.read() as conn:
+                t = time.perf_counter()
+                ref = naive(conn, lo, hi)
+                t_naive = time.perf_counter() - t
+                n_lines = conn.execute("SELECT COUNT(*) FROM sales s JOIN sale_items si ON si.sale_id = s.id "
+                                       "WHERE s.sid=? AND s.ts >= ? AND s.ts < ?", (SID, lo, hi)).fetchone()[0]
+            t = time.perf_counter()
+            cubes = svc.reports.analytics(SID, lo, hi)
+            for view in VIEWS:                  # tous les cubes calculés, comme après un tour des graphiques
+                getattr(cubes, view)
+            t_cold = time.perf_counter() - t
+            t = time.perf_counter()
+            again = svc.reports.analytics(SID, lo, hi)
+            t_hit = time.perf_counter() - t
+            good = same(cubes, ref) and again is cubes
+            ok &= good
+            print(f"{window:>7}j {t_naive * 1000:>7.0f}ms {t_cold * 1000:>7.0f}ms {t_hit * 1000:>7.2f}ms {n_lines:>10,} "
+                  f"{'✅' if good else '❌'}")
+
+        # Une vente dans la période change la version : cubes reconstruits, CA augmenté d'autant
+        lo, hi = day_bounds(date.today() - timedelta(days=29), date.today())
+        before = svc.reports.analytics(SID, lo, hi)
+        with db.write() as conn:
+            sale = record_sale(conn, SID, "vendeur0", [{'id': 1, 'item': "ARTICLE 00001", 'q': 2, 'p': 10.0, 'buy': 4.0}],
+                               "COMPTANT", 20.0, "USD")
+        after = svc.reports.analytics(SID, lo, hi)
+        fresh = after is not before and abs(after.summary.iloc[0]["Période"] - before.summary.iloc[0]["Période"]
+                                            - sale['total_usd']) < 0.01
+        print(f"  {'✅' if fresh else '❌'} nouvelle vente : cache invalidé, CA +{sale['total_usd']:.2f} $ "
+              f"(cache : {svc.reports.cubes.hits} succès, {svc.reports.cubes.misses} reconstructions)")
+        ok &= fresh
+        db.close()
+        print("✅ Cubes cohérents." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# ==============================================================================
+# 💎 BALIKA ERP - ARCHIVAGE DES MOIS CLOS : TAILLE ET LATENCES AVANT / APRÈS
+# ------------------------------------------------------------------------------
+# Une boutique avec --months mois d'historique à --sales ventes/jour (retours
+# sur ~3 % des factures, une ligne d'audit par opération). Avant puis après
+# archive_closed(keep=--keep) + VACUUM :
+#   - taille de la base vivante et durée d'un instantané (balika.backup) ;
+#   - latences : page de la grille des ventes (30 derniers jours), facture
+#     récente dans RETOURS, journal d'audit (7 jours), comptage complet de
+#     sales ; puis facture archivée (première ouverture du mois et suivantes)
+#     et grille sur un mois archivé.
+# Contrôles : lignes en ligne + archivées = lignes d'origine ; mêmes pages de
+# grille et même facture retournable qu'avant ; toutes les pages de la grille des
+# ventes et du journal d'audit (bases vivante + archivées, tout l'historique)
+# redonnent les lignes de la base d'origine ; tables dérivées inchangées,
+# même après leurs reconstructions ; retour sur une facture archivée borné par
+# les retours déjà archivés ; un second passage n'archive rien.
+#
+#   python bench/bench_archive.py --months 24 --sales 150 --keep 3
+# ==============================================================================
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.analytics import rebuild_hourly_sales  # noqa: E402
+from balika.archive import TABLES, ArchiveStore  # noqa: E402
+from balika.backup import create_snapshot  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.paging import fetch_page, fetch_page_many  # noqa: E402
+from balika.replenish import rebuild_item_sales  # noqa: E402
+from balika.services import ReturnError, Services  # noqa: E402
+from balika.shards import init_database  # noqa: E402
+from balika.stats import rebuild_daily_stats  # noqa: E402
+
+SID = "shop0"
+SKUS = 500
+COLS = ["date", "time", "ref", "cli", "total_usd", "seller"]
+DERIVED = ("daily_shop_stats", "hourly_sales", "daily_item_sales")
+
+
+def seed(db, months, per_day, rnd):
+    with db.write() as conn:
+        conn.execute("INSERT INTO shops (sid, name) VALUES (?,?)", (SID, "BOUTIQUE"))
+        conn.executemany("INSERT INTO inventory (id, item, category, qty, buy_price, sell_price, sid) VALUES (?,?,?,?,?,?,?)",
+                         [(i, f"ARTICLE {i:03d}", f"CAT {i % 12:02d}", 10 ** 6, 1.0 + i % 7, 2.0 + i % 7, SID)
+                          for i in range(1, SKUS + 1)])
+    today = date.today()
+    n = today.year * 12 + today.month - 1 - months
+    day, sale_id = date(n // 12, n % 12 + 1, 1), 0
+    while day <= today:
+        sales, items, rets, audit = [], [], [], []
+        for _ in range(per_day):
+            sale_id += 1
+            ts = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rnd.randint(8 * 3600, 20 * 3600))
+            ref, seller = f"B-{sale_id:07d}", f"vendeur{rnd.randrange(4)}"
+            total = cost = 0.0
+            for i in rnd.sample(range(1, SKUS + 1), rnd.randint(1, 4)):
+                q = rnd.randint(1, 3)
+                items.append((sale_id, i, f"ARTICLE {i:03d}", q, 2.0 + i % 7, 1.0 + i % 7, SID))
+                total, cost = total + q * (2.0 + i % 7), cost + q * (1.0 + i % 7)
+            sales.append((sale_id, ref, "COMPTANT", total, total, 0.0, ts.strftime("%d/%m/%Y"), ts.strftime("%H:%M"), seller,
+                          SID, "USD", total - cost, ts.isoformat(timespec="seconds")))
+            audit.append((seller, "VENTE", f"{ref} {total:.2f}$", ts.strftime("%d/%m/%Y"), ts.strftime("%H:%M:%S"), SID,
+                          ts.isoformat(timespec="seconds")))
+            if rnd.random() < 0.03:     # retour quelques jours plus tard (parfois le mois suivant)
+                back = ts + timedelta(days=rnd.randint(0, 10))
+                if back.date() <= today:
+                    it = items[-1]
+                    rets.append((ref, it[2], 1, "DÉFAUT", back.strftime("%d/%m/%Y"), SID, it[4], back.isoformat(timespec="seconds")))
+        with db.write() as conn:
+            conn.executemany("""INSERT INTO sales (id, ref, cli, total_usd, paid_usd, rest_usd, date, time, seller, sid,
+                                                   currency, profit, ts) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""", sales)
+            conn.executemany("""INSERT INTO sale_items (sale_id, inv_id, item, qty, unit_price, buy_price, sid)
+                                VALUES (?,?,?,?,?,?,?)""", items)
+            conn.executemany("""INSERT INTO returns (sale_ref, item, qty, reason, date, sid, refund_amount, ts)
+                                VALUES (?,?,?,?,?,?,?,?)""", rets)
+            conn.executemany("INSERT INTO audit_logs (user, action, details, date, time, sid, ts) VALUES (?,?,?,?,?,?,?)", audit)
+        day += timedelta(days=1)
+    return sale_id
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        runs.append((time.perf_counter() - t) * 1000)
+    runs.sort()
+    return result, runs[len(runs) // 2]
+
+
+def grid_page(bases, table, where, params, sort="ts"):
+    # Comme paged_grid : une base -> fetch_page, plusieurs -> pages fusionnées
+    with ExitStack() as stack:
+        conns = [stack.enter_context(b.read()) for b in bases]
+        cols = COLS if table == "sales" else ["date", "time", "user", "action", "details"]
+        if len(conns) == 1:
+            return fetch_page(conns[0], table, cols, where, params, sort, True, None, 50)[0]
+        return fetch_page_many(conns, table, cols, where, params, sort, True, None, 50)[0]
+
+
+def grid_all(bases, table, where, params, sort="ts"):
+    """Toutes les lignes de la grille, page après page (curseur de fetch_page_many)."""
+    cols = COLS if table == "sales" else ["date", "time", "user", "action", "details"]
+    rows, after = [], None
+    with ExitStack() as stack:
+        conns = [stack.enter_context(b.read()) for b in bases]
+        while True:
+            page, after = fetch_page_many(conns, table, cols, where, params, sort, True, after, 500)
+            rows += page
+            if after is None:
+                return rows
+
+
+def snapshot(db, tmp):
+    t = time.perf_counter()
+    res = create_snapshot(db.path, os.path.join(tmp, "snap"), keep=1)
+    return res['bytes_gz'], time.perf_counter() - t
+
+
+def counts(conn):
+    return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in TABLES}
+
+
+def derived(conn):
+    return {t: conn.execute(f"SELECT * FROM {t} ORDER BY 1, 2, 3").fetchall() for t in DERIVED}
+
+
+def measure(svc, db, recent_ref, repeat):
+    lo30, hi = (date.today() - timedelta(days=29)).isoformat(), (date.today() + timedelta(days=1)).isoformat()
+    lo7 = (date.today() - timedelta(days=6)).isoformat()
+    out = {}
+    _, out["grille ventes 30 j"] = timed(lambda: grid_page(svc.reports.sales_bases(SID, lo30, hi), "sales",
+                                                          "sid=? AND ts >= ? AND ts < ?", (SID, lo30, hi)), repeat)
+    _, out["RETOURS facture récente"] = timed(lambda: svc.sales.returnable(SID, recent_ref), repeat)
+    _, out["journal d'audit 7 j"] = timed(lambda: grid_page(svc.reports.audit_bases(lo7, hi), "audit_logs",
+                                                           "ts >= ? AND ts < ?", (lo7, hi)), repeat)
+    with db.read() as conn:
+        _, out["comptage complet sales"] = timed(lambda: conn.execute("SELECT COUNT(*), SUM(total_usd) FROM sales").fetchone(),
+                                                 repeat)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Archivage des mois clos : taille et latences avant / après")
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--sales", type=int, default=150, help="ventes par jour")
+    ap.add_argument("--keep", type=int, default=3, help="mois gardés en ligne en plus du mois en cours")
+    ap.add_argument("--repeat", type=int, default=15)
+    args = ap.parse_args()
+    rnd = random.Random(17)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        init_database(db)
+        t = time.perf_counter()
+        n_sales = seed(db, args.months, args.sales, rnd)
+        print(f"Historique : {n_sales:,} ventes sur {args.months} mois en {time.perf_counter() - t:.0f} s")
+        store = ArchiveStore(os.path.join(tmp, "archives"))
+        svc = Services.build(db, archive=store)
+
+        # Références : une facture récente, une facture ancienne (avec retour archivé), un mois ancien
+        old_month = (date.today().replace(day=1) - timedelta(days=30 * (args.months // 2))).strftime("%Y-%m")
+        old_lo, old_hi = f"{old_month}-01", f"{old_month}-28"
+        with db.read() as conn:
+            recent_ref = conn.execute("SELECT ref FROM sales ORDER BY id DESC LIMIT 1").fetchone()[0]
+            old_ref = conn.execute("SELECT sale_ref FROM returns WHERE ts >= ? AND ts < ? ORDER BY id LIMIT 1",
+                                   (old_lo, old_hi)).fetchone()[0]
+            before_counts, before_derived = counts(conn), derived(conn)
+        before_old = svc.sales.returnable(SID, old_ref)
+        before_page = grid_page([db], "sales", "sid=? AND ts >= ? AND ts < ?", (SID, old_lo, old_hi))
+        all_lo, all_hi = "0000-01-01", (date.today() + timedelta(days=1)).isoformat()
+        before_sales = grid_all([db], "sales", "sid=? AND ts >= ? AND ts < ?", (SID, all_lo, all_hi))
+        before_audit = grid_all([db], "audit_logs", "ts >= ? AND ts < ?", (all_lo, all_hi))
+
+        db.vacuum()
+        size_before = os.path.getsize(db.path)
+        snap_before = snapshot(db, tmp)
+        lat_before = measure(svc, db, recent_ref, args.repeat)
+
+        t = time.perf_counter()
+        done = store.archive_closed(db, args.keep)
+        t_archive = time.perf_counter() - t
+        db.vacuum()
+        size_after = os.path.getsize(db.path)
+        snap_after = snapshot(db, tmp)
+        lat_after = measure(svc, db, recent_ref, args.repeat)
+        archived = sum(r['bytes'] for r in done)
+        print(f"Archivage : {len(done)} mois, {sum(r['sales'] for r in done):,} ventes en {t_archive:.1f} s "
+              f"-> {archived / 1e6:,.1f} Mo compressés")
+        print(f"Base vivante : {size_before / 1e6:,.1f} Mo -> {size_after / 1e6:,.1f} Mo ; instantané "
+              f"{snap_before[0] / 1e6:,.1f} Mo en {snap_before[1]:.2f} s -> {snap_after[0] / 1e6:,.1f} Mo en {snap_after[1]:.2f} s")
+        print(f"{'p50 (ms)':<28} {'avant':>9} {'après':>9}")
+        for label in lat_before:
+            print(f"{label:<28} {lat_before[label]:>9.2f} {lat_after[label]:>9.2f}")
+
+        # Lecture transparente des mois archivés
+        t = time.perf_counter()
+        after_old = svc.sales.returnable(SID, old_ref)
+        t_cold = (time.perf_counter() - t) * 1000
+        _, t_warm = timed(lambda: svc.sales.returnable(SID, old_ref), args.repeat)
+        after_page, t_page = timed(lambda: grid_page(svc.reports.sales_bases(SID, old_lo, old_hi), "sales",
+                                                     "sid=? AND ts >= ? AND ts < ?", (SID, old_lo, old_hi)), args.repeat)
+        print(f"{'RETOURS facture archivée':<28} {'':>9} {t_warm:>9.2f}  (première ouverture du mois {t_cold:.1f} ms)")
+        print(f"{'grille ventes mois archivé':<28} {'':>9} {t_page:>9.2f}")
+
+        checks = {}
+        with db.read() as conn:
+            live = counts(conn)
+            in_archive = dict(zip(TABLES, conn.execute("SELECT SUM(sales), SUM(sale_items), SUM(returns), SUM(audit_logs) "
+                                                       "FROM archive_manifest WHERE sid=?", (SID,)).fetchone()))
+            checks["en ligne + archivé = origine"] = all(live[t] + (in_archive[t] or 0) == before_counts[t] for t in TABLES)
+            checks["tables dérivées inchangées"] = derived(conn) == before_derived
+        checks["même page de grille sur un mois archivé"] = after_page == before_page
+        after_sales = grid_all(svc.reports.sales_bases(SID, all_lo, all_hi), "sales",
+                               "sid=? AND ts >= ? AND ts < ?", (SID, all_lo, all_hi))
+        after_audit = grid_all(svc.reports.audit_bases(all_lo, all_hi, SID), "audit_logs",
+                               "ts >= ? AND ts < ?", (all_lo, all_hi))
+        print(f"Grilles complètes (en ligne + archives) : {len(after_sales):,}/{len(before_sales):,} ventes, "
+              f"{len(after_audit):,}/{len(before_audit):,} lignes d'audit")
+        checks["toutes les pages : mêmes ventes qu'à l'origine"] = after_sales == before_sales
+        checks["toutes les pages : même journal d'audit qu'à l'origine"] = after_audit == before_audit
+        checks["même facture retournable (archivée)"] = after_old == before_old and after_old is not None
+        with db.write() as conn:
+            rebuild_daily_stats(conn)
+            rebuild_item_sales(conn)
+            rebuild_hourly_sales(conn)
+        with db.read() as conn:
+            checks["reconstructions : mois archivés gardés"] = derived(conn) == before_derived
+        item, line = next(iter(after_old.items()))
+        svc.sales.record_return(SID, "bench", old_ref, item, line.qty)
+        try:
+            svc.sales.record_return(SID, "bench", old_ref, item, 1)
+            refused = False
+        except ReturnError:
+            refused = True
+        again = svc.sales.returnable(SID, old_ref)
+        checks["retour sur facture archivée borné"] = refused and item not in again
+        checks["second passage : rien à archiver"] = store.archive_closed(db, args.keep) == []
+        store.close()
+        db.close()
+        for label, good in checks.items():
+            print(f"  {'✅' if good else '❌'} {label}")
+        ok = all(checks.values())
+        print("✅ Archives cohérentes." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
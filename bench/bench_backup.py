@@ -0,0 +1,136 @@
+# ==============================================================================
+# 💎 BALIKA ERP - SAUVEGARDE EN LIGNE : DÉBIT, MÉMOIRE ET ÉCRITURES CONCURRENTES
+# ------------------------------------------------------------------------------
+# Génère une base de --size-mb Mo (ventes factices), puis lance create_snapshot()
+# pendant qu'un caissier simulé continue d'écrire (--writer). Affiche le débit
+# en Mo/s, le pic mémoire Python (tracemalloc) et RSS, et le nombre d'écritures
+# validées pendant la copie (0 = la sauvegarde bloque les caisses), ainsi que
+# l'espace disque temporaire maximal pris dans le dossier des instantanés (le
+# .gz en cours seulement : aucune copie brute de la base). Contrôle : l'instantané
+# décompressé s'ouvre seul (sans -wal) et contient toutes les ventes générées ;
+# --restore le réinjecte sous le verrou de l'écrivain.
+#
+#   python bench/bench_backup.py --size-mb 200 --writer
+# ==============================================================================
+import argparse
+import gzip
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.backup import CHUNK, create_snapshot, restore_snapshot  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.schema import create_tables, migrate  # noqa: E402
+
+
+def seed(path, size_mb):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("BEGIN")
+    create_tables(conn.cursor())
+    migrate(conn)
+    conn.execute("COMMIT")
+    n = 0
+    while os.path.getsize(path) < size_mb * 1024 * 1024:
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO sales (ref, cli, total_usd, paid_usd, rest_usd, currency, date, time, seller, sid, items_json, profit, ts) "
+                         "VALUES (?, 'COMPTANT', 10, 10, 0, 'USD', '01/01/2026', '10:00:00', 'bench', 'shop0', ?, 5, '2026-01-01T10:00:00')",
+                         [(f"S-{n + i}", '{"ARTICLE DE TEST %d": {"q": 1, "p": 10}}' % (n + i)) for i in range(20000)])
+        conn.execute("COMMIT")
+        n += 20000
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return n
+
+
+def dir_size(path):
+    return sum(e.stat().st_size for e in os.scandir(path)) if os.path.isdir(path) else 0
+
+
+def snapshot_rows(snap, tmp):
+    """(journal_mode, ventes) de l'instantané décompressé, ouvert seul."""
+    out = os.path.join(tmp, "check.db")
+    with gzip.open(snap, "rb") as fin, open(out, "wb") as fout:
+        while block := fin.read(CHUNK):
+            fout.write(block)
+    conn = sqlite3.connect(out)
+    try:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0], conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    finally:
+        conn.close()
+        os.remove(out)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sauvegarde en ligne : débit et mémoire")
+    ap.add_argument("--size-mb", type=int, default=100)
+    ap.add_argument("--writer", action="store_true", help="écritures concurrentes pendant la copie")
+    ap.add_argument("--restore", action="store_true", help="mesurer aussi la restauration")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        rows = seed(path, args.size_mb)
+        print(f"Base : {os.path.getsize(path) / 1e6:,.1f} Mo, {rows} ventes")
+
+        db = Database(path)
+        stop, writes = threading.Event(), [0]
+
+        def writer():
+            while not stop.is_set():
+                with db.write() as conn:
+                    conn.execute("INSERT INTO expenses (label, amount, date, sid, ts) VALUES ('bench', 1, '01/01/2026', 'shop0', '2026-01-01T10:00:00')")
+                writes[0] += 1
+                time.sleep(0.002)
+
+        th = threading.Thread(target=writer) if args.writer else None
+        if th:
+            th.start()
+        backups, disk = os.path.join(tmp, "backups"), [0]
+
+        def progress(done, total):
+            disk[0] = max(disk[0], dir_size(backups))
+
+        tracemalloc.start()
+        res = create_snapshot(path, backups, progress=progress)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        during = writes[0]
+        if th:
+            stop.set()
+            th.join()
+
+        mb = res['bytes_raw'] / 1e6
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"Instantané : {mb:,.1f} Mo -> {res['bytes_gz'] / 1e6:,.1f} Mo gzip en {res['seconds']:.2f} s "
+              f"({mb / res['seconds']:,.1f} Mo/s)")
+        print(f"Mémoire : pic Python {peak / 1e6:,.1f} Mo, RSS max {rss:,.0f} Mo")
+        print(f"Disque temporaire max : {disk[0] / 1e6:,.1f} Mo (base {mb:,.1f} Mo)")
+        if th:
+            print(f"Écritures validées pendant la copie : {during}")
+        mode, sales = snapshot_rows(res['path'], tmp)
+        ok = mode == "delete" and sales == rows
+        print(f"  {'✅' if ok else '❌'} instantané autonome ({mode}), {sales:,} ventes sur {rows:,}")
+        if args.restore:
+            with db.write() as conn:
+                conn.execute("DELETE FROM sales")
+            t0 = time.perf_counter()
+            restore_snapshot(res['path'], path, db)
+            t_restore = time.perf_counter() - t0
+            with db.read() as conn:
+                good = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == rows
+            ok &= good
+            print(f"Restauration : {t_restore:.2f} s {'✅' if good else '❌'}")
+        db.close()
+        print("✅ Sauvegarde cohérente." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
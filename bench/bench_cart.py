@@ -0,0 +1,128 @@
+# ==============================================================================
+# 💎 BALIKA ERP - CAISSE : TEMPS SERVEUR PAR INTERACTION SUR LE PANIER
+# ------------------------------------------------------------------------------
+# Exécute balika-app.py sans navigateur (streamlit.testing AppTest) sur une
+# boutique de --skus articles, remplit un panier de --lines lignes (➕), change
+# chaque quantité, retire la moitié des lignes (❌) puis encaisse. Par type
+# d'interaction :
+#   - avant : rerun complet du script (init, configuration, CSS, fiche boutique,
+#     recherche) x le nombre de reruns que provoquait l'ancienne page (➕ et ❌
+#     appelaient st.rerun() : deux exécutions) ;
+#   - après : exécution du seul fragment cart_fragment (page de télémétrie
+#     « 🛒 PANIER »), ce qu'un clic réexécute désormais ;
+#   - requêtes SQL lancées par le fragment (0 attendu hors recherche).
+# Contrôle : la vente enregistrée porte les quantités et le total du panier.
+#
+#   python bench/bench_cart.py --skus 5000 --lines 10
+# ==============================================================================
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from balika.schema import create_tables, migrate  # noqa: E402
+from balika.telemetry import Telemetry  # noqa: E402
+
+APP = os.path.join(ROOT, "balika-app.py")
+SID = "bench"
+FRAGMENT = "🛒 PANIER"
+OLD_RERUNS = {"➕ ajout": 2, "Qté": 1, "❌ retrait": 2}
+
+
+def seed(path, skus):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    create_tables(conn.cursor())
+    migrate(conn)
+    conn.execute("INSERT INTO shops (sid, name) VALUES (?, 'BENCH')", (SID,))
+    conn.executemany("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES (?, 50, 1, ?, ?)",
+                     [(f"ARTICLE {i:05d}", 2 + i % 7, SID) for i in range(skus)])
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def by_label(coll, label):
+    return next(e for e in coll if e.label and e.label.startswith(label))
+
+
+def main():
+    from streamlit.testing.v1 import AppTest
+
+    ap = argparse.ArgumentParser(description="CAISSE : temps serveur par interaction sur le panier")
+    ap.add_argument("--skus", type=int, default=5000)
+    ap.add_argument("--lines", type=int, default=10)
+    args = ap.parse_args()
+    # Télémétrie du processus lue directement (AppTest exécute l'application dans ce processus)
+    probe = Telemetry()
+    Telemetry.from_env = classmethod(lambda cls: probe)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # DB_FILE est relatif au répertoire courant
+        path = os.path.join(tmp, "balika_v650_master.db")
+        seed(path, args.skus)
+        at = AppTest.from_file(APP, default_timeout=120)
+        at.session_state["session"] = {'logged_in': True, 'user': 'bench', 'role': 'GERANT', 'shop_id': SID,
+                                       'cart': {}, 'viewing_invoice': None, 'msg_count': 0, 'name': 'BENCH'}
+        at.run()
+        radio = at.sidebar.radio[0]
+        radio.set_value(next(o for o in radio.options if "CAISSE" in o))
+        at.run()
+
+        samples = {kind: [] for kind in OLD_RERUNS}
+
+        def interact(kind, action):
+            probe.reset()
+            action()
+            t0 = time.perf_counter()
+            at.run()
+            full = (time.perf_counter() - t0) * 1000
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+            frag = probe.page_stats()[FRAGMENT]
+            queries = sum(q['count'] for q in probe.query_stats(top=1000) if q['page'] == FRAGMENT)
+            samples[kind].append((full, frag['total_ms'] / frag['count'], queries))
+
+        for k in range(args.lines):
+            by_label(at.text_input, "🔎").set_value(f"ARTICLE {k * 37 % args.skus:05d}")
+            at.run()
+            by_label(at.selectbox, "RECHERCHER").select_index(1)
+            at.run()
+            interact("➕ ajout", lambda: next(b for b in at.button if b.label.startswith("➕")).click())
+        qtys = [e for e in at.number_input if e.label == "Qté"]
+        for n, e in enumerate(qtys):
+            interact("Qté", lambda e=e, n=n: e.set_value(2 + n % 3))
+        for _ in range(len(qtys) // 2):
+            interact("❌ retrait", lambda: next(b for b in at.button if b.label == "❌").click())
+
+        cart = dict(at.session_state["session"]['cart'])
+        expected = sum(d['q'] * d['p'] for d in cart.values())
+        next(b for b in at.button if b.label.startswith("✅")).click()
+        at.run()
+        conn = sqlite3.connect(path)
+        row = conn.execute("SELECT total_usd, (SELECT SUM(qty) FROM sale_items) FROM sales WHERE sid=?", (SID,)).fetchone()
+        conn.close()
+        ok = (row is not None and abs(row[0] - expected) < 0.01 and row[1] == sum(d['q'] for d in cart.values())
+              and not at.session_state["session"]['cart'])
+
+        print(f"{'interaction':<12} {'n':>3} {'avant':>10} {'après':>10} {'SQL fragment':>13}")
+        for kind, rows in samples.items():
+            if not rows:
+                continue
+            full = statistics.median(r[0] for r in rows) * OLD_RERUNS[kind]
+            frag = statistics.median(r[1] for r in rows)
+            print(f"{kind:<12} {len(rows):>3} {full:>8.1f}ms {frag:>8.2f}ms {statistics.mean(r[2] for r in rows):>13.1f}")
+        no_sql = all(r[2] == 0 for kind in ("Qté", "❌ retrait") for r in samples[kind])
+        ok &= no_sql
+        print(f"  {'✅' if no_sql else '❌'} quantités et retraits sans requête SQL")
+        print(f"  {'✅' if ok else '❌'} vente encaissée : {len(cart)} lignes, {expected:,.2f} $ ({args.skus:,} articles)")
+        print("✅ Panier cohérent." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# ==============================================================================
+# 💎 BALIKA ERP - CONCURRENCE CAISSE : DÉBIT EN VENTES/S
+# ------------------------------------------------------------------------------
+# Plusieurs caissiers simulés (threads) encaissent des paniers aléatoires sur un
+# stock volontairement court ; affiche le débit en ventes/s. Les garanties (pas
+# de survente, pas de référence en double) sont vérifiées par
+# tests/test_checkout_concurrency.py.
+#
+#   python bench/bench_checkout.py --cashiers 32 --skus 50 --stock 40
+#   python bench/bench_checkout.py --separate-pools   (un pool par caissier)
+# ==============================================================================
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.checkout import StockError, checkout  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.schema import create_tables, migrate  # noqa: E402
+
+
+def seed(path, shops, skus, stock):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    create_tables(conn.cursor())
+    migrate(conn)
+    for s in range(shops):
+        conn.executemany("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES (?,?,1,2,?)",
+                         [(f"ART-{i}", stock, f"shop{s}") for i in range(skus)])
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrence CAISSE : débit en ventes/s")
+    ap.add_argument("--cashiers", type=int, default=32)
+    ap.add_argument("--shops", type=int, default=2)
+    ap.add_argument("--skus", type=int, default=50)
+    ap.add_argument("--stock", type=int, default=40)
+    ap.add_argument("--sales", type=int, default=300, help="tentatives par caissier")
+    ap.add_argument("--separate-pools", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.shops, args.skus, args.stock)
+        shared = Database(path)
+        with shared.read() as conn:
+            by_shop = {}
+            for inv_id, sid in conn.execute("SELECT id, sid FROM inventory"):
+                by_shop.setdefault(sid, []).append(inv_id)
+        ok, refused = [0] * args.cashiers, [0] * args.cashiers
+
+        def cashier(i):
+            db = Database(path, readers=1) if args.separate_pools else shared
+            rnd = random.Random(i)
+            sid = f"shop{i % args.shops}"
+            for _ in range(args.sales):
+                lines = [{'id': inv_id, 'item': f"#{inv_id}", 'q': rnd.randint(1, 3), 'p': 2.0, 'buy': 1.0}
+                         for inv_id in rnd.sample(by_shop[sid], rnd.randint(1, 4))]
+                paid = rnd.choice((None, 0.0))
+                total = sum(l['q'] * l['p'] for l in lines)
+                try:
+                    checkout(db, sid, f"caissier{i}", lines, "COMPTANT", total if paid is None else paid, "USD")
+                    ok[i] += 1
+                except StockError:
+                    refused[i] += 1
+            if db is not shared:
+                db.close()
+
+        threads = [threading.Thread(target=cashier, args=(i,)) for i in range(args.cashiers)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+        with shared.read() as conn:
+            n_debts = conn.execute("SELECT COUNT(*) FROM debts").fetchone()[0]
+        shared.close()
+        print(f"{args.cashiers} caissiers, {sum(ok)} ventes validées, {sum(refused)} refusées (stock), "
+              f"{n_debts} dettes, {elapsed:.2f} s -> {sum(ok) / elapsed:.1f} ventes/s")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# ==============================================================================
+# 💎 BALIKA ERP - CLÔTURE DE CAISSE : COÛT INDÉPENDANT DE L'HISTORIQUE
+# ------------------------------------------------------------------------------
+# Génère --days jours d'activité (ventes USD/CDF, dettes, dépenses, retours ;
+# le journal cash_movements est rempli par les triggers) avec une clôture par
+# jour, puis mesure la clôture du jour courant et la compare à un recalcul
+# naïf de tout l'historique. Vérifie aussi que le fond reporté est cohérent :
+#   attendu = fond d'ouverture + somme des mouvements depuis le dernier point.
+#
+#   python bench/bench_closing.py --days 365 --per-day 300
+# ==============================================================================
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.cash import close_register, pending  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.schema import create_tables, migrate  # noqa: E402
+
+SID = "shop0"
+
+
+def seed_day(conn, day, per_day, rnd, ref0):
+    d = day.strftime("%d/%m/%Y")
+    sales, debts, expenses, returns = [], [], [], []
+    for i in range(per_day):
+        ts = (day + timedelta(seconds=30 * i)).strftime("%Y-%m-%dT%H:%M:%S")
+        total = round(rnd.uniform(1, 80), 2)
+        paid = total if rnd.random() > 0.1 else round(total / 2, 2)
+        sales.append((f"B-{ref0 + i:06d}", "CLIENT", total, paid, total - paid, d, SID, rnd.choice(("USD", "CDF")), ts))
+        if paid < total:
+            debts.append(("CLIENT", total - paid, f"B-{ref0 + i:06d}", SID, d, ts, ts))
+        if i % 25 == 0:
+            expenses.append(("TAXI", round(rnd.uniform(1, 10), 2), d, SID, "bench", ts))
+        if i % 40 == 0:
+            returns.append((f"B-{ref0 + i:06d}", "ART", 1, d, SID, ts, round(total / 4, 2)))
+    conn.executemany("""INSERT INTO sales (ref, cli, total_usd, paid_usd, rest_usd, date, sid, currency, ts)
+                        VALUES (?,?,?,?,?,?,?,?,?)""", sales)
+    conn.executemany("INSERT INTO debts (cli, balance, sale_ref, sid, last_update, ts, updated_ts) VALUES (?,?,?,?,?,?,?)", debts)
+    conn.execute("UPDATE debts SET balance = balance / 2, updated_ts = ? WHERE sid=? AND ts >= ?",
+                 (day.strftime("%Y-%m-%dT23:00:00"), SID, day.strftime("%Y-%m-%d")))
+    conn.executemany("INSERT INTO expenses (label, amount, date, sid, user, ts) VALUES (?,?,?,?,?,?)", expenses)
+    conn.executemany("INSERT INTO returns (sale_ref, item, qty, date, sid, ts, refund_amount) VALUES (?,?,?,?,?,?,?)", returns)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Clôture de caisse : coût vs historique")
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--per-day", type=int, default=300)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+    rnd = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("BEGIN")
+        create_tables(conn.cursor())
+        migrate(conn)
+        conn.execute("INSERT INTO shops (sid, name, rate) VALUES (?,?,2800)", (SID, SID))
+        conn.execute("COMMIT")
+        conn.close()
+
+        db = Database(path)
+        start = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0) - timedelta(days=args.days)
+        t0 = time.perf_counter()
+        for n in range(args.days):
+            with db.write() as conn:
+                seed_day(conn, start + timedelta(days=n), args.per_day, rnd, n * args.per_day)
+            with db.read() as conn:
+                exp = pending(conn, SID)['expected']
+            close_register(db, SID, "bench", max(0.0, exp['USD']), max(0.0, exp['CDF']), kept_usd=50.0, kept_cdf=0.0,
+                           now=start + timedelta(days=n, hours=12))
+        with db.write() as conn:
+            seed_day(conn, start + timedelta(days=args.days), args.per_day, rnd, args.days * args.per_day)
+        with db.read() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM cash_movements").fetchone()[0]
+        print(f"Historique : {args.days} jours, {total:,} mouvements de caisse ({time.perf_counter() - t0:.1f} s)")
+
+        with db.read() as conn:
+            best = min(_timed(lambda: pending(conn, SID)) for _ in range(args.repeat))
+            naive = min(_timed(lambda: conn.execute(
+                "SELECT kind, currency, COUNT(*), SUM(amount) FROM cash_movements WHERE sid=? GROUP BY kind, currency",
+                (SID,)).fetchall()) for _ in range(max(1, args.repeat // 4)))
+            p = pending(conn, SID)
+            since = p['since_id']
+            check = conn.execute("SELECT currency, SUM(amount) FROM cash_movements WHERE sid=? AND id > ? GROUP BY currency",
+                                 (SID, since)).fetchall()
+        print(f"Clôture du jour : {p['movements']:,} mouvements agrégés en {best * 1000:.2f} ms "
+              f"(recalcul de tout l'historique : {naive * 1000:.1f} ms)")
+        t = time.perf_counter()
+        c = close_register(db, SID, "bench", 0.0, 0.0)
+        print(f"Écriture de la clôture : {(time.perf_counter() - t) * 1000:.2f} ms")
+        db.close()
+
+        ok = (abs(c['opening']['USD'] - 50.0) < 1e-9
+              and all(abs(c['net'][cur] - amount) < 1e-6 for cur, amount in check)
+              and abs(c['expected']['USD'] - (50.0 + c['net']['USD'])) < 1e-6)
+        print("✅ Clôture cohérente." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+def _timed(fn):
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+
+if __name__ == "__main__":
+    sys.exit(main())
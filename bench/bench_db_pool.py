@@ -0,0 +1,132 @@
+# ==============================================================================
+# 💎 BALIKA ERP - BENCHMARK : CONNEXION PAR BLOC vs POOL WAL PARTAGÉ
+# ------------------------------------------------------------------------------
+# Rejoue le mélange de requêtes d'un rerun Streamlit (config, boutique, tuiles
+# ACCUEIL, stock CAISSE + un journal d'audit sur 10 reruns) depuis plusieurs
+# sessions concurrentes, et compte les reruns/s et les "database is locked".
+#
+#   python bench/bench_db_pool.py --sessions 30 --seconds 5
+# ==============================================================================
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.db import Database  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE system_config (id INTEGER PRIMARY KEY, app_name TEXT, marquee TEXT, theme_id TEXT,
+    marquee_active INTEGER, broadcast_msg TEXT);
+CREATE TABLE shops (sid TEXT PRIMARY KEY, name TEXT, rate REAL, head TEXT, addr TEXT, tel TEXT,
+    currency_pref TEXT, closing_balance REAL);
+CREATE TABLE inventory (id INTEGER PRIMARY KEY AUTOINCREMENT, item TEXT, qty INTEGER, buy_price REAL,
+    sell_price REAL, sid TEXT);
+CREATE TABLE sales (id INTEGER PRIMARY KEY AUTOINCREMENT, total_usd REAL, profit REAL, date TEXT, sid TEXT);
+CREATE TABLE expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, amount REAL, date TEXT, sid TEXT);
+CREATE TABLE audit_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT, action TEXT, details TEXT,
+    date TEXT, time TEXT, sid TEXT);
+"""
+
+
+def seed(path, shops, skus, sales):
+    today = datetime.now().strftime("%d/%m/%Y")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SCHEMA)
+        conn.execute("INSERT INTO system_config VALUES (1, 'BALIKA', 'M', 'Cobalt', 1, 'B')")
+        for s in range(shops):
+            sid = f"shop{s}"
+            conn.execute("INSERT INTO shops VALUES (?,?,2800,'H','','','USD',0)", (sid, sid))
+            conn.executemany("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES (?,?,1,2,?)",
+                             [(f"ART-{i}", 50, sid) for i in range(skus)])
+            conn.executemany("INSERT INTO sales (total_usd, profit, date, sid) VALUES (10, 2, ?, ?)",
+                             [(today, sid)] * sales)
+
+
+def rerun(read, write, sid, n):
+    today = datetime.now().strftime("%d/%m/%Y")
+    with read() as conn:
+        conn.execute("SELECT app_name, marquee, theme_id, marquee_active, broadcast_msg FROM system_config WHERE id=1").fetchone()
+    with read() as conn:
+        conn.execute("SELECT name, rate, head FROM shops WHERE sid=?", (sid,)).fetchone()
+    with read() as conn:
+        conn.execute("SELECT SUM(total_usd), SUM(profit) FROM sales WHERE sid=? AND date=?", (sid, today)).fetchone()
+        conn.execute("SELECT SUM(amount) FROM expenses WHERE sid=? AND date=?", (sid, today)).fetchone()
+    with read() as conn:
+        conn.execute("SELECT item, sell_price, qty, buy_price FROM inventory WHERE sid=? AND qty > 0", (sid,)).fetchall()
+    if n % 10 == 0:
+        with write() as conn:
+            conn.execute("INSERT INTO audit_logs (user, action, details, date, time, sid) VALUES (?,?,?,?,?,?)",
+                         (sid, "CONNEXION", "bench", today, "00:00:00", sid))
+
+
+def direct_mode(path):
+    # Comportement historique : sqlite3.connect() par bloc, journal par défaut
+    @contextmanager
+    def block():
+        conn = sqlite3.connect(path)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    return block, block, None
+
+
+def pooled_mode(path):
+    db = Database(path)
+    return db.read, db.write, db
+
+
+def run(label, factory, path, sessions, seconds, shops):
+    read, write, db = factory(path)
+    done, locked = [0] * sessions, [0] * sessions
+    stop = time.perf_counter() + seconds
+
+    def worker(i):
+        sid, n = f"shop{i % shops}", 0
+        while time.perf_counter() < stop:
+            n += 1
+            try:
+                rerun(read, write, sid, n)
+                done[i] += 1
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                locked[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(sessions)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    if db:
+        db.close()
+    print(f"{label:<22} {sum(done) / elapsed:>10.1f} reruns/s   {sum(locked):>6} 'database is locked'")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Connexion par bloc vs pool WAL partagé")
+    ap.add_argument("--sessions", type=int, default=30)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--shops", type=int, default=10)
+    ap.add_argument("--skus", type=int, default=500)
+    ap.add_argument("--sales", type=int, default=2000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, factory in (("AVANT (connect/bloc)", direct_mode), ("APRÈS (pool WAL)", pooled_mode)):
+            path = os.path.join(tmp, f"{factory.__name__}.db")
+            seed(path, args.shops, args.skus, args.sales)
+            run(label, factory, path, args.sessions, args.seconds, args.shops)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# ==============================================================================
+# 💎 BALIKA ERP - DETTES : COMPTES CLIENTS, RÈGLEMENTS FIFO, ANCIENNETÉ
+# ------------------------------------------------------------------------------
+# Boutique avec --clients clients à crédit (jusqu'à --max-debts factures
+# ouvertes chacun, étalées sur 120 jours). Mesure :
+#   - une page de la grille DETTES (50 clients + tranches d'ancienneté en SQL) ;
+#   - les totaux d'ancienneté de la boutique (table debt_aging) ;
+#   - un règlement FIFO (DebtService.pay_client) ;
+# puis vérifie que chaque solde client = somme de ses dettes ouvertes et que
+# chaque règlement = somme de ses lignes d'imputation, et que les tranches de
+# la boutique égalent un recalcul direct sur debts.
+#
+#   python bench/bench_debts.py --clients 5000 --max-debts 40
+# ==============================================================================
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.credit import aging_columns, aging_limits  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.paging import fetch_page  # noqa: E402
+from balika.schema import create_tables, migrate  # noqa: E402
+from balika.services import Services  # noqa: E402
+
+SID = "shop0"
+
+
+def seed(path, clients, max_debts, rnd):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    create_tables(conn.cursor())
+    migrate(conn)
+    now = datetime.now()
+    rows = []
+    for c in range(clients):
+        for k in range(rnd.randint(1, max_debts)):
+            ts = (now - timedelta(days=rnd.uniform(0, 120))).strftime("%Y-%m-%dT%H:%M:%S")
+            rows.append((f"CLIENT {c:05d}", round(rnd.uniform(1, 200), 2), f"B-{len(rows) + 1:07d}", SID, ts[:10], ts, ts))
+    conn.executemany("INSERT INTO debts (cli, balance, sale_ref, sid, last_update, ts, updated_ts) VALUES (?,?,?,?,?,?,?)", rows)
+    conn.execute("COMMIT")
+    conn.close()
+    return len(rows)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description="DETTES : comptes clients et règlements FIFO")
+    ap.add_argument("--clients", type=int, default=5000)
+    ap.add_argument("--max-debts", type=int, default=40)
+    ap.add_argument("--payments", type=int, default=2000)
+    args = ap.parse_args()
+    rnd = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        t0 = time.perf_counter()
+        n = seed(path, args.clients, args.max_debts, rnd)
+        print(f"Dettes : {n:,} factures ouvertes pour {args.clients:,} clients ({time.perf_counter() - t0:.1f} s)")
+        db = Database(path)
+        svc = Services.build(db)
+
+        cols = ["name", "balance", "open_debts", *aging_columns(), "last_ts"]
+        with db.read() as conn:
+            page = timed(lambda: fetch_page(conn, "clients", cols, "sid=? AND open_debts > 0", (SID,), "balance", True), 20)
+            full = timed(lambda: conn.execute(f"SELECT {', '.join(cols)} FROM clients WHERE sid=? AND open_debts > 0",
+                                              (SID,)).fetchall(), 3)
+        aging = timed(lambda: svc.debts.aging(SID), 20)
+        print(f"Page DETTES (50 clients + ancienneté) : {page:.2f} ms "
+              f"(ancienneté des {args.clients:,} clients d'un coup : {full:.0f} ms)")
+        print(f"Totaux d'ancienneté boutique : {aging:.2f} ms")
+
+        lat = []
+        for _ in range(args.payments):
+            cli = f"CLIENT {rnd.randrange(args.clients):05d}"
+            t = time.perf_counter()
+            try:
+                svc.debts.pay_client(SID, "bench", cli, round(rnd.uniform(5, 400), 2))
+            except Exception:
+                continue
+            lat.append((time.perf_counter() - t) * 1000)
+        lat.sort()
+        print(f"Règlements FIFO : {len(lat)} en {sum(lat) / 1000:.2f} s, p50 {lat[len(lat) // 2]:.2f} ms, "
+              f"p95 {lat[int(len(lat) * 0.95)]:.2f} ms")
+
+        with db.read() as conn:
+            drift = conn.execute("""SELECT COUNT(*) FROM clients c WHERE ABS(c.balance - (
+                                        SELECT COALESCE(SUM(balance), 0) FROM debts d
+                                        WHERE d.sid = c.sid AND d.cli = c.name AND d.status = 'OUVERT')) > 1e-6
+                                     OR c.open_debts != (SELECT COUNT(*) FROM debts d
+                                        WHERE d.sid = c.sid AND d.cli = c.name AND d.status = 'OUVERT')""").fetchone()[0]
+            split = conn.execute("""SELECT COUNT(*) FROM debt_payments p WHERE ABS(p.amount - (
+                                        SELECT SUM(amount) FROM debt_payment_lines l WHERE l.payment_id = p.id)) > 1e-6""").fetchone()[0]
+            negative = conn.execute("SELECT COUNT(*) FROM debts WHERE balance < 0").fetchone()[0]
+            d30, d60 = aging_limits()
+            direct = conn.execute("""SELECT COALESCE(SUM(CASE WHEN ts >= ? THEN balance END), 0),
+                                            COALESCE(SUM(CASE WHEN ts >= ? AND ts < ? THEN balance END), 0),
+                                            COALESCE(SUM(CASE WHEN ts < ? THEN balance END), 0)
+                                     FROM debts WHERE sid=? AND status='OUVERT'""", (d30, d60, d30, d60, SID)).fetchone()
+        buckets = svc.debts.aging(SID)
+        db.close()
+        aged_ok = all(abs(a - b) < 1e-3 for a, b in zip(buckets.values(), direct))
+        ok = drift == 0 and split == 0 and negative == 0 and aged_ok
+        print(f"Comptes en écart : {drift}, règlements mal répartis : {split}, soldes négatifs : {negative}, "
+              f"tranches boutique = recalcul direct : {'oui' if aged_ok else 'NON'}")
+        print("✅ Comptes clients cohérents." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
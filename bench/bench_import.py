@@ -0,0 +1,80 @@
+# ==============================================================================
+# 💎 BALIKA ERP - IMPORT EN MASSE DU STOCK : DÉBIT SUR 100 000 LIGNES
+# ------------------------------------------------------------------------------
+# Génère un CSV de --rows articles (dont ~1 % de lignes invalides), l'importe
+# dans une base neuve (création), puis le réimporte (réassort des mêmes
+# articles). Affiche lignes/s, rejets et contrôle le stock final et l'index FTS.
+#
+#   python bench/bench_import.py --rows 100000 --chunk 2000
+# ==============================================================================
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.db import Database  # noqa: E402
+from balika.importer import import_inventory, read_rows  # noqa: E402
+from balika.schema import create_tables, migrate  # noqa: E402
+
+CATS = ("ALIMENTAIRE", "COSMETIQUE", "HABILLEMENT", "ÉLECTRONIQUE", "GÉNÉRAL")
+
+
+def make_csv(path, rows, rnd):
+    bad = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Désignation;Catégorie;Quantité;Prix achat;Prix vente;Stock min;Code-barres\n")
+        for i in range(rows):
+            if rnd.random() < 0.01:
+                bad += 1
+                f.write(f"ARTICLE {i:06d};{rnd.choice(CATS)};douze;1,00;2,00;;\n")
+                continue
+            buy = rnd.uniform(0.2, 50)
+            f.write(f"ARTICLE {i:06d};{rnd.choice(CATS)};{rnd.randint(1, 500)};{buy:.2f}".replace(".", ",")
+                    + f";{buy * 1.3:.2f};{rnd.randint(2, 20)};{600000000000 + i}\n".replace(".", ","))
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Import en masse du stock : débit")
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--chunk", type=int, default=2000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path, csv_path = os.path.join(tmp, "bench.db"), os.path.join(tmp, "stock.csv")
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("BEGIN")
+        create_tables(conn.cursor())
+        migrate(conn)
+        conn.execute("COMMIT")
+        conn.close()
+        bad = make_csv(csv_path, args.rows, random.Random(7))
+        print(f"CSV : {args.rows} lignes ({bad} invalides), {os.path.getsize(csv_path) / 1e6:.1f} Mo")
+
+        db = Database(path)
+        totals = []
+        for label in ("création", "réassort"):
+            with open(csv_path, "rb") as f:
+                rep = import_inventory(db, "shop0", read_rows(f, "stock.csv"), "add", chunk=args.chunk)
+            totals.append(rep)
+            print(f"{label:<9} : {rep.created} créés, {rep.updated} mis à jour, {len(rep.rejected)} rejetés "
+                  f"en {rep.seconds:.2f} s -> {rep.read / rep.seconds:,.0f} lignes/s")
+        with db.write() as conn:
+            # index plein texte alimenté en bloc : doit rester identique au contenu (sinon SQLITE_CORRUPT_VTAB)
+            conn.execute("INSERT INTO inventory_fts (inventory_fts, rank) VALUES ('integrity-check', 1)")
+        with db.read() as conn:
+            n, qty = conn.execute("SELECT COUNT(*), SUM(qty) FROM inventory WHERE sid='shop0'").fetchone()
+            stamped = conn.execute("SELECT COUNT(*) FROM inventory WHERE last_restock IS NULL").fetchone()[0]
+            found = conn.execute("SELECT COUNT(*) FROM inventory_fts WHERE inventory_fts MATCH 'ARTICLE'").fetchone()[0]
+        db.close()
+        ok = n == args.rows - bad and stamped == 0 and len(totals[0].rejected) == bad and found == n
+        print(f"Stock : {n} articles, quantité totale {qty}, sans last_restock : {stamped}, trouvés par FTS : {found}")
+        print("✅ Import cohérent." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# ==============================================================================
+# 💎 BALIKA ERP - MESSAGERIE : DIFFUSION, COMPTEURS DE NON LUS ET RELÈVE INCRÉMENTALE
+# ------------------------------------------------------------------------------
+# --shops boutiques (un gérant + --sellers vendeurs chacune) et --history
+# messages déjà échangés (admin <-> gérants, gérant <-> vendeurs). Mesures :
+#   - diffusion admin -> tous les gérants : une transaction par boutique
+#     contre un seul executemany (MessageService.broadcast) ;
+#   - rerun de la page MESSAGERIE, avant : boîte relue en entier + COUNT(*)
+#     des non lus sans index ; après : messages d'id > dernier vu (intervalle
+#     de idx_messages_inbox) + compteur message_unread (clé primaire) ;
+# Contrôles :
+#   - message_unread = COUNT(*) des non lus pour chaque destinataire, après
+#     l'historique, la diffusion et des « tout marquer lu » ; = rebuild_unread ;
+#   - la relève incrémentale reconstitue exactement la boîte relue en entier.
+#
+#   python bench/bench_messages.py --shops 500 --history 200000
+# ==============================================================================
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika import messaging  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.services import Services  # noqa: E402
+from balika.shards import init_database  # noqa: E402
+
+ADMIN = "admin"
+FULL_INBOX = "SELECT id, sender, receiver, content, date, is_read FROM messages WHERE receiver=? ORDER BY id"
+NAIVE_UNREAD = "SELECT COUNT(*) FROM messages WHERE receiver=? AND is_read=0"
+INDEXES = ("idx_messages_inbox", "idx_messages_sent", "idx_messages_unread")
+
+
+def seed(db, shops, sellers, history, rnd):
+    managers = [f"shop{i:04d}" for i in range(shops)]
+    with db.write() as conn:
+        conn.executemany("INSERT INTO users (uid, pwd, role, shop, status, name) VALUES (?,?,?,?,?,?)",
+                         [(m, "x", "GERANT", m, "ACTIF", m.upper()) for m in managers]
+                         + [(f"{m}-v{k}", "x", "VENDEUR", m, "ACTIF", f"VENDEUR {k}") for m in managers for k in range(sellers)])
+    pairs = []
+    for _ in range(history):
+        m = rnd.choice(managers)
+        other = ADMIN if rnd.random() < 0.3 else f"{m}-v{rnd.randrange(sellers)}"
+        pairs.append((m, other) if rnd.random() < 0.5 else (other, m))
+    with db.write() as conn:
+        conn.executemany("INSERT INTO messages (sender, receiver, content, date, is_read) VALUES (?,?,?,?,?)",
+                         [(s, r, f"message {n}", "2025-01-01T08:00:00", int(rnd.random() < 0.9))
+                          for n, (s, r) in enumerate(pairs)])
+    return managers
+
+
+def counters_ok(conn):
+    live = dict(conn.execute("SELECT receiver, n FROM message_unread WHERE n != 0"))
+    ref = dict(conn.execute("SELECT receiver, COUNT(*) FROM messages WHERE is_read=0 GROUP BY receiver"))
+    return live == ref
+
+
+def main():
+    ap = argparse.ArgumentParser(description="MESSAGERIE : diffusion, compteurs de non lus et relève incrémentale")
+    ap.add_argument("--shops", type=int, default=500)
+    ap.add_argument("--sellers", type=int, default=3)
+    ap.add_argument("--history", type=int, default=200_000)
+    ap.add_argument("--polls", type=int, default=200)
+    args = ap.parse_args()
+    rnd = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        init_database(db)
+        t = time.perf_counter()
+        managers = seed(db, args.shops, args.sellers, args.history, rnd)
+        svc = Services.build(db)
+        print(f"Base : {args.shops} boutiques, {args.history:,} messages en {time.perf_counter() - t:.1f} s")
+        with db.read() as conn:
+            ok = counters_ok(conn)
+        print(f"  {'✅' if ok else '❌'} compteurs de non lus après l'historique")
+
+        # --- Diffusion -------------------------------------------------------------------
+        t = time.perf_counter()
+        for m in managers:
+            with db.write() as conn:
+                messaging.send(conn, ADMIN, [m], "diffusion (une transaction par boutique)")
+        t_loop = time.perf_counter() - t
+        t = time.perf_counter()
+        n = svc.messages.broadcast(ADMIN, "diffusion (executemany)")
+        t_batch = time.perf_counter() - t
+        with db.read() as conn:
+            good = n == len(managers) and counters_ok(conn)
+        ok &= good
+        print(f"Diffusion à {len(managers)} gérants : {t_loop * 1000:.0f} ms une par une, {t_batch * 1000:.1f} ms en lot "
+              f"{'✅' if good else '❌'}")
+
+        # --- Reruns de la page MESSAGERIE --------------------------------------------
+        # Avant : ni index ni compteur, toute la boîte relue et comptée à chaque rerun
+        readers = rnd.sample(managers, min(args.polls, len(managers)))
+        with db.write() as conn:
+            for name in INDEXES:
+                conn.execute(f"DROP INDEX {name}")
+        t = time.perf_counter()
+        with db.read() as conn:
+            full = {}
+            for uid in readers:
+                full[uid] = conn.execute(FULL_INBOX, (uid,)).fetchall()
+                conn.execute(NAIVE_UNREAD, (uid,)).fetchone()
+        t_before = (time.perf_counter() - t) / len(readers)
+        with db.write() as conn:
+            messaging.install(conn)
+        # Après : premier affichage (toute la boîte, par pages) puis relève des seuls nouveaux messages
+        seen, last = {}, {}
+        for uid in readers:
+            rows, after = [], 0
+            while True:
+                page = svc.messages.since(uid, after, 500)
+                rows += page
+                if len(page) < 500:
+                    break
+                after = page[-1].id
+            seen[uid], last[uid] = rows, (rows[-1].id if rows else 0)
+        new = {uid: rnd.choice([ADMIN, f"{uid}-v0"]) for uid in readers[::2]}
+        with db.write() as conn:
+            for uid, sender in new.items():
+                messaging.send(conn, sender, [uid], "nouveau")
+        t = time.perf_counter()
+        for uid in readers:
+            fresh = svc.messages.since(uid, last[uid])
+            svc.messages.unread(uid)
+            seen[uid] += fresh
+            last[uid] = fresh[-1].id if fresh else last[uid]
+        t_after = (time.perf_counter() - t) / len(readers)
+        with db.read() as conn:
+            good = all([m.id for m in seen[uid]] == [r[0] for r in conn.execute(FULL_INBOX, (uid,))] for uid in readers)
+            avg = sum(len(v) for v in full.values()) / len(full)
+        ok &= good
+        print(f"Rerun MESSAGERIE ({len(readers)} boîtes, {avg:,.0f} messages en moyenne) : "
+              f"{t_before * 1000:.2f} ms avant, {t_after * 1000:.3f} ms après {'✅' if good else '❌'}")
+
+        # --- Tout marquer lu ---------------------------------------------------------------
+        for uid in readers[:50]:
+            svc.messages.mark_read(uid, last[uid])
+        with db.read() as conn:
+            cleared = all(svc.messages.unread(uid) == 0 for uid in readers[:50]) and counters_ok(conn)
+            before = dict(conn.execute("SELECT receiver, n FROM message_unread WHERE n != 0"))
+        with db.write() as conn:
+            messaging.rebuild_unread(conn)
+        with db.read() as conn:
+            same = before == dict(conn.execute("SELECT receiver, n FROM message_unread WHERE n != 0"))
+        good = cleared and same
+        ok &= good
+        print(f"  {'✅' if good else '❌'} « tout marquer lu » : compteurs à zéro, identiques à rebuild_unread")
+        db.close()
+        print("✅ Messagerie cohérente." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
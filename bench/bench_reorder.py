@@ -0,0 +1,174 @@
+# ==============================================================================
+# 💎 BALIKA ERP - RÉASSORT : ALERTES INCRÉMENTALES ET VITESSE DE VENTE
+# ------------------------------------------------------------------------------
+# Une boutique de --skus articles (seuils variés, certains sans seuil), --days
+# jours d'historique à --sales ventes/jour (popularité très inégale). Mesures :
+#   - compte low_stock (ACCUEIL) et liste de réassort (balika.replenish) contre
+#     le calcul naïf : tout le stock + toutes les lignes de la fenêtre en pandas ;
+# Contrôles :
+#   - ensemble low_stock = recalcul complet sur inventory, après l'historique
+#     puis après des ventes CAISSE, des réassorts et des changements de seuil ;
+#   - daily_item_sales = regroupement direct de sales x sale_items ;
+#   - vitesse NumPy = calcul de référence en Python pur ;
+#   - tout article au seuil (seuil > 0) figure dans la liste de réassort.
+#
+#   python bench/bench_reorder.py --skus 10000 --days 90 --sales 300
+# ==============================================================================
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.checkout import record_sale  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.replenish import (COVER_DAYS, HALF_LIFE_DAYS, WINDOW_DAYS, low_stock_count, recent_sales,  # noqa: E402
+                              reorder_list, velocity)
+from balika.services import CartLine, Services, StockError  # noqa: E402
+from balika.shards import init_database  # noqa: E402
+
+SID = "shop0"
+FULL_SCAN = "SELECT id FROM inventory WHERE sid=? AND COALESCE(qty, 0) <= COALESCE(min_stock, 5)"
+
+
+def seed(db, skus, days, per_day, rnd):
+    with db.write() as conn:
+        conn.execute("INSERT INTO shops (sid, name) VALUES (?,?)", (SID, "BOUTIQUE"))
+        conn.executemany("INSERT INTO inventory (item, category, qty, buy_price, sell_price, sid, min_stock) VALUES (?,?,?,?,?,?,?)",
+                         [(f"ARTICLE {i:05d}", f"CAT {i % 40:02d}", rnd.randint(0, 400), 1.0 + i % 9, 2.0 + i % 9, SID,
+                           None if i % 50 == 0 else rnd.randint(0, 12)) for i in range(skus)])
+        items = conn.execute("SELECT id, item, sell_price, buy_price FROM inventory WHERE sid=?", (SID,)).fetchall()
+    # Popularité en loi de puissance : quelques articles font l'essentiel des ventes
+    weights = [1.0 / (k + 1) ** 1.1 for k in range(len(items))]
+    start = datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
+    for d in range(days):
+        with db.write() as conn:
+            for _ in range(per_day):
+                picked = {i[0]: i for i in rnd.choices(items, weights, k=rnd.randint(1, 4))}.values()
+                lines = [{'id': i, 'item': it, 'q': rnd.randint(1, 3), 'p': p, 'buy': b} for i, it, p, b in picked]
+                now = start + timedelta(days=d, seconds=rnd.randint(8 * 3600, 20 * 3600))
+                record_sale(conn, SID, "bench", lines, "COMPTANT", sum(l['q'] * l['p'] for l in lines), "USD", now,
+                            strict=False)
+    return items
+
+
+def low_set(conn):
+    return {r[0] for r in conn.execute("SELECT inv_id FROM low_stock WHERE sid=?", (SID,))}
+
+
+def scan_set(conn):
+    return {r[0] for r in conn.execute(FULL_SCAN, (SID,))}
+
+
+def joined_sales(conn, since):
+    return set(conn.execute("""SELECT si.inv_id, substr(s.ts, 1, 10), SUM(si.qty) FROM sales s
+                               JOIN sale_items si ON si.sale_id = s.id WHERE s.sid=? AND s.ts >= ?
+                               GROUP BY 1, 2""", (SID, since)).fetchall())
+
+
+def naive_reorder(conn, today, window=WINDOW_DAYS):
+    # Référence lente : tout le stock et toutes les lignes de la fenêtre chargés en pandas
+    import pandas as pd
+    since = (today - timedelta(days=window - 1)).isoformat()
+    inv = pd.read_sql("SELECT id, item, qty, min_stock FROM inventory WHERE sid=?", conn, params=(SID,))
+    lines = pd.read_sql("SELECT si.inv_id, s.ts, si.qty FROM sales s JOIN sale_items si ON si.sale_id = s.id "
+                        "WHERE s.sid=? AND s.ts >= ?", conn, params=(SID, since))
+    sold = lines.groupby("inv_id")["qty"].sum() / window
+    inv["v"] = inv["id"].map(sold).fillna(0)
+    return inv[(inv["qty"] <= inv["min_stock"].fillna(5)) | (inv["qty"] < inv["v"] * COVER_DAYS)]
+
+
+def reference_velocity(rows, today, window=WINDOW_DAYS, half_life=HALF_LIFE_DAYS):
+    norm = sum(0.5 ** (a / half_life) for a in range(window))
+    out = {}
+    for inv_id, day, qty in rows:
+        age = min(max((today - date.fromisoformat(day)).days, 0), window - 1)
+        out[inv_id] = out.get(inv_id, 0.0) + qty * 0.5 ** (age / half_life)
+    return {k: v / norm for k, v in out.items()}
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        runs.append((time.perf_counter() - t) * 1000)
+    runs.sort()
+    return result, runs[len(runs) // 2]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Réassort : alertes incrémentales et vitesse de vente")
+    ap.add_argument("--skus", type=int, default=10000)
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--sales", type=int, default=300, help="ventes par jour d'historique")
+    ap.add_argument("--live", type=int, default=500, help="ventes CAISSE après l'historique")
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+    rnd = random.Random(11)
+    today = date.today()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        init_database(db)
+        t = time.perf_counter()
+        items = seed(db, args.skus, args.days, args.sales, rnd)
+        print(f"Historique : {args.skus:,} articles, {args.days * args.sales:,} ventes en {time.perf_counter() - t:.1f} s")
+        checks = {}
+        with db.read() as conn:
+            checks["low_stock = recalcul complet (historique)"] = low_set(conn) == scan_set(conn)
+            n_low, t_count = timed(lambda: low_stock_count(conn, SID), args.repeat)
+            _, t_scan = timed(lambda: scan_set(conn), args.repeat)
+            df, t_list = timed(lambda: reorder_list(conn, SID, today), args.repeat)
+            _, t_naive = timed(lambda: naive_reorder(conn, today), args.repeat)
+            since = (today - timedelta(days=WINDOW_DAYS - 1)).isoformat()
+            rows = recent_sales(conn, SID, since)
+            checks["daily_item_sales = regroupement des lignes de vente"] = set(rows) == joined_sales(conn, since)
+        ids, vel = velocity(rows, today)
+        ref = reference_velocity(rows, today)
+        checks["vitesse NumPy = référence Python"] = (set(ids.tolist()) == set(ref)
+                                                      and all(abs(v - ref[i]) < 1e-9 for i, v in zip(ids.tolist(), vel)))
+        print(f"ACCUEIL compte sous le seuil : {n_low} articles, p50 {t_count:.2f} ms (parcours complet {t_scan:.2f} ms)")
+        print(f"Liste de réassort : {len(df):,} lignes, {df['Coût estimé'].sum():,.2f} $, p50 {t_list:.1f} ms "
+              f"(calcul naïf en pandas {t_naive:.1f} ms)")
+
+        # Vie courante : ventes CAISSE, réassorts, changements de seuil
+        svc = Services.build(db)
+        lat, refused = [], 0
+        for k in range(args.live):
+            picked = {i[0]: i for i in rnd.sample(items[:500], rnd.randint(1, 4))}.values()
+            lines = [CartLine(i, it, rnd.randint(1, 5), p, b) for i, it, p, b in picked]
+            t = time.perf_counter()
+            try:
+                svc.sales.checkout(SID, "bench", lines, "COMPTANT", sum(l.q * l.p for l in lines), "USD")
+            except StockError:
+                refused += 1
+            lat.append((time.perf_counter() - t) * 1000)
+            if k % 5 == 0:
+                _, it, p, b = rnd.choice(items)
+                svc.inventory.restock(SID, "bench", it, "GÉNÉRAL", rnd.randint(1, 50), b, p)
+            if k % 10 == 0:
+                with db.write() as conn:
+                    conn.execute("UPDATE inventory SET min_stock=? WHERE id=?", (rnd.randint(0, 30), rnd.choice(items)[0]))
+        lat.sort()
+        print(f"CAISSE avec triggers de seuil : {len(lat)} ventes ({refused} refusées), p50 {lat[len(lat) // 2]:.2f} ms, "
+              f"p95 {lat[int(len(lat) * 0.95)]:.2f} ms")
+        with db.read() as conn:
+            low, scan = low_set(conn), scan_set(conn)
+            floors = dict(conn.execute("SELECT id, COALESCE(min_stock, 5) FROM inventory WHERE sid=?", (SID,)))
+            listed = set(reorder_list(conn, SID, today)["id"].tolist())
+        checks["low_stock = recalcul complet (après CAISSE et réassorts)"] = low == scan
+        checks["articles au seuil dans la liste"] = {i for i in low if floors[i] > 0} <= listed
+        db.close()
+        for label, good in checks.items():
+            print(f"  {'✅' if good else '❌'} {label}")
+        ok = all(checks.values())
+        print("✅ Alertes et suggestions cohérentes." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# ==============================================================================
+# 💎 BALIKA ERP - LATENCE PAR RERUN (PAGE DE CONNEXION ET CAISSE)
+# ------------------------------------------------------------------------------
+# Exécute balika-app.py sans navigateur (streamlit.testing AppTest) et mesure
+# le temps serveur d'un rerun complet, médiane et p95 sur --reruns passages.
+#
+#   python bench/bench_rerun_latency.py --skus 5000 --reruns 50
+# ==============================================================================
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from balika.schema import create_tables, migrate  # noqa: E402
+
+APP = os.path.join(ROOT, "balika-app.py")
+
+
+def seed(path, skus):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    create_tables(conn.cursor())
+    migrate(conn)
+    conn.execute("INSERT INTO shops (sid, name) VALUES ('bench', 'BENCH')")
+    conn.executemany("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES (?, 50, 1, 2, 'bench')",
+                     [(f"ARTICLE {i:05d}",) for i in range(skus)])
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def timed_reruns(at, n):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - t0) * 1000)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    from streamlit.testing.v1 import AppTest
+
+    ap = argparse.ArgumentParser(description="Latence serveur par rerun Streamlit")
+    ap.add_argument("--skus", type=int, default=2000)
+    ap.add_argument("--reruns", type=int, default=30)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # DB_FILE est relatif au répertoire courant
+        seed(os.path.join(tmp, "balika_v650_master.db"), args.skus)
+
+        at = AppTest.from_file(APP, default_timeout=120)
+        at.run()
+        med, p95 = timed_reruns(at, args.reruns)
+        print(f"{'CONNEXION':<10} médiane {med:8.1f} ms   p95 {p95:8.1f} ms")
+
+        at = AppTest.from_file(APP, default_timeout=120)
+        at.session_state["session"] = {'logged_in': True, 'user': 'bench', 'role': 'GERANT', 'shop_id': 'bench',
+                                       'cart': {}, 'viewing_invoice': None, 'msg_count': 0, 'name': 'BENCH'}
+        at.run()
+        radio = at.sidebar.radio[0]
+        radio.set_value(next(o for o in radio.options if "CAISSE" in o))
+        at.run()
+        med, p95 = timed_reruns(at, args.reruns)
+        print(f"{'CAISSE':<10} médiane {med:8.1f} ms   p95 {p95:8.1f} ms   ({args.skus} articles)")
+
+
+if __name__ == "__main__":
+    main()
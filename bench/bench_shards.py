@@ -0,0 +1,148 @@
+# ==============================================================================
+# 💎 BALIKA ERP - DÉBIT D'ÉCRITURE : BASE UNIQUE VS UN FICHIER PAR BOUTIQUE
+# ------------------------------------------------------------------------------
+# Une caisse par boutique encaisse en boucle (SalesService.checkout, 1 à 4
+# lignes) pendant --duration s, pour 1, 2, 4, 8 boutiques. Deux stockages :
+#   - single : toutes les boutiques dans un seul fichier (un écrivain) ;
+#   - shards : catalogue + un fichier par boutique (balika.shards.ShardRouter).
+# Les caisses sont des threads d'un même processus (comme Streamlit) ou, avec
+# --processes, des processus séparés (plusieurs workers derrière un proxy) :
+# en base unique ils se disputent alors le verrou du fichier.
+# --synchronous FULL : chaque commit attend le disque (fsync), cas d'un serveur
+# où l'écriture est bornée par les E/S et non par le CPU ; les fichiers séparés
+# font alors leurs fsync en parallèle.
+# Vérifie ensuite, boutique par boutique : ventes comptées = lignes sales et
+# stock initial = stock restant + quantités vendues.
+#
+#   python bench/bench_shards.py --shops 1 2 4 8 --duration 5 --processes --synchronous FULL
+# ==============================================================================
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika import db as balika_db  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.schema import create_tables, migrate  # noqa: E402
+from balika.services import CartLine, Services, StockError  # noqa: E402
+from balika.shards import ShardRouter  # noqa: E402
+
+SKUS = 200
+STOCK = 10 ** 6
+
+
+def set_synchronous(level):
+    # Réglage de mesure : remplace le pragma par défaut (NORMAL) des connexions ouvertes ensuite
+    balika_db.PRAGMAS = tuple((n, level if n == "synchronous" else v) for n, v in balika_db.PRAGMAS)
+
+
+def open_store(mode, root):
+    if mode == "shards":
+        return ShardRouter(os.path.join(root, "catalog.db"), os.path.join(root, "shards"))
+    db = Database(os.path.join(root, "single.db"))
+    with db.write() as conn:
+        create_tables(conn.cursor())
+        migrate(conn)
+    return db
+
+
+def seed(store, sids):
+    with store.catalog.write() as conn:
+        conn.executemany("INSERT INTO shops (sid, name) VALUES (?,?)", [(s, s) for s in sids])
+    for sid in sids:
+        with store.shop(sid).write() as conn:
+            conn.executemany("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES (?,?,?,?,?)",
+                             [(f"ARTICLE {i:04d}", STOCK, 1.0, 2.0, sid) for i in range(SKUS)])
+
+
+def cashier(store, sid, start_at, duration, seed_n):
+    """Encaisse en boucle de start_at à start_at + duration ; retourne le nombre de ventes."""
+    svc = Services.build(store)
+    with store.shop(sid).read() as conn:
+        items = conn.execute("SELECT id, item, sell_price, buy_price FROM inventory WHERE sid=?", (sid,)).fetchall()
+    rnd = random.Random(seed_n)
+    time.sleep(max(0.0, start_at - time.time()))
+    n, stop = 0, start_at + duration
+    while time.time() < stop:
+        lines = [CartLine(i, it, rnd.randint(1, 3), p, b) for i, it, p, b in rnd.sample(items, rnd.randint(1, 4))]
+        try:
+            svc.sales.checkout(sid, "bench", lines, "COMPTANT", sum(l.q * l.p for l in lines), "USD")
+        except StockError:
+            continue
+        n += 1
+    return n
+
+
+def _process_cashier(args):
+    mode, root, sid, start_at, duration, seed_n, sync = args
+    set_synchronous(sync)
+    store = open_store(mode, root)
+    try:
+        return cashier(store, sid, start_at, duration, seed_n)
+    finally:
+        store.close()
+
+
+def run(mode, root, shops, duration, processes, sync):
+    sids = [f"shop{i}" for i in range(shops)]
+    store = open_store(mode, root)
+    seed(store, sids)
+    start_at = time.time() + (1.5 if processes else 0.2)
+    if processes:
+        with multiprocessing.get_context("spawn").Pool(shops) as pool:
+            counts = pool.map(_process_cashier, [(mode, root, s, start_at, duration, n, sync) for n, s in enumerate(sids)])
+    else:
+        counts = [0] * shops
+
+        def work(n, sid):
+            counts[n] = cashier(store, sid, start_at, duration, n)
+        threads = [threading.Thread(target=work, args=(n, s)) for n, s in enumerate(sids)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    ok = all(check(store, sid, count) for sid, count in zip(sids, counts))
+    store.close()
+    return sum(counts) / duration, ok
+
+
+def check(store, sid, count):
+    with store.shop(sid).read() as conn:
+        sales = conn.execute("SELECT COUNT(*) FROM sales WHERE sid=?", (sid,)).fetchone()[0]
+        left = conn.execute("SELECT SUM(qty) FROM inventory WHERE sid=?", (sid,)).fetchone()[0]
+        sold = conn.execute("SELECT COALESCE(SUM(qty), 0) FROM sale_items WHERE sid=?", (sid,)).fetchone()[0]
+    return sales == count and left + sold == SKUS * STOCK
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Débit d'écriture : base unique vs un fichier par boutique")
+    ap.add_argument("--shops", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--duration", type=float, default=5.0)
+    ap.add_argument("--processes", action="store_true", help="une caisse par processus au lieu d'un thread")
+    ap.add_argument("--synchronous", choices=("NORMAL", "FULL"), default="NORMAL")
+    ap.add_argument("--dir", help="dossier des bases (par défaut : temporaire du système)")
+    args = ap.parse_args()
+    set_synchronous(args.synchronous)
+
+    print(f"Caisses : {'processus' if args.processes else 'threads'}, synchronous={args.synchronous}, "
+          f"{args.duration:.0f} s par mesure, {os.cpu_count()} CPU")
+    print(f"{'boutiques':>9} {'single v/s':>11} {'shards v/s':>11} {'gain':>6}")
+    ok = True
+    for shops in args.shops:
+        rates = {}
+        for mode in ("single", "shards"):
+            with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+                rates[mode], good = run(mode, tmp, shops, args.duration, args.processes, args.synchronous)
+                ok &= good
+        print(f"{shops:>9} {rates['single']:>11.0f} {rates['shards']:>11.0f} {rates['shards'] / max(rates['single'], 1e-9):>5.2f}x")
+    print("✅ Ventes et stocks cohérents." if ok else "❌ Incohérence détectée.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# ==============================================================================
+# 💎 BALIKA ERP - TERMINAUX HORS LIGNE : BOUT EN BOUT CONTRE UNE INGESTION LOCALE
+# ------------------------------------------------------------------------------
+# Une base centrale (une boutique), --terminals terminaux provisionnés par copie
+# de la base centrale, chacun avec son outbox et son SyncWorker.
+#   1. hors ligne (port fermé) : chaque terminal encaisse --sales ventes (dont
+#      des ventes à crédit et l'article RARE, vendu plus de fois qu'il n'y en a),
+#      règle des dettes, saisit des dépenses et des retours ; latence de la
+#      CAISSE locale ;
+#   2. l'ingestion démarre sur ce port, avec des pannes injectées : --fail %
+#      de réponses 503, --drop % de lots appliqués puis connexion coupée avant
+#      la réponse (le terminal renvoie le lot : déduplication par uid) ;
+#   3. attente de la vidange des files, puis contrôle : mêmes ventes, mêmes
+#      totaux, mêmes dépenses, retours (et leurs remboursements dans le journal
+#      de caisse) et encours au central que sur les terminaux,
+#      chaque enregistrement ingéré une seule fois, stock central = stock
+#      initial - ventes + retours (0 pour RARE, conflit noté et stock terminal
+#      aligné).
+#
+# --shards : terminaux partitionnés (balika.shards : catalogue + un fichier par
+# boutique), la file de chaque boutique vit dans son fichier.
+#
+#   python bench/bench_sync.py --terminals 3 --sales 300 --fail 20 --drop 10 [--shards]
+# ==============================================================================
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.db import Database  # noqa: E402
+from balika.ingest import IngestHandler, make_server  # noqa: E402
+from balika.outbox import Outbox, SyncWorker  # noqa: E402
+from balika.services import CartLine, Services  # noqa: E402
+from balika.shards import ShardRouter, init_database, split  # noqa: E402
+
+SID = "shop0"
+SKUS = 50
+STOCK = 10 ** 5
+RARE = ("RARE", 3)     # article, stock central
+
+
+class FlakyHandler(IngestHandler):
+    """Ingestion réelle, précédée de pannes tirées au hasard."""
+
+    def do_POST(self):
+        roll = self.server.rnd.random() * 100
+        if roll < self.server.fail:
+            return self._send(503, {'error': "indisponible"})
+        if roll < self.server.fail + self.server.drop:
+            self.server.dropped += 1
+            self._send = lambda code, body: None      # lot appliqué, réponse perdue
+            super().do_POST()
+            self.close_connection = True
+            return
+        super().do_POST()
+
+
+def seed_central(path):
+    db = Database(path)
+    init_database(db)
+    with db.write() as conn:
+        conn.execute("INSERT INTO shops (sid, name) VALUES (?,?)", (SID, "BOUTIQUE"))
+        conn.executemany("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES (?,?,?,?,?)",
+                         [(f"ARTICLE {i:03d}", STOCK, 1.0, 2.5, SID) for i in range(SKUS)] + [(RARE[0], RARE[1], 5.0, 9.0, SID)])
+    return db
+
+
+def provision(central, path, shards=False):
+    # Terminal = copie cohérente de la base centrale (API backup SQLite), découpée si --shards
+    dst = sqlite3.connect(path)
+    with central.read() as conn:
+        conn.backup(dst)
+    dst.close()
+    if not shards:
+        return Database(path)
+    root = os.path.splitext(path)[0]
+    split(path, root + "-catalog.db", root + "-shards", progress=lambda *_: None)
+    return ShardRouter(root + "-catalog.db", root + "-shards")
+
+
+def free_port():
+    server = make_server(None, port=0)
+    port = server.server_port
+    server.server_close()
+    return port
+
+
+def run_terminal(n, db, svc, sales, rnd, lat):
+    with db.shop(SID).read() as conn:
+        items = conn.execute("SELECT id, item, sell_price, buy_price FROM inventory WHERE sid=? AND item != ?",
+                             (SID, RARE[0])).fetchall()
+        rare = conn.execute("SELECT id, item, sell_price, buy_price FROM inventory WHERE item=?", (RARE[0],)).fetchone()
+    user = f"caisse{n}"
+    for k in range(sales):
+        picked = rnd.sample(items, rnd.randint(1, 4))
+        lines = [CartLine(i, it, rnd.randint(1, 3), p, b) for i, it, p, b in picked]
+        if k == 0:
+            lines.append(CartLine(rare[0], rare[1], 2, rare[2], rare[3]))   # chaque terminal vend 2 RARE sur 3
+        total = sum(l.q * l.p for l in lines)
+        credit = k % 7 == 0
+        client = f"CLIENT T{n}-{k % 5}" if credit else "COMPTANT"
+        t = time.perf_counter()
+        sale = svc.sales.checkout(SID, user, lines, client, round(total / 2, 2) if credit else total, "USD")
+        lat.append((time.perf_counter() - t) * 1000)
+        if k % 20 == 19:
+            svc.sales.record_return(SID, user, sale.ref, lines[0].item, 1)
+        if k % 25 == 24:
+            svc.sales.record_expense(SID, user, "TRANSPORT", round(rnd.uniform(1, 20), 2))
+        if credit and k % 3 == 0:
+            svc.debts.pay_client(SID, user, client, round(total / 4, 2))
+
+
+def totals(db):
+    with db.shop(SID).read() as conn:
+        return {'sales': conn.execute("SELECT COUNT(*), ROUND(SUM(total_usd), 2) FROM sales WHERE sid=?", (SID,)).fetchone(),
+                'refs': {r[0] for r in conn.execute("SELECT ref FROM sales WHERE sid=?", (SID,))},
+                'returns': conn.execute("SELECT COUNT(*), ROUND(COALESCE(SUM(refund_amount), 0), 2) FROM returns WHERE sid=?",
+                                        (SID,)).fetchone(),
+                'refunds': conn.execute("SELECT ROUND(COALESCE(SUM(amount_usd), 0), 2) FROM cash_movements WHERE sid=? AND kind='RETOUR'",
+                                        (SID,)).fetchone()[0],
+                'back': dict(conn.execute("SELECT item, SUM(qty) FROM returns WHERE sid=? GROUP BY item", (SID,)).fetchall()),
+                'expenses': conn.execute("SELECT ROUND(COALESCE(SUM(amount), 0), 2) FROM expenses WHERE sid=?", (SID,)).fetchone()[0],
+                'debt': conn.execute("SELECT ROUND(COALESCE(SUM(balance), 0), 2) FROM clients WHERE sid=?", (SID,)).fetchone()[0],
+                'sold': dict(conn.execute("SELECT item, SUM(qty) FROM sale_items WHERE sid=? GROUP BY item", (SID,)).fetchall()),
+                'stock': dict(conn.execute("SELECT item, qty FROM inventory WHERE sid=?", (SID,)).fetchall())}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Terminaux hors ligne : synchro de bout en bout")
+    ap.add_argument("--terminals", type=int, default=3)
+    ap.add_argument("--sales", type=int, default=300, help="ventes par terminal")
+    ap.add_argument("--fail", type=float, default=20.0, help="%% de lots refusés (503)")
+    ap.add_argument("--drop", type=float, default=10.0, help="%% de lots appliqués dont la réponse est perdue")
+    ap.add_argument("--batch", type=int, default=50)
+    ap.add_argument("--shards", action="store_true", help="terminaux partitionnés par boutique")
+    args = ap.parse_args()
+    rnd = random.Random(5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        central = seed_central(os.path.join(tmp, "central.db"))
+        port = free_port()
+        url = f"http://127.0.0.1:{port}/ingest"
+        terms = []
+        for n in range(1, args.terminals + 1):
+            db = provision(central, os.path.join(tmp, f"T{n}.db"), args.shards)
+            worker = SyncWorker(db, url, batch_size=args.batch, interval=0.2, base_delay=0.05, max_delay=0.5, timeout=5.0)
+            terms.append((n, db, Services.build(db, outbox=Outbox(f"T{n}")), worker))
+
+        # 1. Hors ligne
+        lat = []
+        for n, db, svc, _ in terms:
+            run_terminal(n, db, svc, args.sales, rnd, lat)
+        lat.sort()
+        time.sleep(1.0)
+        offline = [w.status() for *_, w in terms]
+        print(f"Hors ligne : {len(lat)} ventes locales, p50 {lat[len(lat) // 2]:.2f} ms, p95 {lat[int(len(lat) * 0.95)]:.2f} ms ; "
+              f"file {sum(s['depth'] for s in offline)} enregistrements, retard max {max(s['lag_s'] for s in offline):.1f} s, "
+              f"{sum(s['retries'] for s in offline)} essais échoués")
+
+        # 2. Ingestion disponible, avec pannes
+        server = make_server(central, port=port, handler=FlakyHandler)
+        server.rnd, server.fail, server.drop, server.dropped = random.Random(9), args.fail, args.drop, 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        t0 = time.perf_counter()
+        drained = all(w.drain(timeout=120) for *_, w in terms)
+        drain_s = time.perf_counter() - t0
+        stats = [w.status() for *_, w in terms]
+        alive = all(w._thread.is_alive() for *_, w in terms)
+        for *_, w in terms:
+            w.close()
+        server.shutdown()
+        server.server_close()
+        # Un lot dont la réponse est perdue est renvoyé : ses enregistrements reviennent "duplicate", acquittés une fois
+        records = sum(s['sent'] for s in stats)
+        print(f"Synchro : {records} enregistrements en {drain_s:.2f} s, {sum(s['retries'] for s in stats)} essais échoués, "
+              f"{server.dropped} réponses perdues, {sum(s['duplicates'] for s in stats)} doublons ignorés, "
+              f"{sum(s['conflicts'] for s in stats)} conflit(s) de stock")
+
+        # 3. Contrôles
+        local = [totals(db) for _, db, _, _ in terms]
+        remote = totals(central)
+        with central.read() as conn:
+            ingested = conn.execute("SELECT COUNT(*), COUNT(DISTINCT uid) FROM ingested").fetchone()
+            conflicts = conn.execute("SELECT COUNT(*) FROM sync_conflicts WHERE sid=?", (SID,)).fetchone()[0]
+        depth_after = sum(w.status()['depth'] for *_, w in terms)
+        sold, back = {}, {}
+        for t in local:
+            for item, q in t['sold'].items():
+                sold[item] = sold.get(item, 0) + q
+            for item, q in t['back'].items():
+                back[item] = back.get(item, 0) + q
+        expect_stock = {it: max(0, (RARE[1] if it == RARE[0] else STOCK) - sold.get(it, 0)) + back.get(it, 0)
+                        for it in remote['stock']}
+        rare_local = [t['stock'][RARE[0]] for t in local]
+        checks = {
+            "files vidées": drained and depth_after == 0,
+            "threads d'envoi vivants": alive,
+            "mêmes ventes": remote['refs'] == set().union(*(t['refs'] for t in local)),
+            "même CA": abs(remote['sales'][1] - sum(t['sales'][1] for t in local)) < 0.01,
+            "mêmes dépenses": abs(remote['expenses'] - sum(t['expenses'] for t in local)) < 0.01,
+            "mêmes retours": (remote['returns'][0] == sum(t['returns'][0] for t in local) > 0
+                              and abs(remote['returns'][1] - sum(t['returns'][1] for t in local)) < 0.01),
+            "remboursements au journal de caisse": abs(remote['refunds'] - sum(t['refunds'] for t in local)) < 0.01
+                                                   and abs(remote['refunds'] + remote['returns'][1]) < 0.01,
+            "même encours": abs(remote['debt'] - sum(t['debt'] for t in local)) < 0.01,
+            "ingestion unique": ingested[0] == ingested[1] == records,
+            "stock central": remote['stock'] == expect_stock,
+            "conflit RARE noté et stock terminal aligné": conflicts >= 1 and 0 in rare_local,
+        }
+        for db in [central] + [db for _, db, _, _ in terms]:
+            db.close()
+        for label, good in checks.items():
+            print(f"  {'✅' if good else '❌'} {label}")
+        ok = all(checks.values())
+        print("✅ Synchro cohérente." if ok else "❌ Incohérence détectée.")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# ==============================================================================
+# 💎 BALIKA ERP - COÛT DE LA TÉLÉMÉTRIE SUR LES REQUÊTES CHAUDES
+# ------------------------------------------------------------------------------
+# Même série de lectures typiques (connexion, tuiles ACCUEIL, recherche CAISSE,
+# page de grille) avec : pool sans télémétrie, télémétrie désactivée
+# (BALIKA_TELEMETRY=0) et télémétrie active. Affiche µs par requête et surcoût.
+#
+#   python bench/bench_telemetry.py --rounds 5000
+# ==============================================================================
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.dates import today_bounds  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.paging import fetch_page  # noqa: E402
+from balika.schema import create_tables, migrate  # noqa: E402
+from balika.search import search_inventory  # noqa: E402
+from balika.stats import shop_totals  # noqa: E402
+from balika.telemetry import Telemetry  # noqa: E402
+
+WORDS = ("SAVON", "RIZ", "HUILE", "SUCRE", "FARINE", "CÂBLE", "CHARGEUR", "PAGNE", "CAHIER", "STYLO")
+
+
+def seed(path, skus):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    create_tables(conn.cursor())
+    migrate(conn)
+    conn.execute("INSERT INTO users (uid, pwd, role, shop, status, name) VALUES ('shop0', 'x', 'GERANT', 'shop0', 'ACTIF', 'B')")
+    conn.executemany("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES (?, 10, 1, 2, 'shop0')",
+                     [(f"{WORDS[i % len(WORDS)]} {i:05d}",) for i in range(skus)])
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def workload(db, rounds, rnd):
+    lo, hi = today_bounds()
+    n = 0
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        with db.read() as conn:
+            conn.execute("SELECT pwd, role, shop, status, name FROM users WHERE uid=?", ("shop0",)).fetchone()
+            shop_totals(conn, "shop0", lo, hi)
+            search_inventory(conn, "shop0", rnd.choice(WORDS)[:3])
+            fetch_page(conn, "inventory", ["item", "qty", "sell_price"], "sid=?", ("shop0",), "item", False, None, 50)
+        n += 4
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Surcoût de la télémétrie par requête")
+    ap.add_argument("--rounds", type=int, default=3000)
+    ap.add_argument("--skus", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.skus)
+        configs = (("sans télémétrie", None), ("BALIKA_TELEMETRY=0", Telemetry(enabled=False)),
+                   ("télémétrie active", Telemetry()))
+        dbs = {label: Database(path, readers=1, telemetry=tel) for label, tel in configs}
+        for db in dbs.values():
+            workload(db, 200, random.Random(0))  # chauffe
+        # Passes alternées, meilleure des --repeat : le bruit de la machine pèse sur toutes les variantes
+        tel = configs[-1][1]
+        tel.reset()
+        results = {}
+        for _ in range(args.repeat):
+            for label, _ in configs:
+                us = workload(dbs[label], args.rounds, random.Random(1))
+                results[label] = min(us, results.get(label, us))
+        for db in dbs.values():
+            db.close()
+        base = results["sans télémétrie"]
+        for label, us in results.items():
+            print(f"{label:<20} {us:8.1f} µs/requête  ({us - base:+6.1f} µs, {(us - base) / base * 100:+5.1f} %)")
+        print(f"Requêtes distinctes suivies : {len(tel.query_stats(top=1000))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+# ==============================================================================
+# 💎 BALIKA ERP - GÉNÉRATEUR DE CHARGE SANS NAVIGATEUR
+# ------------------------------------------------------------------------------
+# 1. seed : remplit une base avec N boutiques, leurs articles et des années de
+#    ventes (lignes sale_items), dettes, dépenses et retours.
+# 2. replay : un pool de threads rejoue, via balika.services, les accès des
+#    pages (connexion, CAISSE, recherche article, ACCUEIL, RAPPORTS, tableau de
+#    bord admin, RETOURS, DETTES, CLÔTURE) sur un seul pool Database partagé
+#    (ou un ShardRouter avec --shards), comme le processus Streamlit.
+# 3. rapport : p50/p95/p99 et débit par opération, sauvegardés en JSON pour
+#    comparer deux versions (--baseline ancien.json => écart p95 par opération,
+#    code retour 1 au-delà de --tolerance %).
+#
+# Seule la couche données est mesurée (pas le rendu Streamlit : voir
+# bench_rerun_latency.py).
+#
+#   python bench/loadgen.py --shops 10 --skus 800 --years 2 --workers 16 --duration 30 --out run.json
+#   python bench/loadgen.py --db seed.db --keep ...           (réutilise une base déjà générée)
+#   python bench/loadgen.py --shards ...   (base générée puis découpée : catalogue + un fichier par boutique)
+# ==============================================================================
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from balika.audit import AuditLogger  # noqa: E402
+from balika.dates import day_bounds, last_days, now_ts, today_bounds  # noqa: E402
+from balika.db import Database  # noqa: E402
+from balika.paging import fetch_page  # noqa: E402
+from balika.schema import create_tables, migrate  # noqa: E402
+from balika.services import CartLine, DebtError, Services, StockError  # noqa: E402
+from balika.shards import ShardRouter, split  # noqa: E402
+from balika.stats import rebuild_daily_stats  # noqa: E402
+
+PASSWORD = "bench"
+CATEGORIES = ("BOISSONS", "ALIMENTATION", "HYGIÈNE", "ÉLECTRONIQUE", "TEXTILE", "QUINCAILLERIE", "PAPETERIE")
+WORDS = ("SAVON", "RIZ", "HUILE", "SUCRE", "FARINE", "CÂBLE", "CHARGEUR", "PAGNE", "CAHIER", "STYLO",
+         "BIÈRE", "JUS", "LAIT", "SEL", "CLOU", "AMPOULE", "PILE", "TORCHE", "SAC", "BOUGIE")
+CLIENTS = tuple(f"CLIENT {i:03d}" for i in range(200))
+
+# Poids des opérations : une caisse encaisse et cherche bien plus qu'elle ne consulte les rapports
+MIX = {"login": 2, "caisse": 30, "recherche": 40, "accueil": 10, "rapports": 5, "dashboard": 2, "retour": 3,
+       "dette": 3, "cloture": 1}
+
+
+def sid_of(s):
+    return f"shop{s:03d}"
+
+
+def item_name(i):
+    return f"{WORDS[i % len(WORDS)]} {CATEGORIES[i % len(CATEGORIES)][:4]} {i:05d}"
+
+
+# ------------------------------------------------------------------------------
+# 1. GÉNÉRATION DES DONNÉES
+# ------------------------------------------------------------------------------
+def seed(path, shops, skus, years, sales_per_day, rnd):
+    """Remplit `path` ; retourne le nombre de lignes par table."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("BEGIN")
+    create_tables(conn.cursor())
+    migrate(conn)
+    pwd = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    conn.executemany("INSERT INTO users (uid, pwd, role, shop, status, name) VALUES (?,?,'GERANT',?,'ACTIF',?)",
+                     [(sid_of(s), pwd, sid_of(s), f"BOUTIQUE {s}") for s in range(shops)])
+    conn.executemany("INSERT INTO shops (sid, name) VALUES (?,?)", [(sid_of(s), f"BOUTIQUE {s}") for s in range(shops)])
+    conn.execute("COMMIT")
+
+    catalog = []  # (prix achat, prix vente) par indice d'article, commun à toutes les boutiques
+    for i in range(skus):
+        buy = round(rnd.uniform(0.5, 40), 2)
+        catalog.append((buy, round(buy * rnd.uniform(1.1, 1.6), 2)))
+
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=int(365 * years))
+    days = (datetime.now() - start).days
+    counts = dict.fromkeys(("inventory", "sales", "sale_items", "debts", "expenses", "returns"), 0)
+    sale_id = 0
+    for s in range(shops):
+        sid = sid_of(s)
+        conn.execute("BEGIN")
+        # ~5 % des articles en rupture, pour que la recherche « en stock » filtre vraiment
+        conn.executemany("""INSERT INTO inventory (id, item, category, qty, buy_price, sell_price, sid, barcode)
+                            VALUES (?,?,?,?,?,?,?,?)""",
+                         [(s * skus + i + 1, item_name(i), CATEGORIES[i % len(CATEGORIES)],
+                           0 if rnd.random() < 0.05 else rnd.randint(10_000, 100_000),
+                           catalog[i][0], catalog[i][1], sid, f"{s:03d}{i:09d}") for i in range(skus)])
+        counts["inventory"] += skus
+        n_ref = 0
+        for d in range(days):
+            day = start + timedelta(days=d)
+            sales, lines, debts, exps, rets = [], [], [], [], []
+            for _ in range(max(0, int(rnd.gauss(sales_per_day, sales_per_day / 4)))):
+                sale_id += 1
+                n_ref += 1
+                ref = f"B-{n_ref:06d}"
+                at = day + timedelta(seconds=rnd.randint(7 * 3600, 20 * 3600))
+                ts = now_ts(at)
+                total = profit = 0.0
+                basket = []
+                for i in rnd.sample(range(skus), rnd.randint(1, 4)):
+                    q = rnd.randint(1, 5)
+                    buy, sell = catalog[i]
+                    total += q * sell
+                    profit += q * (sell - buy)
+                    basket.append((item_name(i), q, sell))
+                    lines.append((sale_id, s * skus + i + 1, item_name(i), q, sell, buy, sid))
+                credit = rnd.random() < 0.1
+                cli = rnd.choice(CLIENTS) if credit else "COMPTANT"
+                paid = round(total * rnd.uniform(0, 0.7), 2) if credit else total
+                sales.append((sale_id, ref, cli, total, paid, total - paid, at.strftime("%d/%m/%Y"), at.strftime("%H:%M"),
+                              sid, sid, "USD", profit, ts))
+                if credit:
+                    settled = rnd.random() < 0.6
+                    debts.append((cli, 0 if settled else total - paid, ref, sid, "SOLDE" if settled else "OUVERT",
+                                  at.strftime("%d/%m/%Y"), ts, ts))
+                if rnd.random() < 0.01:
+                    it, q, sell = basket[0]
+                    rets.append((ref, it, 1, at.strftime("%d/%m/%Y"), sid, ts, sell))
+            for k in range(rnd.randint(0, 3)):
+                at = day + timedelta(hours=8 + k)
+                exps.append((rnd.choice(("LOYER", "TRANSPORT", "ÉLECTRICITÉ", "SALAIRE")), round(rnd.uniform(5, 200), 2),
+                             at.strftime("%d/%m/%Y"), sid, sid, now_ts(at)))
+            conn.executemany("""INSERT INTO sales (id, ref, cli, total_usd, paid_usd, rest_usd, date, time, seller, sid,
+                                                   currency, profit, ts) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""", sales)
+            conn.executemany("""INSERT INTO sale_items (sale_id, inv_id, item, qty, unit_price, buy_price, sid)
+                                VALUES (?,?,?,?,?,?,?)""", lines)
+            conn.executemany("""INSERT INTO debts (cli, balance, sale_ref, sid, status, last_update, ts, updated_ts)
+                                VALUES (?,?,?,?,?,?,?,?)""", debts)
+            conn.executemany("INSERT INTO expenses (label, amount, date, sid, user, ts) VALUES (?,?,?,?,?,?)", exps)
+            conn.executemany("INSERT INTO returns (sale_ref, item, qty, date, sid, ts, refund_amount) VALUES (?,?,?,?,?,?,?)", rets)
+            for name, rows in (("sales", sales), ("sale_items", lines), ("debts", debts), ("expenses", exps), ("returns", rets)):
+                counts[name] += len(rows)
+        conn.execute("INSERT INTO shop_counters (sid, last_ref) VALUES (?,?)", (sid, n_ref))
+        conn.execute("COMMIT")
+    # Les triggers ont compté les dettes à leur solde courant : on repart de l'historique
+    conn.execute("BEGIN")
+    rebuild_daily_stats(conn)
+    conn.execute("COMMIT")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+
+# ------------------------------------------------------------------------------
+# 2. OPÉRATIONS (mêmes services balika.services que les pages de balika-app.py)
+# ------------------------------------------------------------------------------
+def _load_catalog(db):
+    with db.read() as conn:
+        return (conn.execute("SELECT id, item, sell_price, buy_price FROM inventory").fetchall(),
+                conn.execute("SELECT sid, last_ref FROM shop_counters").fetchall())
+
+
+def _counts(db):
+    with db.read() as conn:
+        return (conn.execute("SELECT COUNT(*) FROM inventory").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0])
+
+
+class Replay:
+    def __init__(self, db, audit, shops, skus):
+        self.db, self.svc, self.shops, self.skus = db, Services.build(db, audit), shops, skus
+        parts = db.fan_out(_load_catalog)
+        self.catalog = {r[0]: r[1:] for items, _ in parts for r in items}
+        self.last_ref = {sid: ref for _, refs in parts for sid, ref in refs}
+
+    def login(self, rnd, sid):
+        self.svc.auth.login(sid, PASSWORD)
+
+    def caisse(self, rnd, sid):
+        s = int(sid[4:])
+        lines = []
+        for i in rnd.sample(range(self.skus), rnd.randint(1, 4)):
+            item, sell, buy = self.catalog[s * self.skus + i + 1]
+            lines.append(CartLine(s * self.skus + i + 1, item, rnd.randint(1, 3), sell, buy))
+        total = sum(l.q * l.p for l in lines)
+        try:
+            self.svc.sales.checkout(sid, sid, lines, "COMPTANT", total, "USD")
+        except StockError:
+            pass
+
+    def recherche(self, rnd, sid):
+        s, i = int(sid[4:]), rnd.randrange(self.skus)
+        if rnd.random() < 0.3:
+            text = f"{s:03d}{i:09d}"  # douchette
+        else:
+            name = item_name(i)
+            text = rnd.choice((name[:3], name[:5], name.split()[0][:4] + " " + name.split()[1][:2]))
+        self.svc.inventory.search(sid, text)
+
+    def accueil(self, rnd, sid):
+        self.svc.reports.shop_totals(sid, *today_bounds())
+
+    def rapports(self, rnd, sid):
+        lo, hi = day_bounds(*last_days(30))
+        with self.db.shop(sid).read() as conn:
+            fetch_page(conn, "sales", ["date", "time", "ref", "cli", "total_usd", "seller"],
+                       "sid=? AND ts >= ? AND ts < ?", (sid, lo, hi), "ts", True, None, 50)
+        cubes = self.svc.reports.analytics(sid, lo, hi)
+        cubes.summary, cubes.by_day, cubes.top(), cubes.bottom()      # ce que la page affiche par défaut
+
+    def dashboard(self, rnd, sid):
+        self.svc.reports.network_totals()
+        self.svc.reports.revenue_by_shop()
+
+    def retour(self, rnd, sid):
+        sale_ref = f"B-{rnd.randint(1, max(1, self.last_ref.get(sid, 1))):06d}"
+        items = self.svc.sales.returnable(sid, sale_ref)
+        if items:
+            self.svc.sales.record_return(sid, sid, sale_ref, rnd.choice(list(items)), 1)
+
+    def dette(self, rnd, sid):
+        try:
+            self.svc.debts.pay_client(sid, sid, rnd.choice(CLIENTS), round(rnd.uniform(1, 50), 2))
+        except DebtError:
+            pass  # client sans dette ouverte dans cette boutique
+
+    def cloture(self, rnd, sid):
+        pos = self.svc.cash.position(sid)
+        self.svc.cash.close(sid, sid, max(0.0, pos.expected['USD']), max(0.0, pos.expected['CDF']))
+
+
+# ------------------------------------------------------------------------------
+# 3. MESURE
+# ------------------------------------------------------------------------------
+def percentile(sorted_ms, p):
+    if not sorted_ms:
+        return None
+    return sorted_ms[min(len(sorted_ms) - 1, int(round(p / 100 * (len(sorted_ms) - 1))))]
+
+
+def run(replay, workers, duration, mix, think_ms, shops, seed_value):
+    names, weights = list(mix), list(mix.values())
+    samples = {n: [] for n in names}
+    errors = {n: 0 for n in names}
+    deadline = time.perf_counter() + duration
+
+    def worker(w):
+        rnd = random.Random(seed_value * 1000 + w)
+        sid = sid_of(w % shops)  # un caissier reste sur sa boutique
+        local = {n: [] for n in names}
+        while time.perf_counter() < deadline:
+            op = rnd.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                getattr(replay, op)(rnd, sid)
+            except Exception:
+                errors[op] += 1
+                continue
+            local[op].append((time.perf_counter() - t0) * 1000)
+            if think_ms:
+                time.sleep(think_ms / 1000)
+        for n in names:
+            samples[n].extend(local[n])
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(workers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    ops = {}
+    for n in names:
+        ms = sorted(samples[n])
+        ops[n] = {'count': len(ms), 'errors': errors[n], 'per_s': round(len(ms) / elapsed, 1),
+                  'mean_ms': round(sum(ms) / len(ms), 3) if ms else None,
+                  **{f"p{p}_ms": (round(percentile(ms, p), 3) if ms else None) for p in (50, 95, 99)}}
+    total = sum(o['count'] for o in ops.values())
+    return elapsed, ops, round(total / elapsed, 1)
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(result, baseline, tolerance):
+    """Affiche l'écart p95 par opération ; retourne la liste des régressions."""
+    worse = []
+    print(f"\nComparaison avec {baseline.get('version')} ({baseline.get('created')}) :")
+    for n, o in result['ops'].items():
+        old = baseline.get('ops', {}).get(n, {}).get('p95_ms')
+        if not old or o['p95_ms'] is None:
+            continue
+        delta = (o['p95_ms'] - old) / old * 100
+        flag = "❌" if delta > tolerance else "  "
+        print(f"{flag} {n:<10} p95 {old:9.2f} -> {o['p95_ms']:9.2f} ms ({delta:+.0f} %)")
+        if delta > tolerance:
+            worse.append(n)
+    return worse
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Charge synthétique sur les chemins de données de l'ERP")
+    ap.add_argument("--db", help="fichier de base (par défaut : temporaire)")
+    ap.add_argument("--keep", action="store_true", help="réutiliser --db s'il existe déjà (pas de génération)")
+    ap.add_argument("--shops", type=int, default=5)
+    ap.add_argument("--skus", type=int, default=500, help="articles par boutique")
+    ap.add_argument("--years", type=float, default=1.0, help="années d'historique")
+    ap.add_argument("--sales-per-day", type=int, default=40, help="ventes par boutique et par jour")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--shards", action="store_true", help="rejouer sur la base découpée par boutique (balika.shards)")
+    ap.add_argument("--duration", type=float, default=20.0, help="durée du rejeu (s)")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="pause entre deux opérations d'un worker")
+    ap.add_argument("--mix", help="poids des opérations, ex: caisse=50,recherche=50")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", help="fichier JSON du résultat")
+    ap.add_argument("--baseline", help="résultat JSON précédent à comparer")
+    ap.add_argument("--tolerance", type=float, default=25.0, help="régression p95 tolérée en %%")
+    args = ap.parse_args()
+
+    mix = dict(MIX)
+    if args.mix:
+        mix = {k: float(v) for k, v in (kv.split("=") for kv in args.mix.split(","))}
+        unknown = set(mix) - set(MIX)
+        if unknown:
+            ap.error(f"opérations inconnues : {', '.join(sorted(unknown))} (connues : {', '.join(MIX)})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db or os.path.join(tmp, "loadgen.db")
+        seeded, seed_s = None, 0.0
+        if not (args.keep and os.path.exists(path)):
+            if os.path.exists(path):
+                ap.error(f"{path} existe déjà (utiliser --keep pour la réutiliser)")
+            t0 = time.perf_counter()
+            seeded = seed(path, args.shops, args.skus, args.years, args.sales_per_day, random.Random(args.seed))
+            seed_s = time.perf_counter() - t0
+            print(f"Génération : {seeded} en {seed_s:.1f} s")
+        if args.shards:
+            t0 = time.perf_counter()
+            split(path, os.path.join(tmp, "catalog.db"), os.path.join(tmp, "shards"), progress=lambda msg: None)
+            print(f"Découpage par boutique : {time.perf_counter() - t0:.1f} s")
+            db = ShardRouter(os.path.join(tmp, "catalog.db"), os.path.join(tmp, "shards"))
+        else:
+            db = Database(path)
+        with db.catalog.read() as conn:
+            shops = conn.execute("SELECT COUNT(*) FROM shops").fetchone()[0]
+        counts = db.fan_out(_counts)
+        skus = sum(c[0] for c in counts) // max(shops, 1)
+        n_sales = sum(c[1] for c in counts)
+        audit = AuditLogger(db)
+        replay = Replay(db, audit, shops, skus)
+        print(f"Rejeu : {args.workers} workers, {args.duration:.0f} s, {shops} boutiques x {skus} articles, {n_sales} ventes")
+        elapsed, ops, total = run(replay, args.workers, args.duration, mix, args.think_ms, shops, args.seed)
+        audit.close()
+        db_mb = sum(os.path.getsize(d.path) for d in db.databases()) / 1e6
+        db.close()
+
+    print(f"\n{'opération':<10} {'nb':>8} {'err':>5} {'/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for n, o in ops.items():
+        if o['count']:
+            print(f"{n:<10} {o['count']:>8} {o['errors']:>5} {o['per_s']:>8.1f} {o['p50_ms']:>9.2f} {o['p95_ms']:>9.2f} {o['p99_ms']:>9.2f}")
+    print(f"{'TOTAL':<10} {sum(o['count'] for o in ops.values()):>8} {'':>5} {total:>8.1f}")
+
+    result = {'version': git_version(), 'created': datetime.now().isoformat(timespec="seconds"),
+              'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+              'params': vars(args), 'mix': mix, 'seed': {'rows': seeded, 'seconds': round(seed_s, 1), 'db_mb': round(db_mb, 1)},
+              'elapsed_s': round(elapsed, 2), 'total_per_s': total, 'ops': ops}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Résultat écrit dans {args.out}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            if compare(result, json.load(f), args.tolerance):
+                return 1
+    return 1 if any(o['errors'] for o in ops.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import os
+
+from balika.backup import create_snapshot, restore_snapshot
+from balika.db import Database
+from balika.shards import init_database
+
+
+def _expenses(db):
+    with db.read() as conn:
+        return conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+
+
+def _spend(db, n):
+    with db.write() as conn:
+        conn.executemany("INSERT INTO expenses (label, amount, date, sid, ts) VALUES (?, 1, '01/01/2026', 's', '2026-01-01T10:00:00')",
+                         [(f"dépense {i}",) for i in range(n)])
+
+
+def test_snapshot_streams_and_restores_under_writer_lock(tmp_path):
+    db = Database(str(tmp_path / "live.db"))
+    init_database(db)
+    _spend(db, 100)  # encore dans le WAL : l'instantané doit le contenir
+    backups = str(tmp_path / "backups")
+    seen = []
+    res = create_snapshot(db.path, backups, progress=lambda done, total: seen.append(total))
+    assert seen and res['bytes_raw'] % seen[-1] == 0
+    assert os.listdir(backups) == [os.path.basename(res['path'])]  # aucun fichier temporaire laissé
+
+    _spend(db, 50)
+    assert _expenses(db) == 150
+    restore_snapshot(res['path'], db.path, db)
+    assert _expenses(db) == 100
+    _spend(db, 1)  # l'écrivain reprend après la restauration
+    assert _expenses(db) == 101
+    db.close()
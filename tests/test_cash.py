@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from balika.cash import close_register, pending
+from balika.db import Database
+from balika.services import CartLine, Services
+from balika.shards import init_database
+
+SID = "s"
+
+
+def test_closings_aggregate_only_new_movements(tmp_path):
+    db = Database(str(tmp_path / "cash.db"))
+    init_database(db)
+    with db.write() as conn:
+        conn.execute("INSERT INTO shops (sid, name, closing_balance, closing_balance_cdf) VALUES (?, 'BOUTIQUE', 20, 0)", (SID,))
+        inv_id = conn.execute("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES ('SAVON', 10, 1, 5, ?)",
+                              (SID,)).lastrowid
+    svc = Services.build(db)
+
+    # Jour 1 : vente à crédit (20 $ sur 25 $ encaissés) et dépense
+    sale = svc.sales.checkout(SID, "caisse", [CartLine(inv_id, "SAVON", 5, 5.0, 1.0)], "CLIENT", 20.0, "USD")
+    svc.sales.record_expense(SID, "caisse", "TRANSPORT", 3.0)
+    first = close_register(db, SID, "gérant", 37.0, 0.0, kept_usd=10.0)
+    assert first['since_id'] == 0 and first['movements'] == 2
+    assert first['opening']['USD'] == 20.0 and first['net']['USD'] == 17.0 and first['expected']['USD'] == 37.0
+    assert {k: v['USD'] for k, v in first['by_kind'].items()} == {"VENTE": 20.0, "DÉPENSE": -3.0}
+
+    # Jour 2 : règlement de la dette et retour ; la clôture précédente n'est pas recomptée
+    svc.debts.pay_client(SID, "caisse", "CLIENT", 5.0)
+    svc.sales.record_return(SID, "caisse", sale.ref, "SAVON", 1)
+    with db.read() as conn:
+        p = pending(conn, SID)
+    assert p['since_id'] == first['last_id'] and p['movements'] == 2
+    assert p['opening']['USD'] == 10.0     # fond conservé = fond d'ouverture suivant
+    assert {k: v['USD'] for k, v in p['by_kind'].items()} == {"DETTE": 5.0, "RETOUR": -5.0}
+    second = close_register(db, SID, "gérant", 10.0, 0.0)
+    assert second['expected']['USD'] == 10.0 and second['gap']['USD'] == 0.0
+    with db.read() as conn:
+        assert pending(conn, SID)['movements'] == 0
+        assert conn.execute("SELECT COUNT(*) FROM cash_movements WHERE sid=?", (SID,)).fetchone()[0] == 4
+
+    # Journal en ajout seul
+    with pytest.raises(sqlite3.IntegrityError, match="ajout seul"):
+        with db.write() as conn:
+            conn.execute("UPDATE cash_movements SET amount = 0")
+    with pytest.raises(sqlite3.IntegrityError, match="ajout seul"):
+        with db.write() as conn:
+            conn.execute("DELETE FROM cash_movements")
+    db.close()
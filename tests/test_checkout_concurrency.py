@@ -0,0 +1,58 @@
+import random
+import sqlite3
+import threading
+
+from balika.checkout import StockError, checkout
+from balika.db import Database
+from balika.schema import create_tables, migrate
+
+SHOPS, SKUS, STOCK = 2, 8, 12
+CASHIERS, SALES = 8, 40
+
+
+def test_no_oversell_no_duplicate_ref(tmp_path):
+    path = str(tmp_path / "caisse.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    create_tables(conn.cursor())
+    migrate(conn)
+    for s in range(SHOPS):
+        conn.executemany("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES (?,?,1,2,?)",
+                         [(f"ART-{i}", STOCK, f"shop{s}") for i in range(SKUS)])
+    conn.execute("COMMIT")
+    conn.close()
+
+    db = Database(path)
+    with db.read() as conn:
+        inv = {r[0]: (r[1], r[2]) for r in conn.execute("SELECT id, sid, qty FROM inventory")}
+    by_shop = {}
+    for inv_id, (sid, _) in inv.items():
+        by_shop.setdefault(sid, []).append(inv_id)
+    confirmed, refused = [0] * CASHIERS, [0] * CASHIERS
+
+    def cashier(i):
+        rnd, sid = random.Random(i), f"shop{i % SHOPS}"
+        for _ in range(SALES):
+            lines = [{'id': inv_id, 'item': f"#{inv_id}", 'q': rnd.randint(1, 3), 'p': 2.0, 'buy': 1.0}
+                     for inv_id in rnd.sample(by_shop[sid], rnd.randint(1, 3))]
+            try:
+                checkout(db, sid, f"caissier{i}", lines, "COMPTANT", sum(l['q'] * l['p'] for l in lines), "USD")
+                confirmed[i] += 1
+            except StockError:
+                refused[i] += 1
+
+    threads = [threading.Thread(target=cashier, args=(i,)) for i in range(CASHIERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with db.read() as conn:
+        sold = dict(conn.execute("SELECT inv_id, SUM(qty) FROM sale_items GROUP BY inv_id"))
+        final = dict(conn.execute("SELECT id, qty FROM inventory"))
+        refs = conn.execute("SELECT sid, ref FROM sales").fetchall()
+    db.close()
+    assert sum(refused) > 0          # stock volontairement court : des ventes sont refusées
+    assert min(final.values()) >= 0
+    assert final == {i: q0 - sold.get(i, 0) for i, (_, q0) in inv.items()}
+    assert len(refs) == len(set(refs)) == sum(confirmed)
@@ -0,0 +1,76 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from balika.credit import allocate_payment
+from balika.schema import create_tables, migrate
+
+SID, CLI = "s", "CLIENT A"
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "credit.db", isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    create_tables(conn.cursor())
+    migrate(conn)
+    # Trois factures à crédit, insérées hors ordre chronologique ; une autre cliente
+    conn.executemany("INSERT INTO debts (cli, balance, sale_ref, sid, ts) VALUES (?,?,?,?,?)",
+                     [(CLI, 30.0, "B-2", SID, "2026-01-20T10:00:00"), (CLI, 10.0, "B-1", SID, "2026-01-05T10:00:00"),
+                      (CLI, 50.0, "B-3", SID, "2026-02-10T10:00:00"), ("CLIENT B", 40.0, "B-4", SID, "2026-01-01T10:00:00")])
+    yield conn
+    conn.execute("ROLLBACK")
+    conn.close()
+
+
+def _debts(conn):
+    return dict((ref, (bal, status)) for ref, bal, status in conn.execute("SELECT sale_ref, balance, status FROM debts"))
+
+
+def _client(conn, name=CLI):
+    return conn.execute("SELECT balance, open_debts FROM clients WHERE sid=? AND name=?", (SID, name)).fetchone()
+
+
+def test_fifo_across_debts(conn):
+    pid, applied, lines = allocate_payment(conn, SID, CLI, 25.0, "caisse", now=NOW)
+    assert applied == 25.0
+    assert [(ref, paid, rest) for _, ref, paid, rest in lines] == [("B-1", 10.0, 0.0), ("B-2", 15.0, 15.0)]
+    debts = _debts(conn)
+    assert debts["B-1"] == (0.0, "SOLDE") and debts["B-2"] == (15.0, "OUVERT") and debts["B-3"] == (50.0, "OUVERT")
+    assert debts["B-4"] == (40.0, "OUVERT")
+    assert _client(conn) == (65.0, 2)
+    assert conn.execute("SELECT sid, cli, amount, debts FROM debt_payments WHERE id=?", (pid,)).fetchone() == (SID, CLI, 25.0, 2)
+    assert conn.execute("SELECT sale_ref, amount, balance_after FROM debt_payment_lines WHERE payment_id=? ORDER BY sale_ref",
+                        (pid,)).fetchall() == [("B-1", 10.0, 0.0), ("B-2", 15.0, 15.0)]
+
+
+def test_overpayment_capped_at_amount_owed(conn):
+    pid, applied, lines = allocate_payment(conn, SID, CLI, 500.0, "caisse", now=NOW)
+    assert applied == 90.0 and len(lines) == 3
+    assert all(status == "SOLDE" for ref, (_, status) in _debts(conn).items() if ref != "B-4")
+    assert _client(conn) == (0.0, 0)
+    assert conn.execute("SELECT amount FROM debt_payments WHERE id=?", (pid,)).fetchone()[0] == 90.0
+    # Plus rien à régler : aucun règlement enregistré
+    assert allocate_payment(conn, SID, CLI, 5.0, "caisse", now=NOW) == (None, 0.0, [])
+    assert conn.execute("SELECT COUNT(*) FROM debt_payments").fetchone()[0] == 1
+
+
+def test_debt_id_targets_one_debt(conn):
+    target = conn.execute("SELECT id FROM debts WHERE sale_ref='B-3'").fetchone()[0]
+    _, applied, lines = allocate_payment(conn, SID, CLI, 60.0, "caisse", now=NOW, debt_id=target)
+    assert applied == 50.0 and [l[1] for l in lines] == ["B-3"]
+    debts = _debts(conn)
+    assert debts["B-3"] == (0.0, "SOLDE") and debts["B-1"] == (10.0, "OUVERT") and debts["B-2"] == (30.0, "OUVERT")
+
+
+def test_cash_movement_per_payment(conn):
+    allocate_payment(conn, SID, CLI, 25.0, "caisse", now=NOW)
+    allocate_payment(conn, SID, CLI, 20.0, "caisse", now=NOW)
+    moves = conn.execute("SELECT ref, amount_usd FROM cash_movements WHERE sid=? AND kind='DETTE' ORDER BY id",
+                         (SID,)).fetchall()
+    # Une ligne de caisse par facture touchée, pour le montant imputé
+    assert moves == [("B-1", 10.0), ("B-2", 15.0), ("B-2", 15.0), ("B-3", 5.0)]
+    paid = conn.execute("SELECT SUM(amount) FROM debt_payments").fetchone()[0]
+    assert sum(a for _, a in moves) == paid == 45.0
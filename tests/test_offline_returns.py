@@ -0,0 +1,50 @@
+import json
+
+from balika.db import Database
+from balika.ingest import ingest
+from balika.outbox import Outbox
+from balika.services import CartLine, Services
+from balika.shards import init_database
+
+SID = "s"
+
+
+def _shop(path):
+    db = Database(str(path))
+    init_database(db)
+    with db.write() as conn:
+        conn.execute("INSERT INTO shops (sid, name) VALUES (?, 'BOUTIQUE')", (SID,))
+        conn.execute("INSERT INTO inventory (item, qty, buy_price, sell_price, sid) VALUES ('SAVON', 10, 1, 3, ?)", (SID,))
+    return db
+
+
+def _outbox(db):
+    with db.read() as conn:
+        return [{'uid': u, 'kind': k, 'sid': s, 'ts': ts, 'payload': json.loads(p)}
+                for u, k, s, ts, p in conn.execute("SELECT uid, kind, sid, ts, payload FROM outbox ORDER BY id")]
+
+
+def test_terminal_return_reaches_central(tmp_path):
+    central, terminal = _shop(tmp_path / "central.db"), _shop(tmp_path / "T1.db")
+    svc = Services.build(terminal, outbox=Outbox("T1"))
+    with terminal.read() as conn:
+        inv_id = conn.execute("SELECT id FROM inventory WHERE item='SAVON'").fetchone()[0]
+    sale = svc.sales.checkout(SID, "caisse", [CartLine(inv_id, "SAVON", 4, 3.0, 1.0)], "COMPTANT", 12.0, "USD")
+    assert svc.sales.record_return(SID, "caisse", sale.ref, "SAVON", 3) == 9.0
+
+    records = _outbox(terminal)
+    assert [r['kind'] for r in records] == ["sale", "return"]
+    assert [r['status'] for r in ingest(central, records)] == ["ok", "ok"]
+    with central.read() as conn:
+        assert conn.execute("SELECT qty FROM inventory WHERE item='SAVON'").fetchone()[0] == 10 - 4 + 3
+        assert conn.execute("SELECT sale_ref, qty, refund_amount FROM returns").fetchall() == [(sale.ref, 3, 9.0)]
+        assert conn.execute("SELECT amount_usd FROM cash_movements WHERE kind='RETOUR'").fetchall() == [(-9.0,)]
+
+    # Même plafond qu'au comptoir : 4 vendus, 3 déjà retournés
+    over = dict(records[1], uid="T1-over", payload=dict(records[1]['payload'], qty=2))
+    assert ingest(central, [over])[0]['status'] == "rejected"
+    assert ingest(central, records[1:])[0]['status'] == "duplicate"
+    with central.read() as conn:
+        assert conn.execute("SELECT SUM(qty) FROM returns").fetchone()[0] == 3
+    central.close()
+    terminal.close()
@@ -0,0 +1,42 @@
+from balika.outbox import Outbox, SyncWorker
+from balika.shards import ShardRouter
+
+
+class _Accept:
+    """Client HTTP factice : l'ingestion acquitte chaque enregistrement."""
+
+    def post(self, url, json):
+        return _Response({'results': [{'uid': r['uid'], 'status': "ok", 'sid': r['sid']} for r in json['records']]})
+
+    def close(self):
+        pass
+
+
+class _Response:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def test_worker_drains_every_shard(tmp_path):
+    db = ShardRouter(str(tmp_path / "catalog.db"), str(tmp_path / "shards"))
+    with db.catalog.write() as conn:
+        conn.executemany("INSERT INTO shops (sid, name) VALUES (?,?)", [("a", "A"), ("b", "B")])
+    outbox = Outbox("T1")
+    for sid in ("a", "b"):
+        with db.shop(sid).write() as conn:
+            for k in range(3):
+                outbox.append(conn, "expense", sid, {'label': f"X{k}", 'amount': 1.0})
+    worker = SyncWorker(db, "http://ingest.invalid/", interval=0.05, client=_Accept())
+    try:
+        assert worker.drain(timeout=10)
+        assert worker._thread.is_alive()
+        assert worker.status()['depth'] == 0 and worker.sent == 6 and worker.last_error is None
+    finally:
+        worker.close()
+        db.close()
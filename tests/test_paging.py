@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+from balika.paging import fetch_page_many
+
+
+def _base(n, start=0):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, ts TEXT NOT NULL)")
+    conn.executemany("INSERT INTO t (id, ts) VALUES (?,?)", [(start + i, f"2025-01-{1 + i % 28:02d}") for i in range(n)])
+    return conn
+
+
+def _all_pages(conns, desc, limit=50):
+    seen, after = [], None
+    while True:
+        rows, after = fetch_page_many(conns, "t", ["id"], sort="ts", desc=desc, after=after, limit=limit)
+        seen += [r[0] for r in rows]
+        if after is None:
+            return seen
+
+
+@pytest.mark.parametrize("desc", [False, True])
+def test_full_base_and_empty_base(desc):
+    conns = [_base(60), _base(0)]
+    rows, cursor = fetch_page_many(conns, "t", ["id"], sort="ts", desc=desc, limit=50)
+    assert len(rows) == 50 and cursor is not None
+    assert sorted(_all_pages(conns, desc)) == list(range(60))
+
+
+@pytest.mark.parametrize("desc", [False, True])
+def test_full_base_and_short_base(desc):
+    conns = [_base(60), _base(7, start=1000)]
+    seen = _all_pages(conns, desc)
+    assert sorted(seen) == [*range(60), *range(1000, 1007)]
+    assert len(seen) == len(set(seen))
@@ -0,0 +1,16 @@
+import sqlite3
+
+from balika.schema import HOT_QUERIES, check_query_plans, create_tables, migrate
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    conn = sqlite3.connect(tmp_path / "plans.db", isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        create_tables(conn.cursor())
+        migrate(conn)
+        conn.execute("COMMIT")
+        assert HOT_QUERIES
+        assert check_query_plans(conn) == []
+    finally:
+        conn.close()
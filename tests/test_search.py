@@ -0,0 +1,41 @@
+import sqlite3
+
+import pytest
+
+from balika.schema import create_tables, migrate
+from balika.search import has_fts, search_inventory
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "search.db", isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    create_tables(conn.cursor())
+    migrate(conn)
+    # qty sans NOT NULL : un article peut ne jamais avoir reçu de quantité
+    conn.executemany("INSERT INTO inventory (item, category, qty, sell_price, barcode, sid) VALUES (?,?,?,?,?,'s')",
+                     [("SAVON NULL", "HYGIENE", None, 1, "111"), ("SAVON STOCK", "HYGIENE", 5, 1, "222")])
+    conn.execute("COMMIT")
+    yield conn
+    conn.close()
+
+
+def _items(found):
+    return sorted(r[1] for r in found.values())
+
+
+def test_barcode_with_null_qty(conn):
+    assert search_inventory(conn, "s", "111") == {}
+    assert _items(search_inventory(conn, "s", "111", in_stock=False)) == ["SAVON NULL"]
+    assert _items(search_inventory(conn, "s", "222")) == ["SAVON STOCK"]
+
+
+def test_prefix_with_null_qty(conn):
+    assert _items(search_inventory(conn, "s", "savon")) == ["SAVON STOCK"]
+    assert _items(search_inventory(conn, "s", "savon", in_stock=False)) == ["SAVON NULL", "SAVON STOCK"]
+
+
+def test_fts_with_null_qty(conn):
+    assert has_fts(conn)
+    assert _items(search_inventory(conn, "s", "hygiene")) == ["SAVON STOCK"]
+    assert _items(search_inventory(conn, "s", "hygiene", in_stock=False)) == ["SAVON NULL", "SAVON STOCK"]